@@ -3,11 +3,12 @@ import asyncio
 import importlib
 import json
 import os
+import hashlib
 from typing import Optional, Any, Tuple
 
 try:
     from fastapi import APIRouter, HTTPException, Depends, Request, Response
-    from fastapi.responses import JSONResponse
+    from fastapi.responses import JSONResponse, StreamingResponse
 except Exception:  # pragma: no cover - fallback for test environment without fastapi
     class APIRouter:
         def __init__(self, *args, **kwargs):
@@ -33,12 +34,17 @@ except Exception:  # pragma: no cover - fallback for test environment without fa
     class Request:
         def __init__(self):
             self.session = {}
+            self.headers = {}
 
     class Response:
-        def __init__(self, content="", media_type="text/plain", status_code=200):
+        def __init__(self, content="", media_type="text/plain", status_code=200, headers=None):
             self.content = content
             self.media_type = media_type
             self.status_code = status_code
+            self.headers = headers or {}
+
+    class StreamingResponse(Response):
+        pass
 
 try:
     from pydantic import BaseModel
@@ -50,6 +56,16 @@ except Exception:  # pragma: no cover - fallback for test environment without py
 
 from app.utils.global_helpers import module_helpers as mh
 from app.utils.global_helpers import io_helpers as ioh
+from app.utils.global_helpers import packet_log as pl
+from app.utils.global_helpers.unit_of_work import config_unit_of_work
+from app.utils.global_helpers.nflog_listener import get_listener_stats
+from app.utils.global_helpers.status_registry import StatusRegistry, status_label
+from app.utils.global_helpers.http_cache import cache_headers, is_not_modified
+from app.utils.global_helpers.state_store import read_json_bytes
+from app.utils.global_helpers.snapshot import build_snapshot
+from app.utils.global_helpers.event_bus import event_bus, format_sse
+from app.utils.global_helpers.ruleset_snapshot import SnapshotScheduler
+from app.utils.global_helpers.restore_agent import persist_applied_state
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -59,6 +75,13 @@ ALLOWED_MODULES = ["wan", "nat", "firewall", "vlans", "tagging", "dmz", "ebtable
 BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
 CONFIG_DIR = os.path.join(BASE_DIR, "config")
 
+# Estados de módulos en memoria (se refresca tras cada acción)
+status_registry = StatusRegistry(BASE_DIR, ALLOWED_MODULES)
+# Instantáneas del estado aplicado tras cada acción que lo modifica (arranque rápido)
+state_snapshots = SnapshotScheduler(lambda: persist_applied_state(BASE_DIR))
+STATE_ACTIONS = ("start", "stop", "restart")
+SSE_HEARTBEAT = 15.0
+
 
 # -----------------------------
 # Modelos
@@ -72,12 +95,7 @@ class ModuleRequest(BaseModel):
 # Estado servicios
 # -----------------------------
 def get_status_from_config(module_name: str) -> str:
-    status = mh.get_module_status_by_name(BASE_DIR, module_name)
-    if status == 0:
-        return "INACTIVO"
-    elif status == 1:
-        return "ACTIVO"
-    return "DESCONOCIDO"
+    return status_label(status_registry.get(module_name))
 
 
 # -----------------------------
@@ -97,11 +115,45 @@ def require_login(request: Request) -> str:
 # Endpoints
 # -----------------------------
 @router.get("/status", response_model=dict[str, str])
-async def get_status(_: None = Depends(require_login)):
-    status_info: dict[str, str] = {}
-    for module in ALLOWED_MODULES:
-        status_info[module] = get_status_from_config(module)
-    return status_info
+async def get_status(request: Request, _: None = Depends(require_login)):
+    etag, body = status_registry.snapshot()
+    # no-cache: el navegador revalida siempre con If-None-Match
+    headers = cache_headers(etag)
+    if is_not_modified(request.headers, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/snapshot")
+async def get_snapshot(request: Request, fields: Optional[str] = None, _: None = Depends(require_login)):
+    """
+    Vista completa del panel en una petición: statuses, modules (resumen de
+    configuración), counters y jobs. 'fields' selecciona secciones o elementos,
+    p.ej. ?fields=statuses,modules.wan
+    """
+    _, status_body = status_registry.snapshot()
+    data = build_snapshot(BASE_DIR, ALLOWED_MODULES, json.loads(status_body), fields,
+                          counters={"packet_log": get_listener_stats()})
+    content = json.dumps(data, separators=(",", ":")).encode()
+    etag = '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+    headers = cache_headers(etag)
+    if is_not_modified(request.headers, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.get("/metrics")
+async def get_metrics(probe: bool = False, _: None = Depends(require_login)):
+    """Métricas de rendimiento: dnsmasq (caché DNS, upstreams, eventos DHCP), autenticación y NFLOG."""
+    from app.modules.dhcp import stats as dnsmasq_stats
+    from app.utils.auth_service import auth_service
+    from app.utils.global_helpers.restore_agent import last_restore
+    return {
+        "dnsmasq": await asyncio.to_thread(dnsmasq_stats.collect, probe),
+        "auth": auth_service.stats(),
+        "packet_log": get_listener_stats(),
+        "restore": last_restore,
+    }
 
 
 @router.get("/{module_name}/info")
@@ -110,7 +162,7 @@ async def get_module_info(module_name: str, _: None = Depends(require_login)):
     if module_name not in ALLOWED_MODULES:
         raise HTTPException(status_code=404, detail="Módulo no encontrado")
     
-    status = mh.get_module_status_by_name(BASE_DIR, module_name)
+    status = status_registry.get(module_name)
     return {"status": 1 if status == 1 else 0}
 
 
@@ -128,8 +180,8 @@ async def get_log(module_name: str, _: None = Depends(require_login)):
 
 
 @router.get("/config/{module_name}/{config_file}")
-async def get_config_file(module_name: str, config_file: str, _: None = Depends(require_login)):
-    """Servir archivos de configuración JSON de los módulos."""
+async def get_config_file(module_name: str, config_file: str, request: Request, _: None = Depends(require_login)):
+    """Servir archivos de configuración JSON de los módulos (bytes tal cual, con 304)."""
     if module_name not in ALLOWED_MODULES:
         raise HTTPException(status_code=404, detail="Módulo no encontrado")
     
@@ -137,11 +189,70 @@ async def get_config_file(module_name: str, config_file: str, _: None = Depends(
         raise HTTPException(status_code=400, detail="Solo se permiten archivos JSON")
     
     file_path = os.path.join(CONFIG_DIR, module_name, config_file)
-    content = ioh.read_json_file(file_path, None)
-    
-    if content is None:
+    return json_file_response(request, file_path)
+
+
+def json_file_response(request: Request, file_path: str) -> Response:
+    """Respuesta condicional (ETag / Last-Modified) con el contenido JSON sin decodificar."""
+    try:
+        etag, mtime, content = read_json_bytes(file_path)
+    except (FileNotFoundError, IsADirectoryError):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado o vacío")
+    if not content.strip():
         raise HTTPException(status_code=404, detail="Archivo no encontrado o vacío")
-    return content
+
+    headers = cache_headers(etag, mtime)
+    if is_not_modified(request.headers, etag, mtime):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.get("/packets")
+async def get_packets(prefix: Optional[str] = None, ip: Optional[str] = None, minutes: Optional[float] = None,
+                      limit: int = 100, _: None = Depends(require_login)):
+    """Consultar el almacén de paquetes NFLOG (prefijos [JSB-...] separados por comas, IP, últimos N minutos)."""
+    tags = [t.strip() for t in prefix.split(",") if t.strip()] if prefix else None
+    limit = max(1, min(limit, 1000))
+    records = await asyncio.to_thread(pl.query_packets, tags, ip, minutes, limit)
+    return {"mode": pl.get_log_mode(), "listener": get_listener_stats(), "packets": records}
+
+
+@router.get("/events")
+async def stream_events(request: Request, _: None = Depends(require_login)):
+    """
+    Flujo SSE de eventos (status, action, config). El primer evento es el estado
+    completo; con Last-Event-ID se reenvían los eventos perdidos.
+    """
+    subscription = event_bus.subscribe(request.headers.get("last-event-id"))
+    _, body = status_registry.snapshot()
+
+    async def event_stream():
+        try:
+            yield b"retry: 3000\n\n"
+            yield format_sse("status", {"changes": {}, "statuses": json.loads(body)})
+            while not await request.is_disconnected():
+                try:
+                    event = await subscription.get(SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                yield format_sse(event["type"], dict(event["data"], ts=event["ts"]), event["id"])
+        finally:
+            subscription.close()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
+
+async def watch_status_changes():
+    """Revalida los estados mientras haya clientes SSE (recoge cambios del servidor CLI)."""
+    while True:
+        await asyncio.sleep(status_registry.max_age)
+        if event_bus.subscriber_count():
+            try:
+                status_registry.refresh()
+            except Exception as e:
+                logging.error(f"Error revalidando estados de módulos: {e}")
 
 
 # -----------------------------
@@ -173,11 +284,22 @@ async def execute_module_action(module_name: str, action: str, params: Optional[
         ioh.log_action(module_name, f"Acción '{action}' no permitida")
         return False, f"Acción '{action}' no permitida"
 
+    event_bus.publish("action", {"module": module_name, "action": action, "phase": "started"})
     try:
-        if asyncio.iscoroutinefunction(func):
-            result = await func(params)
-        else:
-            result = func(params)
+        # Todas las escrituras de configuración de la acción se confirman juntas
+        try:
+            with config_unit_of_work() as uow:
+                if asyncio.iscoroutinefunction(func):
+                    result = await func(params)
+                else:
+                    result = func(params)
+        finally:
+            # Una acción puede cambiar el estado de este u otros módulos
+            status_registry.refresh()
+            for path in uow.written:
+                event_bus.publish("config", {"module": module_name, "file": os.path.relpath(path, CONFIG_DIR)})
+        for error in uow.errors:
+            ioh.log_action(module_name, f"{action} - WARNING: {error}", "WARNING")
             
         if isinstance(result, tuple) and len(result) == 2:
             success, message = result
@@ -192,20 +314,31 @@ async def execute_module_action(module_name: str, action: str, params: Optional[
                         log_message = f"(Se listaron {count} switches, detalles ocultos por seguridad)"
                     except Exception:
                         log_message = "(Resumen no disponible, salida oculta)"
+                elif action == "generate_vouchers" and isinstance(message, dict):
+                    log_message = f"(Lote {message.get('batch')}: {len(message.get('codes', []))} vales, códigos ocultos)"
                 elif log_message.startswith("{") or log_message.startswith("["):
                     if len(log_message) > 100:
                         log_message = f"(JSON extenso omitido: {len(log_message)} bytes)"
 
             ioh.log_action(module_name, f"{action} - {'SUCCESS' if success else 'ERROR'}: {log_message}")
+            if success and (uow.written or action in STATE_ACTIONS):
+                state_snapshots.request()
+            _publish_action_finished(module_name, action, bool(success))
             return bool(success), message
         ioh.log_action(module_name, f"Resultado inesperado de la acción '{action}'")
+        _publish_action_finished(module_name, action, True)
         return True, str(result)
     except Exception as e:
         error_message = f"Error ejecutando '{action}': {e}"
         ioh.log_action(module_name, error_message)
+        _publish_action_finished(module_name, action, False)
         return False, error_message
 
 
+def _publish_action_finished(module_name: str, action: str, success: bool):
+    event_bus.publish("action", {"module": module_name, "action": action, "phase": "finished", "success": success})
+
+
 @router.post("/{module_name}")
 async def admin_module(module_name: str, req: ModuleRequest, _: None = Depends(require_login)):
     success, message = await execute_module_action(module_name=module_name, action=req.action, params=req.params)
@@ -1,14 +1,16 @@
 import logging
 import os
-from fastapi import Request, Depends
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from fastapi import Request, Depends, HTTPException
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, Response
 from starlette.types import ASGIApp, Scope, Receive, Send
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 from app.utils.global_helpers import io_helpers as ioh
-from app.utils.auth_helper import authenticate_user
+from app.utils.auth_helper import authenticate_user_async
+from app.utils.auth_service import AuthBusyError
+from .static_assets import AssetStore
 
 # Rutas que no requieren autenticación
 PUBLIC_PATHS = {"/login", "/", "/web/css/login.css", "/web/js/login.js"}
@@ -100,13 +102,30 @@ def setup_app(app):
     app.add_middleware(SecurityHeadersMiddleware)
     app.add_middleware(AuthMiddleware)
 
+    # Recursos de web/ en memoria, con huella y variantes comprimidas
+    assets = AssetStore("web")
+    assets.load()
+    app.state.assets = assets
+
+    def asset_response(full_path: str, request: Request):
+        result = assets.respond(full_path, request.query_params.get("v"), request.headers)
+        if result is None:
+            return None
+        status_code, headers, body = result
+        return Response(content=body, status_code=status_code, headers=headers)
+
     @app.get("/web/{full_path:path}")
     async def protected_web(full_path: str, request: Request):
         # Doble verificación (assets login)
         public_assets = {"css/login.css", "js/login.js"}
         if full_path not in public_assets and "user" not in request.session:
             return RedirectResponse("/login")
-            
+
+        response = asset_response(full_path, request)
+        if response is not None:
+            return response
+
+        # Ficheros añadidos después del arranque
         file_path = os.path.join("web", full_path)
         if not os.path.exists(file_path) or os.path.isdir(file_path):
             return JSONResponse({"detail": "Recurso no encontrado"}, status_code=404)
@@ -117,13 +136,19 @@ def setup_app(app):
         if "user" not in request.session:
             return RedirectResponse("/login")
         file_path = os.path.join("config", full_path)
+        if file_path.endswith(".json"):
+            # Mismo camino que /admin/config: bytes cacheados, ETag y 304
+            try:
+                return admin_router.json_file_response(request, os.path.abspath(file_path))
+            except HTTPException:
+                return JSONResponse({"detail": "Archivo no encontrado"}, status_code=404)
         if not os.path.exists(file_path) or os.path.isdir(file_path):
             return JSONResponse({"detail": "Archivo no encontrado"}, status_code=404)
         return FileResponse(file_path)
 
     @app.get("/login")
-    async def get_login():
-        return FileResponse("web/login.html")
+    async def get_login(request: Request):
+        return asset_response("login.html", request) or FileResponse("web/login.html")
 
     @app.post("/login")
     @limiter.limit("10/15 minute")
@@ -135,7 +160,11 @@ def setup_app(app):
             mfa_code = data.get("mfa_code")
             
             auth_file = os.path.join(os.getcwd(), "config", "cli_users.json")
-            success, user_data = authenticate_user(username, password, auth_file)
+            try:
+                success, user_data = await authenticate_user_async(username, password, auth_file)
+            except AuthBusyError:
+                return JSONResponse({"detail": "Servidor ocupado, reintente en unos segundos"},
+                                    status_code=503, headers={"Retry-After": "2"})
             
             if success:
                 # Verificar si requiere MFA
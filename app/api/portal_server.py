@@ -1,8 +1,10 @@
+import asyncio
 import logging
 import os
 from fastapi import FastAPI, Request
 from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
 import uvicorn
+from app.utils.global_helpers.neighbors import neighbor_table, start_neighbor_monitor, stop_neighbor_monitor
 
 # Configuración básica de log para el portal
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -10,6 +12,55 @@ logger = logging.getLogger("portal")
 
 app = FastAPI(title="JSBach Captive Portal")
 
+VOUCHER_SWEEP_INTERVAL = 30
+
+def _client_mac(client_ip: str):
+    """MAC del cliente según la tabla de vecinos del kernel (None si no aparece)."""
+    return neighbor_table.lookup(client_ip)
+
+async def revoke_macs(macs):
+    """Revoca un lote de MACs con una sola actualización del firewall."""
+    from app.modules.wifi import wifi
+    ok, removed = await asyncio.to_thread(wifi.deauthorize_macs, macs)
+    if removed:
+        logger.info(f"Portal: acceso revocado para {len(removed)} dispositivos: {', '.join(removed)}")
+    elif not ok:
+        logger.error(f"Portal: error al revocar {len(macs)} dispositivos")
+
+async def voucher_maintenance():
+    """Revoca dispositivos con vales agotados y persiste el uso de vales."""
+    from app.modules.wifi.vouchers import voucher_registry
+    while True:
+        await asyncio.sleep(VOUCHER_SWEEP_INTERVAL)
+        try:
+            expired = voucher_registry.expired_macs()
+            if expired:
+                logger.info(f"Portal: {len(expired)} dispositivos con vale agotado")
+                await revoke_macs(expired)
+            await asyncio.to_thread(voucher_registry.persist)
+        except Exception as e:
+            logger.error(f"Portal: error en mantenimiento de vales: {e}")
+
+@app.on_event("startup")
+async def start_voucher_maintenance():
+    from app.modules.wifi.hostapd_ctrl import HostapdEventListener
+    from app.utils.global_helpers import load_json_config
+    start_neighbor_monitor()
+    app.state.voucher_task = asyncio.create_task(voucher_maintenance())
+
+    # Sesiones volátiles: al desconectarse una estación se revoca su acceso (por lotes)
+    wifi_cfg = load_json_config(os.path.join(os.getcwd(), "config", "wifi", "wifi.json"), {})
+    listener = HostapdEventListener(wifi_cfg.get("interface", "wlp3s0"), revoke_macs)
+    app.state.hostapd_task = asyncio.create_task(listener.run())
+
+@app.on_event("shutdown")
+async def stop_voucher_maintenance():
+    from app.modules.wifi.vouchers import voucher_registry
+    app.state.voucher_task.cancel()
+    app.state.hostapd_task.cancel()
+    stop_neighbor_monitor()
+    voucher_registry.persist(force=True)
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     logger.info(f"Portal Request: {request.client.host} -> {request.url.path}")
@@ -37,24 +88,24 @@ async def portal_login(request: Request):
         data = await request.json()
         username = data.get("username")
         password = data.get("password")
+        voucher = data.get("voucher")
         client_ip = request.client.host
+
+        if voucher:
+            return await voucher_login(voucher, client_ip)
         
         # Cargar helpers internamente
-        from app.utils.auth_helper import authenticate_user
+        from app.utils.auth_helper import authenticate_user_async
+        from app.utils.auth_service import AuthBusyError
         portal_users_path = os.path.join(os.getcwd(), "config", "wifi", "portal_users.json")
-        success, user_data = authenticate_user(username, password, portal_users_path)
+        try:
+            success, user_data = await authenticate_user_async(username, password, portal_users_path)
+        except AuthBusyError:
+            return JSONResponse({"detail": "Portal ocupado, reintente en unos segundos"},
+                                status_code=503, headers={"Retry-After": "2"})
         
         if success:
-            import subprocess
-            mac = None
-            try:
-                res = subprocess.check_output(["arp", "-n", client_ip], stderr=subprocess.STDOUT).decode()
-                import re
-                match = re.search(r'([0-9a-fA-F]{2}[:-]){5}([0-9a-fA-F]{2})', res)
-                if match:
-                    mac = match.group(0).lower()
-            except:
-                pass
+            mac = _client_mac(client_ip)
             
             if not mac:
                 logger.warning(f"Portal: Autenticado {username} pero no se detectó MAC de {client_ip}")
@@ -73,6 +124,35 @@ async def portal_login(request: Request):
         logger.error(f"Portal login error: {e}")
         return JSONResponse({"detail": "Error en el portal de acceso"}, status_code=500)
 
+async def voucher_login(code: str, client_ip: str):
+    """Acceso con vale: HMAC en memoria, sin Argon2 ni lectura de ficheros."""
+    from app.modules.wifi.vouchers import voucher_registry
+    if voucher_registry.check(code) is None:
+        return JSONResponse({"detail": "Código de acceso no válido"}, status_code=401)
+
+    mac = _client_mac(client_ip)
+    if not mac:
+        logger.warning(f"Portal: vale válido pero no se detectó MAC de {client_ip}")
+        return JSONResponse({"detail": "No se pudo identificar su dispositivo físico (MAC). Contacte con el administrador."}, status_code=400)
+
+    ok, msg, _expires = voucher_registry.redeem(code, mac)
+    if not ok:
+        return JSONResponse({"detail": msg}, status_code=403)
+
+    from app.modules.wifi import wifi
+    try:
+        ok, msg = await asyncio.to_thread(wifi.authorize_mac, {"mac": mac})
+    except Exception:
+        voucher_registry.release(code, mac)
+        raise
+    if not ok:
+        voucher_registry.release(code, mac)
+        return JSONResponse({"detail": f"Error al autorizar: {msg}"}, status_code=500)
+    voucher_registry.confirm(code, mac)
+    voucher_registry.persist()
+    logger.info(f"Portal: dispositivo {mac} autorizado con vale")
+    return JSONResponse({"message": "¡Conectado! Ya puede navegar."})
+
 # Catch-All para Captive Portal Detection (CPD)
 @app.get("/{path:path}")
 async def captive_portal_catch_all(request: Request, path: str):
@@ -0,0 +1,184 @@
+# app/api/static_assets.py
+"""
+Recursos estáticos de web/ servidos desde memoria.
+
+Al arrancar se lee web/ una sola vez:
+- Cada recurso obtiene una huella (sha256 del contenido).
+- Las referencias a CSS/JS en los HTML se reescriben como "ruta?v=<huella>".
+- Se precalculan las variantes gzip y brotli (si el paquete brotli está
+  instalado) de los tipos comprimibles.
+
+Una petición con ?v=<huella actual> se sirve con 'Cache-Control: immutable'
+(el navegador no vuelve a pedirla). Sin huella se sirve con ETag y 304.
+"""
+
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+import posixpath
+import threading
+from typing import Dict, Mapping, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+from app.utils.global_helpers.http_cache import cache_headers, is_not_modified
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = "/web/"
+COMPRESSIBLE = {".html", ".css", ".js", ".json", ".svg", ".txt", ".md"}
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE = "private, max-age=31536000, immutable"
+REVALIDATE = "private, no-cache"
+
+# src="..." / href="..." hacia CSS o JS locales
+_ASSET_REF = re.compile(r'''(?P<attr>\b(?:src|href))=(?P<q>["'])(?P<url>[^"'?#]+\.(?:css|js))(?P=q)''')
+
+
+class Asset:
+    __slots__ = ("url", "content_type", "digest", "etag", "variants")
+
+    def __init__(self, url: str, content: bytes, content_type: str, compress: bool):
+        self.url = url
+        self.content_type = content_type
+        self.digest = hashlib.sha256(content).hexdigest()[:16]
+        self.etag = f'"{self.digest}"'
+        self.variants: Dict[str, bytes] = {"identity": content}
+        if compress and len(content) >= MIN_COMPRESS_SIZE:
+            gz = gzip.compress(content, compresslevel=9, mtime=0)
+            if len(gz) < len(content):
+                self.variants["gzip"] = gz
+            if brotli is not None:
+                br = brotli.compress(content, quality=11)
+                if len(br) < len(content):
+                    self.variants["br"] = br
+
+
+def _accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def negotiate_encoding(asset: Asset, accept_encoding: Optional[str]) -> str:
+    """Variante más pequeña aceptada por el cliente (br > gzip > identity)."""
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    for encoding in ("br", "gzip"):
+        if encoding in asset.variants and accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return "identity"
+
+
+class AssetStore:
+    """Copia en memoria de web/ con huellas y variantes comprimidas."""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._assets: Dict[str, Asset] = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        raw: Dict[str, bytes] = {}
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+                try:
+                    with open(full, "rb") as f:
+                        raw[rel] = f.read()
+                except OSError as e:
+                    logger.warning(f"No se pudo leer {full}: {e}")
+
+        # Primero CSS/JS y demás (sus huellas se usan al reescribir los HTML)
+        assets: Dict[str, Asset] = {}
+        for rel, content in raw.items():
+            if not rel.endswith(".html"):
+                assets[rel] = self._make_asset(rel, content)
+        for rel, content in raw.items():
+            if rel.endswith(".html"):
+                assets[rel] = self._make_asset(rel, self._fingerprint_html(rel, content, assets))
+
+        with self._lock:
+            self._assets = assets
+        total = sum(len(a.variants["identity"]) for a in assets.values())
+        compressed = sum(min(len(v) for v in a.variants.values()) for a in assets.values())
+        logger.info(f"Recursos web cargados: {len(assets)} ficheros, {total} bytes ({compressed} comprimidos)")
+
+    @staticmethod
+    def _make_asset(rel: str, content: bytes) -> Asset:
+        ext = os.path.splitext(rel)[1].lower()
+        content_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or ext in (".js", ".json", ".svg"):
+            content_type += "; charset=utf-8"
+        return Asset(URL_PREFIX + rel, content, content_type, ext in COMPRESSIBLE)
+
+    @staticmethod
+    def _fingerprint_html(rel: str, content: bytes, assets: Dict[str, Asset]) -> bytes:
+        base = posixpath.dirname(rel)
+        try:
+            text = content.decode("utf-8")
+        except UnicodeDecodeError:
+            return content
+
+        def replace(match):
+            url = match.group("url")
+            if url.startswith(("http:", "https:", "//")):
+                return match.group(0)
+            if url.startswith(URL_PREFIX):
+                target = url[len(URL_PREFIX):]
+            elif url.startswith("/"):
+                return match.group(0)
+            else:
+                target = posixpath.normpath(posixpath.join(base, url))
+            asset = assets.get(target)
+            if asset is None:
+                return match.group(0)
+            q = match.group("q")
+            return f"{match.group('attr')}={q}{url}?v={asset.digest}{q}"
+
+        return _ASSET_REF.sub(replace, text).encode("utf-8")
+
+    def get(self, rel: str) -> Optional[Asset]:
+        with self._lock:
+            return self._assets.get(rel)
+
+    def respond(self, rel: str, query_version: Optional[str],
+                request_headers: Mapping[str, str]) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """(status, cabeceras, cuerpo) o None si el recurso no está en memoria."""
+        asset = self.get(rel)
+        if asset is None:
+            return None
+
+        encoding = negotiate_encoding(asset, request_headers.get("accept-encoding"))
+        # ETag fuerte distinto por codificación (los bytes son distintos)
+        etag = asset.etag if encoding == "identity" else f'"{asset.digest}-{encoding}"'
+        immutable = query_version is not None and query_version == asset.digest
+        headers = cache_headers(etag, cache_control=IMMUTABLE if immutable else REVALIDATE)
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if is_not_modified(request_headers, etag):
+            return 304, headers, b""
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        headers["Content-Type"] = asset.content_type
+        return 200, headers, asset.variants[encoding]
@@ -19,12 +19,12 @@ class CommandParser:
     
     # Acciones específicas por módulo
     MODULE_ACTIONS = {
-        'wan': ['block', 'unblock', 'traffic_log', 'top'],
-        'nat': ['block', 'unblock', 'traffic_log', 'top'],
-        'firewall': ['enable_whitelist', 'disable_whitelist', 'add_rule', 'remove_rule', 'isolate', 'unisolate', 'restrict', 'unrestrict', 'traffic_log', 'top'],
-        'dmz': ['add_destination', 'remove_destination', 'isolate', 'unisolate', 'eliminar'],
-        'vlans': ['isolate', 'unisolate', 'traffic_log', 'top'],
-        'tagging': ['isolate', 'unisolate', 'traffic_log', 'top'],
+        'wan': ['block', 'unblock', 'traffic_log', 'top', 'traffic_query'],
+        'nat': ['block', 'unblock', 'traffic_log', 'top', 'traffic_query'],
+        'firewall': ['enable_whitelist', 'disable_whitelist', 'add_rule', 'remove_rule', 'isolate', 'unisolate', 'restrict', 'unrestrict', 'traffic_log', 'top', 'traffic_query'],
+        'dmz': ['add_destination', 'remove_destination', 'isolate', 'unisolate', 'eliminar', 'traffic_query'],
+        'vlans': ['isolate', 'unisolate', 'traffic_log', 'top', 'traffic_query'],
+        'tagging': ['isolate', 'unisolate', 'traffic_log', 'top', 'traffic_query'],
         'expect': ['auth', 'config', 'reset', 'mac_table', 'isolate', 'unisolate', 'get_state', 'list_switches', 'add_switch', 'remove_switch', 'update_switch', 'security_mode', 'add_to_whitelist', 'remove_from_whitelist', 'apply_whitelist', 'get_whitelist'],
     }
     
@@ -7,7 +7,8 @@ import logging
 import os
 from typing import Tuple
 
-from app.utils.auth_helper import authenticate_user
+from app.utils.auth_helper import authenticate_user_async
+from app.utils.auth_service import AuthBusyError
 from .parser import CommandParser
 from .executor import CommandExecutor
 
@@ -86,7 +87,13 @@ class CLISession:
             
         # Autenticar contra cli_users.json
         auth_file = os.path.join(os.getcwd(), "config", "cli_users.json")
-        success, user_data = authenticate_user(username, password, auth_file)
+        try:
+            success, user_data = await authenticate_user_async(username, password, auth_file)
+        except AuthBusyError:
+            await self.send("")
+            await self.send("⚠️  Servidor ocupado, inténtelo de nuevo en unos segundos")
+            await self.send("")
+            return False
         
         if success:
             self.authenticated = True
@@ -1 +1,9 @@
 from .dhcp import ALLOWED_ACTIONS
+from .helpers import DNSMASQ_DAEMON
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+# dnsmasq solo sirve las VLANs cuya interfaz ya existe al generar su configuración
+LABEL = "DHCP"
+DEPENDENCIES = {"configured": ["wan"], "after": ["vlans"]}
+RESOURCES = []
+LIVE_STATE = {"daemons": [DNSMASQ_DAEMON]}
@@ -1,10 +1,20 @@
 import os
+import re
 import time
-from typing import Dict, Any, Tuple, Optional
+import logging
+import ipaddress
+from typing import Dict, Any, List, Tuple, Optional
 from ...utils.global_helpers import (
     load_json_config, save_json_config, update_module_status, run_command
 )
-from .helpers import generate_dnsmasq_conf, get_dnsmasq_pid
+from ...utils.global_helpers.neighbors import neighbor_table
+from .leases import lease_index, DEFAULT_PAGE_SIZE
+from . import stats as dnsmasq_stats
+from ...utils.global_helpers.process_supervisor import process_tracker, wait_for_exit
+from .helpers import (
+    render_dnsmasq, write_fragment, get_dnsmasq_pid, get_active_vlans, DNSMASQ_DAEMON, DEFAULT_CACHE_SIZE,
+    DHCP_OPTS_FILE, DHCP_HOSTS_FILE, DNS_HOSTS_FILE
+)
 
 # Caminos
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
@@ -13,14 +23,25 @@ CONFIG_FILE = os.path.join(CONFIG_DIR, "dhcp.json")
 DNSMASQ_CONF = os.path.join(CONFIG_DIR, "dnsmasq.conf")
 PID_FILE = os.path.join(CONFIG_DIR, "dnsmasq.pid")
 LOG_FILE = os.path.join(BASE_DIR, "logs", "dhcp", "dnsmasq.log")
+TUNE_STATE_FILE = os.path.join(CONFIG_DIR, "tune_state.json")
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_CONFIG = {
     "status": 0,
     "dns_servers": ["8.8.8.8", "8.8.4.4"],
     "lease_time": "12h",
-    "vlan_configs": {}
+    "vlan_configs": {},
+    "reservations": []
 }
 
+MAX_CACHE_SIZE = 10000
+LEASE_TIME_RE = re.compile(r"^(\d+)([smhdw]?)$")
+LEASE_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+MAC_RE = re.compile(r"^[0-9a-f]{2}(:[0-9a-f]{2}){5}$")
+HOSTNAME_RE = re.compile(r"^[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?$")
+
 def _load_config() -> Dict[str, Any]:
     return load_json_config(CONFIG_FILE, DEFAULT_CONFIG)
 
@@ -30,6 +51,27 @@ def _save_config(cfg: Dict[str, Any]) -> bool:
 def _update_status(status: int):
     update_module_status(CONFIG_FILE, status)
 
+def _write_config(cfg: Dict[str, Any]) -> Tuple[bool, bool, List[str]]:
+    """
+    Escribe dnsmasq.conf y sus fragmentos.
+    Retorna (conf_principal_cambiada, requiere_sighup, advertencias).
+    """
+    conf_content, fragments, warnings = render_dnsmasq(cfg)
+    needs_hup = False
+    for path, content in fragments.items():
+        _changed, removed = write_fragment(path, content)
+        needs_hup = needs_hup or removed
+    try:
+        with open(DNSMASQ_CONF, "r") as f:
+            main_changed = f.read() != conf_content
+    except OSError:
+        main_changed = True
+    if main_changed:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        with open(DNSMASQ_CONF, "w") as f:
+            f.write(conf_content)
+    return main_changed, needs_hup, warnings
+
 def start(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
     """Inicia el servicio dnsmasq."""
     cfg = _load_config()
@@ -40,12 +82,9 @@ def start(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
         _update_status(1)
         return True, f"DHCP ya está en ejecución (PID: {pid})"
     
-    # Generar fichero de configuración de dnsmasq
-    conf_content, warnings = generate_dnsmasq_conf(cfg)
+    # Generar fichero de configuración de dnsmasq y sus fragmentos
     try:
-        os.makedirs(CONFIG_DIR, exist_ok=True)
-        with open(DNSMASQ_CONF, "w") as f:
-            f.write(conf_content)
+        _write_config(cfg)
     except Exception as e:
         return False, f"Error al generar dnsmasq.conf: {str(e)}"
     
@@ -61,11 +100,9 @@ def start(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
     if not success:
         return False, f"Error al iniciar dnsmasq: {msg}"
     
-    # Esperar un momento a que el PID file aparezca y el proceso se estabilice
-    for _ in range(5):
-        time.sleep(0.5)
-        if get_dnsmasq_pid():
-            break
+    # Esperar a que el PID file aparezca (inotify) y apunte a un dnsmasq vivo
+    if not process_tracker.wait_ready(DNSMASQ_DAEMON, 3):
+        logger.warning("dnsmasq no ha escrito su PID file a tiempo")
 
     _update_status(1)
     return True, "Servicio DHCP iniciado correctamente"
@@ -84,21 +121,13 @@ def stop(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
     # Matar el proceso
     run_command(["sudo", "-n", "kill", str(pid)], use_sudo=False)
     
-    # Esperar a que muera
-    timeout = 5
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        if not get_dnsmasq_pid():
-            break
-        time.sleep(0.5)
-    
-    # Si persiste, forzar kill -9
-    pid_ext = get_dnsmasq_pid()
-    if pid_ext:
-        run_command(["sudo", "-n", "kill", "-9", str(pid_ext)], use_sudo=False)
+    # Esperar a que muera (poll sobre su pidfd); si persiste, forzar kill -9
+    if not wait_for_exit(pid, 5):
+        run_command(["sudo", "-n", "kill", "-9", str(pid)], use_sudo=False)
+        wait_for_exit(pid, 2)
 
     # Limpieza de ficheros temporales (Zero-Disk en stop)
-    for f in [PID_FILE, DNSMASQ_CONF]:
+    for f in [PID_FILE, DNSMASQ_CONF, DHCP_OPTS_FILE, DHCP_HOSTS_FILE, DNS_HOSTS_FILE]:
         if os.path.exists(f):
             try: os.remove(f)
             except: pass
@@ -113,14 +142,40 @@ def restart(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
         return False, msg
     return start()
 
+def reload(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
+    """
+    Aplica la configuración en caliente. Solo se reinicia dnsmasq si cambian
+    las interfaces o los rangos (dnsmasq.conf); opciones y reservas se
+    recogen por inotify o, si se eliminan líneas, con SIGHUP.
+    """
+    pid = get_dnsmasq_pid()
+    if not pid:
+        return True, "El servicio DHCP no está en ejecución; la configuración se aplicará al iniciarlo"
+    try:
+        main_changed, needs_hup, _warnings = _write_config(_load_config())
+    except Exception as e:
+        return False, f"Error al generar la configuración de dnsmasq: {str(e)}"
+
+    if main_changed:
+        ok, msg = restart()
+        return ok, f"Interfaces o rangos modificados, dnsmasq reiniciado: {msg}"
+    if needs_hup:
+        # pkill acotado a nuestro dnsmasq (pidfile + nombre), ver sudoers en install.py
+        pkill = __import__("shutil").which("pkill") or "/usr/bin/pkill"
+        success, output = run_command(["sudo", "-n", pkill, "-HUP", "-x", "-F", PID_FILE, "dnsmasq"],
+                                      use_sudo=False)
+        if not success:
+            return False, f"Error al recargar dnsmasq: {output}"
+        return True, "Configuración DHCP recargada (SIGHUP)"
+    return True, "Configuración DHCP aplicada en caliente"
+
 def status(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
     """Devuelve el estado detallado del servicio DHCP."""
     cfg = _load_config()
     pid = get_dnsmasq_pid()
     
-    # Contar leases activas
-    ok_leases, leases = list_leases()
-    lease_count = len(leases) if ok_leases else 0
+    # Contar leases activas (índice en memoria, sin releer el fichero si no cambia)
+    lease_count = lease_index.count()
     
     status_msg = "Estado del Módulo DHCP:\n"
     status_msg += "=" * 30 + "\n"
@@ -131,6 +186,21 @@ def status(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
     status_msg += f"DNS Upstream: {', '.join(cfg.get('dns_servers', []))}\n"
     status_msg += f"Tiempo de concesión: {cfg.get('lease_time')}\n"
     status_msg += f"Leases activas: {lease_count}\n"
+
+    if pid:
+        metrics = dnsmasq_stats.collect()
+        dns = metrics["dns"]
+        if dns:
+            hit_rate = f"{dns['hit_rate'] * 100:.1f}%" if dns["hit_rate"] is not None else "N/A"
+            status_msg += f"Caché DNS: {dns['cachesize']} entradas | Aciertos: {hit_rate} | Expulsiones: {dns['evictions']}\n"
+            for server in dns["servers"]:
+                status_msg += f"  Upstream {server['server']}: {server['queries']} consultas, {server['failed']} fallidas\n"
+        dhcp_events = metrics["dhcp"]
+        status_msg += (
+            f"DHCP (última hora): {dhcp_events['events'].get('DHCPACK', 0)} ACK, "
+            f"{dhcp_events['unique_clients']} clientes, {dhcp_events['naks']} NAK, "
+            f"{dhcp_events['pool_exhausted']} sin direcciones libres\n"
+        )
     
     # Agrupar leases por red/hostname si hay muchas (opcional, de momento simple)
     
@@ -146,28 +216,53 @@ def status(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
             
     return True, status_msg
 
+def _lease_filters(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "search": str(params.get("search", "")).strip(),
+        "vlan": params.get("vlan"),
+        "sort": str(params.get("sort", "ip")),
+    }
+
+def _mark_online(leases: List[Dict[str, Any]]):
+    """Presencia en la tabla de vecinos (solo de las concesiones devueltas)."""
+    neighbors = neighbor_table.snapshot()
+    for lease in leases:
+        lease["online"] = neighbors.get(lease["ip"], {}).get("mac") == lease["mac"]
+
 def list_leases(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
-    """Lista las concesiones (leases) activas del servidor DHCP."""
-    LEASE_FILE = "/var/lib/misc/dnsmasq.leases"
-    if not os.path.exists(LEASE_FILE):
-        return True, [] 
-    
-    leases = []
+    """
+    Lista las concesiones (leases) activas del servidor DHCP.
+    Parámetros opcionales: sort (ip, mac, hostname, timestamp; '-' para
+    descendente), search (prefijo) y vlan. Para listas grandes: query_leases.
+    """
+    params = params or {}
     try:
-        with open(LEASE_FILE, "r") as f:
-            for line in f:
-                parts = line.strip().split()
-                if len(parts) >= 5:
-                    leases.append({
-                        "timestamp": parts[0],
-                        "mac": parts[1],
-                        "ip": parts[2],
-                        "hostname": parts[3] if parts[3] != "*" else "Desconocido",
-                        "client_id": parts[4] if parts[4] != "*" else ""
-                    })
-        return True, leases
+        leases = lease_index.select(**_lease_filters(params))
+    except ValueError as e:
+        return False, f"Parámetros no válidos: {str(e)}"
     except Exception as e:
         return False, f"Error al leer concesiones DHCP: {str(e)}"
+    _mark_online(leases)
+    return True, leases
+
+def query_leases(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
+    """
+    Concesiones paginadas: {"total", "page", "page_size", "leases"}.
+    Mismos filtros que list_leases, más page y page_size.
+    """
+    params = params or {}
+    try:
+        result = lease_index.query(
+            page=params.get("page", 1),
+            page_size=params.get("page_size", DEFAULT_PAGE_SIZE),
+            **_lease_filters(params),
+        )
+    except ValueError as e:
+        return False, f"Parámetros no válidos: {str(e)}"
+    except Exception as e:
+        return False, f"Error al leer concesiones DHCP: {str(e)}"
+    _mark_online(result["leases"])
+    return True, result
 
 def config(params: Dict[str, Any]) -> Tuple[bool, str]:
     """Configura los parámetros del servidor DHCP."""
@@ -186,6 +281,16 @@ def config(params: Dict[str, Any]) -> Tuple[bool, str]:
     if "lease_time" in params:
         cfg["lease_time"] = str(params["lease_time"])
         changed = True
+
+    if "cache_size" in params:
+        try:
+            cache_size = int(params["cache_size"])
+        except (TypeError, ValueError):
+            return False, f"cache_size no válido: {params['cache_size']}"
+        if not 0 <= cache_size <= MAX_CACHE_SIZE:
+            return False, f"cache_size debe estar entre 0 y {MAX_CACHE_SIZE}"
+        cfg["cache_size"] = cache_size
+        changed = True
         
     if "vlan_configs" in params and isinstance(params["vlan_configs"], dict):
         cfg.setdefault("vlan_configs", {}).update(params["vlan_configs"])
@@ -200,15 +305,202 @@ def config(params: Dict[str, Any]) -> Tuple[bool, str]:
 
     if changed:
         if _save_config(cfg):
-            if get_dnsmasq_pid():
-                restart()
-            return True, "Configuración DHCP actualizada"
+            ok, msg = reload()
+            if not ok:
+                return False, f"Configuración DHCP guardada, pero no aplicada: {msg}"
+            return True, f"Configuración DHCP actualizada. {msg}"
         else:
             return False, "Error al guardar la configuración"
             
     return False, "No se realizaron cambios"
 
 
+def add_reservation(params: Dict[str, Any]) -> Tuple[bool, str]:
+    """Reserva una IP fija para una MAC (y opcionalmente un nombre DNS)."""
+    if not params or not params.get("mac") or not params.get("ip"):
+        return False, "Parámetros requeridos: mac, ip"
+    mac = str(params["mac"]).strip().lower().replace("-", ":")
+    if not MAC_RE.match(mac):
+        return False, f"MAC no válida: {params['mac']}"
+    try:
+        ip = str(ipaddress.IPv4Address(str(params["ip"]).strip()))
+    except ValueError:
+        return False, f"IP no válida: {params['ip']}"
+    hostname = str(params.get("hostname", "")).strip()
+    if hostname and not HOSTNAME_RE.match(hostname):
+        return False, f"Nombre de host no válido: {hostname}"
+
+    cfg = _load_config()
+    reservations = cfg.setdefault("reservations", [])
+    for res in reservations:
+        if res.get("ip") == ip and res.get("mac") != mac:
+            return False, f"La IP {ip} ya está reservada para {res.get('mac')}"
+    reservations[:] = [r for r in reservations if r.get("mac") != mac]
+    reservations.append({"mac": mac, "ip": ip, "hostname": hostname})
+    if not _save_config(cfg):
+        return False, "Error al guardar la configuración"
+    ok, msg = reload()
+    if not ok:
+        return False, f"Reserva guardada, pero no aplicada: {msg}"
+    return True, f"Reserva {mac} -> {ip} guardada. {msg}"
+
+def remove_reservation(params: Dict[str, Any]) -> Tuple[bool, str]:
+    """Elimina la reserva de una MAC."""
+    if not params or not params.get("mac"):
+        return False, "Parámetro requerido: mac"
+    mac = str(params["mac"]).strip().lower().replace("-", ":")
+    cfg = _load_config()
+    reservations = cfg.get("reservations", [])
+    remaining = [r for r in reservations if r.get("mac") != mac]
+    if len(remaining) == len(reservations):
+        return False, f"No existe ninguna reserva para {mac}"
+    cfg["reservations"] = remaining
+    if not _save_config(cfg):
+        return False, "Error al guardar la configuración"
+    ok, msg = reload()
+    if not ok:
+        return False, f"Reserva eliminada, pero no aplicada: {msg}"
+    return True, f"Reserva de {mac} eliminada. {msg}"
+
+def list_reservations(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
+    """Lista las reservas de IP fijas."""
+    return True, _load_config().get("reservations", [])
+
+
+def metrics(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
+    """Métricas de dnsmasq: caché DNS, upstreams (probe=true mide su latencia) y eventos DHCP."""
+    probe = str((params or {}).get("probe", "")).lower() in ("1", "true", "yes", "si", "sí")
+    result = dnsmasq_stats.collect(probe=probe)
+    result["leases"] = lease_index.count()
+    return True, result
+
+def _lease_seconds(value: str) -> Optional[int]:
+    match = LEASE_TIME_RE.match(str(value).strip().lower())
+    if not match:
+        return None
+    return int(match.group(1)) * LEASE_UNITS[match.group(2)]
+
+def _format_lease(seconds: int) -> str:
+    return f"{seconds // 86400}d" if seconds % 86400 == 0 else f"{seconds // 3600}h" if seconds % 3600 == 0 else f"{seconds // 60}m"
+
+def _pool_usage(cfg: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Tamaño de cada rango DHCP y concesiones activas en él."""
+    leases_by_vlan = lease_index.snapshot().by_vlan
+    pools = {}
+    for vlan in get_active_vlans():
+        ip_int = vlan.get("ip_interface")
+        if not ip_int or "/" not in ip_int:
+            continue
+        try:
+            network = ipaddress.IPv4Network(ip_int, strict=False)
+            spec = cfg.get("vlan_configs", {}).get(str(vlan.get("id")), {})
+            start_ip = ipaddress.IPv4Address(spec.get("start", str(network.network_address + 100)))
+            end_ip = ipaddress.IPv4Address(spec.get("end", str(network.network_address + 250)))
+        except ValueError:
+            continue
+        pools[str(vlan.get("id"))] = {
+            "size": int(end_ip) - int(start_ip) + 1,
+            "leases": len(leases_by_vlan.get(str(vlan.get("id")), [])),
+        }
+    wifi_cfg = load_json_config(os.path.join(BASE_DIR, "config", "wifi", "wifi.json"), {})
+    if wifi_cfg.get("status") == 1:
+        try:
+            size = int(ipaddress.IPv4Address(wifi_cfg.get("dhcp_end", "10.0.99.200"))) - \
+                int(ipaddress.IPv4Address(wifi_cfg.get("dhcp_start", "10.0.99.100"))) + 1
+            pools["wifi"] = {"size": size, "leases": len(leases_by_vlan.get("wifi", []))}
+        except ValueError:
+            pass
+    return pools
+
+def _evictions_since_last_tune(dns: Dict[str, Any]) -> Tuple[Optional[int], Dict[str, Any]]:
+    """
+    (expulsiones de la caché desde el último ajuste aplicado, referencia actual).
+    None si aún no hay referencia. Los contadores de dnsmasq empiezan de cero
+    con cada proceso: si ha cambiado el PID todo lo contado es posterior.
+    """
+    total = dns.get("evictions")
+    pid = get_dnsmasq_pid()
+    current = {"pid": pid, "evictions": total, "at": int(time.time())}
+    last = load_json_config(TUNE_STATE_FILE, {})
+    if total is None or not last:
+        return None, current
+    if last.get("pid") != pid or total < (last.get("evictions") or 0):
+        return total, current
+    return total - (last.get("evictions") or 0), current
+
+def tune(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, Any]:
+    """
+    Recomienda cache_size y lease_time a partir de la carga observada
+    (expulsiones de la caché desde el último ajuste aplicado, ocupación de los
+    rangos y rotación de clientes). Con apply=true guarda los valores, aplica
+    la configuración y toma la referencia de expulsiones para el siguiente.
+    """
+    params = params or {}
+    apply = str(params.get("apply", "")).lower() in ("1", "true", "yes", "si", "sí")
+    cfg = _load_config()
+    observed = dnsmasq_stats.collect(max_age=0)
+    dns, dhcp_events = observed["dns"], observed["dhcp"]
+    reasons = []
+
+    cache_size = int(cfg.get("cache_size", DEFAULT_CACHE_SIZE))
+    new_cache = cache_size
+    baseline, first_run = None, False
+    if dns is None:
+        reasons.append("dnsmasq no responde a las consultas de estadísticas: caché sin cambios")
+    else:
+        evictions, baseline = _evictions_since_last_tune(dns)
+        first_run = evictions is None
+        if first_run:
+            reasons.append("Primera ejecución: se toma la referencia de expulsiones de la caché "
+                           "(vuelva a ejecutar tune tras un periodo de uso)")
+        elif evictions > 0 and cache_size < MAX_CACHE_SIZE:
+            new_cache = min(MAX_CACHE_SIZE, cache_size * 2)
+            reasons.append(f"{evictions} expulsiones de la caché desde el último ajuste: ampliar a {new_cache} entradas")
+        else:
+            reasons.append("Sin expulsiones en la caché DNS desde el último ajuste: tamaño adecuado")
+
+    lease_time = str(cfg.get("lease_time", "12h"))
+    lease_seconds = _lease_seconds(lease_time)
+    new_lease = lease_time
+    pools = _pool_usage(cfg)
+    usage = max((p["leases"] / p["size"] for p in pools.values() if p["size"] > 0), default=0.0)
+    if lease_seconds is None:
+        reasons.append(f"Tiempo de concesión '{lease_time}' no numérico: sin cambios")
+    elif dhcp_events["pool_exhausted"] > 0 or usage > 0.8:
+        # Rangos casi llenos: liberar antes las IPs de clientes que ya no están
+        target = max(3600, lease_seconds // 2)
+        new_lease = _format_lease(target)
+        reasons.append(f"Ocupación del {usage * 100:.0f}% ({dhcp_events['pool_exhausted']} peticiones sin IP libre): concesión de {new_lease}")
+    elif usage < 0.3 and lease_seconds < 86400 and \
+            dhcp_events["unique_clients"] < max((p["size"] for p in pools.values()), default=0) * 0.3:
+        # Pocos clientes y rangos holgados: menos renovaciones
+        new_lease = _format_lease(86400)
+        reasons.append(f"Ocupación del {usage * 100:.0f}% y baja rotación: concesión de {new_lease}")
+    else:
+        reasons.append(f"Ocupación del {usage * 100:.0f}%: tiempo de concesión adecuado")
+
+    result = {
+        "current": {"cache_size": cache_size, "lease_time": lease_time},
+        "recommended": {"cache_size": new_cache, "lease_time": new_lease},
+        "pools": pools,
+        "reasons": reasons,
+        "applied": False,
+    }
+    if baseline is not None and (first_run or apply):
+        save_json_config(TUNE_STATE_FILE, baseline)
+    if apply and (new_cache != cache_size or new_lease != lease_time):
+        cfg["cache_size"] = new_cache
+        cfg["lease_time"] = new_lease
+        if not _save_config(cfg):
+            return False, "Error al guardar la configuración"
+        ok, msg = reload()
+        if not ok:
+            return False, f"Ajustes guardados, pero no aplicados: {msg}"
+        result["applied"] = True
+        result["message"] = msg
+    return True, result
+
+
 def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     status_val = params.get("status", "on")
     # Persistence
@@ -228,7 +520,14 @@ ALLOWED_ACTIONS = {
     "start": start,
     "stop": stop,
     "restart": restart,
+    "reload": reload,
     "status": status,
     "config": config,
-    "list_leases": list_leases
+    "list_leases": list_leases,
+    "query_leases": query_leases,
+    "add_reservation": add_reservation,
+    "remove_reservation": remove_reservation,
+    "list_reservations": list_reservations,
+    "metrics": metrics,
+    "tune": tune
 }
@@ -2,23 +2,60 @@ import os
 import ipaddress
 from typing import List, Dict, Any, Tuple, Optional
 from ...utils.global_helpers import (
-    load_json_config, run_command, module_helpers as mh
+    load_json_config, get_module_status, module_helpers as mh
 )
+from ...utils.global_helpers.process_supervisor import DaemonSpec, process_tracker
 
 # Caminos absolutos
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 VLAN_CONFIG_FILE = os.path.join(BASE_DIR, "config", "vlans", "vlans.json")
+DHCP_CONFIG_FILE = os.path.join(BASE_DIR, "config", "dhcp", "dhcp.json")
+DNSMASQ_CONF_FILE = os.path.join(BASE_DIR, "config", "dhcp", "dnsmasq.conf")
+DEFAULT_CACHE_SIZE = 1000
+
+# Directorios vigilados por dnsmasq con inotify (dhcp-optsdir, dhcp-hostsdir, hostsdir).
+# Fuera de config/ (700, solo jsbach): dnsmasq los relee tras soltar privilegios
+# (inotify y SIGHUP), así que deben ser legibles por su usuario. Los crea el instalador.
+DNSMASQ_FRAGMENTS_DIR = "/var/lib/jsbach/dnsmasq"
+DHCP_OPTS_DIR = os.path.join(DNSMASQ_FRAGMENTS_DIR, "opts.d")
+DHCP_HOSTS_DIR = os.path.join(DNSMASQ_FRAGMENTS_DIR, "hosts.d")
+DNS_HOSTS_DIR = os.path.join(DNSMASQ_FRAGMENTS_DIR, "names.d")
+DHCP_OPTS_FILE = os.path.join(DHCP_OPTS_DIR, "jsbach.conf")
+DHCP_HOSTS_FILE = os.path.join(DHCP_HOSTS_DIR, "jsbach.conf")
+DNS_HOSTS_FILE = os.path.join(DNS_HOSTS_DIR, "jsbach.hosts")
+
+# dnsmasq lanzado por JSBach (se distingue de otros dnsmasq del sistema por su --conf-file)
+DNSMASQ_DAEMON = DaemonSpec(
+    "dnsmasq", os.path.join(BASE_DIR, "config", "dhcp", "dnsmasq.pid"),
+    os.fsencode(DNSMASQ_CONF_FILE), "dhcp",
+    wanted=lambda: get_module_status(DHCP_CONFIG_FILE) == 1,
+)
 
 def get_active_vlans() -> List[Dict[str, Any]]:
     """Obtiene la lista de VLANs configuradas y activas."""
     cfg = load_json_config(VLAN_CONFIG_FILE, {"vlans": [], "status": 0})
     return cfg.get("vlans", [])
 
-def generate_dnsmasq_conf(dhcp_cfg: Dict[str, Any]) -> Tuple[str, List[str]]:
+def _reservation_lines(dhcp_cfg: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """Líneas de dhcp-hostsdir (mac,ip,nombre) y de hostsdir (ip nombre) de las reservas."""
+    hosts, names = [], []
+    for res in dhcp_cfg.get("reservations", []):
+        mac, ip, hostname = res.get("mac"), res.get("ip"), res.get("hostname", "")
+        if not mac or not ip:
+            continue
+        hosts.append(f"{mac},{ip},{hostname}" if hostname else f"{mac},{ip}")
+        if hostname:
+            names.append(f"{ip} {hostname}")
+    return hosts, names
+
+def render_dnsmasq(dhcp_cfg: Dict[str, Any]) -> Tuple[str, Dict[str, str], List[str]]:
     """
-    Genera el contenido del fichero dnsmasq.conf basado en las VLANs
-    y la configuración del módulo DHCP siguiendo el nuevo template.
-    Retorna una tupla (contenido_config, lista_de_advertencias).
+    Genera la configuración de dnsmasq separada en dos partes:
+    - dnsmasq.conf: interfaces y rangos (dnsmasq solo los lee al arrancar).
+    - Fragmentos en directorios que dnsmasq vigila con inotify: opciones por
+      red (dhcp-optsdir), reservas (dhcp-hostsdir) y sus nombres (hostsdir).
+      Las líneas nuevas se aplican solas, sin reinicio ni pérdida de caché.
+    Retorna (contenido_config, {ruta_fragmento: contenido}, advertencias).
     """
     vlans = get_active_vlans()
     global_dns = dhcp_cfg.get("dns_servers", ["8.8.8.8", "8.8.4.4"])
@@ -27,15 +64,19 @@ def generate_dnsmasq_conf(dhcp_cfg: Dict[str, Any]) -> Tuple[str, List[str]]:
     
     lines = [
         "# Generado automáticamente por JSBach DHCP Module",
-        f"# Debug: vlan_configs keys = {list(dhcp_cfg.get('vlan_configs', {}).keys())}",
         "domain-needed",
         "bogus-priv",
         "no-resolv",
         "no-poll",
         "bind-interfaces",
-        "cache-size=1000",
+        f"cache-size={int(dhcp_cfg.get('cache_size', DEFAULT_CACHE_SIZE))}",
+        f"dhcp-optsdir={DHCP_OPTS_DIR}",
+        f"dhcp-hostsdir={DHCP_HOSTS_DIR}",
+        f"hostsdir={DNS_HOSTS_DIR}",
         ""
     ]
+    # Cada opción lleva la etiqueta de su interfaz (dnsmasq la asigna a las peticiones recibidas por ella)
+    opts = ["# Opciones DHCP por red"]
     
     # Configuración por cada VLAN
     for vlan in vlans:
@@ -76,19 +117,19 @@ def generate_dnsmasq_conf(dhcp_cfg: Dict[str, Any]) -> Tuple[str, List[str]]:
             lines.append(f"# VLAN {vlan_id}: {vlan.get('name')}")
             lines.append(f"interface={iface_name}")
             lines.append(f"dhcp-range={iface_name},{start_ip},{end_ip},{netmask},{lease_time}")
-            lines.append(f"dhcp-option={iface_name},3,{ip_addr}")  # Gateway
-            if dns_str:
-                lines.append(f"dhcp-option={iface_name},6,{dns_str}")  # DNS
             lines.append("")
+            opts.append(f"tag:{iface_name},3,{ip_addr}")  # Gateway
+            if dns_str:
+                opts.append(f"tag:{iface_name},6,{dns_str}")  # DNS
             
         except Exception as e:
             lines.append(f"# Error procesando VLAN {vlan_id}: {str(e)}")
             
     # Configuración para la interfaz Wi-Fi (si está activa)
     wifi_cfg_file = os.path.join(BASE_DIR, "config", "wifi", "wifi.json")
-    if os.path.exists(wifi_cfg_file):
+    wifi_cfg = load_json_config(wifi_cfg_file, {})
+    if wifi_cfg:
         try:
-            wifi_cfg = load_json_config(wifi_cfg_file, {})
             if wifi_cfg.get("status") == 1:
                 iface = wifi_cfg.get("interface", "wlp3s0")
                 ip_addr = wifi_cfg.get("ip_address", "10.0.99.1")
@@ -106,54 +147,67 @@ def generate_dnsmasq_conf(dhcp_cfg: Dict[str, Any]) -> Tuple[str, List[str]]:
                     lines.append("# Módulo Wi-Fi AP")
                     lines.append(f"interface={iface}")
                     lines.append(f"dhcp-range={iface},{start_ip},{end_ip},{mask},{lease_time}")
-                    lines.append(f"dhcp-option={iface},3,{ip_addr}")
-                    lines.append(f"dhcp-option={iface},6,{global_dns[0]}")
+                    lines.append("")
+                    opts.append(f"tag:{iface},3,{ip_addr}")
+                    opts.append(f"tag:{iface},6,{global_dns[0]}")
                     
                     # RFC 8910 / RFC 7710: Captive Portal identification
                     if wifi_cfg.get("portal_enabled", True):
                         portal_port = wifi_cfg.get("portal_port", 8500)
                         portal_url = f"http://{ip_addr}:{portal_port}/portal"
                         # Opción 114 (moderna) y 160 (antigua pero usada por Android/iOS)
-                        lines.append(f"dhcp-option={iface},114,\"{portal_url}\"")
-                        lines.append(f"dhcp-option={iface},160,\"{portal_url}\"")
-                    
-                    lines.append("")
+                        opts.append(f"tag:{iface},114,\"{portal_url}\"")
+                        opts.append(f"tag:{iface},160,\"{portal_url}\"")
         except Exception as e:
             lines.append(f"# Error procesando Wi-Fi: {str(e)}")
-    
-    return "\n".join(lines), warnings
 
-def get_dnsmasq_pid() -> Optional[int]:
+    hosts, names = _reservation_lines(dhcp_cfg)
+    fragments = {
+        DHCP_OPTS_FILE: "\n".join(opts) + "\n",
+        DHCP_HOSTS_FILE: "\n".join(["# Reservas DHCP (mac,ip[,nombre])"] + hosts) + "\n",
+        DNS_HOSTS_FILE: "\n".join(["# Nombres de las reservas DHCP"] + names) + "\n",
+    }
+    return "\n".join(lines), fragments, warnings
+
+def generate_dnsmasq_conf(dhcp_cfg: Dict[str, Any]) -> Tuple[str, List[str]]:
     """
-    Busca el PID de dnsmasq de forma robusta evitando auto-coincidencias de pgrep.
+    Genera el contenido del fichero dnsmasq.conf (sin los fragmentos recargables).
+    Retorna una tupla (contenido_config, lista_de_advertencias).
     """
-    conf_path = os.path.join(BASE_DIR, 'config', 'dhcp', 'dnsmasq.conf')
-    # Usamos ps para listar todos los procesos dnsmasq y sus argumentos
-    # Esto es mucho más seguro que pgrep -f que puede matchear al propio pgrep
-    success, output = run_command(["ps", "-C", "dnsmasq", "-o", "pid,args", "--no-headers"], use_sudo=False)
-    
-    if success and output.strip():
-        for line in output.strip().split("\n"):
-            parts = line.strip().split(None, 1)
-            if len(parts) < 2: continue
-            pid_str, args = parts
-            if conf_path in args:
-                try:
-                    return int(pid_str)
-                except ValueError:
-                    continue
+    content, _fragments, warnings = render_dnsmasq(dhcp_cfg)
+    return content, warnings
 
-    # Fallback al PID file si ps no lo encontró (por si dnsmasq tiene otro nombre en ps)
-    pid_file = os.path.join(BASE_DIR, "config", "dhcp", "dnsmasq.pid")
-    if os.path.exists(pid_file):
-        try:
-            with open(pid_file, "r") as f:
-                pid = int(f.read().strip())
-            # Doble verificación directa del PID
-            success_ps, output_ps = run_command(["ps", "-p", str(pid), "-o", "comm="], use_sudo=False)
-            if success_ps and "dnsmasq" in output_ps:
-                return pid
-        except:
-            pass
-            
-    return None
+def write_fragment(path: str, content: str) -> Tuple[bool, bool]:
+    """
+    Escribe un fragmento de forma atómica si su contenido cambia.
+    Retorna (cambiado, requiere_sighup): dnsmasq incorpora por inotify las
+    líneas nuevas, pero las eliminadas o modificadas siguen vigentes hasta
+    un SIGHUP (que además vacía la caché DNS, por eso se evita si no hace falta).
+    """
+    try:
+        with open(path, "r") as f:
+            previous = f.read()
+    except OSError:
+        previous = None
+    if previous == content:
+        return False, False
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+        # El UMask del servicio (0027) dejaría el directorio cerrado para dnsmasq
+        os.chmod(directory, 0o755)
+    # dnsmasq ignora los ficheros ocultos: el temporal no se carga a medio escribir
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    # dnsmasq lee los fragmentos tras soltar privilegios: deben ser legibles por todos
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+    removed = previous is not None and not set(previous.splitlines()) <= set(content.splitlines())
+    return True, removed
+
+def get_dnsmasq_pid() -> Optional[int]:
+    """
+    PID de nuestro dnsmasq (pidfile verificado con /proc y seguido por pidfd, sin 'ps').
+    """
+    return process_tracker.pid(DNSMASQ_DAEMON)
@@ -0,0 +1,219 @@
+# app/modules/dhcp/leases.py
+"""
+Índice en memoria de las concesiones de dnsmasq (/var/lib/misc/dnsmasq.leases).
+
+El fichero solo se vuelve a leer cuando cambia su firma (mtime/ctime/tamaño/
+inodo); mientras tanto las consultas trabajan sobre el índice:
+- diccionarios por MAC, IP, nombre de host y red (VLAN o Wi-Fi),
+- listas ordenadas de claves para búsquedas por prefijo con bisect,
+- órdenes precalculados (perezosos) para la paginación.
+"""
+
+import os
+import bisect
+import ipaddress
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ...utils.global_helpers import load_json_config
+from ...utils.global_helpers.config_cache import file_signature
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+LEASE_FILE = "/var/lib/misc/dnsmasq.leases"
+VLAN_CONFIG_FILE = os.path.join(BASE_DIR, "config", "vlans", "vlans.json")
+WIFI_CONFIG_FILE = os.path.join(BASE_DIR, "config", "wifi", "wifi.json")
+
+SORT_FIELDS = ("ip", "mac", "hostname", "timestamp")
+SEARCH_FIELDS = ("ip", "mac", "hostname")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def _ip_key(ip: str) -> Tuple[int, int]:
+    try:
+        addr = ipaddress.ip_address(ip)
+        return addr.version, int(addr)
+    except ValueError:
+        return 99, 0
+
+
+def _load_networks() -> List[Tuple[Any, str]]:
+    """(red, etiqueta) de las VLANs configuradas y de la red Wi-Fi."""
+    networks = []
+    for vlan in load_json_config(VLAN_CONFIG_FILE, {"vlans": []}).get("vlans", []):
+        ip_int = vlan.get("ip_interface")
+        if ip_int and "/" in ip_int:
+            try:
+                networks.append((ipaddress.IPv4Network(ip_int, strict=False), str(vlan.get("id"))))
+            except ValueError:
+                continue
+    wifi_cfg = load_json_config(WIFI_CONFIG_FILE, {})
+    if wifi_cfg.get("ip_address"):
+        try:
+            network = ipaddress.IPv4Network(f"{wifi_cfg['ip_address']}/{wifi_cfg.get('netmask', '255.255.255.0')}", strict=False)
+            networks.append((network, "wifi"))
+        except ValueError:
+            pass
+    return networks
+
+
+class _Snapshot:
+    """Contenido indexado de una versión concreta del fichero de concesiones."""
+
+    def __init__(self, leases: List[Dict[str, Any]]):
+        self.leases = leases
+        self.by_mac: Dict[str, Dict[str, Any]] = {}
+        self.by_ip: Dict[str, Dict[str, Any]] = {}
+        self.by_hostname: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_vlan: Dict[str, List[Dict[str, Any]]] = {}
+        self.prefixes: Dict[str, List[Tuple[str, int]]] = {}
+        self._orders: Dict[str, List[int]] = {}
+        for i, lease in enumerate(leases):
+            self.by_mac[lease["mac"]] = lease
+            self.by_ip[lease["ip"]] = lease
+            self.by_hostname.setdefault(lease["hostname"].lower(), []).append(lease)
+            if lease["vlan"] is not None:
+                self.by_vlan.setdefault(lease["vlan"], []).append(lease)
+        for field in SEARCH_FIELDS:
+            self.prefixes[field] = sorted((lease[field].lower(), i) for i, lease in enumerate(leases))
+
+    def search(self, prefix: str) -> List[int]:
+        """Posiciones de las concesiones con IP, MAC o nombre que empiezan por 'prefix'."""
+        prefix = prefix.lower()
+        found = set()
+        for keys in self.prefixes.values():
+            pos = bisect.bisect_left(keys, (prefix, -1))
+            while pos < len(keys) and keys[pos][0].startswith(prefix):
+                found.add(keys[pos][1])
+                pos += 1
+        return sorted(found)
+
+    def order(self, field: str) -> List[int]:
+        """Posiciones ordenadas por 'field' (calculado una vez por versión del fichero)."""
+        order = self._orders.get(field)
+        if order is None:
+            if field == "ip":
+                key = lambda i: _ip_key(self.leases[i]["ip"])
+            elif field == "timestamp":
+                key = lambda i: int(self.leases[i]["timestamp"]) if self.leases[i]["timestamp"].isdigit() else 0
+            else:
+                key = lambda i: self.leases[i][field].lower()
+            order = sorted(range(len(self.leases)), key=key)
+            self._orders[field] = order
+        return order
+
+
+class LeaseIndex:
+    """Concesiones indexadas, recargadas solo cuando cambia el fichero."""
+
+    def __init__(self, path: str = LEASE_FILE):
+        self.path = path
+        self.reloads = 0
+        self._signature = None
+        self._networks_signature = None
+        self._networks: List[Tuple[Any, str]] = []
+        self._snapshot = _Snapshot([])
+        self._lock = threading.Lock()
+
+    def _vlan_for(self, ip: str) -> Optional[str]:
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        for network, label in self._networks:
+            if addr.version == network.version and addr in network:
+                return label
+        return None
+
+    def _parse(self) -> List[Dict[str, Any]]:
+        leases = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    parts = line.strip().split()
+                    # Las líneas "duid ..." (DHCPv6) no son concesiones
+                    if len(parts) < 5:
+                        continue
+                    leases.append({
+                        "timestamp": parts[0],
+                        "mac": parts[1].lower(),
+                        "ip": parts[2],
+                        "hostname": parts[3] if parts[3] != "*" else "Desconocido",
+                        "client_id": parts[4] if parts[4] != "*" else "",
+                        "vlan": self._vlan_for(parts[2]),
+                    })
+        except FileNotFoundError:
+            pass
+        return leases
+
+    def snapshot(self) -> _Snapshot:
+        signature = file_signature(self.path)
+        networks_signature = (file_signature(VLAN_CONFIG_FILE), file_signature(WIFI_CONFIG_FILE))
+        with self._lock:
+            if signature == self._signature and networks_signature == self._networks_signature:
+                return self._snapshot
+            if networks_signature != self._networks_signature:
+                self._networks = _load_networks()
+                self._networks_signature = networks_signature
+            self._snapshot = _Snapshot(self._parse())
+            self._signature = signature
+            self.reloads += 1
+            return self._snapshot
+
+    def count(self) -> int:
+        return len(self.snapshot().leases)
+
+    def get_by_mac(self, mac: str) -> Optional[Dict[str, Any]]:
+        lease = self.snapshot().by_mac.get(mac.lower())
+        return dict(lease) if lease else None
+
+    def get_by_ip(self, ip: str) -> Optional[Dict[str, Any]]:
+        lease = self.snapshot().by_ip.get(ip)
+        return dict(lease) if lease else None
+
+    def _select(self, snap: _Snapshot, search: str, vlan: Optional[str], sort: str) -> List[int]:
+        """
+        Posiciones de las concesiones filtradas y ordenadas. 'sort' admite un
+        '-' inicial para orden descendente; 'search' filtra por prefijo de IP,
+        MAC o nombre.
+        """
+        descending = sort.startswith("-")
+        field = sort.lstrip("-")
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Campo de ordenación no válido: {field} (admitidos: {', '.join(SORT_FIELDS)})")
+
+        order = snap.order(field)
+        if descending:
+            order = order[::-1]
+        if search:
+            matches = set(snap.search(search))
+            order = [i for i in order if i in matches]
+        if vlan is not None:
+            order = [i for i in order if snap.leases[i]["vlan"] == str(vlan)]
+        return order
+
+    def select(self, search: str = "", vlan: Optional[str] = None, sort: str = "ip") -> List[Dict[str, Any]]:
+        """Todas las concesiones que cumplen el filtro, en el orden pedido."""
+        snap = self.snapshot()
+        return [dict(snap.leases[i]) for i in self._select(snap, search, vlan, sort)]
+
+    def query(self, search: str = "", vlan: Optional[str] = None, sort: str = "ip",
+              page: int = 1, page_size: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """Página de concesiones (mismos filtros que select)."""
+        snap = self.snapshot()
+        order = self._select(snap, search, vlan, sort)
+        page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        page = max(1, int(page))
+        start = (page - 1) * page_size
+        return {
+            "total": len(order),
+            "page": page,
+            "page_size": page_size,
+            "leases": [dict(snap.leases[i]) for i in order[start:start + page_size]],
+        }
+
+
+lease_index = LeaseIndex()
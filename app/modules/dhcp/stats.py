@@ -0,0 +1,301 @@
+# app/modules/dhcp/stats.py
+"""
+Telemetría de dnsmasq sin procesos externos.
+
+- DNS: registros TXT de clase CHAOS (cachesize.bind, insertions.bind,
+  evictions.bind, hits.bind, misses.bind, servers.bind) consultados por UDP
+  al propio dnsmasq en 127.0.0.1 (dnsmasq siempre escucha también en lo).
+  El resultado se reutiliza durante DNS_STATS_TTL segundos (vista de estado).
+- DHCP: lectura incremental de dnsmasq.log (solo los bytes nuevos desde la
+  última consulta; se detecta la rotación por inodo/tamaño) agregada en
+  cubos por minuto durante WINDOW segundos.
+"""
+
+import os
+import re
+import copy
+import time
+import socket
+import struct
+import logging
+import secrets
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+LOG_FILE = os.path.join(BASE_DIR, "logs", "dhcp", "dnsmasq.log")
+
+DNS_ADDR = ("127.0.0.1", 53)
+DNS_TIMEOUT = 0.5
+DNS_STATS_TTL = 5.0         # segundos que se reutilizan las consultas CHAOS
+CHAOS_COUNTERS = ("cachesize", "insertions", "evictions", "hits", "misses")
+CLASS_CHAOS = 3
+CLASS_IN = 1
+TYPE_TXT = 16
+TYPE_NS = 2
+
+WINDOW = 3600               # segundos de historial de eventos DHCP
+INITIAL_TAIL = 1024 * 1024  # bytes del log que se leen la primera vez
+MAX_READ = 4 * 1024 * 1024  # bytes máximos por consulta
+
+_DHCP_RE = re.compile(
+    r"^(?P<ts>\w{3}\s+\d+\s+[\d:]{8})\s+dnsmasq-dhcp\[\d+\]:\s+(?:\d+\s+)?"
+    r"(?P<event>DHCP[A-Z]+)\((?P<iface>[^)]+)\)\s*(?P<rest>.*)$"
+)
+_MAC_RE = re.compile(r"([0-9a-fA-F]{2}(?::[0-9a-fA-F]{2}){5})")
+
+
+# =============================================================================
+# DNS (registros CHAOS)
+# =============================================================================
+
+def build_query(name: str, qtype: int = TYPE_TXT, qclass: int = CLASS_CHAOS, recursion: bool = False) -> Tuple[int, bytes]:
+    """(id, paquete) de una consulta DNS con una sola pregunta."""
+    query_id = secrets.randbelow(0x10000)
+    header = struct.pack("!HHHHHH", query_id, 0x0100 if recursion else 0, 1, 0, 0, 0)
+    qname = b"".join(bytes([len(label)]) + label.encode("ascii") for label in name.split(".") if label) + b"\x00"
+    return query_id, header + qname + struct.pack("!HH", qtype, qclass)
+
+
+def _skip_name(packet: bytes, pos: int) -> int:
+    while pos < len(packet):
+        length = packet[pos]
+        if length & 0xC0 == 0xC0:
+            return pos + 2
+        if length == 0:
+            return pos + 1
+        pos += length + 1
+    raise ValueError("Nombre DNS truncado")
+
+
+def parse_txt_response(packet: bytes, query_id: int) -> List[str]:
+    """Cadenas de los registros TXT de la respuesta."""
+    if len(packet) < 12:
+        raise ValueError("Respuesta DNS demasiado corta")
+    rid, flags, qdcount, ancount, _ns, _ar = struct.unpack_from("!HHHHHH", packet)
+    if rid != query_id:
+        raise ValueError("Identificador de respuesta DNS inesperado")
+    if flags & 0x000F:
+        raise ValueError(f"Respuesta DNS con error (rcode {flags & 0x000F})")
+    pos = 12
+    for _ in range(qdcount):
+        pos = _skip_name(packet, pos) + 4
+    strings = []
+    for _ in range(ancount):
+        pos = _skip_name(packet, pos)
+        rtype, _rclass, _ttl, rdlength = struct.unpack_from("!HHIH", packet, pos)
+        pos += 10
+        end = pos + rdlength
+        if rtype == TYPE_TXT:
+            while pos < end:
+                length = packet[pos]
+                strings.append(packet[pos + 1:pos + 1 + length].decode("utf-8", "replace"))
+                pos += length + 1
+        pos = end
+    return strings
+
+
+def query_txt(sock: socket.socket, name: str, addr: Tuple[str, int] = DNS_ADDR) -> List[str]:
+    query_id, packet = build_query(name)
+    sock.sendto(packet, addr)
+    while True:
+        data, _ = sock.recvfrom(4096)
+        try:
+            return parse_txt_response(data, query_id)
+        except ValueError as e:
+            # Respuesta tardía de una consulta anterior: seguir esperando la nuestra
+            if "Identificador" not in str(e):
+                raise
+
+
+def parse_servers(strings: List[str]) -> List[Dict[str, Any]]:
+    """servers.bind: "8.8.8.8#53 120 2" -> servidor, consultas enviadas y fallidas."""
+    servers = []
+    for entry in strings:
+        parts = entry.split()
+        if not parts:
+            continue
+        numbers = [int(p) for p in parts[1:] if p.isdigit()]
+        servers.append({
+            "server": parts[0],
+            "queries": numbers[0] if len(numbers) > 0 else None,
+            "failed": numbers[1] if len(numbers) > 1 else None,
+        })
+    return servers
+
+
+def collect_dns_stats(addr: Tuple[str, int] = DNS_ADDR, timeout: float = DNS_TIMEOUT) -> Optional[Dict[str, Any]]:
+    """Contadores de caché y servidores de dnsmasq, o None si no responde."""
+    stats: Dict[str, Any] = {}
+    started = time.monotonic()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(timeout)
+            for counter in CHAOS_COUNTERS:
+                values = query_txt(sock, f"{counter}.bind", addr)
+                stats[counter] = int(values[0]) if values and values[0].isdigit() else None
+            stats["servers"] = parse_servers(query_txt(sock, "servers.bind", addr))
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"dnsmasq no responde a las consultas CHAOS: {e}")
+        return None
+    stats["local_rtt_ms"] = round((time.monotonic() - started) * 1000 / (len(CHAOS_COUNTERS) + 1), 2)
+    hits, misses = stats.get("hits") or 0, stats.get("misses") or 0
+    stats["hit_rate"] = round(hits / (hits + misses), 4) if hits + misses else None
+    return stats
+
+
+_dns_cache: Tuple[float, Optional[Dict[str, Any]]] = (0.0, None)
+_dns_lock = threading.Lock()
+
+
+def cached_dns_stats(max_age: float = DNS_STATS_TTL) -> Optional[Dict[str, Any]]:
+    """
+    collect_dns_stats() reutilizado durante 'max_age' segundos. Las consultas
+    concurrentes esperan a la que está en curso en lugar de repetirla.
+    """
+    global _dns_cache
+    with _dns_lock:
+        at, stats = _dns_cache
+        if not at or time.monotonic() - at >= max_age:
+            stats = collect_dns_stats()
+            _dns_cache = (time.monotonic(), stats)
+        return copy.deepcopy(stats)
+
+
+def probe_upstream(server: str, timeout: float = 1.0) -> Optional[float]:
+    """Latencia (ms) de una consulta mínima (NS de la raíz) a un servidor upstream."""
+    host, _, port = server.partition("#")
+    try:
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        with socket.socket(family, socket.SOCK_DGRAM) as sock:
+            sock.settimeout(timeout)
+            query_id, packet = build_query(".", TYPE_NS, CLASS_IN, recursion=True)
+            started = time.monotonic()
+            sock.sendto(packet, (host, int(port or 53)))
+            while True:
+                data, _ = sock.recvfrom(4096)
+                if len(data) >= 2 and struct.unpack_from("!H", data)[0] == query_id:
+                    return round((time.monotonic() - started) * 1000, 2)
+    except (OSError, ValueError):
+        return None
+
+
+# =============================================================================
+# DHCP (dnsmasq.log)
+# =============================================================================
+
+def _log_time(ts: str, now: float) -> float:
+    """Marca de tiempo syslog ("Mar  1 10:00:00", sin año) a epoch; 'now' si no se entiende."""
+    try:
+        parsed = time.mktime(time.strptime(f"{time.localtime(now).tm_year} {ts}", "%Y %b %d %H:%M:%S"))
+    except (ValueError, OverflowError):
+        return now
+    # Entradas de diciembre leídas en enero
+    return parsed - 365 * 86400 if parsed > now + 86400 else parsed
+
+
+class DhcpLogStats:
+    """Eventos DHCP del log de dnsmasq agregados por minuto (lectura incremental)."""
+
+    def __init__(self, path: str = LOG_FILE, window: int = WINDOW):
+        self.path = path
+        self.window = window
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._partial = b""
+        self._buckets: Dict[int, Dict[str, Any]] = {}
+        self.total: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _bucket(self, when: float) -> Dict[str, Any]:
+        minute = int(when // 60) * 60
+        bucket = self._buckets.get(minute)
+        if bucket is None:
+            bucket = self._buckets[minute] = {"events": Counter(), "ifaces": Counter(), "macs": set()}
+        return bucket
+
+    def _consume(self, line: str, now: float):
+        match = _DHCP_RE.match(line)
+        if not match:
+            return
+        when = _log_time(match.group("ts"), now)
+        if when < now - self.window:
+            return
+        event, rest = match.group("event"), match.group("rest")
+        bucket = self._bucket(when)
+        if "no address available" in rest:
+            event = "NOADDR"
+        bucket["events"][event] += 1
+        self.total[event] += 1
+        if event == "DHCPACK":
+            bucket["ifaces"][match.group("iface")] += 1
+            mac = _MAC_RE.search(rest)
+            if mac:
+                bucket["macs"].add(mac.group(1).lower())
+
+    def update(self):
+        """Procesa las líneas nuevas del log."""
+        now = time.time()
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != self._inode or st.st_size < self._offset:
+                    # Primera lectura o log rotado/truncado
+                    first = self._inode is None
+                    self._inode = st.st_ino
+                    self._partial = b""
+                    self._offset = max(0, st.st_size - INITIAL_TAIL) if first else 0
+                    if self._offset:
+                        f.seek(self._offset)
+                        skipped = f.readline()  # línea incompleta
+                        self._offset += len(skipped)
+                f.seek(self._offset)
+                data = f.read(MAX_READ)
+        except OSError:
+            return
+        self._offset += len(data)
+        data = self._partial + data
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        for raw in lines:
+            self._consume(raw.decode("utf-8", "replace"), now)
+        cutoff = now - self.window
+        for minute in [m for m in self._buckets if m + 60 <= cutoff]:
+            del self._buckets[minute]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            self.update()
+            events: Counter = Counter()
+            ifaces: Counter = Counter()
+            macs = set()
+            for bucket in self._buckets.values():
+                events.update(bucket["events"])
+                ifaces.update(bucket["ifaces"])
+                macs |= bucket["macs"]
+            return {
+                "window_minutes": self.window // 60,
+                "events": dict(events),
+                "acks_per_interface": dict(ifaces),
+                "unique_clients": len(macs),
+                "naks": events.get("DHCPNAK", 0),
+                "pool_exhausted": events.get("NOADDR", 0),
+            }
+
+
+dhcp_log_stats = DhcpLogStats()
+
+
+def collect(probe: bool = False, max_age: float = DNS_STATS_TTL) -> Dict[str, Any]:
+    """
+    Métricas de DNS (caché, upstreams) y DHCP (eventos recientes).
+    max_age=0 fuerza nuevas consultas CHAOS.
+    """
+    dns = cached_dns_stats(max_age)
+    if dns is not None and probe:
+        for server in dns["servers"]:
+            server["latency_ms"] = probe_upstream(server["server"])
+    return {"dns": dns, "dhcp": dhcp_log_stats.summary(), "collected_at": int(time.time())}
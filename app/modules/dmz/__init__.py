@@ -1 +1,8 @@
 from .dmz import ALLOWED_ACTIONS
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+# Inserta reglas en JSB_FW_RESTRICT: tras el firewall y el NAT
+LABEL = "DMZ"
+DEPENDENCIES = {"configured": ["wan"], "active": ["vlans", "tagging"], "after": ["firewall", "nat"]}
+RESOURCES = ["iptables"]
+LIVE_STATE = {"iptables": ["JSB_DMZ_", "JSB_FW_RESTRICT"]}
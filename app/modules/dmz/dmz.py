@@ -8,7 +8,8 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "
 import logging
 from typing import Dict, Any, Tuple
 from ...utils.global_helpers import run_command
-from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh
+from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh, packet_log as pl
+from ...utils.global_helpers.neighbors import neighbor_table
 from .helpers import (
     ensure_dirs, write_log, load_config, save_config,
     load_wan_config, load_firewall_config, load_vlans_config, get_vlan_from_ip,
@@ -147,7 +148,7 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
             _run_command([
                 f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-A", chain_name,
                 "-i", wan_interface, "-p", protocol, "--dport", str(port),
-                "-j", "LOG", "--log-prefix", f"[JSB-DMZ-DNAT] {ip}:{port} "
+                *pl.iptables_log_target(f"[JSB-DMZ-DNAT] {ip}:{port} ")
             ])
             cmd = [
                 f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-A", chain_name,
@@ -303,7 +304,8 @@ def status(params: Dict[str, Any] = None) -> Tuple[bool, str]:
             port = dest["port"]
             protocol = dest["protocol"]
             vlan_id = _get_vlan_from_ip(ip)
-            lines.append(f"  - {ip}:{port}/{protocol} (VLAN {vlan_id})")
+            mac = neighbor_table.lookup(ip) or "sin respuesta ARP"
+            lines.append(f"  - {ip}:{port}/{protocol} (VLAN {vlan_id}, MAC {mac})")
     
     msg = "\n".join(lines)
     logger.info("=== FIN: dmz status ===")
@@ -765,8 +767,15 @@ def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     ioh.log_action(os.path.basename(os.path.dirname(__file__)), f"Traffic Log set to {status_val}")
     return True, f"Log de tráfico configurado: {status_val}"
 
+
+def traffic_query(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    """Consultar los paquetes registrados por las reglas [JSB-DMZ-*]."""
+    return pl.traffic_query(["JSB-DMZ"], params)
+
+
 ALLOWED_ACTIONS = {
     "traffic_log": traffic_log,
+    "traffic_query": traffic_query,
     "start": start,
     "stop": stop,
     "restart": restart,
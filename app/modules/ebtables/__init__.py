@@ -1 +1,7 @@
 from .ebtables import ALLOWED_ACTIONS
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+LABEL = "Ebtables"
+DEPENDENCIES = {"configured": ["wan"], "active": ["vlans", "tagging"]}
+RESOURCES = ["ebtables"]
+LIVE_STATE = {"ebtables": ["JSB_EBT_"]}
@@ -6,7 +6,7 @@ import os
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 import logging
 from typing import Dict, Any, Tuple
-from ...utils.global_helpers import module_helpers as mh
+from ...utils.global_helpers import module_helpers as mh, packet_log as pl
 from ...utils.global_helpers.io_helpers import log_action
 from ...utils.global_helpers.io_helpers import log_action
 from ...utils.global_helpers.io_helpers import log_action
@@ -944,26 +944,14 @@ def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     if status_val not in ["on", "off"]:
         return False, "Parámetro 'status' debe ser 'on' u 'off'"
 
-    action = "-I" if status_val == "on" else "-D"
-    cmd = [f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", action, "FORWARD", "--log-prefix", "[JSB-EBT-FWD] ", "-j", "LOG"]
-    success, msg = run_ebtables(cmd)
-    if success:
-        eb_cfg = load_ebtables_config()
-        eb_cfg["traffic_log_enabled"] = (status_val == "on")
-        save_ebtables_config(eb_cfg)
-        return True, f"Log de tráfico EBTABLES {'activado' if status_val == 'on' else 'desactivado'}"
-    return False, f"Error configurando log EBTABLES: {msg}"
-
-
-def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
-    """Activar/Desactivar log de tráfico EBTABLES (Capa 2)."""
-    status_val = params.get("status")
-    if status_val not in ["on", "off"]:
-        return False, "Parámetro 'status' debe ser 'on' u 'off'"
-
-    action = "-I" if status_val == "on" else "-D"
-    cmd = [f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", action, "FORWARD", "--log-prefix", "[JSB-EBT-FWD] ", "-j", "LOG"]
-    success, msg = run_ebtables(cmd)
+    # El log en ebtables es un watcher (LOG o NFLOG); CONTINUE deja seguir la evaluación
+    if status_val == "on":
+        success, msg = run_ebtables(["-I", "FORWARD", *pl.ebtables_log_watcher("[JSB-EBT-FWD] "), "-j", "CONTINUE"])
+    else:
+        results = [run_ebtables(["-D", "FORWARD", *watcher, "-j", "CONTINUE"])
+                   for watcher in pl.ebtables_log_watchers("[JSB-EBT-FWD] ")]
+        success = any(ok for ok, _ in results)
+        msg = results[-1][1]
     if success:
         eb_cfg = load_ebtables_config()
         eb_cfg["traffic_log_enabled"] = (status_val == "on")
@@ -972,21 +960,9 @@ def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     return False, f"Error configurando log EBTABLES: {msg}"
 
 
-def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
-    """Activar/Desactivar log de tráfico EBTABLES (Capa 2)."""
-    status_val = params.get("status")
-    if status_val not in ["on", "off"]:
-        return False, "Parámetro 'status' debe ser 'on' u 'off'"
-
-    action = "-I" if status_val == "on" else "-D"
-    cmd = [f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", action, "FORWARD", "--log-prefix", "[JSB-EBT-FWD] ", "-j", "LOG"]
-    success, msg = run_ebtables(cmd)
-    if success:
-        eb_cfg = load_ebtables_config()
-        eb_cfg["traffic_log_enabled"] = (status_val == "on")
-        save_ebtables_config(eb_cfg)
-        return True, f"Log de tráfico EBTABLES {'activado' if status_val == 'on' else 'desactivado'}"
-    return False, f"Error configurando log EBTABLES: {msg}"
+def traffic_query(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    """Consultar los paquetes registrados por las reglas [JSB-EBT-*]."""
+    return pl.traffic_query(["JSB-EBT"], params)
 
 ALLOWED_ACTIONS = {
     "start": start,
@@ -1001,6 +977,7 @@ ALLOWED_ACTIONS = {
     "disable_blacklist": disable_blacklist,
     "show_blacklist": show_blacklist,
     "config": config,
-    "traffic_log": traffic_log
+    "traffic_log": traffic_log,
+    "traffic_query": traffic_query,
 }
 
@@ -2,7 +2,6 @@
 # Helper functions para el módulo Ebtables (aislamiento L2)
 
 import subprocess
-import json
 import os
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 import logging
@@ -10,7 +9,8 @@ import re
 from typing import Dict, Any, Tuple, List
 from ...utils.global_helpers import (
     module_helpers as mh,
-    io_helpers as ioh
+    io_helpers as ioh,
+    packet_log as pl
 )
 from ...utils.validators import validate_interface_name
 from ...utils.global_helpers import (
@@ -61,38 +61,17 @@ def save_ebtables_config(data: dict):
 
 def load_vlans_config() -> dict:
     """Cargar configuración de VLANs desde vlans.json."""
-    if not os.path.exists(VLANS_CONFIG_FILE):
-        return {"vlans": [], "status": 0}
-    try:
-        with open(VLANS_CONFIG_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Error cargando VLANs config: {e}")
-        return {"vlans": [], "status": 0}
+    return load_json_config(VLANS_CONFIG_FILE, {"vlans": [], "status": 0})
 
 
 def load_wan_config() -> dict:
     """Cargar configuración de WAN."""
-    if not os.path.exists(WAN_CONFIG_FILE):
-        return None
-    try:
-        with open(WAN_CONFIG_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Error cargando WAN config: {e}")
-        return None
+    return load_json_config(WAN_CONFIG_FILE, None)
 
 
 def load_tagging_config() -> dict:
     """Cargar configuración de tagging desde tagging.json."""
-    if not os.path.exists(TAGGING_CONFIG_FILE):
-        return {"interfaces": [], "status": 0}
-    try:
-        with open(TAGGING_CONFIG_FILE, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Error cargando tagging config: {e}")
-        return {"interfaces": [], "status": 0}
+    return load_json_config(TAGGING_CONFIG_FILE, {"interfaces": [], "status": 0})
 
 
 def validate_wan_interface(wan_iface: str) -> Tuple[bool, str]:
@@ -520,7 +499,7 @@ def apply_isolation(vlan_id: int, wan_iface: str, vlan_interfaces: List[str]) ->
     
     if not drop_exists:
         # LOG before DROP (Full Logging)
-        run_ebtables(["-A", chain_name, "--log-level", "info", "--log-prefix", f"[JSB-EBT-BLOCK] VLAN-{vlan_id} ISO ", "-j", "CONTINUE"])
+        run_ebtables(["-A", chain_name, *pl.ebtables_log_watcher(f"[JSB-EBT-BLOCK] VLAN-{vlan_id} ISO "), "-j", "CONTINUE"])
         success, msg = run_ebtables(["-A", chain_name, "-j", "DROP"])
         
         if not success:
@@ -695,10 +674,10 @@ def apply_mac_filter_rules(vlan_id: Any, _, blacklist: list) -> bool:
         for mac_addr in blacklist:
             normalized_mac = normalize_mac_address(mac_addr)
             # LOG before DROP
-            run_ebtables(["-A", chain_name, "-s", normalized_mac, "--log-prefix", f"[JSB-EBT-BLOCK] {vlan_id} MAC-S ", "-j", "CONTINUE"])
+            run_ebtables(["-A", chain_name, "-s", normalized_mac, *pl.ebtables_log_watcher(f"[JSB-EBT-BLOCK] {vlan_id} MAC-S "), "-j", "CONTINUE"])
             run_ebtables(["-A", chain_name, "-s", normalized_mac, "-j", "DROP"])
             
-            run_ebtables(["-A", chain_name, "-d", normalized_mac, "--log-prefix", f"[JSB-EBT-BLOCK] {vlan_id} MAC-D ", "-j", "CONTINUE"])
+            run_ebtables(["-A", chain_name, "-d", normalized_mac, *pl.ebtables_log_watcher(f"[JSB-EBT-BLOCK] {vlan_id} MAC-D "), "-j", "CONTINUE"])
             run_ebtables(["-A", chain_name, "-d", normalized_mac, "-j", "DROP"])
     
     logger.info(f"MAC blacklist aplicada a {vlan_id} con {len(blacklist)} entradas")
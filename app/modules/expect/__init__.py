@@ -2,7 +2,7 @@
 import os
 import json
 from typing import Dict, Any, Tuple, Optional, cast
-from . import state_manager, actions
+from . import state_manager, actions, session_pool
 from .base import logger
 from app.utils.global_helpers import (
     load_json_config, save_json_config, update_module_status,
@@ -133,6 +133,7 @@ def auth(params: Dict[str, Any]) -> Tuple[bool, str]:
     secrets = load_json_config(SECRETS_JSON)
     secrets[ip] = {"user": user, "password": password or ""}
     save_json_config(SECRETS_JSON, secrets)
+    session_pool.discard(ip)
     return True, f"Credenciales guardadas para {ip}"
 
 def list_switches(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
@@ -191,6 +192,7 @@ def add_switch(params: Dict[str, Any]) -> Tuple[bool, str]:
     # Actualizar credenciales si vienen en el request
     password = params.get("password")
     _update_credentials(ip, params["user"], password)
+    session_pool.discard(ip)
     
     return True, "Switch guardado"
 
@@ -207,6 +209,7 @@ def remove_switch(params: Dict[str, Any]) -> Tuple[bool, str]:
     if ip in secrets:
         del secrets[ip]
         save_json_config(SECRETS_JSON, secrets)
+    session_pool.discard(ip)
     return True, "Switch eliminado"
 
 def update_switch(params: Dict[str, Any]) -> Tuple[bool, str]:
@@ -245,6 +248,7 @@ def update_switch(params: Dict[str, Any]) -> Tuple[bool, str]:
             "password": params.get("password", "")
         }
     save_json_config(SECRETS_JSON, secrets)
+    session_pool.discard(original_ip)
     
     return True, f"Switch {ip} actualizado"
 
@@ -303,7 +307,9 @@ async def get_whitelist_action(params: Dict[str, Any]) -> Tuple[bool, str]:
 
 def status(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]: return True, "Módulo Expect Modular activo"
 def start(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]: return True, "Iniciado"
-def stop(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]: return True, "Detenido"
+async def stop(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
+    await session_pool.close_all()
+    return True, "Detenido"
 def restart(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]: return True, "Reiniciado"
 
 async def set_security_toggle(params: Dict[str, Any]) -> Tuple[bool, str]:
@@ -351,3 +357,9 @@ ALLOWED_ACTIONS = {
     "stop": stop,
     "restart": restart
 }
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+LABEL = "Expect"
+DEPENDENCIES = {"configured": ["wan"], "active": ["vlans", "tagging"]}
+RESOURCES = []
+RESTORE = "never"
@@ -1,15 +1,13 @@
 # app/modules/expect/actions/config.py
 from typing import Dict, Any, Tuple, Optional
-from ..base import async_run_expect_script
+from .. import session_pool
 from .. import state_manager
 from ..helpers import parse_config_blocks
 
 async def run_config(ip: str, actions_raw: str, profile: Dict[str, Any], _auth_required: bool, user: str, password: str, dry_run: bool = False, protocol: Optional[str] = None) -> Tuple[bool, str]:
-    from ..base import get_script_path
     commands = []
     
     blocks = parse_config_blocks(actions_raw)
-    config_prompt = profile["prompts"]["config"]
     
     for block in blocks:
         ports = block.get("ports")
@@ -35,28 +33,13 @@ async def run_config(ip: str, actions_raw: str, profile: Dict[str, Any], _auth_r
                     cmd = cmd_template.replace("{value}", str(val))
                     commands.append(cmd)
 
-    # Configuración vía variable de entorno (Zero-Disk)
+    # Sesión persistente del switch (Zero-Disk: los comandos no pasan por disco)
     try:
-        env_vars = {
-            "PROTOCOL": protocol or profile.get("auth_type", "telnet"),
-            "IP": ip,
-            "USER": user,
-            "LOGIN_PROMPT": profile["prompts"]["login"],
-            "PASSWORD_PROMPT": profile["prompts"]["password"],
-            "EXEC_PROMPT": profile["prompts"]["exec"],
-            "PRIV_PROMPT": profile["prompts"]["exec_priv"],
-            "CONFIG_PROMPT": config_prompt,
-            "CLI_COMMANDS": "\n".join(commands),
-            "SAVE_CMD": profile.get("save_cmd", "write memory"),
-            "EXPECT_PASS": password or ""
-        }
-        
-        script_path = get_script_path("generic_config")
+        job = session_pool.config_job(profile, commands)
         if dry_run:
-            with open(script_path, 'r') as f:
-                return True, f"MODO SIMULACIÓN (Script Externo):\n{f.read()}\n\nCOMANDOS:\n" + "\n".join(commands)
-            
-        success, stdout, stderr = await async_run_expect_script(script_path, timeout=180, env_vars=env_vars)
+            return True, "MODO SIMULACIÓN (sesión persistente):\n\nCOMANDOS:\n" + "\n".join(job)
+
+        success, stdout = await session_pool.run_commands(ip, profile, user, password, job, protocol=protocol)
         if success:
             state = state_manager.load_state()
             state.setdefault("switches", {}).setdefault(ip, {})["last_config"] = {
@@ -64,19 +47,17 @@ async def run_config(ip: str, actions_raw: str, profile: Dict[str, Any], _auth_r
                 "status": "success"
             }
             state_manager.save_state(state)
-        return success, stdout if success else f"Error en configuración: {stderr or stdout}"
+        return success, stdout if success else f"Error en configuración: {stdout}"
     except Exception as e:
         return False, f"Error ejecutando configuración: {e}"
 
 async def run_reset(ip: str, profile: Dict[str, Any], _auth_required: bool, user: str, password: str, max_ports: int, dry_run: bool = False, protocol: Optional[str] = None) -> Tuple[bool, str]:
-    from ..base import get_script_path
     commands = []
     
     reset_cmd_tmpl = profile.get("reset_cmd")
     if not reset_cmd_tmpl:
         return False, "El perfil no soporta la función de reset."
 
-    config_prompt = profile["prompts"]["config"]
     port_prefix = profile.get("port_prefix", "ethernet ")
     cmds = [c.strip() for c in reset_cmd_tmpl.split(',')]
     
@@ -95,30 +76,15 @@ async def run_reset(ip: str, profile: Dict[str, Any], _auth_required: bool, user
                 commands.append(actual_cmd)
             commands.append("exit")
 
-    # Reset vía variable de entorno (Zero-Disk)
+    # Reset en la sesión persistente del switch (Zero-Disk)
     try:
-        env_vars = {
-            "PROTOCOL": protocol or profile.get("auth_type", "telnet"),
-            "IP": ip,
-            "USER": user,
-            "LOGIN_PROMPT": profile["prompts"]["login"],
-            "PASSWORD_PROMPT": profile["prompts"]["password"],
-            "EXEC_PROMPT": profile["prompts"]["exec"],
-            "PRIV_PROMPT": profile["prompts"]["exec_priv"],
-            "CONFIG_PROMPT": config_prompt,
-            "CLI_COMMANDS": "\n".join(commands),
-            "SAVE_CMD": profile.get("save_cmd", "write memory"),
-            "EXPECT_PASS": password or ""
-        }
-        
-        script_path = get_script_path("generic_config")
+        job = session_pool.config_job(profile, commands)
         if dry_run:
-            with open(script_path, 'r') as f:
-                return True, f"MODO SIMULACIÓN (Reset - Script Externo):\n{f.read()}\n\nCOMANDOS:\n" + "\n".join(commands)
-            
-        success, stdout, stderr = await async_run_expect_script(script_path, timeout=180, env_vars=env_vars)
+            return True, "MODO SIMULACIÓN (Reset - sesión persistente):\n\nCOMANDOS:\n" + "\n".join(job)
+
+        success, stdout = await session_pool.run_commands(ip, profile, user, password, job, protocol=protocol)
         if success:
             state_manager.clear_switch_state(ip)
-        return success, stdout if success else f"Error en reset: {stderr or stdout}"
+        return success, stdout if success else f"Error en reset: {stdout}"
     except Exception as e:
         return False, f"Error ejecutando reset: {e}"
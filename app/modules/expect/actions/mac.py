@@ -1,7 +1,7 @@
 # app/modules/expect/actions/mac.py
 import re
 from typing import Dict, Any, Tuple, Optional
-from ..base import async_run_expect_script
+from .. import session_pool
 from .. import state_manager
 from ..helpers import normalize_mac
 
@@ -27,28 +27,17 @@ def mac_acl_name(profile: Dict[str, Any], mac: str) -> str:
     return re.sub(r"[^a-zA-Z0-9_-]", "_", name)
 
 async def run_mac_table(ip: str, profile: Dict[str, Any], _auth_required: bool, user: str, password: str, protocol: Optional[str] = None) -> Tuple[bool, str]:
-    from ..base import get_script_path
-    
-    env_vars = {
-        "PROTOCOL": protocol or profile.get("auth_type", "telnet"),
-        "IP": ip,
-        "USER": user,
-        "LOGIN_PROMPT": profile["prompts"]["login"],
-        "PASSWORD_PROMPT": profile["prompts"]["password"],
-        "EXEC_PROMPT": profile["prompts"]["exec"],
-        "PRIV_PROMPT": profile["prompts"]["exec_priv"],
-        "MAC_TABLE_CMD": profile.get("mac_table_cmd", "show mac address-table"),
-        "EXPECT_PASS": password or ""
-    }
-    
     try:
-        script_path = get_script_path("mac_table")
-        success, stdout, stderr = await async_run_expect_script(script_path, timeout=30, env_vars=env_vars)
+        success, stdout = await session_pool.run_commands(
+            ip, profile, user, password,
+            [profile.get("mac_table_cmd", "show mac address-table")],
+            protocol=protocol,
+        )
         
         if not success and ("MAC" in stdout and "VLAN" in stdout):
             success = True
             
-        return success, stdout if success else f"Error consultando tabla MAC: {stderr or stdout}"
+        return success, stdout if success else f"Error consultando tabla MAC: {stdout}"
     except Exception as e:
         return False, f"Error ejecutando mac_table: {e}"
 
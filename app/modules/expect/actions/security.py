@@ -1,19 +1,16 @@
 # app/modules/expect/actions/security.py
 from typing import Dict, Any, Tuple, Optional
-from ..base import async_run_expect_script
+from .. import session_pool
 from .. import state_manager
 from ..helpers import normalize_mac
 
 async def run_sync_security(ip: str, profile: Dict[str, Any], _auth_required: bool, user: str, password: str, max_ports: int, protocol: Optional[str] = None) -> Tuple[bool, str]:
-    from ..base import get_script_path
-    
     sec_cmds = profile.get("mac_security_cmds")
     if not sec_cmds or "layers" not in sec_cmds:
         return False, "El perfil no soporta la arquitectura de capas de seguridad."
 
     sw_state = state_manager.get_switch_state(ip)
     layers_cfg = sec_cmds.get("layers", [])
-    config_prompt = profile["prompts"]["config"]
     
     commands = []
     sync_results = {}
@@ -101,29 +98,16 @@ async def run_sync_security(ip: str, profile: Dict[str, Any], _auth_required: bo
         pass
 
     try:
-        env_vars = {
-            "PROTOCOL": protocol or profile.get("auth_type", "telnet"),
-            "IP": ip,
-            "USER": user,
-            "LOGIN_PROMPT": profile["prompts"]["login"],
-            "PASSWORD_PROMPT": profile["prompts"]["password"],
-            "EXEC_PROMPT": profile["prompts"]["exec"],
-            "PRIV_PROMPT": profile["prompts"]["exec_priv"],
-            "CONFIG_PROMPT": config_prompt,
-            "CLI_COMMANDS": "\n".join(commands),
-            "SAVE_CMD": profile.get("save_cmd", "write memory"),
-            "EXPECT_PASS": password or ""
-        }
-        
-        script_path = get_script_path("security_sync")
-        success, stdout, stderr = await async_run_expect_script(script_path, timeout=180, env_vars=env_vars)
+        success, stdout = await session_pool.run_commands(
+            ip, profile, user, password, session_pool.config_job(profile, commands), protocol=protocol
+        )
         
         if success:
             for lid, res in sync_results.items():
                 if res["enabled"]:
                     state_manager.set_active_acl_id(ip, res["shadow"], lid)
             
-        return success, stdout if success else f"Error sincronizando seguridad: {stderr or stdout}"
+        return success, stdout if success else f"Error sincronizando seguridad: {stdout}"
     except Exception as e:
         return False, f"Error ejecutando sincronización de seguridad: {e}"
     finally:
@@ -5,7 +5,7 @@ import os
 import re
 import json
 from typing import Tuple, List, Dict, Any, Optional
-from app.utils.global_helpers import run_command
+from app.utils.global_helpers import run_command, load_json_config
 from app.utils.validators import validate_ip_address
 from app.utils import crypto_helper, sanitization_helper
 
@@ -140,26 +140,25 @@ def sanitize_config_value(value: str) -> str:
 
 def get_secrets(ip: str, secrets_json: str) -> Tuple[Optional[str], Optional[str]]:
     """Lee las credenciales asociadas a una IP desde el archivo de secretos."""
-    if not os.path.exists(secrets_json):
+    secrets = load_json_config(secrets_json, None)
+    if not isinstance(secrets, dict):
         return None, None
     try:
-        with open(secrets_json, 'r') as f:
-            secrets = json.load(f)
-            creds = secrets.get(ip, {})
-            user = creds.get("user")
-            password = creds.get("password")
-            
-            # Intentar descifrar si parece estar cifrado
-            if password and not password.startswith("$") and len(password) > 32:
-                try:
-                    key = crypto_helper.get_master_key()
-                    if key:
-                        password = crypto_helper.decrypt_string(password, key)
-                except Exception:
-                    # Si falla el descifrado, devolvemos el original (podría ser plano)
-                    pass
-            
-            return user, password
+        creds = secrets.get(ip, {})
+        user = creds.get("user")
+        password = creds.get("password")
+        
+        # Intentar descifrar si parece estar cifrado
+        if password and not password.startswith("$") and len(password) > 32:
+            try:
+                key = crypto_helper.get_master_key()
+                if key:
+                    password = crypto_helper.decrypt_string(password, key)
+            except Exception:
+                # Si falla el descifrado, devolvemos el original (podría ser plano)
+                pass
+        
+        return user, password
     except Exception:
         return None, None
 
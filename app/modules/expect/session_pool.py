@@ -0,0 +1,463 @@
+# app/modules/expect/session_pool.py
+"""
+Pool de sesiones CLI autenticadas por switch.
+
+Cada sesión hace el login y entra en modo privilegiado una sola vez; después
+ejecuta los trabajos que se le encargan. Operaciones seguidas sobre el mismo
+switch reutilizan la sesión y se ahorran la conexión y el login.
+
+- telnet: cliente asíncrono nativo (telnet_driver.py) en el propio bucle.
+- Otros protocolos (ssh): proceso expect de larga duración (scripts/session.exp)
+  que recibe los trabajos por stdin.
+
+- Como mucho MAX_SESSIONS_PER_SWITCH sesiones por switch; el resto de trabajos
+  espera en cola (FIFO): cada sesión liberada o hueco se entrega directamente
+  al trabajo que más tiempo lleva esperando.
+- Las sesiones libres reciben un keepalive cada KEEPALIVE_INTERVAL segundos y
+  se cierran tras IDLE_TIMEOUT segundos sin uso.
+- Una sesión que falla (timeout, conexión cerrada) se descarta; el siguiente
+  trabajo abre otra.
+
+Hay un pool por bucle de eventos (API y servidor CLI tienen el suyo).
+"""
+
+import os
+import re
+import abc
+import json
+import time
+import asyncio
+import hashlib
+import weakref
+import itertools
+import collections
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.utils.global_helpers import log_action as ioh_log_action
+from .base import logger, get_script_path, ensure_script_permissions
+from .telnet_driver import TELNET_PORT, ProfilePrompts, TelnetClient, TelnetError
+
+EXPECT_BIN = "/usr/bin/expect"
+MAX_SESSIONS_PER_SWITCH = 2
+IDLE_TIMEOUT = 300.0
+KEEPALIVE_INTERVAL = 60.0
+REAPER_INTERVAL = 5.0
+LOGIN_TIMEOUT = 30
+COMMAND_TIMEOUT = 30
+CLOSE_TIMEOUT = 5.0
+
+_DONE_RE = re.compile(r"^@@DONE (\d+) (\d+)$")
+_job_ids = itertools.count(1)
+_NEW_SLOT = object()   # concesión de un hueco para abrir una sesión nueva
+
+
+class SessionError(Exception):
+    """La sesión no pudo abrirse o quedó inservible."""
+
+
+def prompt_regex(profile: Dict[str, Any]) -> str:
+    """Regex para session.exp (al final de la salida) de cualquiera de los prompts del perfil."""
+    prompts = profile.get("prompts", {})
+    alternatives = sorted(
+        {prompts[k] for k in ("exec", "exec_priv", "config", "interface") if prompts.get(k)},
+        key=len, reverse=True,
+    )
+    if not alternatives:
+        return r"(#|>)\s*$"
+    return "(" + "|".join(re.escape(p) for p in alternatives) + r")\s*$"
+
+
+def command_lines(commands: List[str]) -> List[str]:
+    """
+    Una línea por comando CLI: los comandos de varias líneas de los perfiles
+    (p.ej. apply_cmd de Cisco, "interface ...\n mac access-group ...") se
+    separan, sin espacios sobrantes ni líneas vacías. Un trabajo sin comandos
+    se envía como una línea vacía (keepalive).
+    """
+    lines = [line.strip() for cmd in commands for line in cmd.splitlines() if line.strip()]
+    return lines or [""]
+
+
+def config_job(profile: Dict[str, Any], commands: List[str]) -> List[str]:
+    """Comandos en modo configuración; la sesión vuelve al modo privilegiado y se guarda."""
+    return [profile.get("config_cmd", "configure"), *commands, "end",
+            profile.get("save_cmd", "write memory")]
+
+
+class SwitchSession(abc.ABC):
+    """Sesión CLI autenticada con un switch (en modo privilegiado entre trabajos)."""
+
+    def __init__(self, ip: str, key: Tuple[Any, ...]):
+        self.ip = ip
+        self.key = key
+        self.last_used = time.monotonic()   # último trabajo (cierre por inactividad)
+        self.last_seen = self.last_used      # último intercambio, keepalive incluido
+        self.jobs = 0
+
+    @property
+    @abc.abstractmethod
+    def alive(self) -> bool:
+        """La conexión sigue abierta."""
+
+    @abc.abstractmethod
+    async def open(self):
+        """Conecta, inicia sesión y entra en modo privilegiado (SessionError si falla)."""
+
+    @abc.abstractmethod
+    async def run(self, commands: List[str], timeout: int = COMMAND_TIMEOUT) -> Tuple[bool, str]:
+        """Ejecuta los comandos esperando al prompt tras cada uno (timeout por comando)."""
+
+    @abc.abstractmethod
+    async def close(self):
+        """Cierra la sesión (sin error si ya estaba cerrada)."""
+
+
+class TelnetSession(SwitchSession):
+    """Sesión telnet nativa (telnet_driver), sin procesos externos."""
+
+    def __init__(self, ip: str, key: Tuple[Any, ...], profile: Dict[str, Any], user: str,
+                 password: str, port: Optional[int] = None):
+        super().__init__(ip, key)
+        self._client = TelnetClient(ip, ProfilePrompts.from_profile(profile), port or TELNET_PORT)
+        self._user = user or ""
+        self._password = password or ""
+        self._enable_cmd = profile.get("enable_cmd", "en")
+
+    @property
+    def alive(self) -> bool:
+        return self._client.connected
+
+    async def open(self):
+        try:
+            await self._client.connect()
+            await self._client.login(self._user, self._password, self._enable_cmd, LOGIN_TIMEOUT)
+        except TelnetError as e:
+            await self._client.close()
+            raise SessionError(f"No se pudo iniciar sesión en {self.ip}: {e}")
+
+    async def run(self, commands: List[str], timeout: int = COMMAND_TIMEOUT) -> Tuple[bool, str]:
+        success, output = await self._client.run(command_lines(commands), timeout)
+        self.last_seen = time.monotonic()
+        return success, output.strip("\n")
+
+    async def close(self):
+        await self._client.close()
+
+
+class ExpectSession(SwitchSession):
+    """Sesión a través de un proceso expect de larga duración (SSH u otros clientes)."""
+
+    def __init__(self, ip: str, key: Tuple[Any, ...], profile: Dict[str, Any], user: str,
+                 password: str, protocol: str):
+        super().__init__(ip, key)
+        prompts = profile["prompts"]
+        self._env = {
+            "PROTOCOL": protocol,
+            "IP": ip,
+            "USER": user or "",
+            "LOGIN_PROMPT": prompts["login"],
+            "PASSWORD_PROMPT": prompts["password"],
+            "EXEC_PROMPT": prompts["exec"],
+            "PRIV_PROMPT": prompts["exec_priv"],
+            "ENABLE_CMD": profile.get("enable_cmd", "en"),
+            "PROMPT_RE": prompt_regex(profile),
+            "LOGIN_TIMEOUT": str(LOGIN_TIMEOUT),
+            "EXPECT_PASS": password or "",
+        }
+        self.process: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def _read_until(self, done, timeout: float) -> Tuple[List[str], Optional[str]]:
+        """Lee líneas hasta que 'done(línea)' sea cierto. Devuelve (salida, línea final)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        lines: List[str] = []
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise SessionError("Timeout esperando respuesta del switch")
+            raw = await asyncio.wait_for(self.process.stdout.readline(), remaining)
+            if not raw:
+                raise SessionError("La sesión se cerró inesperadamente:\n" + "\n".join(lines[-5:]))
+            line = raw.decode(errors="replace").rstrip("\r\n").replace("\r", "")
+            if done(line):
+                return lines, line
+            lines.append(line)
+
+    async def open(self):
+        script = get_script_path("session")
+        ensure_script_permissions(script)
+        env = os.environ.copy()
+        env.update(self._env)
+        self.process = await asyncio.create_subprocess_exec(
+            EXPECT_BIN, script,
+            env=env,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        try:
+            _, last = await self._read_until(lambda l: l.startswith(("@@READY", "@@FAIL")), LOGIN_TIMEOUT + 5)
+        except (SessionError, asyncio.TimeoutError) as e:
+            await self.close()
+            raise SessionError(f"No se pudo iniciar sesión en {self.ip}: {e}")
+        if last != "@@READY":
+            await self.close()
+            raise SessionError(f"No se pudo iniciar sesión en {self.ip} ({last[2:].lower()})")
+
+    async def run(self, commands: List[str], timeout: int = COMMAND_TIMEOUT) -> Tuple[bool, str]:
+        """Ejecuta los comandos esperando al prompt tras cada uno (timeout por comando)."""
+        job_id = next(_job_ids)
+        commands = command_lines(commands)
+        lines = [f"@@JOB {job_id} {int(timeout)}", *commands, "@@END"]
+        try:
+            self.process.stdin.write(("\n".join(lines) + "\n").encode())
+            await self.process.stdin.drain()
+        except (ConnectionError, RuntimeError) as e:
+            raise SessionError(f"La sesión con {self.ip} no acepta comandos: {e}")
+
+        def done(line: str) -> bool:
+            match = _DONE_RE.match(line)
+            return bool(match) and int(match.group(1)) == job_id
+
+        try:
+            output, last = await self._read_until(done, timeout * (len(commands) + 1) + 5)
+        except asyncio.TimeoutError:
+            raise SessionError(f"Timeout ejecutando comandos en {self.ip}")
+        self.last_seen = time.monotonic()
+        rc = int(_DONE_RE.match(last).group(2))
+        return rc == 0, "\n".join(output).strip("\n")
+
+    async def close(self):
+        if self.process is None or self.process.returncode is not None:
+            return
+        try:
+            self.process.stdin.write(b"@@QUIT\n")
+            await self.process.stdin.drain()
+            self.process.stdin.close()
+            await asyncio.wait_for(self.process.wait(), CLOSE_TIMEOUT)
+        except (ConnectionError, RuntimeError, asyncio.TimeoutError):
+            pass
+        if self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+
+
+class SessionPool:
+    """Sesiones abiertas por switch, con cola de trabajos, keepalive y cierre por inactividad."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS_PER_SWITCH,
+                 idle_timeout: float = IDLE_TIMEOUT, keepalive: float = KEEPALIVE_INTERVAL):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self._idle: Dict[str, List[SwitchSession]] = {}
+        self._count: Dict[str, int] = {}
+        # Trabajos en espera por switch, en orden de llegada: (clave, futuro)
+        self._waiters: Dict[str, Deque[Tuple[Tuple[Any, ...], asyncio.Future]]] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _new_session(ip: str, profile: Dict[str, Any], user: str, password: str,
+                     protocol: Optional[str], port: Optional[int]):
+        """(clave, fábrica) de la sesión: telnet nativo o expect para el resto de protocolos."""
+        protocol = protocol or profile.get("auth_type", "telnet")
+        key = (protocol, port, user or "", hashlib.sha256((password or "").encode()).hexdigest(),
+               json.dumps(profile.get("prompts", {}), sort_keys=True), profile.get("enable_cmd", "en"))
+        if protocol == "telnet":
+            return key, lambda: TelnetSession(ip, key, profile, user, password, port)
+        return key, lambda: ExpectSession(ip, key, profile, user, password, protocol)
+
+    def _take(self, ip: str, key: Tuple[Any, ...]):
+        """Sesión libre con esa clave, _NEW_SLOT si cabe una sesión nueva, o None."""
+        idle = self._idle.get(ip, [])
+        for session in list(idle):
+            if session.key == key and session.alive:
+                idle.remove(session)
+                return session
+        # Sesiones muertas o con otras credenciales dejan sitio a una nueva
+        for session in [s for s in idle if not s.alive or s.key != key]:
+            idle.remove(session)
+            self._count[ip] -= 1
+            asyncio.get_running_loop().create_task(session.close())
+        if self._count.get(ip, 0) < self.max_sessions:
+            self._count[ip] = self._count.get(ip, 0) + 1
+            return _NEW_SLOT
+        return None
+
+    def _serve(self, ip: str):
+        """Entrega sesiones libres y huecos a los trabajos en espera, por orden de llegada."""
+        waiters = self._waiters.get(ip)
+        while waiters:
+            key, future = waiters[0]
+            if future.done():   # trabajo cancelado mientras esperaba
+                waiters.popleft()
+                continue
+            grant = self._take(ip, key)
+            if grant is None:
+                break
+            waiters.popleft()
+            future.set_result(grant)
+        if not waiters:
+            self._waiters.pop(ip, None)
+
+    async def _acquire(self, ip: str, key: Tuple[Any, ...], factory) -> Tuple[SwitchSession, bool]:
+        # Con trabajos en cola, el nuevo se pone detrás aunque haya una sesión libre
+        grant = None if self._waiters.get(ip) else self._take(ip, key)
+        if grant is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(ip, collections.deque()).append((key, future))
+            try:
+                grant = await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Cancelado tras recibir la concesión: pasa al siguiente
+                    self._give_back(ip, future.result())
+                raise
+        if grant is not _NEW_SLOT:
+            return grant, True
+        session = factory()
+        try:
+            await session.open()
+        except BaseException:
+            self._forget(ip)
+            raise
+        return session, False
+
+    def _give_back(self, ip: str, grant):
+        if grant is _NEW_SLOT:
+            self._forget(ip)
+        else:
+            self._idle.setdefault(ip, []).append(grant)
+            self._serve(ip)
+
+    def _forget(self, ip: str):
+        self._count[ip] -= 1
+        if not self._count[ip]:
+            del self._count[ip]
+        self._serve(ip)
+
+    async def _release(self, session: SwitchSession, healthy: bool):
+        if healthy and session.alive:
+            self._idle.setdefault(session.ip, []).append(session)
+            self._serve(session.ip)
+            self._ensure_reaper()
+        else:
+            await session.close()
+            self._forget(session.ip)
+
+    async def run(self, ip: str, profile: Dict[str, Any], user: str, password: str,
+                  commands: List[str], protocol: Optional[str] = None,
+                  timeout: int = COMMAND_TIMEOUT, port: Optional[int] = None) -> Tuple[bool, str]:
+        """Ejecuta los comandos en una sesión del switch (en modo privilegiado)."""
+        key, factory = self._new_session(ip, profile, user, password, protocol, port)
+        start_time = time.monotonic()
+        try:
+            session, reused = await self._acquire(ip, key, factory)
+        except SessionError as e:
+            return False, str(e)
+        healthy = False
+        try:
+            success, output = await session.run(commands, timeout)
+            session.jobs += 1
+            session.last_used = session.last_seen
+            # Un comando sin prompt deja la sesión desincronizada
+            healthy = success
+        except SessionError as e:
+            return False, str(e)
+        finally:
+            await self._release(session, healthy)
+        ioh_log_action("expect", f"{len(commands)} comandos en {ip} en {time.monotonic() - start_time:.2f}s "
+                                 f"({'sesión reutilizada' if reused else 'sesión nueva'})")
+        return success, output
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap())
+
+    async def _reap(self):
+        """Keepalive de las sesiones libres y cierre de las inactivas."""
+        while self._count:
+            await asyncio.sleep(REAPER_INTERVAL)
+            now = time.monotonic()
+            expired: List[SwitchSession] = []
+            stale: List[SwitchSession] = []
+            for idle in self._idle.values():
+                for session in list(idle):
+                    if not session.alive or now - session.last_used >= self.idle_timeout:
+                        expired.append(session)
+                    elif now - session.last_seen >= self.keepalive:
+                        stale.append(session)
+                    else:
+                        continue
+                    idle.remove(session)
+            for session in expired:
+                logger.info(f"Cerrando sesión inactiva con {session.ip}")
+                await session.close()
+                self._forget(session.ip)
+            for session in stale:
+                try:
+                    healthy, _ = await session.run([""], COMMAND_TIMEOUT)
+                except SessionError as e:
+                    logger.warning(f"Keepalive fallido con {session.ip}: {e}")
+                    healthy = False
+                await self._release(session, healthy)
+
+    def discard(self, ip: str):
+        """Cierra las sesiones libres de un switch (p.ej. al cambiar sus credenciales)."""
+        loop = asyncio.get_running_loop()
+        for session in self._idle.pop(ip, []):
+            self._count[ip] -= 1
+            loop.create_task(session.close())
+        if not self._count.get(ip):
+            self._count.pop(ip, None)
+        self._serve(ip)
+
+    async def close_all(self):
+        sessions = [s for idle in self._idle.values() for s in idle]
+        self._idle.clear()
+        for session in sessions:
+            self._count[session.ip] -= 1
+            if not self._count[session.ip]:
+                del self._count[session.ip]
+        for ip in list(self._waiters):
+            self._serve(ip)
+        if self._reaper is not None:
+            self._reaper.cancel()
+        await asyncio.gather(*(s.close() for s in sessions), return_exceptions=True)
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SessionPool]" = weakref.WeakKeyDictionary()
+
+
+def get_pool() -> SessionPool:
+    """Pool del bucle de eventos en curso."""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = _pools[loop] = SessionPool()
+    return pool
+
+
+async def run_commands(ip: str, profile: Dict[str, Any], user: str, password: str,
+                       commands: List[str], protocol: Optional[str] = None,
+                       timeout: int = COMMAND_TIMEOUT, port: Optional[int] = None) -> Tuple[bool, str]:
+    return await get_pool().run(ip, profile, user, password, commands, protocol, timeout, port)
+
+
+def discard(ip: str):
+    try:
+        pool = _pools.get(asyncio.get_running_loop())
+    except RuntimeError:
+        return
+    if pool is not None:
+        pool.discard(ip)
+
+
+async def close_all():
+    pool = _pools.get(asyncio.get_running_loop())
+    if pool is not None:
+        await pool.close_all()
@@ -1,31 +1,20 @@
 # app/core/expect/state_manager.py
 import os
-import json
 from datetime import datetime
 from typing import Dict, Any, Optional
+from ...utils.global_helpers import load_json_config, save_json_config
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 STATE_JSON = os.path.join(BASE_DIR, "config", "expect", "state.json")
 
 def load_state() -> Dict[str, Any]:
     """Carga el estado actual desde state.json."""
-    if not os.path.exists(STATE_JSON):
-        return {"switches": {}}
-    try:
-        with open(STATE_JSON, "r") as f:
-            return json.load(f)
-    except Exception:
-        return {"switches": {}}
+    state = load_json_config(STATE_JSON, None)
+    return state if isinstance(state, dict) else {"switches": {}}
 
 def save_state(state: Dict[str, Any]) -> bool:
-    """Guarda el estado en state.json."""
-    try:
-        os.makedirs(os.path.dirname(STATE_JSON), exist_ok=True)
-        with open(STATE_JSON, "w") as f:
-            json.dump(state, f, indent=4)
-        return True
-    except Exception:
-        return False
+    """Guarda el estado en state.json (una escritura por acción, ver unit_of_work)."""
+    return save_json_config(STATE_JSON, state)
 
 def get_switch_state(ip: str) -> Dict[str, Any]:
     """Obtiene el estado de un switch específico."""
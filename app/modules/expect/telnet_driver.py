@@ -0,0 +1,231 @@
+# app/modules/expect/telnet_driver.py
+"""
+Cliente telnet asíncrono para los switches, guiado por los prompts del perfil
+(prompts.login/password/exec/exec_priv/config/interface y, opcionalmente,
+prompts.more para la paginación).
+
+Sustituye al intérprete expect en las sesiones telnet: no hay proceso externo
+por sesión y cientos de sesiones pueden convivir en el mismo bucle de eventos.
+
+- ProfilePrompts compila una vez las regex de cada perfil.
+- La salida se procesa por fragmentos a medida que llega (on_output recibe cada
+  uno) y el prompt solo se busca en la última línea del búfer.
+- Cada comando tiene su propio timeout.
+- Negociación telnet mínima: se aceptan ECHO y SGA del servidor y se rechaza
+  todo lo demás.
+"""
+
+import re
+import codecs
+import asyncio
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TELNET_PORT = 23
+CONNECT_TIMEOUT = 10.0
+READ_SIZE = 4096
+
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+OPT_ECHO, OPT_SGA = 1, 3
+ACCEPTED_SERVER_OPTIONS = (OPT_ECHO, OPT_SGA)
+
+
+class TelnetError(Exception):
+    """Fallo de conexión, login o timeout esperando un prompt."""
+
+
+class ProfilePrompts:
+    """Regex precompiladas de los prompts de un perfil (ancladas al final de la línea)."""
+
+    def __init__(self, login: str, password: str, exec_: str, exec_priv: str,
+                 config_prompts: Tuple[str, ...], more: Optional[str]):
+        self.login = self._compile(login)
+        self.password = self._compile(password)
+        self.exec = self._compile(exec_)
+        self.exec_priv = self._compile(exec_priv)
+        # Cualquier prompt de comandos; los más largos primero ("(config)#" antes que "#")
+        alternatives = sorted({p for p in (exec_, exec_priv, *config_prompts) if p}, key=len, reverse=True)
+        self.any = self._compile(*alternatives)
+        # Tras la contraseña: prompt de comandos o, si se rechaza, de nuevo el de usuario
+        self.after_login = self._compile(*alternatives, login)
+        self.more = self._compile(more) if more else None
+
+    @staticmethod
+    def _compile(*prompts: str) -> "re.Pattern":
+        return re.compile("(?:" + "|".join(re.escape(p) for p in prompts) + r")\s*$")
+
+    @classmethod
+    def from_profile(cls, profile: Dict[str, Any]) -> "ProfilePrompts":
+        p = profile["prompts"]
+        return _compiled_prompts(p["login"], p["password"], p["exec"], p["exec_priv"],
+                                 tuple(p[k] for k in ("config", "interface") if p.get(k)), p.get("more"))
+
+
+@lru_cache(maxsize=64)
+def _compiled_prompts(*args) -> ProfilePrompts:
+    return ProfilePrompts(*args)
+
+
+class _TelnetParser:
+    """Separa los comandos telnet (IAC) de los datos; conserva el estado entre fragmentos."""
+
+    def __init__(self):
+        self._state = "data"
+        self._command = 0
+        self._answered: Dict[Tuple[int, int], int] = {}
+
+    def _reply(self, command: int, option: int) -> bytes:
+        if command == WILL:
+            answer = DO if option in ACCEPTED_SERVER_OPTIONS else DONT
+        elif command == DO:
+            answer = WONT
+        else:
+            # DONT/WONT: se confirma con la negativa correspondiente
+            answer = {DONT: WONT, WONT: DONT}[command]
+        # No repetir la misma respuesta (evita bucles de negociación)
+        if self._answered.get((command, option)) == answer:
+            return b""
+        self._answered[(command, option)] = answer
+        return bytes((IAC, answer, option))
+
+    def feed(self, data: bytes) -> Tuple[bytes, bytes]:
+        """Devuelve (datos, respuestas de negociación para el servidor)."""
+        text = bytearray()
+        replies = bytearray()
+        for byte in data:
+            state = self._state
+            if state == "data":
+                if byte == IAC:
+                    self._state = "iac"
+                elif byte:
+                    text.append(byte)
+            elif state == "iac":
+                if byte == IAC:
+                    text.append(IAC)
+                    self._state = "data"
+                elif byte in (WILL, WONT, DO, DONT):
+                    self._command = byte
+                    self._state = "option"
+                elif byte == SB:
+                    self._state = "sb"
+                else:
+                    self._state = "data"
+            elif state == "option":
+                replies += self._reply(self._command, byte)
+                self._state = "data"
+            elif state == "sb":
+                if byte == IAC:
+                    self._state = "sb_iac"
+            elif state == "sb_iac":
+                self._state = "data" if byte == SE else "sb"
+        return bytes(text), bytes(replies)
+
+
+class TelnetClient:
+    """Sesión telnet con un switch."""
+
+    def __init__(self, host: str, prompts: ProfilePrompts, port: int = TELNET_PORT,
+                 on_output: Optional[Callable[[str], None]] = None):
+        self.host = host
+        self.port = port
+        self.prompts = prompts
+        self.on_output = on_output
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._parser = _TelnetParser()
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = ""  # última línea recibida (donde aparece el prompt)
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing() and not self._reader.at_eof()
+
+    async def connect(self, timeout: float = CONNECT_TIMEOUT):
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise TelnetError(f"No se pudo conectar a {self.host}:{self.port}: {e or 'timeout'}")
+
+    async def _send(self, line: str):
+        try:
+            self._writer.write(line.encode() + b"\r\n")
+            await self._writer.drain()
+        except (ConnectionError, RuntimeError) as e:
+            raise TelnetError(f"Conexión con {self.host} cerrada: {e}")
+
+    async def read_until(self, pattern: "re.Pattern", timeout: float) -> str:
+        """Lee hasta que la última línea coincide con 'pattern'. Devuelve el texto recibido."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        chunks: List[str] = []
+        while not pattern.search(self._tail):
+            if self.prompts.more and self.prompts.more.search(self._tail):
+                # Paginación: pedir la página siguiente
+                self._tail = ""
+                self._writer.write(b" ")
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise TelnetError(f"Timeout esperando el prompt de {self.host}")
+            try:
+                data = await asyncio.wait_for(self._reader.read(READ_SIZE), remaining)
+            except asyncio.TimeoutError:
+                raise TelnetError(f"Timeout esperando el prompt de {self.host}")
+            except (ConnectionError, OSError) as e:
+                raise TelnetError(f"Conexión con {self.host} cerrada: {e}")
+            if not data:
+                raise TelnetError(f"{self.host} cerró la conexión")
+            raw, replies = self._parser.feed(data)
+            if replies:
+                self._writer.write(replies)
+            chunk = self._decoder.decode(raw).replace("\r\n", "\n").replace("\r", "")
+            if not chunk:
+                continue
+            chunks.append(chunk)
+            if self.on_output:
+                self.on_output(chunk)
+            newline = chunk.rfind("\n")
+            self._tail = chunk[newline + 1:] if newline >= 0 else self._tail + chunk
+        self._tail = ""
+        return "".join(chunks)
+
+    async def login(self, user: str, password: str, enable_cmd: str = "enable",
+                    timeout: float = 30.0) -> str:
+        """Login y paso a modo privilegiado."""
+        output = [await self.read_until(self.prompts.login, timeout)]
+        await self._send(user)
+        output.append(await self.read_until(self.prompts.password, timeout))
+        await self._send(password)
+        output.append(await self.read_until(self.prompts.after_login, timeout))
+        last_line = output[-1].rsplit("\n", 1)[-1]
+        if not self.prompts.any.search(last_line):
+            raise TelnetError(f"Credenciales rechazadas por {self.host}")
+        if not self.prompts.exec_priv.search(last_line):
+            await self._send(enable_cmd)
+            output.append(await self.read_until(self.prompts.exec_priv, timeout))
+        return "".join(output)
+
+    async def execute(self, command: str, timeout: float) -> str:
+        """Envía un comando y espera a cualquier prompt del perfil."""
+        await self._send(command)
+        return await self.read_until(self.prompts.any, timeout)
+
+    async def run(self, commands: List[str], timeout: float) -> Tuple[bool, str]:
+        """Ejecuta los comandos en orden; se detiene en el primero que no devuelve el prompt."""
+        output: List[str] = []
+        for command in commands:
+            try:
+                output.append(await self.execute(command, timeout))
+            except TelnetError as e:
+                output.append(f"\n{e}")
+                return False, "".join(output)
+        return True, "".join(output)
+
+    async def close(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
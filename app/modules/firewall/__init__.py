@@ -1 +1,8 @@
 from .firewall import ALLOWED_ACTIONS
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+# Sin VLANs/Tagging basta con el Wi-Fi activo
+LABEL = "Firewall"
+DEPENDENCIES = {"configured": ["wan"], "active": [["vlans", "wifi"], ["tagging", "wifi"]]}
+RESOURCES = ["iptables"]
+LIVE_STATE = {"iptables": ["JSB_FW_", "INPUT_VLAN_", "FORWARD_VLAN_", "INPUT_WIFI", "FORWARD_WIFI"]}
@@ -5,13 +5,13 @@
 import os
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 import re
-import json
 import logging
 import ipaddress
 from typing import Dict, Any, Tuple, List
 from ...utils.global_helpers import (
     module_helpers as mh,
     io_helpers as ioh,
+    packet_log as pl,
     log_action,
     check_module_dependencies
 )
@@ -189,7 +189,7 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
             
             # Aplicar restricción si está habilitada (bloquear acceso al router)
             if wifi_fw_cfg.get("restricted", True):
-                _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", "INPUT_WIFI", "-j", "LOG", "--log-prefix", "[JSB-WIFI-RESTRICT] "])
+                _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", "INPUT_WIFI", *pl.iptables_log_target("[JSB-WIFI-RESTRICT] ")])
                 _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", "INPUT_WIFI", "-j", "DROP"])
                 logger.info("Wi-Fi: Acceso al router RESTRINGIDO con Full Logging")
             else:
@@ -215,7 +215,7 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
                     logger.info(f"Wi-Fi: AISLAMIENTO activado (permitiendo salida por {wan_iface})")
                 
                 # Bloquear todo lo que no sea WAN (VLANs, otras subredes locales) con Log
-                _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", "FORWARD_WIFI", "-j", "LOG", "--log-prefix", "[JSB-WIFI-ISOLATE] "])
+                _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", "FORWARD_WIFI", *pl.iptables_log_target("[JSB-WIFI-ISOLATE] ")])
                 _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", "FORWARD_WIFI", "-j", "DROP"])
             else:
                 # Permitir resto (Acceso libre jerárquico)
@@ -591,7 +591,7 @@ def isolate(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         # Añadir Reglas de LOG y DROP
         _run_command([
             f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-I", "JSB_FW_ISOLATE", "1", "-d", ip_mask, "-m", "conntrack", 
-            "--ctstate", "NEW", "-j", "LOG", "--log-prefix", "[JSB-FW-ISOLATE] "
+            "--ctstate", "NEW", *pl.iptables_log_target("[JSB-FW-ISOLATE] ")
         ])
         success, output = _run_command([
             f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-I", "JSB_FW_ISOLATE", "2", "-d", ip_mask, "-m", "conntrack", 
@@ -621,7 +621,7 @@ def isolate(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         # Añadir Reglas de LOG y DROP
         _run_command([
             f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-I", "JSB_FW_ISOLATE", "1", "-s", ip_mask, "-m", "conntrack", 
-            "--ctstate", "NEW", "-j", "LOG", "--log-prefix", "[JSB-FW-ISOLATE] "
+            "--ctstate", "NEW", *pl.iptables_log_target("[JSB-FW-ISOLATE] ")
         ])
         success, output = _run_command([
             f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-I", "JSB_FW_ISOLATE", "2", "-s", ip_mask, "-m", "conntrack", 
@@ -698,11 +698,12 @@ def unisolate(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         _save_firewall_config(fw_cfg)
         return True, f"VLAN {vlan_id} no estaba aislada"
     
-    # Eliminar regla de LOG (si existe)
-    _run_command([
-        f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-D", "JSB_FW_ISOLATE", "-s", ip_mask, "-m", "conntrack", 
-        "--ctstate", "NEW", "-j", "LOG", "--log-prefix", "[JSB-FW-ISOLATE] "
-    ])
+    # Eliminar regla de LOG/NFLOG (si existe)
+    for target in pl.iptables_log_targets("[JSB-FW-ISOLATE] "):
+        _run_command([
+            f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-D", "JSB_FW_ISOLATE", "-s", ip_mask, "-m", "conntrack", 
+            "--ctstate", "NEW", *target
+        ])
     
     # Eliminar regla de DROP
     success, output = _run_command([
@@ -786,7 +787,7 @@ def restrict(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     if vlan_id in [1, 2]:
         # DROP total con LOG
         logger.info(f"VLAN {vlan_id}: aplicando DROP total")
-        _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", chain_name, "-j", "LOG", "--log-prefix", "[JSB-FW-RESTRICT] "])
+        _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", chain_name, *pl.iptables_log_target("[JSB-FW-RESTRICT] ")])
         _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", chain_name, "-j", "DROP"])
         msg = f"VLAN {vlan_id} restringida: bloqueado acceso total al router"
     else:
@@ -801,7 +802,7 @@ def restrict(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         # ICMP
         _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", chain_name, "-p", "icmp", "-j", "RETURN"])
         # DROP resto con LOG
-        _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", chain_name, "-j", "LOG", "--log-prefix", "[JSB-FW-RESTRICT] "])
+        _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", chain_name, *pl.iptables_log_target("[JSB-FW-RESTRICT] ")])
         _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-A", chain_name, "-j", "DROP"])
         msg = f"VLAN {vlan_id} restringida: solo DHCP, DNS e ICMP permitidos (RETURN) al router"
     
@@ -956,11 +957,9 @@ def disable_whitelist(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     dmz_ips = set()
     try:
         dmz_cfg_path = os.path.join(BASE_DIR, "config", "dmz", "dmz.json")
-        if os.path.exists(dmz_cfg_path):
-            with open(dmz_cfg_path, "r") as f:
-                dmz_cfg = json.load(f)
-                for dest in dmz_cfg.get("destinations", []):
-                    dmz_ips.add(dest.get("ip"))
+        dmz_cfg = mh.load_json_config(dmz_cfg_path, {}) or {}
+        for dest in dmz_cfg.get("destinations", []):
+            dmz_ips.add(dest.get("ip"))
     except Exception as e:
         logger.warning(f"No se pudo cargar dmz.json: {e}")
     
@@ -1238,15 +1237,24 @@ def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     ip_mask = vlan_cfg.get("ip")
     if not ip_mask: return False, f"VLAN {vlan_id} sin IP configurada"
     
-    action = "-I" if status_val == "on" else "-D"
-    cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", action, "JSB_FW_STATS", "1", "-s", ip_mask, "-j", "LOG", "--log-prefix", "[JSB-FW-LOG] "]
-    success, msg = _run_command(cmd)
-    if status_val == "on" and not success: return False, f"Error activando log: {msg}"
-    
-    _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", action, "JSB_FW_STATS", "1", "-d", ip_mask, "-j", "LOG", "--log-prefix", "[JSB-FW-LOG] "])
+    if status_val == "on":
+        target = pl.iptables_log_target("[JSB-FW-LOG] ")
+        cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-I", "JSB_FW_STATS", "1", "-s", ip_mask, *target]
+        success, msg = _run_command(cmd)
+        if not success: return False, f"Error activando log: {msg}"
+        _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-I", "JSB_FW_STATS", "1", "-d", ip_mask, *target])
+    else:
+        for target in pl.iptables_log_targets("[JSB-FW-LOG] "):
+            _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-D", "JSB_FW_STATS", "-s", ip_mask, *target])
+            _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-D", "JSB_FW_STATS", "-d", ip_mask, *target])
     return True, f"Log de tráfico para VLAN {vlan_id}: {status_val}"
 
 
+def traffic_query(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    """Consultar los paquetes registrados por las reglas [JSB-FW-*] y [JSB-WIFI-*]."""
+    return pl.traffic_query(["JSB-FW", "JSB-WIFI"], params)
+
+
 def top(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     success, output = _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-L", "JSB_FW_STATS", "-n", "-v", "-x"])
     if not success: return False, f"Error obteniendo estadísticas: {output}"
@@ -1291,5 +1299,6 @@ ALLOWED_ACTIONS = {
     "remove_rule": remove_rule,
     "reset_defaults": reset_defaults,
     "traffic_log": traffic_log,
+    "traffic_query": traffic_query,
     "top": top,
 }
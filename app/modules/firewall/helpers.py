@@ -5,7 +5,6 @@
 import os
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
 import re
-import json
 import logging
 from typing import Tuple, List
 from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh
@@ -245,11 +244,9 @@ def apply_whitelist(vlan_id: int, whitelist: List[str]) -> Tuple[bool, str]:
     dmz_ips = set()
     try:
         dmz_cfg_path = os.path.join(BASE_DIR, "config", "dmz", "dmz.json")
-        if os.path.exists(dmz_cfg_path):
-            with open(dmz_cfg_path, "r") as f:
-                dmz_cfg = json.load(f)
-                for dest in dmz_cfg.get("destinations", []):
-                    dmz_ips.add(dest.get("ip"))
+        dmz_cfg = load_json_config(dmz_cfg_path, {}) or {}
+        for dest in dmz_cfg.get("destinations", []):
+            dmz_ips.add(dest.get("ip"))
     except Exception as e:
         logger.warning(f"No se pudo cargar dmz.json: {e}")
     
@@ -395,6 +392,44 @@ def apply_single_whitelist_rule(chain_name: str, rule: str) -> bool:
 # Captive Portal Management
 # ==========================================
 
+_PORTAL_BYPASS_CHAINS = (("nat", "WIFI_PORTAL_REDIRECT"), ("filter", "WIFI_PORTAL_INPUT"), ("filter", "WIFI_PORTAL_FORWARD"))
+
+
+def update_wifi_portal_macs(added: List[str], removed: List[str]) -> bool:
+    """
+    Actualiza solo las reglas de bypass de MACs del portal (sin reconstruir el firewall).
+
+    Todas las altas/bajas se aplican en una única transacción 'iptables-restore --noflush'.
+    'removed' debe contener solo MACs que estaban autorizadas (sus reglas existen).
+    Devuelve False si las cadenas del portal no existen o la transacción falla;
+    el llamante debe entonces reconstruir con setup_wifi_portal().
+    """
+    if not added and not removed:
+        return True
+    iptables = __import__('shutil').which('iptables') or '/usr/sbin/iptables'
+    exists, _ = run_command([iptables, "-t", "nat", "-S", "WIFI_PORTAL_REDIRECT"], ignore_error=True)
+    if not exists:
+        return False
+
+    lines = []
+    for table in ("nat", "filter"):
+        lines.append(f"*{table}")
+        for chain_table, chain in _PORTAL_BYPASS_CHAINS:
+            if chain_table != table:
+                continue
+            for mac in removed:
+                lines.append(f"-D {chain} -m mac --mac-source {mac} -j RETURN")
+            for mac in added:
+                lines.append(f"-I {chain} 1 -m mac --mac-source {mac} -j RETURN")
+        lines.append("COMMIT")
+
+    restore = __import__('shutil').which('iptables-restore') or '/usr/sbin/iptables-restore'
+    success, output = run_command([restore, "--noflush"], input_text="\n".join(lines) + "\n")
+    if not success:
+        logger.warning(f"Actualización incremental del portal fallida: {output}")
+    return success
+
+
 def setup_wifi_portal(portal_enabled: bool, portal_port: int, authorized_macs: List[str]):
     """Configura las reglas de iptables para el Portal Cautivo Wi-Fi."""
     wifi_cfg = mh.load_module_config(BASE_DIR, "wifi", {})
@@ -1 +1,7 @@
 from .nat import ALLOWED_ACTIONS
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+LABEL = "NAT"
+DEPENDENCIES = {"configured": ["wan"], "after": ["wan", "firewall"]}
+RESOURCES = ["iptables"]
+LIVE_STATE = {"iptables": ["JSB_NAT_"], "sysctl": ["net.ipv4.ip_forward"]}
@@ -2,9 +2,8 @@
 
 import os
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
-import json
 from typing import Dict, Any, Tuple
-from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh
+from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh, packet_log as pl
 from ...utils.validators import sanitize_interface_name
 from ...utils.global_helpers import (
     load_json_config, save_json_config, update_module_status, run_command
@@ -21,6 +20,9 @@ _save_config = lambda config: save_json_config(CONFIG_FILE, config)
 _update_status = lambda status: update_module_status(CONFIG_FILE, status)
 _run_command = lambda cmd, ignore_error=False: run_command(cmd)
 
+# La regla MASQUERADE lleva un comentario propio: así se distingue de las de otros
+# programas en los volcados (instantáneas y huellas del estado aplicado)
+MASQ_COMMENT = ["-m", "comment", "--comment", "JSB_NAT_MASQ"]
 
 
 # -----------------------------
@@ -47,7 +49,7 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         return False, f"Nombre de interfaz inválido: '{interfaz}'. Solo use caracteres alfanuméricos, puntos, guiones y guiones bajos."
 
     # Comprobar si NAT ya está activo
-    cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-C", "POSTROUTING", "-o", interfaz, "-j", "MASQUERADE"]
+    cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-C", "POSTROUTING", "-o", interfaz, *MASQ_COMMENT, "-j", "MASQUERADE"]
     nat_rule_exists, _ = _run_command(cmd)
 
     # Capturar estado actual de IP forwarding para rollback
@@ -80,7 +82,9 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     
     # Añadir regla NAT
     if not nat_rule_exists:
-        success, msg = _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-A", "POSTROUTING", "-o", interfaz, "-j", "MASQUERADE"])
+        # Regla sin comentario de versiones anteriores
+        _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-D", "POSTROUTING", "-o", interfaz, "-j", "MASQUERADE"], ignore_error=True)
+        success, msg = _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-A", "POSTROUTING", "-o", interfaz, *MASQ_COMMENT, "-j", "MASQUERADE"])
         if not success:
             # Rollback ip_forward al estado anterior
             if ip_forward_prev in ("0", "1"):
@@ -113,7 +117,8 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-X", "JSB_NAT_ISOLATE"], ignore_error=True)
 
     # Limpiar logging
-    _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-D", "POSTROUTING", "-o", interfaz, "-j", "LOG", "--log-prefix", "[JSB-NAT-OUT] "], ignore_error=True)
+    for target in pl.iptables_log_targets("[JSB-NAT-OUT] "):
+        _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-D", "POSTROUTING", "-o", interfaz, *target], ignore_error=True)
 
     # Verificar si otros módulos dependen del IP forwarding
     base_config_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "config"))
@@ -124,15 +129,13 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     
     active_modules = []
     for module_name, config_path in modules_to_check.items():
-        if os.path.exists(config_path):
-            try:
-                with open(config_path, 'r') as f:
-                    module_config = json.load(f)
-                    if module_config.get("status") == 1:
-                        active_modules.append(module_name)
-            except Exception:
-                # Si hay error leyendo, asumir activo para evitar desactivar forwarding
-                active_modules.append(f"{module_name} (config ilegible)")
+        module_config = mh.load_json_config(config_path, None)
+        if isinstance(module_config, dict):
+            if module_config.get("status") == 1:
+                active_modules.append(module_name)
+        elif os.path.exists(config_path):
+            # Si hay error leyendo, asumir activo para evitar desactivar forwarding
+            active_modules.append(f"{module_name} (config ilegible)")
     
     if active_modules:
         modules_str = ", ".join(active_modules)
@@ -143,8 +146,9 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     if not success:
         return False, f"Error desactivando IP forwarding: {msg}"
     
-    # Eliminar regla NAT (no importa si falla, puede que no exista)
-    _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-D", "POSTROUTING", "-o", interfaz, "-j", "MASQUERADE"])
+    # Eliminar regla NAT (no importa si falla, puede que no exista; también la regla sin comentario)
+    _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-D", "POSTROUTING", "-o", interfaz, *MASQ_COMMENT, "-j", "MASQUERADE"])
+    _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-D", "POSTROUTING", "-o", interfaz, "-j", "MASQUERADE"], ignore_error=True)
     
     _update_status(0)
     return True, f"NAT desactivado en {interfaz}"
@@ -185,14 +189,16 @@ def status(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     forwarding_status = "✅ Activado" if ip_forward == "1" else "❌ Desactivado"
     
     # Verificar regla NAT
-    cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-C", "POSTROUTING", "-o", interfaz, "-j", "MASQUERADE"]
+    cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-C", "POSTROUTING", "-o", interfaz, *MASQ_COMMENT, "-j", "MASQUERADE"]
     nat_active, _ = _run_command(cmd)
     
     overall_status = "🟢 ACTIVO" if (ip_forward == "1" and nat_active and is_up) else "🔴 INACTIVO"
     
     # Verificar si hay logging activo
-    log_cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-C", "POSTROUTING", "-o", interfaz, "-j", "LOG", "--log-prefix", "[JSB-NAT-OUT] "]
-    log_active, _ = _run_command(log_cmd)
+    log_active = any(
+        _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-C", "POSTROUTING", "-o", interfaz, *target])[0]
+        for target in pl.iptables_log_targets("[JSB-NAT-OUT] ")
+    )
     
     status_summary = f"""Estado de NAT:
 ==================
@@ -286,16 +292,23 @@ def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     config = _load_config()
     interfaz = config.get("interface", "")
     
-    action = "-I" if status == "on" else "-D"
-    cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", action, "POSTROUTING", "1", "-o", interfaz, "-j", "LOG", "--log-prefix", "[JSB-NAT-OUT] "]
-    
-    success, msg = _run_command(cmd)
-    if status == "on" and not success:
-        return False, f"Error activando log de NAT: {msg}"
+    if status == "on":
+        cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-I", "POSTROUTING", "1", "-o", interfaz, *pl.iptables_log_target("[JSB-NAT-OUT] ")]
+        success, msg = _run_command(cmd)
+        if not success:
+            return False, f"Error activando log de NAT: {msg}"
+    else:
+        for target in pl.iptables_log_targets("[JSB-NAT-OUT] "):
+            _run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-t", "nat", "-D", "POSTROUTING", "-o", interfaz, *target], ignore_error=True)
     
     return True, f"Log de tráfico NAT: {status}"
 
 
+def traffic_query(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    """Consultar los paquetes registrados por las reglas [JSB-NAT-*]."""
+    return pl.traffic_query(["JSB-NAT"], params)
+
+
 def top(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     """Muestra conexiones NAT activas agrupadas por IP origen usando conntrack"""
     success, output = _run_command([f"{__import__('shutil').which('conntrack') or '/usr/sbin/conntrack'}", "-L"])
@@ -341,5 +354,6 @@ ALLOWED_ACTIONS = {
     "block": block,
     "unblock": unblock,
     "traffic_log": traffic_log,
+    "traffic_query": traffic_query,
     "top": top,
 }
\ No newline at end of file
@@ -1 +1,8 @@
 from .tagging import ALLOWED_ACTIONS
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+LABEL = "Tagging"
+DEPENDENCIES = {"active": ["vlans"]}
+RESOURCES = ["ebtables"]
+RESTORE = "always"
+LIVE_STATE = {"ebtables": ["JSB_TAG_"], "bridge_vlans": []}
@@ -5,7 +5,7 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "
 import json
 import subprocess
 from typing import Dict, Any, Tuple, Optional
-from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh
+from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh, packet_log as pl
 from ...utils.validators import validate_interface_name
 from ...utils.global_helpers import (
     load_json_config, save_json_config, update_module_status, run_command
@@ -28,6 +28,14 @@ def _save_config(data):
 _update_status = lambda status: update_module_status(CONFIG_FILE, status)
 
 
+def _load_ebtables_config(path: str):
+    """Config de ebtables: None si no existe, False si no se puede leer."""
+    cfg = load_json_config(path, None)
+    if cfg is None:
+        return False if os.path.exists(path) else None
+    return cfg
+
+
 # Aliases para funciones de helpers
 _run_cmd = run_cmd
 _bridge_exists = bridge_exists
@@ -389,13 +397,10 @@ def config(params: Dict[str, Any]) -> Tuple[bool, str]:
         # Cargar VLANs configuradas para validar existencia
         vlans_cfg_path = os.path.join(os.path.dirname(CONFIG_FILE), "..", "vlans", "vlans.json")
         configured_vlan_ids = []
-        if os.path.exists(vlans_cfg_path):
-            try:
-                with open(vlans_cfg_path, 'r') as f:
-                    vlans_cfg = json.load(f)
-                    configured_vlan_ids = [v.get("id") for v in vlans_cfg.get("vlans", [])]
-            except Exception:
-                pass  # Si falla la lectura, permitir configuración (puede que VLANs no estén configuradas aún)
+        # Si falla la lectura, permitir configuración (puede que VLANs no estén configuradas aún)
+        vlans_cfg = mh.load_json_config(vlans_cfg_path, {})
+        if isinstance(vlans_cfg, dict):
+            configured_vlan_ids = [v.get("id") for v in vlans_cfg.get("vlans", [])]
         
         # Validar que VLANs existan si hay VLANs configuradas
         if configured_vlan_ids:
@@ -424,24 +429,22 @@ def config(params: Dict[str, Any]) -> Tuple[bool, str]:
         ebtables_cfg_path = os.path.join(os.path.dirname(CONFIG_FILE), "..", "ebtables", "ebtables.json")
         existing_iface = next((i for i in cfg["interfaces"] if i.get("name") == name), None)
         
-        if existing_iface and os.path.exists(ebtables_cfg_path):
-            try:
-                with open(ebtables_cfg_path, 'r') as f:
-                    ebtables_cfg = json.load(f)
-                    # Buscar si esta interfaz está siendo usada
-                    for vlan_id, vlan_data in ebtables_cfg.get("vlans", {}).items():
-                        interfaces = vlan_data.get("interfaces", [])
-                        if name in interfaces:
-                            # Interfaz está siendo usada en aislar
-                            # Si la configuración actual y la nueva son incompatibles, rechazar
-                            old_vlan_untag = existing_iface.get("vlan_untag", "")
-                            if old_vlan_untag != vlan_untag or vlan_tag:
-                                return False, (
-                                    f"❌ Error: Interfaz {name} está siendo usada por ebtables VLAN {vlan_id}. "
-                                    f"Primero desaísla VLAN {vlan_id} antes de cambiar la configuración."
-                                )
-            except Exception:
+        if existing_iface:
+            ebtables_cfg = _load_ebtables_config(ebtables_cfg_path)
+            if ebtables_cfg is False:
                 return False, "Error: no se pudo leer la configuración de ebtables para validar dependencias"
+            # Buscar si esta interfaz está siendo usada
+            for vlan_id, vlan_data in (ebtables_cfg or {}).get("vlans", {}).items():
+                interfaces = vlan_data.get("interfaces", [])
+                if name in interfaces:
+                    # Interfaz está siendo usada en aislar
+                    # Si la configuración actual y la nueva son incompatibles, rechazar
+                    old_vlan_untag = existing_iface.get("vlan_untag", "")
+                    if old_vlan_untag != vlan_untag or vlan_tag:
+                        return False, (
+                            f"❌ Error: Interfaz {name} está siendo usada por ebtables VLAN {vlan_id}. "
+                            f"Primero desaísla VLAN {vlan_id} antes de cambiar la configuración."
+                        )
         
         # Eliminar si ya existía la interfaz
         cfg["interfaces"] = [i for i in cfg["interfaces"] if i.get("name") != name]
@@ -471,20 +474,17 @@ def config(params: Dict[str, Any]) -> Tuple[bool, str]:
         
         # VALIDACIÓN: Verificar que la interfaz no esté siendo usada por ebtables
         ebtables_cfg_path = os.path.join(os.path.dirname(CONFIG_FILE), "..", "ebtables", "ebtables.json")
-        if os.path.exists(ebtables_cfg_path):
-            try:
-                with open(ebtables_cfg_path, 'r') as f:
-                    ebtables_cfg = json.load(f)
-                    # Buscar si esta interfaz está en alguna VLAN aislada
-                    for vlan_id, vlan_data in ebtables_cfg.get("vlans", {}).items():
-                        interfaces = vlan_data.get("interfaces", [])
-                        if name in interfaces:
-                            return False, (
-                                f"❌ Error: Interfaz {name} está siendo usada por ebtables en VLAN {vlan_id}. "
-                                f"Primero desaísla VLAN {vlan_id} usando: ebtables unisolate {{'vlan_id': {vlan_id}}}"
-                            )
-            except Exception:
-                return False, "Error: no se pudo leer la configuración de ebtables para validar dependencias"
+        ebtables_cfg = _load_ebtables_config(ebtables_cfg_path)
+        if ebtables_cfg is False:
+            return False, "Error: no se pudo leer la configuración de ebtables para validar dependencias"
+        # Buscar si esta interfaz está en alguna VLAN aislada
+        for vlan_id, vlan_data in (ebtables_cfg or {}).get("vlans", {}).items():
+            interfaces = vlan_data.get("interfaces", [])
+            if name in interfaces:
+                return False, (
+                    f"❌ Error: Interfaz {name} está siendo usada por ebtables en VLAN {vlan_id}. "
+                    f"Primero desaísla VLAN {vlan_id} usando: ebtables unisolate {{'vlan_id': {vlan_id}}}"
+                )
         
         original_count = len(cfg["interfaces"])
         cfg["interfaces"] = [i for i in cfg["interfaces"] if i.get("name") != name]
@@ -542,16 +542,25 @@ def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     iface = params.get("iface")
     if not iface: return False, "Falta parámetro 'iface'"
     
-    action = "-I" if status_val == "on" else "-D"
-    # En ebtables (nf_tables), el log puede ser un watcher. Usamos sintaxis simplificada.
-    cmd = [f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", action, "JSB_TAG_STATS", "1", "-i", iface, "--log-prefix", "[JSB-TAG-OUT] ", "-j", "CONTINUE"]
-    success, msg = _run_cmd(cmd)
-    if status_val == "on" and not success: return False, f"Error activando log en {iface}: {msg}"
-    
-    _run_cmd([f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", action, "JSB_TAG_STATS", "1", "-o", iface, "--log-prefix", "[JSB-TAG-OUT] ", "-j", "CONTINUE"])
+    # En ebtables (nf_tables), el log es un watcher (LOG o NFLOG) seguido de CONTINUE.
+    if status_val == "on":
+        watcher = pl.ebtables_log_watcher("[JSB-TAG-OUT] ")
+        cmd = [f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", "-I", "JSB_TAG_STATS", "1", "-i", iface, *watcher, "-j", "CONTINUE"]
+        success, msg = _run_cmd(cmd)
+        if not success: return False, f"Error activando log en {iface}: {msg}"
+        _run_cmd([f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", "-I", "JSB_TAG_STATS", "1", "-o", iface, *watcher, "-j", "CONTINUE"])
+    else:
+        for watcher in pl.ebtables_log_watchers("[JSB-TAG-OUT] "):
+            _run_cmd([f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", "-D", "JSB_TAG_STATS", "-i", iface, *watcher, "-j", "CONTINUE"])
+            _run_cmd([f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", "-D", "JSB_TAG_STATS", "-o", iface, *watcher, "-j", "CONTINUE"])
     return True, f"Log de tráfico en puerto {iface}: {status_val}"
 
 
+def traffic_query(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    """Consultar los paquetes registrados por las reglas [JSB-TAG-*]."""
+    return pl.traffic_query(["JSB-TAG"], params)
+
+
 def top(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     success, output = _run_cmd([f"{__import__('shutil').which('ebtables') or '/usr/sbin/ebtables'}", "-L", "JSB_TAG_STATS", "--Lc"])
     if not success: return False, f"Error obteniendo estadísticas L2: {output}"
@@ -589,6 +598,7 @@ ALLOWED_ACTIONS = {
     "isolate": isolate,
     "unisolate": unisolate,
     "traffic_log": traffic_log,
+    "traffic_query": traffic_query,
     "top": top,
 }
 
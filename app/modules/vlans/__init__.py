@@ -1 +1,8 @@
 from .vlans import ALLOWED_ACTIONS
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+LABEL = "VLANs"
+DEPENDENCIES = {}
+RESOURCES = ["iptables"]
+RESTORE = "always"
+LIVE_STATE = {"iptables": ["JSB_VLAN_"], "links": ["br0"]}
@@ -5,7 +5,7 @@ import subprocess
 import json
 import ipaddress
 from typing import Dict, Any, Tuple, Optional
-from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh
+from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh, packet_log as pl
 from ...utils.validators import validate_vlan_id, validate_ip_network
 from .helpers import initialize_default_vlans, bridge_exists
 
@@ -124,7 +124,8 @@ def stop(params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
     _run_cmd([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-X", "JSB_VLAN_ISOLATE"], ignore_error=True)
 
     # Limpiar logging inter-VLAN
-    _run_cmd([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-D", "FORWARD", "-i", "br0.+", "-o", "br0.+", "-j", "LOG", "--log-prefix", "[JSB-VLAN-INT] "], ignore_error=True)
+    for target in pl.iptables_log_targets("[JSB-VLAN-INT] "):
+        _run_cmd([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-D", "FORWARD", "-i", "br0.+", "-o", "br0.+", *target], ignore_error=True)
 
     for vlan in vlans:
         vlan_id = str(vlan.get("id"))
@@ -446,13 +447,21 @@ def unisolate(params: Dict[str, Any]) -> Tuple[bool, str]:
 
 def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     status = params.get("status", "on")
-    action = "-I" if status == "on" else "-D"
-    cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", action, "FORWARD", "1", "-i", "br0.+", "-o", "br0.+", "-j", "LOG", "--log-prefix", "[JSB-VLAN-INT] "]
-    success, msg = _run_cmd(cmd)
-    if status == "on" and not success: return False, f"Error activando log inter-VLAN: {msg}"
+    if status == "on":
+        cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-I", "FORWARD", "1", "-i", "br0.+", "-o", "br0.+", *pl.iptables_log_target("[JSB-VLAN-INT] ")]
+        success, msg = _run_cmd(cmd)
+        if not success: return False, f"Error activando log inter-VLAN: {msg}"
+    else:
+        for target in pl.iptables_log_targets("[JSB-VLAN-INT] "):
+            _run_cmd([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-D", "FORWARD", "-i", "br0.+", "-o", "br0.+", *target], ignore_error=True)
     return True, f"Log de tráfico inter-VLAN: {status}"
 
 
+def traffic_query(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    """Consultar los paquetes registrados por las reglas [JSB-VLAN-*]."""
+    return pl.traffic_query(["JSB-VLAN"], params)
+
+
 def top(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     cfg = _load_config()
     vlans_list = cfg.get("vlans", [])
@@ -497,5 +506,6 @@ ALLOWED_ACTIONS = {
     "isolate": isolate,
     "unisolate": unisolate,
     "traffic_log": traffic_log,
+    "traffic_query": traffic_query,
     "top": top,
 }
\ No newline at end of file
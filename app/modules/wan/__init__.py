@@ -1 +1,11 @@
-from .wan import ALLOWED_ACTIONS
+from .wan import ALLOWED_ACTIONS, wait_ready
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+LABEL = "WAN"
+DEPENDENCIES = {}
+RESOURCES = ["iptables"]
+RESTORE = "always"
+REQUIRED_CONFIG = ["interface"]
+READY_TIMEOUT = 20
+# Sin LIVE_STATE: siempre se arranca (lanza dhcpcd, que no sobrevive al servicio)
+WAIT_READY = wait_ready
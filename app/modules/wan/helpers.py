@@ -1,10 +1,9 @@
 # app/core/helpers/helper_wan.py
 """Helper functions para el módulo WAN."""
 
-import asyncio
-import time
 from typing import Tuple, Optional
-from ...utils.global_helpers import run_command, load_json_config, save_json_config
+from ...utils.global_helpers import load_json_config, save_json_config
+from ...utils.global_helpers import link_state
 from ...utils.global_helpers import io_helpers as ioh
 
 
@@ -28,79 +27,48 @@ def verify_wan_status(config_file: str) -> Tuple[bool, Optional[str]]:
     if not iface:
         return False, None
     
-    # Verificar que la interfaz existe y está UP
-    success, ip_info = run_command([f"{__import__('shutil').which('ip') or '/usr/sbin/ip'}", "a", "show", iface], use_sudo=False)
-    if not success:
-        return False, None  # Interfaz no existe
-    
-    is_up = "state UP" in ip_info or ",UP," in ip_info
-    if not is_up:
-        return False, None  # Interfaz no está UP
-    
-    # Verificar que tiene IP asignada
-    has_ip = "inet " in ip_info
-    if not has_ip:
-        return False, None  # Sin IP asignada
-    
-    # Verificar que tiene ruta por defecto
-    success, routes = run_command([f"{__import__('shutil').which('ip') or '/usr/sbin/ip'}", "r"], use_sudo=False)
-    if not success or "default" not in routes:
-        return False, None  # Sin ruta por defecto
+    # Interfaz UP, con IP y ruta por defecto (sysfs, netlink y /proc/net/route)
+    if not link_state.is_ready(iface):
+        return False, None
     
     return True, iface
 
 
-async def verify_dhcp_assignment(iface: str, config_file: str, max_wait: int = 30) -> None:
+def record_dhcp_result(iface: str, config_file: str, ready: bool) -> None:
+    """Persiste el resultado de la configuración DHCP de la WAN (status / dhcp_error)."""
+    cfg = load_json_config(config_file) or {}
+    if ready:
+        cfg["status"] = 1
+        cfg.pop("dhcp_error", None)
+    else:
+        cfg["status"] = 0
+        cfg["dhcp_error"] = f"Timeout DHCP en {iface}"
+    saved = save_json_config(config_file, cfg)
+    if not saved:
+        # Registrar el fallo y salir (no lanzar excepción)
+        field = "estado DHCP" if ready else "dhcp_error"
+        ioh.log_action("wan", f"dhcp - WARNING: No se pudo guardar {field} en {config_file}", "WARNING")
+    if ready:
+        ioh.log_action("wan", f"dhcp - SUCCESS: IP obtenida en {iface}")
+    else:
+        ioh.log_action("wan", f"dhcp - ERROR: Timeout DHCP en {iface}", "ERROR")
+
+
+async def verify_dhcp_assignment(iface: str, config_file: str, max_wait: int = 30) -> bool:
     """
     Verifica en background que se asignó una IP por DHCP.
-    Si después de max_wait segundos no se asignó, detiene el proceso.
+    Si después de max_wait segundos no se asignó, registra el error.
     Se ejecuta como tarea asyncio sin bloquear el flujo principal.
     
-    También verifica que la interfaz está UP y tiene ruta por defecto.
+    La espera se resuelve con los eventos de netlink (dirección IPv4, ruta y
+    estado del enlace) en el instante en que la interfaz está UP, con IP y
+    con ruta por defecto; no hay consultas periódicas.
     
     Args:
         iface: Nombre de la interfaz
         config_file: Ruta al archivo wan.json
         max_wait: Segundos máximos para esperar
     """
-    start_time = time.time()
-    check_interval = 2  # Verificar cada 2 segundos
-    
-    while (time.time() - start_time) < max_wait:
-        await asyncio.sleep(check_interval)
-        
-        # Verificar si la interfaz tiene una IP asignada
-        success, ip_info = run_command([f"{__import__('shutil').which('ip') or '/usr/sbin/ip'}", "a", "show", iface], use_sudo=False)
-        
-        if not success:
-            continue
-        
-        # Verificar que tiene IP, está UP y tiene ruta por defecto
-        has_ip = "inet " in ip_info
-        is_up = "state UP" in ip_info or ",UP," in ip_info
-        
-        if not (has_ip and is_up):
-            continue
-        
-        # Verificar ruta por defecto
-        success_routes, routes = run_command([f"{__import__('shutil').which('ip') or '/usr/sbin/ip'}", "r"], use_sudo=False)
-        if success_routes and "default" in routes:
-            # Todo está bien, WAN está completamente funcional
-            cfg = load_json_config(config_file) or {}
-            cfg["status"] = 1
-            cfg.pop("dhcp_error", None)
-            saved = save_json_config(config_file, cfg)
-            if not saved:
-                # Registrar el fallo y salir (no lanzar excepción)
-                ioh.log_action("wan", f"dhcp - WARNING: No se pudo guardar estado DHCP en {config_file}", "WARNING")
-            ioh.log_action("wan", f"dhcp - SUCCESS: IP obtenida en {iface}")
-            return  # IP asignada correctamente con todas las validaciones, terminar
-
-    # Timeout alcanzado sin completar DHCP
-    cfg = load_json_config(config_file) or {}
-    cfg["status"] = 0
-    cfg["dhcp_error"] = f"Timeout DHCP en {iface}"
-    saved = save_json_config(config_file, cfg)
-    if not saved:
-        ioh.log_action("wan", f"dhcp - WARNING: No se pudo guardar dhcp_error en {config_file}", "WARNING")
-    ioh.log_action("wan", f"dhcp - ERROR: Timeout DHCP en {iface}", "ERROR")
+    ready = await link_state.wait_until_ready(iface, max_wait)
+    record_dhcp_result(iface, config_file, ready)
+    return ready
@@ -1,16 +1,16 @@
 # app/core/wan.py
 
-import asyncio
 import ipaddress
 import os
 from typing import Dict, Any, Tuple
-from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh
+from ...utils.global_helpers import module_helpers as mh, io_helpers as ioh, packet_log as pl
 from ...utils.validators import validate_ip_address, validate_interface_name
 from ...utils.global_helpers import (
     load_json_config, save_json_config, update_module_status,
     run_command
 )
 from .helpers import verify_wan_status, verify_dhcp_assignment
+from ...utils.global_helpers import link_state
 
 # Config file in V4 structure
 CONFIG_FILE = os.path.abspath(
@@ -82,21 +82,9 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
                 # Registrar el fallo y salir (no lanzar excepción)
                 ioh.log_action("wan", f"dhcp - WARNING: No se pudo guardar estado DHCP en {CONFIG_FILE}", "WARNING")
             
-            # Crear una tarea asyncio que verifique en background si se cumplieron todas las validaciones
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    # Si ya hay un loop corriendo (ej: en contexto de FastAPI)
-                    asyncio.create_task(_verify_dhcp_assignment(iface))
-                else:
-                    # Sino, crear la tarea en el loop actual
-                    loop.create_task(_verify_dhcp_assignment(iface))
-            except RuntimeError:
-                # Si no hay loop, intentar crear uno nuevo
-                try:
-                    asyncio.create_task(_verify_dhcp_assignment(iface))
-                except:
-                    pass  # Si falla, al menos DHCP se inició correctamente
+            # Tarea asyncio que marca la WAN activa en cuanto netlink notifica IP y ruta
+            # (en el loop del servicio aunque start() se ejecute en un hilo de trabajo)
+            mh.spawn_background(_verify_dhcp_assignment(iface))
             
             return True, f"DHCP iniciado en {iface} (verificando IP, estado físico y ruta en background)"
 
@@ -167,6 +155,18 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         return False, f"Error inesperado al detener WAN: {e}"
 
 
+async def wait_ready(timeout: float) -> bool:
+    """
+    Espera (por eventos netlink) a que la WAN tenga IP y ruta por defecto.
+    Usada por el agente de restauración para arrancar los módulos dependientes
+    en el mismo instante en que la WAN queda operativa. Solo observa: el
+    resultado DHCP (status / dhcp_error) lo registra la verificación que lanza start().
+    """
+    iface = (_load_config() or {}).get("interface")
+    if not iface:
+        return False
+    return await link_state.wait_until_ready(iface, timeout)
+
 def restart(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     ok, msg = stop()
     if not ok:
@@ -384,14 +384,24 @@ def traffic_log(params: Dict[str, Any]) -> Tuple[bool, str]:
     if not iface:
         return False, "WAN no configurada"
 
-    action = "-I" if status_val == "on" else "-D"
-    cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", action, "FORWARD", "-o", iface, "-j", "LOG", "--log-prefix", "[JSB-WAN-OUT] "]
-    success, msg = _run_command(cmd)
+    if status_val == "on":
+        cmd = [f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-I", "FORWARD", "-o", iface, *pl.iptables_log_target("[JSB-WAN-OUT] ")]
+        success, msg = _run_command(cmd)
+    else:
+        results = [_run_command([f"{__import__('shutil').which('iptables') or '/usr/sbin/iptables'}", "-D", "FORWARD", "-o", iface, *target])
+                   for target in pl.iptables_log_targets("[JSB-WAN-OUT] ")]
+        success = any(ok for ok, _ in results)
+        msg = results[-1][1]
     if success:
         return True, f"Log de tráfico WAN {'activado' if status_val == 'on' else 'desactivado'}"
     return False, f"Error configurando log: {msg}"
 
 
+def traffic_query(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    """Consultar los paquetes registrados por las reglas [JSB-WAN-*]."""
+    return pl.traffic_query(["JSB-WAN"], params)
+
+
 def top(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     """Mostrar top consumidores de ancho de banda WAN."""
     # Obtener estadísticas de la sub-cadena dedicada JSB_WAN_STATS
@@ -508,5 +518,6 @@ ALLOWED_ACTIONS = {
     "block": block,
     "unblock": unblock,
     "traffic_log": traffic_log,
+    "traffic_query": traffic_query,
     "top": top,
 }
\ No newline at end of file
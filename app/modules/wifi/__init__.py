@@ -1,18 +1,32 @@
 from .wifi import (
-    start, stop, restart, status, config,
+    start, stop, restart, restart_portal, status, config, stations,
     add_portal_user, remove_portal_user, list_portal_users,
-    authorize_mac, deauthorize_mac
+    generate_vouchers, list_vouchers, remove_voucher_batch,
+    authorize_mac, deauthorize_mac,
+    HOSTAPD_DAEMON, PORTAL_DAEMON
 )
 
 ALLOWED_ACTIONS = {
     "start": start,
     "stop": stop,
     "restart": restart,
+    "restart_portal": restart_portal,
     "status": status,
+    "stations": stations,
     "config": config,
     "add_portal_user": add_portal_user,
     "remove_portal_user": remove_portal_user,
     "list_portal_users": list_portal_users,
+    "generate_vouchers": generate_vouchers,
+    "list_vouchers": list_vouchers,
+    "remove_voucher_batch": remove_voucher_batch,
     "authorize_mac": authorize_mac,
     "deauthorize_mac": deauthorize_mac
 }
+
+# Metadatos de dependencias (ver app/utils/global_helpers/module_graph.py)
+# start() reinicia el firewall y recarga el DHCP: debe arrancar después de ambos
+LABEL = "Wi-Fi"
+DEPENDENCIES = {"after": ["firewall", "dhcp"]}
+RESOURCES = ["iptables"]
+LIVE_STATE = {"iptables": ["WIFI_PORTAL_"], "daemons": [HOSTAPD_DAEMON, PORTAL_DAEMON]}
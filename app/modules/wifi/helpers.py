@@ -1,5 +1,6 @@
 import os
 import re
+import time
 import logging
 from typing import Dict, Any, Tuple, Optional
 from ...utils.global_helpers import (
@@ -14,11 +15,26 @@ HOSTAPD_CONF = os.path.join(CONFIG_DIR, "hostapd.conf")
 
 logger = logging.getLogger(__name__)
 
+# El soporte AP del hardware no cambia en caliente: se evita lanzar 'iw' en cada status
+AP_SUPPORT_TTL = 300.0
+_ap_support_cache: Dict[str, Tuple[float, Tuple[bool, str]]] = {}
+
 def is_ap_supported() -> Tuple[bool, str]:
     """
     Verifica si el sistema tiene alguna interfaz que soporte el modo AP (Access Point).
-    Permite el uso de interfaces 'dummy' para pruebas.
+    Permite el uso de interfaces 'dummy' para pruebas. Resultado cacheado AP_SUPPORT_TTL segundos.
     """
+    configured_iface = load_json_config(CONFIG_FILE, {}).get("interface", "")
+    cached = _ap_support_cache.get(configured_iface)
+    if cached is not None and time.monotonic() - cached[0] < AP_SUPPORT_TTL:
+        return cached[1]
+    result = _detect_ap_support()
+    if result[0]:
+        # Solo se cachea el resultado positivo (un adaptador USB puede conectarse después)
+        _ap_support_cache[configured_iface] = (time.monotonic(), result)
+    return result
+
+def _detect_ap_support() -> Tuple[bool, str]:
     try:
         # Check if the configured interface is a dummy interface for testing
         wifi_cfg = load_json_config(CONFIG_FILE, {})
@@ -91,7 +107,9 @@ def generate_hostapd_conf(wifi_cfg: Dict[str, Any]) -> str:
         "auth_algs=1",
         "ignore_broadcast_ssid=0",
         "ieee80211n=1",
-        "ctrl_interface=/var/run/hostapd"
+        "ctrl_interface=/var/run/hostapd",
+        # Acceso a la interfaz de control para el grupo de JSBach (eventos de estaciones)
+        f"ctrl_interface_group={os.getgid()}"
     ]
     
     if hw_mode == 'a':
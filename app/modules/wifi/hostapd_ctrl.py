@@ -0,0 +1,355 @@
+# app/modules/wifi/hostapd_ctrl.py
+"""
+Cliente asyncio de la interfaz de control de hostapd (socket Unix datagrama en
+/var/run/hostapd/<iface>), sin hostapd_cli ni procesos auxiliares.
+
+- HostapdControl: peticiones (PING, STA-FIRST...) y recepción de eventos tras ATTACH.
+- HostapdQuery / StationCache: consultas síncronas (STATUS, STA-FIRST/STA-NEXT)
+  para status y la lista de estaciones, cacheadas durante STATION_TTL segundos.
+- DisconnectBatcher: cada desconexión se revoca DEBOUNCE_WINDOW segundos después
+  de producirse; si la estación vuelve a conectarse dentro de su ventana (roaming,
+  reasociación) se descarta su revocación. Las que vencen a la vez se aplican
+  con una sola actualización.
+- HostapdEventListener: bucle de eventos con reconexión (hostapd reiniciado).
+"""
+
+import os
+import re
+import time
+import socket
+import threading
+import asyncio
+import logging
+import tempfile
+import itertools
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CTRL_DIR = "/var/run/hostapd"
+RECV_BUFSIZE = 16384
+REQUEST_TIMEOUT = 2.0
+PING_INTERVAL = 10.0
+DEBOUNCE_WINDOW = 3.0
+DEBOUNCE_SLACK = 0.05       # revocaciones que vencen casi a la vez van en el mismo lote
+RECONNECT_MIN = 2.0
+RECONNECT_MAX = 30.0
+STATION_TTL = 2.0
+MAX_STATIONS = 2048
+
+_MAC_RE = re.compile(r"([0-9a-fA-F]{2}(?::[0-9a-fA-F]{2}){5})")
+_client_ids = itertools.count()
+_STA_INT_FIELDS = ("rx_bytes", "tx_bytes", "rx_packets", "tx_packets", "connected_time", "inactive_msec", "aid")
+
+
+def _local_path() -> str:
+    return os.path.join(tempfile.gettempdir(), f"jsbach-hostapd-{os.getpid()}-{next(_client_ids)}")
+
+
+def parse_kv(reply: str) -> Dict[str, str]:
+    """Respuesta "clave=valor" por líneas (STATUS, STA) a diccionario."""
+    result = {}
+    for line in reply.splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            result[key.strip()] = value.strip()
+    return result
+
+
+def parse_station(reply: str) -> Optional[Dict[str, Any]]:
+    """Bloque de STA-FIRST/STA-NEXT: primera línea la MAC y después clave=valor."""
+    lines = reply.strip().splitlines()
+    if not lines or not _MAC_RE.fullmatch(lines[0].strip()):
+        return None
+    info = parse_kv("\n".join(lines[1:]))
+    flags = info.get("flags", "")
+    station: Dict[str, Any] = {
+        "mac": lines[0].strip().lower(),
+        "authorized": "[AUTHORIZED]" in flags,
+        "associated": "[ASSOC]" in flags,
+        "flags": flags,
+    }
+    for field in _STA_INT_FIELDS:
+        try:
+            station[field] = int(info[field])
+        except (KeyError, ValueError):
+            station[field] = None
+    try:
+        station["signal"] = int(info["signal"])
+    except (KeyError, ValueError):
+        station["signal"] = None
+    station["tx_rate"] = info.get("tx_rate_info") or info.get("tx_rate")
+    return station
+
+
+class HostapdQuery:
+    """Cliente síncrono de la interfaz de control (para hilos de trabajo)."""
+
+    def __init__(self, iface: str, ctrl_dir: str = CTRL_DIR, timeout: float = REQUEST_TIMEOUT):
+        self.ctrl_path = os.path.join(ctrl_dir, iface)
+        self.local_path = _local_path()
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+
+    def __enter__(self) -> "HostapdQuery":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            sock.bind(self.local_path)
+            sock.connect(self.ctrl_path)
+            sock.settimeout(self.timeout)
+        except OSError:
+            sock.close()
+            self._unlink()
+            raise
+        self._sock = sock
+        return self
+
+    def __exit__(self, *exc):
+        self._sock.close()
+        self._sock = None
+        self._unlink()
+
+    def _unlink(self):
+        try:
+            os.unlink(self.local_path)
+        except OSError:
+            pass
+
+    def request(self, command: str) -> str:
+        self._sock.send(command.encode())
+        return self._sock.recv(RECV_BUFSIZE).decode("utf-8", "replace")
+
+    def status(self) -> Dict[str, str]:
+        return parse_kv(self.request("STATUS"))
+
+    def stations(self) -> List[Dict[str, Any]]:
+        stations = []
+        reply = self.request("STA-FIRST")
+        while len(stations) < MAX_STATIONS:
+            station = parse_station(reply)
+            if station is None:
+                break
+            stations.append(station)
+            reply = self.request(f"STA-NEXT {station['mac']}")
+        return stations
+
+
+class StationCache:
+    """Estado del AP y estaciones por interfaz, válidos durante 'ttl' segundos."""
+
+    def __init__(self, ttl: float = STATION_TTL, ctrl_dir: str = CTRL_DIR):
+        self.ttl = ttl
+        self.ctrl_dir = ctrl_dir
+        self._entries: Dict[str, Tuple[float, Optional[Dict[str, str]], List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, iface: str) -> Tuple[Optional[Dict[str, str]], List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(iface)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                return entry[1], entry[2]
+            try:
+                with HostapdQuery(iface, self.ctrl_dir) as query:
+                    status, stations = query.status(), query.stations()
+            except OSError as e:
+                logger.debug(f"Interfaz de control de hostapd ({iface}) no disponible: {e}")
+                status, stations = None, []
+            self._entries[iface] = (time.monotonic(), status, stations)
+            return status, stations
+
+    def status(self, iface: str) -> Optional[Dict[str, str]]:
+        """Respuesta de STATUS o None si hostapd no responde."""
+        return self._get(iface)[0]
+
+    def stations(self, iface: str) -> List[Dict[str, Any]]:
+        return [dict(s) for s in self._get(iface)[1]]
+
+    def invalidate(self, iface: Optional[str] = None):
+        with self._lock:
+            if iface is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(iface, None)
+
+
+station_cache = StationCache()
+
+
+class HostapdControl:
+    """Conexión a la interfaz de control de hostapd para una interfaz."""
+
+    def __init__(self, iface: str, ctrl_dir: str = CTRL_DIR):
+        self.ctrl_path = os.path.join(ctrl_dir, iface)
+        self.local_path = _local_path()
+        self._sock: Optional[socket.socket] = None
+        self._events: Deque[str] = deque()
+        self._lock = asyncio.Lock()
+
+    def open(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            if os.path.exists(self.local_path):
+                os.unlink(self.local_path)
+            # hostapd responde a la dirección del cliente: el socket debe estar enlazado
+            sock.bind(self.local_path)
+            sock.connect(self.ctrl_path)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            self._unlink()
+            raise
+        self._sock = sock
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._unlink()
+
+    def _unlink(self):
+        try:
+            os.unlink(self.local_path)
+        except OSError:
+            pass
+
+    async def _recv(self, timeout: float) -> str:
+        loop = asyncio.get_running_loop()
+        data = await asyncio.wait_for(loop.sock_recv(self._sock, RECV_BUFSIZE), timeout)
+        return data.decode("utf-8", "replace")
+
+    async def request(self, command: str, timeout: float = REQUEST_TIMEOUT) -> str:
+        """Envía un comando y devuelve la respuesta (los eventos intercalados se guardan)."""
+        if self._sock is None:
+            raise ConnectionError("Interfaz de control de hostapd no abierta")
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            await loop.sock_sendall(self._sock, command.encode())
+            deadline = loop.time() + timeout
+            while True:
+                reply = await self._recv(max(deadline - loop.time(), 0.01))
+                if reply.startswith("<") and ">" in reply[:4]:
+                    self._events.append(reply)
+                    continue
+                return reply
+
+    async def attach(self) -> bool:
+        return (await self.request("ATTACH")).strip() == "OK"
+
+    async def next_event(self, timeout: float) -> Optional[str]:
+        """Siguiente evento no solicitado ("<3>AP-STA-...") o None si vence el plazo."""
+        if self._events:
+            return self._events.popleft()
+        async with self._lock:
+            try:
+                return await self._recv(timeout)
+            except asyncio.TimeoutError:
+                return None
+
+
+class DisconnectBatcher:
+    """Revocaciones por desconexión agrupadas y con antirrebote."""
+
+    def __init__(self, apply: Callable[[List[str]], Awaitable[None]], window: float = DEBOUNCE_WINDOW):
+        self.apply = apply
+        self.window = window
+        # MAC -> instante (loop.time()) de revocación, en orden de vencimiento
+        self._pending: Dict[str, float] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    def _arm(self):
+        """Temporizador para la revocación pendiente más próxima."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            deadline = next(iter(self._pending.values()))
+            self._timer = asyncio.get_running_loop().call_at(deadline, self._schedule_flush)
+
+    def disconnected(self, mac: str):
+        # Cada MAC tiene su propia ventana, contada desde su última desconexión
+        self._pending.pop(mac, None)
+        self._pending[mac] = asyncio.get_running_loop().time() + self.window
+        if self._timer is None:
+            self._arm()
+
+    def connected(self, mac: str):
+        # Reasociación dentro de la ventana: se mantiene la autorización
+        self._pending.pop(mac, None)
+
+    def _schedule_flush(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush(due_only=True))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, due_only: bool = False):
+        """Aplica las revocaciones vencidas (o todas, al detener el listener)."""
+        limit = asyncio.get_running_loop().time() + DEBOUNCE_SLACK
+        batch = [mac for mac, deadline in self._pending.items() if not due_only or deadline <= limit]
+        for mac in batch:
+            del self._pending[mac]
+        self._arm()
+        if not batch:
+            return
+        try:
+            await self.apply(batch)
+        except Exception as e:
+            logger.error(f"Error revocando {len(batch)} dispositivos: {e}")
+
+
+class HostapdEventListener:
+    """Escucha los eventos de estaciones de hostapd y revoca el acceso al portal por lotes."""
+
+    def __init__(self, iface: str, apply: Callable[[List[str]], Awaitable[None]],
+                 ctrl_dir: str = CTRL_DIR, window: float = DEBOUNCE_WINDOW):
+        self.iface = iface
+        self.ctrl_dir = ctrl_dir
+        self.batcher = DisconnectBatcher(apply, window)
+        self.events = 0
+
+    def handle_event(self, event: str):
+        mac_match = _MAC_RE.search(event)
+        if not mac_match:
+            return
+        mac = mac_match.group(1).lower()
+        if "AP-STA-DISCONNECTED" in event:
+            self.events += 1
+            self.batcher.disconnected(mac)
+        elif "AP-STA-CONNECTED" in event:
+            self.events += 1
+            self.batcher.connected(mac)
+
+    async def _session(self, ctrl: HostapdControl):
+        loop = asyncio.get_running_loop()
+        last_ping = loop.time()
+        while True:
+            event = await ctrl.next_event(PING_INTERVAL)
+            if event is not None:
+                self.handle_event(event)
+            if loop.time() - last_ping >= PING_INTERVAL:
+                if (await ctrl.request("PING")).strip() != "PONG":
+                    raise ConnectionError("hostapd no responde a PING")
+                last_ping = loop.time()
+
+    async def run(self):
+        delay = RECONNECT_MIN
+        while True:
+            ctrl = HostapdControl(self.iface, self.ctrl_dir)
+            try:
+                ctrl.open()
+                if not await ctrl.attach():
+                    raise ConnectionError("ATTACH rechazado")
+                logger.info(f"Escuchando eventos de hostapd en {ctrl.ctrl_path}")
+                delay = RECONNECT_MIN
+                await self._session(ctrl)
+            except asyncio.CancelledError:
+                await self.batcher.flush()
+                raise
+            except (OSError, ConnectionError, asyncio.TimeoutError) as e:
+                logger.warning(f"Interfaz de control de hostapd no disponible ({e}); reintento en {delay:.0f}s")
+            finally:
+                ctrl.close()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
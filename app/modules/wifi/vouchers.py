@@ -0,0 +1,297 @@
+# app/modules/wifi/vouchers.py
+"""
+Vales (vouchers) de acceso para el portal cautivo.
+
+Un vale es un número de serie firmado con HMAC-SHA256 usando una clave local
+(config/wifi/voucher.key): "ABCD-EFGH-IJKL-MNOP" = base32(serie[4] + hmac[6]).
+Validarlo no requiere leer ningún fichero ni calcular Argon2: basta con
+recalcular el HMAC y compararlo en tiempo constante.
+
+- vouchers.json (lo escribe el panel): lotes generados, cada uno con su rango
+  de series, dispositivos máximos por vale, duración y caducidad.
+- voucher_usage.json (lo escribe el portal): primer uso y MACs de cada vale.
+  El portal lo mantiene en memoria y lo persiste cada PERSIST_INTERVAL segundos.
+  Una MAC nueva queda reservada al canjear y solo se registra cuando el
+  portal confirma que el dispositivo se autorizó (confirm / release).
+"""
+
+import os
+import hmac
+import time
+import base64
+import bisect
+import hashlib
+import logging
+import secrets
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ...utils.global_helpers import load_json_config, save_json_config
+from ...utils.global_helpers.state_store import read_json_bytes
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+CONFIG_DIR = os.path.join(BASE_DIR, "config", "wifi")
+KEY_FILE = os.path.join(CONFIG_DIR, "voucher.key")
+VOUCHERS_FILE = os.path.join(CONFIG_DIR, "vouchers.json")
+USAGE_FILE = os.path.join(CONFIG_DIR, "voucher_usage.json")
+
+SERIAL_BYTES = 4
+MAC_BYTES = 6
+CODE_LENGTH = 16           # caracteres base32 de (serie + hmac)
+MAX_BATCH = 1000
+PERSIST_INTERVAL = 30.0    # segundos entre escrituras de voucher_usage.json
+RELOAD_INTERVAL = 1.0      # como mucho una comprobación de vouchers.json por segundo
+
+
+def load_key(create: bool = False) -> Optional[bytes]:
+    """Clave HMAC de los vales; se genera (0600) la primera vez si create=True."""
+    try:
+        with open(KEY_FILE, "r") as f:
+            return bytes.fromhex(f.read().strip())
+    except (OSError, ValueError):
+        if not create:
+            return None
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    key = secrets.token_bytes(32)
+    fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(key.hex())
+    return key
+
+
+def _mac(key: bytes, serial: int) -> bytes:
+    msg = b"jsbach-voucher:" + serial.to_bytes(SERIAL_BYTES, "big")
+    return hmac.new(key, msg, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+def make_code(key: bytes, serial: int) -> str:
+    raw = serial.to_bytes(SERIAL_BYTES, "big") + _mac(key, serial)
+    code = base64.b32encode(raw).decode("ascii")
+    return "-".join(code[i:i + 4] for i in range(0, CODE_LENGTH, 4))
+
+
+def parse_code(key: bytes, code: str) -> Optional[int]:
+    """Número de serie de un vale con firma válida, o None."""
+    if not isinstance(code, str):
+        return None
+    # Tolerar espacios/guiones y confusiones habituales al teclear (0/O, 1/I, 8/B)
+    clean = code.upper().replace("-", "").replace(" ", "")
+    clean = clean.translate(str.maketrans("018", "OIB"))
+    if len(clean) != CODE_LENGTH:
+        return None
+    try:
+        raw = base64.b32decode(clean)
+    except ValueError:
+        return None
+    serial = int.from_bytes(raw[:SERIAL_BYTES], "big")
+    if not hmac.compare_digest(raw[SERIAL_BYTES:], _mac(key, serial)):
+        return None
+    return serial
+
+
+# =============================================================================
+# Gestión de lotes (panel / CLI)
+# =============================================================================
+
+def generate_batch(count: int, max_devices: int = 1, duration_minutes: int = 1440,
+                   valid_days: int = 30, note: str = "") -> Tuple[Dict[str, Any], List[str]]:
+    """Crea un lote de vales y devuelve (lote, códigos)."""
+    key = load_key(create=True)
+    data = load_json_config(VOUCHERS_FILE, {"next_serial": 1, "batches": []})
+    first = int(data.get("next_serial", 1))
+    now = time.time()
+    batch = {
+        "id": first,
+        "first_serial": first,
+        "count": count,
+        "max_devices": max_devices,
+        "duration_minutes": duration_minutes,
+        "valid_until": int(now + valid_days * 86400),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "note": note,
+    }
+    data.setdefault("batches", []).append(batch)
+    data["next_serial"] = first + count
+    if not save_json_config(VOUCHERS_FILE, data):
+        raise OSError("No se pudo guardar vouchers.json")
+    return batch, [make_code(key, serial) for serial in range(first, first + count)]
+
+
+def list_batches() -> List[Dict[str, Any]]:
+    data = load_json_config(VOUCHERS_FILE, {"batches": []})
+    usage = load_json_config(USAGE_FILE, {}).get("vouchers", {})
+    result = []
+    for batch in data.get("batches", []):
+        first = batch["first_serial"]
+        serials = [str(s) for s in range(first, first + batch["count"])]
+        used = [usage[s] for s in serials if s in usage]
+        result.append(dict(batch, used=len(used), devices=sum(len(u.get("macs", [])) for u in used)))
+    return result
+
+
+def remove_batch(batch_id: int) -> bool:
+    data = load_json_config(VOUCHERS_FILE, {"next_serial": 1, "batches": []})
+    batches = [b for b in data.get("batches", []) if b["id"] != batch_id]
+    if len(batches) == len(data.get("batches", [])):
+        return False
+    data["batches"] = batches
+    return save_json_config(VOUCHERS_FILE, data)
+
+
+# =============================================================================
+# Canje (portal)
+# =============================================================================
+
+class VoucherRegistry:
+    """Estado en memoria de los vales para el proceso del portal."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key: Optional[bytes] = None
+        self._signature = None
+        self._checked = 0.0
+        self._starts: List[int] = []
+        self._batches: List[Dict[str, Any]] = []
+        self._usage: Dict[int, Dict[str, Any]] = {}
+        # (serie, MAC) canjeados pendientes de autorización -> el vale era nuevo
+        self._reserved: Dict[Tuple[int, str], bool] = {}
+        self._dirty = False
+        self._persisted = 0.0
+        self._usage_loaded = False
+
+    def _refresh_batches(self):
+        now = time.monotonic()
+        if now - self._checked < RELOAD_INTERVAL:
+            return
+        self._checked = now
+        # ETag del backend activo: firma del fichero o versión del documento en SQLite
+        try:
+            sig = read_json_bytes(VOUCHERS_FILE)[0]
+        except (OSError, ValueError):
+            sig = None
+        if sig == self._signature and self._key is not None:
+            return
+        self._signature = sig
+        self._key = load_key()
+        batches = sorted(load_json_config(VOUCHERS_FILE, {}).get("batches", []),
+                         key=lambda b: b["first_serial"])
+        self._batches = batches
+        self._starts = [b["first_serial"] for b in batches]
+        if not self._usage_loaded:
+            stored = load_json_config(USAGE_FILE, {}).get("vouchers", {})
+            self._usage = {int(k): v for k, v in stored.items()}
+            self._usage_loaded = True
+
+    def _batch_for(self, serial: int) -> Optional[Dict[str, Any]]:
+        i = bisect.bisect_right(self._starts, serial) - 1
+        if i < 0:
+            return None
+        batch = self._batches[i]
+        return batch if serial < batch["first_serial"] + batch["count"] else None
+
+    def check(self, code: str) -> Optional[int]:
+        """Validación rápida (firma y lote vigente) antes de identificar el dispositivo."""
+        with self._lock:
+            self._refresh_batches()
+            if self._key is None:
+                return None
+            serial = parse_code(self._key, code)
+            if serial is None or self._batch_for(serial) is None:
+                return None
+            return serial
+
+    def redeem(self, code: str, mac: str) -> Tuple[bool, str, Optional[float]]:
+        """
+        (ok, mensaje, expira_en) para el dispositivo 'mac'. Una MAC nueva queda
+        reservada: llamar a confirm() si se autoriza o a release() si falla.
+        """
+        now = time.time()
+        with self._lock:
+            self._refresh_batches()
+            serial = parse_code(self._key, code) if self._key else None
+            batch = self._batch_for(serial) if serial is not None else None
+            if batch is None:
+                return False, "Código de acceso no válido", None
+
+            use = self._usage.get(serial)
+            fresh = use is None
+            if fresh:
+                if now > batch["valid_until"]:
+                    return False, "Código de acceso caducado", None
+                use = {"first_use": now, "macs": []}
+
+            expires = use["first_use"] + batch["duration_minutes"] * 60
+            if now >= expires:
+                return False, "El tiempo de este código ha finalizado", None
+            if mac not in use["macs"]:
+                if len(use["macs"]) >= batch["max_devices"]:
+                    return False, "Este código ya se usa en el máximo de dispositivos", None
+                # Reserva: cuenta para max_devices pero no se persiste hasta confirm()
+                use["macs"].append(mac)
+                self._usage[serial] = use
+                self._reserved[(serial, mac)] = fresh
+            return True, "Código aceptado", expires
+
+    def _reservation(self, code: str, mac: str) -> Optional[Tuple[int, str]]:
+        serial = parse_code(self._key, code) if self._key else None
+        return (serial, mac) if (serial, mac) in self._reserved else None
+
+    def confirm(self, code: str, mac: str):
+        """El dispositivo se autorizó: la MAC reservada pasa a registrarse."""
+        with self._lock:
+            key = self._reservation(code, mac)
+            if key is not None:
+                del self._reserved[key]
+                self._dirty = True
+
+    def release(self, code: str, mac: str):
+        """La autorización falló: se deshace la reserva (y el primer uso si era nuevo)."""
+        with self._lock:
+            key = self._reservation(code, mac)
+            if key is None:
+                return
+            fresh = self._reserved.pop(key)
+            use = self._usage.get(key[0])
+            if use is None:
+                return
+            if mac in use["macs"]:
+                use["macs"].remove(mac)
+            if fresh and not use["macs"]:
+                del self._usage[key[0]]
+
+    def expired_macs(self) -> List[str]:
+        """MACs cuyos vales han agotado su tiempo (se retiran del registro)."""
+        now = time.time()
+        expired: List[str] = []
+        with self._lock:
+            for serial, use in list(self._usage.items()):
+                batch = self._batch_for(serial)
+                duration = batch["duration_minutes"] * 60 if batch else 0
+                if use.get("macs") and now >= use["first_use"] + duration:
+                    expired.extend(use["macs"])
+                    use["macs"] = []
+                    self._dirty = True
+        return expired
+
+    def persist(self, force: bool = False) -> bool:
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._persisted < PERSIST_INTERVAL):
+                return False
+            snapshot = {"vouchers": {}}
+            for serial, use in self._usage.items():
+                macs = [m for m in use["macs"] if (serial, m) not in self._reserved]
+                if not macs and any(self._reserved.get((serial, m)) for m in use["macs"]):
+                    continue  # vale estrenado por un canje aún sin autorizar
+                snapshot["vouchers"][str(serial)] = {"first_use": use["first_use"], "macs": macs}
+            self._dirty = False
+            self._persisted = time.monotonic()
+        if not save_json_config(USAGE_FILE, snapshot):
+            with self._lock:
+                self._dirty = True
+            return False
+        return True
+
+
+voucher_registry = VoucherRegistry()
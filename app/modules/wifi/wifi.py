@@ -1,11 +1,16 @@
 import os
 import time
 import logging
-from typing import Dict, Any, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional
 from ...utils.global_helpers import (
-    load_json_config, save_json_config, update_module_status, run_command
+    load_json_config, save_json_config, update_module_status, get_module_status, run_command
+)
+from ...utils.global_helpers.process_supervisor import (
+    DaemonSpec, process_tracker, wait_for_exit
 )
 from .helpers import is_ap_supported, generate_hostapd_conf, get_wifi_interface
+from . import vouchers
+from .hostapd_ctrl import station_cache
 
 logger = logging.getLogger(__name__)
 
@@ -17,28 +22,40 @@ HOSTAPD_CONF = os.path.join(CONFIG_DIR, "hostapd.conf")
 PID_FILE = os.path.join(CONFIG_DIR, "hostapd.pid")
 PORTAL_USERS_FILE = os.path.join(CONFIG_DIR, "portal_users.json")
 PORTAL_AUTH_FILE = os.path.join(CONFIG_DIR, "portal_auth.json")
+PORTAL_PID_FILE = os.path.join(CONFIG_DIR, "portal_server.pid")
+PORTAL_LOG = os.path.join(BASE_DIR, "logs", "wifi", "portal.log")
+
+# Demonios del módulo (seguidos por pidfd y relanzados por el supervisor si caen)
+HOSTAPD_DAEMON = DaemonSpec(
+    "hostapd", PID_FILE, b"hostapd", "wifi",
+    wanted=lambda: get_module_status(CONFIG_FILE) == 1,
+)
+PORTAL_DAEMON = DaemonSpec(
+    "portal", PORTAL_PID_FILE, b"app.api.portal_server", "wifi", "restart_portal",
+    wanted=lambda: _portal_wanted(),
+)
+
+# PID ficticio que se escribe para las interfaces dummy de pruebas
+DUMMY_PID = 99999
+
+_portal_process = None  # Popen del portal lanzado por este proceso (para recoger su estado)
+
+def _portal_wanted() -> bool:
+    wifi_cfg = load_json_config(CONFIG_FILE, {})
+    return wifi_cfg.get("status") == 1 and bool(wifi_cfg.get("portal_enabled", False))
 
 def get_wifi_pid() -> Optional[int]:
-    """Detecta el PID de hostapd de forma robusta usando ps."""
+    """PID de hostapd: pidfile verificado con /proc y seguido por pidfd (sin 'ps')."""
+    pid = process_tracker.pid(HOSTAPD_DAEMON)
+    if pid:
+        return pid
+    # Interfaces dummy: no hay hostapd, solo el PID ficticio escrito en start
     try:
-        # Buscar el proceso hostapd que usa nuestra configuración específica
-        success, output = run_command(["ps", "aux"], use_sudo=False)
-        if success:
-            for line in output.splitlines():
-                if "hostapd" in line and HOSTAPD_CONF in line:
-                    parts = line.split()
-                    if len(parts) > 1:
-                        return int(parts[1])
-    except Exception as e:
-        logger.debug(f"Error detectando PID de hostapd: {e}")
-    
-    # Fallback al archivo PID si ps falla o no encuentra coincidencia exacta
-    if os.path.exists(PID_FILE):
-        try:
-            with open(PID_FILE, "r") as f:
-                return int(f.read().strip())
-        except:
-            pass
+        with open(PID_FILE, "r") as f:
+            if int(f.read().strip()) == DUMMY_PID:
+                return DUMMY_PID
+    except (OSError, ValueError):
+        pass
     return None
 
 def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
@@ -93,15 +110,14 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         logger.info(f"Omitiendo inicio de hostapd para la interfaz de prueba: {wifi_cfg['interface']}")
         # Fake a PID to satisfy the stop function later
         with open(PID_FILE, "w") as f:
-            f.write("99999\n")
+            f.write(f"{DUMMY_PID}\n")
     else:
         success, output = run_command(cmd)
         if not success:
             return False, f"Error al iniciar hostapd: {output}"
 
-        # Esperar un momento para verificar que sigue vivo
-        time.sleep(1)
-        pid = get_wifi_pid()
+        # hostapd -B escribe el PID file al pasar a segundo plano (espera por inotify)
+        pid = process_tracker.wait_ready(HOSTAPD_DAEMON, 5)
         if not pid:
              return False, "hostapd inició pero se cerró inesperadamente. Compruebe los logs."
 
@@ -117,47 +133,9 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
              stop()
              return False, f"El puerto del portal ({portal_port}) entra en conflicto con el panel JSBach. Cámbialo en Configuración."
              
-        portal_pid_file = os.path.join(CONFIG_DIR, "portal_server.pid")
-        portal_log = os.path.join(BASE_DIR, "logs", "wifi", "portal.log")
-        
-        # Arrancarlo como subproceso. python3 -m uvicorn app.api.portal_server:app
-        import subprocess
-        with open(portal_log, "a") as logfile:
-            # Es vital usar la ruta absoluta del python del entorno virtual
-            python_bin = os.path.join(BASE_DIR, "venv", "bin", "python3")
-            if not os.path.exists(python_bin):
-                 python_bin = "/usr/bin/python3" # Fallback para test local
-                 
-            process = subprocess.Popen(
-                [python_bin, "-m", "uvicorn", "app.api.portal_server:app", "--host", "0.0.0.0", "--port", str(portal_port)],
-                stdout=logfile,
-                stderr=subprocess.STDOUT,
-                cwd=BASE_DIR,
-                preexec_fn=os.setsid # Detach process from terminal session
-            )
-            
-            with open(portal_pid_file, "w") as f:
-                f.write(str(process.pid))
-                
-        logger.info(f"Servidor del portal iniciado en el puerto {portal_port} (PID: {process.pid})")
-        
-        # Iniciar Monitor de Desconexiones (hostapd_cli)
-        monitor_pid_file = os.path.join(CONFIG_DIR, "monitor.pid")
-        monitor_log = os.path.join(BASE_DIR, "logs", "wifi", "monitor.log")
-        monitor_script = os.path.join(os.path.dirname(__file__), "monitor.py")
-        
-        os.makedirs(os.path.dirname(monitor_log), exist_ok=True)
-        with open(monitor_log, "a") as m_logfile:
-            m_process = subprocess.Popen(
-                [python_bin, monitor_script],
-                stdout=m_logfile,
-                stderr=subprocess.STDOUT,
-                cwd=BASE_DIR,
-                preexec_fn=os.setsid
-            )
-            with open(monitor_pid_file, "w") as f:
-                f.write(str(m_process.pid))
-        logger.info(f"Monitor de desconexiones iniciado (PID: {m_process.pid})")
+        ok, portal_msg = _start_portal(portal_port)
+        if not ok:
+            logger.error(portal_msg)
 
     update_module_status(CONFIG_FILE, 1)
     
@@ -166,7 +144,8 @@ def start(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         from ..dhcp import dhcp
         from ..firewall import firewall
         
-        d_ok, d_msg = dhcp.restart()
+        # Añadir la interfaz Wi-Fi cambia dnsmasq.conf: reload reinicia solo si hace falta
+        d_ok, d_msg = dhcp.reload() if dhcp.get_dnsmasq_pid() else dhcp.start()
         if not d_ok:
             logger.warning(f"Trigger DHCP: {d_msg}")
             
@@ -185,18 +164,9 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     pid = get_wifi_pid()
     
     # Parar el servidor del portal si existe
-    portal_pid_file = os.path.join(CONFIG_DIR, "portal_server.pid")
-    if os.path.exists(portal_pid_file):
-        try:
-            with open(portal_pid_file, "r") as f:
-                portal_pid = int(f.read().strip())
-            run_command(["kill", str(portal_pid)])
-            os.remove(portal_pid_file)
-            logger.info("Servidor del portal detenido")
-        except Exception as e:
-            logger.warning(f"Error al detener servidor del portal: {e}")
+    _stop_portal()
 
-    # Parar el monitor de desconexiones si existe
+    # Parar el monitor de desconexiones externo (versiones anteriores) si sigue activo
     monitor_pid_file = os.path.join(CONFIG_DIR, "monitor.pid")
     if os.path.exists(monitor_pid_file):
         try:
@@ -223,9 +193,10 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     wifi_cfg = load_json_config(CONFIG_FILE, {})
     iface = wifi_cfg.get("interface", "wlp3s0")
 
-    success, output = run_command(["kill", str(pid)])
-    if not success:
-        run_command(["kill", "-9", str(pid)])
+    if pid != DUMMY_PID:
+        success, output = run_command(["kill", str(pid)])
+        if not success or not wait_for_exit(pid, 3):
+            run_command(["kill", "-9", str(pid)])
 
     if os.path.exists(PID_FILE):
         try:
@@ -239,7 +210,7 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         run_command(["ip", "addr", "flush", "dev", iface])
 
     # Limpieza estricta de archivos temporales (Zero-Disk)
-    for f_path in [HOSTAPD_CONF, PID_FILE, portal_pid_file, monitor_pid_file]:
+    for f_path in [HOSTAPD_CONF, PID_FILE, PORTAL_PID_FILE, monitor_pid_file]:
         if os.path.exists(f_path):
             try:
                 os.remove(f_path)
@@ -252,7 +223,7 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     try:
         from ..dhcp import dhcp
         from ..firewall import firewall
-        dhcp.restart()
+        dhcp.reload()
         firewall.restart()
     except Exception as e:
         logger.warning(f"Error al disparar triggers post-wifi stop: {e}")
@@ -260,19 +231,91 @@ def stop(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     return True, "Servicio Wi-Fi detenido correctamente"
 
 def restart(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    # stop() ya espera a que hostapd termine: no hace falta una pausa fija
     stop()
-    time.sleep(1)
     return start(params)
 
+def _start_portal(portal_port: int) -> Tuple[bool, str]:
+    """Lanza el servidor aislado del portal (uvicorn app.api.portal_server:app)."""
+    global _portal_process
+    import subprocess
+    os.makedirs(os.path.dirname(PORTAL_LOG), exist_ok=True)
+    with open(PORTAL_LOG, "a") as logfile:
+        # Es vital usar la ruta absoluta del python del entorno virtual
+        python_bin = os.path.join(BASE_DIR, "venv", "bin", "python3")
+        if not os.path.exists(python_bin):
+            python_bin = "/usr/bin/python3" # Fallback para test local
+
+        try:
+            process = subprocess.Popen(
+                [python_bin, "-m", "uvicorn", "app.api.portal_server:app", "--host", "0.0.0.0", "--port", str(portal_port)],
+                stdout=logfile,
+                stderr=subprocess.STDOUT,
+                cwd=BASE_DIR,
+                preexec_fn=os.setsid # Detach process from terminal session
+            )
+        except OSError as e:
+            return False, f"Error al iniciar el servidor del portal: {e}"
+
+    with open(PORTAL_PID_FILE, "w") as f:
+        f.write(str(process.pid))
+    _portal_process = process
+
+    # Las desconexiones las escucha el propio portal (interfaz de control de hostapd)
+    logger.info(f"Servidor del portal iniciado en el puerto {portal_port} (PID: {process.pid})")
+    return True, f"Servidor del portal iniciado (PID: {process.pid})"
+
+def _stop_portal():
+    """Detiene el servidor del portal y recoge su estado de salida."""
+    global _portal_process
+    pid = process_tracker.pid(PORTAL_DAEMON)
+    if pid:
+        run_command(["kill", str(pid)])
+        if not wait_for_exit(pid, 3):
+            run_command(["kill", "-9", str(pid)])
+        logger.info("Servidor del portal detenido")
+    if _portal_process is not None:
+        # Evitar procesos zombi si lo lanzó este mismo proceso
+        try:
+            _portal_process.wait(timeout=1)
+        except Exception:
+            pass
+        _portal_process = None
+    if os.path.exists(PORTAL_PID_FILE):
+        try:
+            os.remove(PORTAL_PID_FILE)
+        except OSError as e:
+            logger.warning(f"Error al detener servidor del portal: {e}")
+
+def restart_portal(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    """Relanza solo el servidor del portal (sin tocar hostapd ni las sesiones)."""
+    wifi_cfg = load_json_config(CONFIG_FILE, {})
+    if wifi_cfg.get("status") != 1 or not wifi_cfg.get("portal_enabled", False):
+        return False, "El portal cautivo no está habilitado o el Wi-Fi está detenido"
+    portal_port = wifi_cfg.get("portal_port", 8500)
+    if portal_port == get_main_app_port():
+        return False, f"El puerto del portal ({portal_port}) entra en conflicto con el panel JSBach. Cámbialo en Configuración."
+    _stop_portal()
+    return _start_portal(portal_port)
+
 def get_connected_stations(iface: str) -> int:
-    """Obtiene el número de estaciones conectadas vía hostapd_cli."""
-    import re
-    success, output = run_command(["/usr/sbin/hostapd_cli", "-i", iface, "all_sta"], use_sudo=True)
-    if success and output:
-        # Contar bloques de MAC (una por cada estación conectada)
-        stations = re.findall(r'([0-9a-fA-F]{2}:){5}[0-9a-fA-F]{2}', output)
-        return len(stations)
-    return 0
+    """Número de estaciones conectadas (interfaz de control de hostapd, cacheado)."""
+    return len(station_cache.stations(iface))
+
+def stations(params: Dict[str, Any] = None) -> Tuple[bool, Any]:
+    """Estaciones asociadas al AP con señal, tráfico, tiempo de conexión y autorización."""
+    wifi_cfg = load_json_config(CONFIG_FILE, {})
+    iface = wifi_cfg.get("interface", "wlp3s0")
+    if station_cache.status(iface) is None:
+        return False, "hostapd no responde en su interfaz de control (¿servicio detenido?)"
+
+    portal_macs = set()
+    if wifi_cfg.get("portal_enabled", False):
+        portal_macs = set(load_json_config(PORTAL_AUTH_FILE, {"authorized_macs": []}).get("authorized_macs", []))
+    result = station_cache.stations(iface)
+    for station in result:
+        station["portal_authorized"] = station["mac"] in portal_macs if wifi_cfg.get("portal_enabled") else None
+    return True, result
 
 def status(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     # 1. Comprobar hardware
@@ -289,18 +332,22 @@ def status(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     iface = wifi_cfg.get("interface", "wlp3s0")
     ssid = wifi_cfg.get("ssid", "N/A")
     channel = wifi_cfg.get("channel", "N/A")
-    stations = get_connected_stations(iface)
+    ap_status = station_cache.status(iface) or {}
+    channel = ap_status.get("channel", channel)
+    connected = get_connected_stations(iface)
     
     msg = (
         f"Servicio: ACTIVO (PID: {pid})\n"
         f"SSID: {ssid} | Canal: {channel} | Interfaz: {iface}\n"
-        f"Clientes conectados: {stations}"
+        f"Clientes conectados: {connected}"
     )
+    if ap_status.get("state"):
+        msg += f"\nEstado del AP: {ap_status['state']}"
     
     # Comprobar si el portal está activado
     if wifi_cfg.get("portal_enabled", False):
-        portal_pid_file = os.path.join(CONFIG_DIR, "portal_server.pid")
-        portal_status = "OK" if os.path.exists(portal_pid_file) else "ERROR (Habilitado pero sin PID)"
+        portal_pid = process_tracker.pid(PORTAL_DAEMON)
+        portal_status = f"OK (PID: {portal_pid})" if portal_pid else "ERROR (Habilitado pero no está en ejecución)"
         msg += f"\nPortal Cautivo: {portal_status} (Puerto: {wifi_cfg.get('portal_port', 8500)})"
         
     return True, msg
@@ -409,25 +456,90 @@ def list_portal_users(params: Dict[str, Any] = None) -> Tuple[bool, Any]:
     safe_users = [{"username": u["username"], "created_at": u.get("created_at", "N/A")} for u in users_data["users"]]
     return True, safe_users
 
+def generate_vouchers(params: Dict[str, Any] = None) -> Tuple[bool, Any]:
+    """Genera un lote de vales de acceso para el portal."""
+    params = params or {}
+    try:
+        count = int(params.get("count", 10))
+        max_devices = int(params.get("max_devices", 1))
+        duration = int(params.get("duration_minutes", 1440))
+        valid_days = int(params.get("valid_days", 30))
+    except (TypeError, ValueError):
+        return False, "Parámetros numéricos inválidos"
+    if not 1 <= count <= vouchers.MAX_BATCH:
+        return False, f"count debe estar entre 1 y {vouchers.MAX_BATCH}"
+    if max_devices < 1 or duration < 1 or valid_days < 1:
+        return False, "max_devices, duration_minutes y valid_days deben ser positivos"
+
+    try:
+        batch, codes = vouchers.generate_batch(count, max_devices, duration, valid_days,
+                                               str(params.get("note", ""))[:64])
+    except OSError as e:
+        return False, f"Error al generar vales: {e}"
+    return True, {"batch": batch["id"], "codes": codes}
+
+def list_vouchers(params: Dict[str, Any] = None) -> Tuple[bool, Any]:
+    return True, vouchers.list_batches()
+
+def remove_voucher_batch(params: Dict[str, Any] = None) -> Tuple[bool, str]:
+    if not params or "batch" not in params:
+        return False, "Falta parámetro: batch"
+    try:
+        batch_id = int(params["batch"])
+    except (TypeError, ValueError):
+        return False, "batch debe ser numérico"
+    if vouchers.remove_batch(batch_id):
+        return True, f"Lote {batch_id} eliminado (sus vales dejan de ser válidos)"
+    return False, "El lote no existe"
+
+def _apply_portal_auth(added: List[str], removed: List[str]):
+    """Aplica altas/bajas de MACs al firewall; reconstrucción completa solo si falla la vía incremental."""
+    try:
+        from ..firewall.helpers import update_wifi_portal_macs
+        if update_wifi_portal_macs(added, removed):
+            return
+        from ..firewall import firewall
+        firewall.restart()
+    except Exception as e:
+        logger.warning(f"No se pudieron aplicar las reglas del portal: {e}")
+
+def authorize_macs(macs: List[str]) -> Tuple[bool, List[str]]:
+    """Autoriza varias MACs con una sola escritura y una sola actualización del firewall."""
+    auth_data = load_json_config(PORTAL_AUTH_FILE, {"authorized_macs": []})
+    current = auth_data["authorized_macs"]
+    added = [m for m in dict.fromkeys(mac.lower() for mac in macs) if m not in current]
+    if not added:
+        return True, []
+    auth_data["authorized_macs"] = current + added
+    if not save_json_config(PORTAL_AUTH_FILE, auth_data):
+        return False, []
+    _apply_portal_auth(added, [])
+    return True, added
+
+def deauthorize_macs(macs: List[str]) -> Tuple[bool, List[str]]:
+    """Revoca varias MACs con una sola escritura y una sola actualización del firewall."""
+    auth_data = load_json_config(PORTAL_AUTH_FILE, {"authorized_macs": []})
+    wanted = {mac.lower() for mac in macs}
+    removed = [m for m in auth_data["authorized_macs"] if m in wanted]
+    if not removed:
+        return True, []
+    auth_data["authorized_macs"] = [m for m in auth_data["authorized_macs"] if m not in wanted]
+    if not save_json_config(PORTAL_AUTH_FILE, auth_data):
+        return False, []
+    _apply_portal_auth([], removed)
+    return True, removed
+
 def authorize_mac(params: Dict[str, Any] = None) -> Tuple[bool, str]:
     """Autoriza una MAC manualmente o vía portal."""
     if not params or "mac" not in params:
         return False, "Falta parámetro: mac"
     
     mac = params["mac"].lower()
-    auth_data = load_json_config(PORTAL_AUTH_FILE, {"authorized_macs": []})
-    
-    if mac not in auth_data["authorized_macs"]:
-        auth_data["authorized_macs"].append(mac)
-        if save_json_config(PORTAL_AUTH_FILE, auth_data):
-            # Notificar al firewall para aplicar reglas de bypass
-            try:
-                from ..firewall import firewall
-                firewall.restart() # O un trigger más específico si existiera
-            except:
-                pass
-            return True, f"Dispositivo {mac} autorizado"
-    
+    ok, added = authorize_macs([mac])
+    if not ok:
+        return False, "Error al guardar las autorizaciones del portal"
+    if added:
+        return True, f"Dispositivo {mac} autorizado"
     return True, f"Dispositivo {mac} ya estaba autorizado"
 
 def deauthorize_mac(params: Dict[str, Any] = None) -> Tuple[bool, str]:
@@ -435,20 +547,11 @@ def deauthorize_mac(params: Dict[str, Any] = None) -> Tuple[bool, str]:
         return False, "Falta parámetro: mac"
     
     mac = params["mac"].lower()
-    logger.info(f"DEBUG: deauthorize_mac called for {mac}. File: {PORTAL_AUTH_FILE}")
-    auth_data = load_json_config(PORTAL_AUTH_FILE, {"authorized_macs": []})
-    logger.info(f"DEBUG: Current authorized_macs in file: {auth_data.get('authorized_macs', [])}")
-    
-    if mac in auth_data["authorized_macs"]:
-        auth_data["authorized_macs"].remove(mac)
-        if save_json_config(PORTAL_AUTH_FILE, auth_data):
-            try:
-                from ..firewall import firewall
-                firewall.restart()
-            except:
-                pass
-            return True, f"Autorización revocada para {mac}"
-    
+    ok, removed = deauthorize_macs([mac])
+    if not ok:
+        return False, "Error al guardar las autorizaciones del portal"
+    if removed:
+        return True, f"Autorización revocada para {mac}"
     return True, f"El dispositivo {mac} no estaba autorizado"
 
 
@@ -471,11 +574,16 @@ ALLOWED_ACTIONS = {
     "start": start,
     "stop": stop,
     "restart": restart,
+    "restart_portal": restart_portal,
     "status": status,
     "config": config,
     "add_portal_user": add_portal_user,
     "remove_portal_user": remove_portal_user,
     "list_portal_users": list_portal_users,
+    "stations": stations,
+    "generate_vouchers": generate_vouchers,
+    "list_vouchers": list_vouchers,
+    "remove_voucher_batch": remove_voucher_batch,
     "authorize_mac": authorize_mac,
     "deauthorize_mac": deauthorize_mac
 }
@@ -3,12 +3,11 @@ Funciones auxiliares de autenticación para JSBach V4.7
 Usadas tanto por el login web como por la autenticación de la CLI
 """
 
-import json
-import os
 import hashlib
 from typing import Optional, Tuple
 from datetime import datetime
 from app.utils import crypto_helper, mfa_helper
+from app.utils.auth_service import auth_service
 
 def hash_password(password: str) -> str:
     """
@@ -36,10 +35,7 @@ def load_users(config_path: str) -> dict:
     Returns:
         Diccionario con los usuarios
     """
-    if not os.path.exists(config_path):
-        return {"users": []}
-    with open(config_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return auth_service.users.load(config_path)
 
 def authenticate_user(username: str, password: str, config_path: str) -> Tuple[bool, Optional[dict]]:
     """
@@ -51,27 +47,25 @@ def authenticate_user(username: str, password: str, config_path: str) -> Tuple[b
     Returns:
         (True, user_data) si autenticado, (False, None) en caso contrario
     """
-    data = load_users(config_path)
-    users = data.get("users", [])
-    
-    for user in users:
-        if user["username"] == username and user.get("enabled", True):
-            if verify_password(password, user["password_hash"]):
-                return True, user
-    return False, None
+    return auth_service.authenticate_sync(username, password, config_path)
+
+async def authenticate_user_async(username: str, password: str, config_path: str) -> Tuple[bool, Optional[dict]]:
+    """
+    Igual que authenticate_user pero sin bloquear el bucle asyncio (pool acotado).
+    Lanza AuthBusyError si hay demasiadas verificaciones en curso.
+    """
+    return await auth_service.authenticate(username, password, config_path)
 
 def verify_mfa_code(username: str, code: str, config_path: str) -> bool:
     """
     Verifica el código MFA para un usuario.
     """
-    data = load_users(config_path)
-    for user in data.get("users", []):
-        if user["username"] == username:
-            if not user.get("mfa_enabled"):
-                return True
-            secret = user.get("mfa_secret")
-            return mfa_helper.verify_totp_code(secret, code)
-    return False
+    user = auth_service.users.get(config_path, username)
+    if user is None:
+        return False
+    if not user.get("mfa_enabled"):
+        return True
+    return mfa_helper.verify_totp_code(user.get("mfa_secret"), code)
 
 def save_mfa_secret(username: str, secret: str, enabled: bool, config_path: str) -> bool:
     """
@@ -87,8 +81,7 @@ def save_mfa_secret(username: str, secret: str, enabled: bool, config_path: str)
             break
     
     if found:
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4)
+        auth_service.users.save(config_path, data)
         return True
     return False
 
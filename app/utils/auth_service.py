@@ -0,0 +1,150 @@
+"""
+Servicio de autenticación para JSBach V4.7 (login web, portal y CLI).
+
+- Índice de usuarios en memoria por fichero (username -> usuario), recargado
+  solo cuando cambia la firma del fichero (mtime/tamaño/inodo).
+- La verificación Argon2 (decenas de ms de CPU y memoria) se ejecuta en un
+  pool de hilos acotado, fuera del bucle asyncio. Si hay demasiadas
+  verificaciones pendientes se rechaza el intento con AuthBusyError en lugar
+  de encolarlo: una avalancha de logins no degrada el resto del API.
+"""
+
+import os
+import json
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.utils.global_helpers.config_cache import atomic_write_json, clone_json, file_signature
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 2
+MAX_PENDING = 16
+
+
+class AuthBusyError(Exception):
+    """Demasiadas verificaciones de contraseña en curso."""
+
+
+class UserIndex:
+    """Usuarios de un fichero JSON ({"users": [...]}) indexados por nombre."""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Any, dict, Dict[str, dict]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    def _entry(self, path: str) -> Tuple[dict, Dict[str, dict]]:
+        key = self._key(path)
+        sig = file_signature(key)
+        if sig is None:
+            with self._lock:
+                self._entries.pop(key, None)
+            return {"users": []}, {}
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == sig:
+                return entry[1], entry[2]
+
+        with open(key, "r", encoding="utf-8") as f:
+            st = os.fstat(f.fileno())
+            sig = (st.st_mtime_ns, st.st_ctime_ns, st.st_size, st.st_ino)
+            data = json.load(f)
+        by_name = {u["username"]: u for u in data.get("users", []) if isinstance(u, dict) and "username" in u}
+        with self._lock:
+            self._entries[key] = (sig, data, by_name)
+        return data, by_name
+
+    def load(self, path: str) -> dict:
+        """Copia modificable del contenido completo del fichero."""
+        return clone_json(self._entry(path)[0])
+
+    def get(self, path: str, username: str) -> Optional[dict]:
+        user = self._entry(path)[1].get(username)
+        return clone_json(user) if user is not None else None
+
+    def save(self, path: str, data: dict):
+        atomic_write_json(self._key(path), data)
+        self.invalidate(path)
+
+    def invalidate(self, path: Optional[str] = None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(path), None)
+
+
+class AuthService:
+    def __init__(self, max_workers: int = MAX_WORKERS, max_pending: int = MAX_PENDING):
+        self.users = UserIndex()
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jsbach-auth")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise AuthBusyError("Demasiados intentos de autenticación en curso")
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _candidate(self, username: str, config_path: str) -> Optional[dict]:
+        if not username or not isinstance(username, str):
+            return None
+        user = self.users.get(config_path, username)
+        if user is None or not user.get("enabled", True) or not user.get("password_hash"):
+            return None
+        return user
+
+    async def authenticate(self, username: str, password: str, config_path: str) -> Tuple[bool, Optional[dict]]:
+        """Versión asíncrona: la verificación se ejecuta en el pool acotado."""
+        from app.utils.auth_helper import verify_password
+
+        user = self._candidate(username, config_path)
+        if user is None or not password:
+            return False, None
+        self._acquire()
+        try:
+            future = self._executor.submit(verify_password, password, user["password_hash"])
+        except BaseException:
+            # submit falla (p. ej. pool cerrado al apagar): el hueco no llega a ocuparse
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        ok = await asyncio.wrap_future(future)
+        return (True, user) if ok else (False, None)
+
+    def authenticate_sync(self, username: str, password: str, config_path: str) -> Tuple[bool, Optional[dict]]:
+        """Para llamantes síncronos (hilos de trabajo): respeta el mismo límite."""
+        from app.utils.auth_helper import verify_password
+
+        user = self._candidate(username, config_path)
+        if user is None or not password:
+            return False, None
+        self._acquire()
+        try:
+            ok = self._executor.submit(verify_password, password, user["password_hash"]).result()
+        finally:
+            self._release()
+        return (True, user) if ok else (False, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"pending": self._pending, "rejected": self.rejected, "max_pending": self.max_pending}
+
+
+auth_service = AuthService()
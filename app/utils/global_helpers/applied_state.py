@@ -0,0 +1,288 @@
+# app/utils/global_helpers/applied_state.py
+"""
+Huellas del estado aplicado por cada módulo, para el arranque en caliente.
+
+Cada paquete de módulo puede declarar en su __init__.py qué estado del kernel
+le pertenece:
+
+    LIVE_STATE = {
+        "iptables": ["JSB_VLAN_"],     # cadenas (por prefijo) y saltos hacia ellas
+        "ebtables": ["JSB_TAG_"],
+        "links": ["br0"],              # interfaces (por prefijo) y sus IPv4
+        "bridge_vlans": [],            # 'bridge vlan show' ([] = todas las interfaces)
+        "sysctl": ["net.ipv4.ip_forward"],
+        "daemons": [DNSMASQ_DAEMON],   # DaemonSpec vivos (pidfd)
+    }
+
+La huella de un módulo es el par (hash de su configuración sin 'status' y del
+código del paquete, hash del estado vivo extraído de un volcado del kernel).
+Se registra en config/applied_state.json al terminar la restauración y al
+parar el servicio. En el siguiente arranque, si ambas coinciden (el servicio se
+reinició pero el kernel conservó las reglas), el módulo se marca activo sin
+volver a ejecutar start(): ni se vacían cadenas ni se tocan enlaces o puentes.
+Cada registro guarda además el boot_id del kernel: tras un reinicio del equipo
+las instantáneas (ruleset_snapshot) recrean reglas y enlaces idénticos, pero no
+los demonios ni los sysctl, así que solo se admite el arranque en caliente si
+el registro es del arranque actual.
+
+KernelDump ejecuta como mucho un comando por fuente (iptables-save, ebtables -L
+por tabla, ip -o link/addr, bridge vlan show) y lo comparte entre módulos.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config_cache import atomic_write_json
+from .module_helpers import load_module_config, run_command
+from .process_supervisor import process_tracker
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+STATE_FILE = os.path.join(BASE_DIR, "config", "applied_state.json")
+BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+MODULES_DIR = os.path.join(BASE_DIR, "app", "modules")
+
+EBTABLES_TABLES = ("filter", "nat", "broute")
+VOLATILE_KEYS = ("status", "dhcp_error")
+
+_COUNTERS_RE = re.compile(r"\s*\[\d+:\d+\]$")
+_EBT_CHAIN_RE = re.compile(r"^Bridge chain: ([^,]+),")
+_LIFETIME_RE = re.compile(r"\s*(valid_lft|preferred_lft)\s+\S+")
+
+_lock = threading.Lock()
+_source_hashes: Dict[str, str] = {}
+
+
+def _bin(cmd: str, default_path: str) -> str:
+    return shutil.which(cmd) or default_path
+
+
+class KernelDump:
+    """Volcado perezoso del estado del kernel (cada fuente se consulta una sola vez)."""
+
+    def __init__(self):
+        self._cache: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, source: str, loader):
+        with self._lock:
+            if source not in self._cache:
+                self._cache[source] = loader()
+            return self._cache[source]
+
+    def iptables(self) -> Dict[str, List[str]]:
+        """{tabla: líneas} de iptables-save, sin contadores ni comentarios."""
+        def load():
+            ok, output = run_command([_bin("iptables-save", "/usr/sbin/iptables-save")], ignore_error=True)
+            tables: Dict[str, List[str]] = {}
+            if not ok:
+                return tables
+            current = None
+            for line in output.splitlines():
+                if line.startswith("*"):
+                    current = tables.setdefault(line[1:].strip(), [])
+                elif current is not None and line and not line.startswith("#") and line != "COMMIT":
+                    current.append(_COUNTERS_RE.sub("", line))
+            return tables
+        return self._get("iptables", load)
+
+    def ebtables(self) -> Dict[str, List[str]]:
+        """{tabla: ["cadena: regla", ...]} de 'ebtables -t <tabla> -L'."""
+        def load():
+            tables: Dict[str, List[str]] = {}
+            for table in EBTABLES_TABLES:
+                ok, output = run_command([_bin("ebtables", "/usr/sbin/ebtables"), "-t", table, "-L"], ignore_error=True)
+                if not ok:
+                    continue
+                lines, chain = [], None
+                for line in output.splitlines():
+                    match = _EBT_CHAIN_RE.match(line)
+                    if match:
+                        chain = match.group(1)
+                        lines.append(f":{chain}")
+                    elif chain and line.strip():
+                        lines.append(f"{chain}: {line.strip()}")
+                tables[table] = lines
+            return tables
+        return self._get("ebtables", load)
+
+    def links(self) -> List[str]:
+        """'ip -o link' e 'ip -o -4 addr' (sin tiempos de vida de las concesiones)."""
+        def load():
+            lines = []
+            for cmd in (["-o", "link", "show"], ["-o", "-4", "addr", "show"]):
+                ok, output = run_command([_bin("ip", "/usr/sbin/ip")] + cmd, use_sudo=False, ignore_error=True)
+                if ok:
+                    lines.extend(_LIFETIME_RE.sub("", line) for line in output.splitlines())
+            return lines
+        return self._get("links", load)
+
+    def bridge_vlans(self) -> List[str]:
+        def load():
+            ok, output = run_command([_bin("bridge", "/usr/sbin/bridge"), "vlan", "show"], use_sudo=False, ignore_error=True)
+            lines, port = [], ""
+            if ok:
+                for line in output.splitlines()[1:]:  # cabecera
+                    if not line.strip():
+                        continue
+                    if not line[0].isspace():
+                        port = line.split()[0]
+                        line = line[len(port):]
+                    lines.append(f"{port} {' '.join(line.split())}")
+            return lines
+        return self._get("bridge_vlans", load)
+
+
+def _chain_lines(lines: Iterable[str], prefixes: List[str]) -> List[str]:
+    """Declaraciones y reglas de las cadenas con esos prefijos y los saltos hacia ellas."""
+    selected = []
+    for line in lines:
+        tokens = line.replace(":", " ").split()
+        if any(tok.startswith(p) for tok in tokens for p in prefixes):
+            selected.append(line)
+    return selected
+
+
+def _link_lines(lines: Iterable[str], prefixes: List[str]) -> List[str]:
+    selected = []
+    for line in lines:
+        # "5: br0.10@br0: <...>" / "5: br0.10    inet 10.0.10.1/24 ..."
+        parts = line.split()
+        name = parts[1].rstrip(":").split("@")[0] if len(parts) > 1 else ""
+        if any(name.startswith(p) for p in prefixes):
+            # Sin el índice: una interfaz recreada desde la instantánea equivale a la original
+            selected.append(" ".join(parts[1:]))
+    return selected
+
+
+def live_lines(spec: Dict[str, Any], dump: KernelDump) -> List[str]:
+    """Estado del kernel que declara un módulo, normalizado."""
+    lines: List[str] = []
+    if spec.get("iptables"):
+        for table, table_lines in sorted(dump.iptables().items()):
+            lines.extend(f"ip4 {table} {l}" for l in _chain_lines(table_lines, spec["iptables"]))
+    if spec.get("ebtables"):
+        for table, table_lines in sorted(dump.ebtables().items()):
+            lines.extend(f"ebt {table} {l}" for l in _chain_lines(table_lines, spec["ebtables"]))
+    if spec.get("links"):
+        lines.extend(f"link {l}" for l in _link_lines(dump.links(), spec["links"]))
+    if "bridge_vlans" in spec:
+        prefixes = spec["bridge_vlans"]
+        lines.extend(f"bvlan {l}" for l in dump.bridge_vlans()
+                     if not prefixes or any(l.startswith(p) for p in prefixes))
+    for key in spec.get("sysctl", []):
+        try:
+            with open(os.path.join("/proc/sys", *key.split(".")), "r") as f:
+                lines.append(f"sysctl {key}={f.read().strip()}")
+        except OSError:
+            lines.append(f"sysctl {key}=?")
+    for daemon in spec.get("daemons", []):
+        lines.append(f"daemon {daemon.name} {'up' if process_tracker.pid(daemon) else 'down'}")
+    return lines
+
+
+def boot_id() -> Optional[str]:
+    """Identificador del arranque actual del kernel (cambia en cada reinicio)."""
+    try:
+        with open(BOOT_ID_FILE, "r") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _source_hash(module_name: str) -> str:
+    """Hash del código del paquete: una actualización de JSBach obliga a arrancar en frío."""
+    digest = _source_hashes.get(module_name)
+    if digest is None:
+        h = hashlib.sha256()
+        package_dir = os.path.join(MODULES_DIR, module_name)
+        for root, dirs, files in os.walk(package_dir):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for fname in sorted(f for f in files if f.endswith(".py")):
+                path = os.path.join(root, fname)
+                h.update(os.path.relpath(path, package_dir).encode())
+                try:
+                    with open(path, "rb") as f:
+                        h.update(f.read())
+                except OSError:
+                    pass
+        digest = _source_hashes[module_name] = h.hexdigest()
+    return digest
+
+
+def config_hash(base_dir: str, module_name: str) -> str:
+    cfg = load_module_config(base_dir, module_name, {}) or {}
+    if isinstance(cfg, dict):
+        cfg = {k: v for k, v in cfg.items() if k not in VOLATILE_KEYS}
+    payload = json.dumps(cfg, sort_keys=True, default=str)
+    return hashlib.sha256(f"{_source_hash(module_name)}\n{payload}".encode()).hexdigest()
+
+
+def live_hash(spec: Dict[str, Any], dump: KernelDump) -> str:
+    return hashlib.sha256("\n".join(live_lines(spec, dump)).encode()).hexdigest()
+
+
+def load_records(path: str = STATE_FILE) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def matches(base_dir: str, module_name: str, spec: Optional[Dict[str, Any]], dump: KernelDump,
+            path: str = STATE_FILE) -> bool:
+    """¿El kernel conserva exactamente el estado que aplicó el módulo con su configuración actual?"""
+    if not spec:
+        return False
+    record = load_records(path).get(module_name)
+    if not record:
+        return False
+    # Otro arranque: el estado pudo recrearse desde las instantáneas sin start()
+    current_boot = boot_id()
+    if current_boot is None or record.get("boot") != current_boot:
+        return False
+    if record.get("config") != config_hash(base_dir, module_name):
+        return False
+    return record.get("live") == live_hash(spec, dump)
+
+
+def record(base_dir: str, specs: Dict[str, Dict[str, Any]], path: str = STATE_FILE) -> Dict[str, Dict[str, Any]]:
+    """
+    Registra la huella de los módulos activos con LIVE_STATE ({módulo: spec})
+    y descarta la de los inactivos. Devuelve los registros guardados.
+    """
+    dump = KernelDump()
+    boot = boot_id()
+    records: Dict[str, Dict[str, Any]] = {}
+    for name, spec in specs.items():
+        if not spec:
+            continue
+        cfg = load_module_config(base_dir, name, {}) or {}
+        if not isinstance(cfg, dict) or cfg.get("status") != 1:
+            continue
+        try:
+            records[name] = {
+                "config": config_hash(base_dir, name),
+                "live": live_hash(spec, dump),
+                "boot": boot,
+                "recorded_at": int(time.time()),
+            }
+        except Exception as e:
+            logger.warning(f"No se pudo calcular la huella de {name}: {e}")
+    with _lock:
+        try:
+            atomic_write_json(path, records)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar {path}: {e}")
+    return records
+
@@ -0,0 +1,201 @@
+# app/utils/global_helpers/config_cache.py
+"""
+Caché de configuración JSON a nivel de proceso.
+
+Cada entrada se indexa por ruta absoluta y se valida con la firma del fichero
+(st_mtime_ns, st_ctime_ns, st_size, st_ino): mientras no cambie, una lectura
+cuesta un stat() y una copia en memoria, sin abrir ni decodificar el fichero.
+Los valores se devuelven como copias para que los llamantes puedan modificarlos
+libremente (patrón cargar -> modificar -> guardar de los módulos).
+
+RawFileCache guarda los bytes sin decodificar para servirlos por HTTP.
+"""
+
+import os
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_Signature = Tuple[int, int, int, int]
+
+
+def clone_json(value: Any) -> Any:
+    """Copia profunda de una estructura JSON (más rápida que copy.deepcopy)."""
+    if isinstance(value, dict):
+        return {k: clone_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clone_json(v) for v in value]
+    return value
+
+
+def atomic_write_json(file_path: str, data: Any, indent: Optional[int] = 4) -> None:
+    """Escribe JSON de forma atómica conservando los permisos del fichero previo."""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+
+    try:
+        previous_mode = os.stat(file_path).st_mode & 0o7777
+    except OSError:
+        previous_mode = None
+
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(file_path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        if previous_mode is not None:
+            os.chmod(tmp_path, previous_mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+
+def _signature_from_stat(st: os.stat_result) -> _Signature:
+    return (st.st_mtime_ns, st.st_ctime_ns, st.st_size, st.st_ino)
+
+
+def file_signature(path: str) -> Optional[_Signature]:
+    try:
+        return _signature_from_stat(os.stat(path))
+    except OSError:
+        return None
+
+
+class ConfigCache:
+    """Caché thread-safe de ficheros JSON validada por firma de fichero."""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[_Signature, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    def load(self, path: str) -> Any:
+        """
+        Devuelve una copia del contenido JSON de 'path'.
+        Lanza FileNotFoundError si no existe y ValueError si está vacío o es inválido.
+        """
+        key = self._key(path)
+        sig = file_signature(key)
+        if sig is None:
+            with self._lock:
+                self._entries.pop(key, None)
+            raise FileNotFoundError(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == sig:
+                self.hits += 1
+                return clone_json(entry[1])
+
+        # La firma se toma del descriptor abierto: si el fichero cambia entre
+        # fstat y read, la siguiente lectura detectará la diferencia.
+        with open(key, "rb") as f:
+            sig = _signature_from_stat(os.fstat(f.fileno()))
+            raw = f.read()
+        if not raw.strip():
+            raise ValueError(f"Fichero vacío: {key}")
+        data = json.loads(raw)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (sig, data)
+        return clone_json(data)
+
+    def store(self, path: str, data: Any):
+        """Registra el contenido recién escrito en 'path' (evita releerlo)."""
+        key = self._key(path)
+        sig = file_signature(key)
+        with self._lock:
+            if sig is None:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = (sig, clone_json(data))
+
+    def invalidate(self, path: Optional[str] = None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(path), None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class RawFileCache:
+    """
+    Bytes de ficheros que se sirven tal cual por HTTP (sin decodificar JSON).
+    LRU acotada por tamaño total y validada por firma de fichero.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[_Signature, bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> Tuple[_Signature, bytes]:
+        """(firma, contenido). Lanza FileNotFoundError si no existe."""
+        key = os.path.normpath(os.path.abspath(path))
+        sig = file_signature(key)
+        if sig is None:
+            self.invalidate(key)
+            raise FileNotFoundError(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == sig:
+                self._entries.move_to_end(key)
+                return entry
+
+        with open(key, "rb") as f:
+            sig = _signature_from_stat(os.fstat(f.fileno()))
+            raw = f.read()
+
+        with self._lock:
+            self._drop(key)
+            if len(raw) <= self.max_bytes:
+                self._entries[key] = (sig, raw)
+                self._size += len(raw)
+                while self._size > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+        return sig, raw
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def invalidate(self, path: Optional[str] = None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._size = 0
+            else:
+                self._drop(os.path.normpath(os.path.abspath(path)))
+
+
+config_cache = ConfigCache()
+raw_file_cache = RawFileCache()
@@ -0,0 +1,125 @@
+# app/utils/global_helpers/event_bus.py
+"""
+Bus interno de publicación/suscripción para notificar cambios a la interfaz web.
+
+Tipos de evento publicados:
+- status: transiciones de estado de módulos (StatusRegistry)
+- action: inicio/fin de una acción de módulo (execute_module_action)
+- config: ficheros de configuración escritos por una acción
+
+publish() es thread-safe y no bloquea: cada suscriptor tiene una cola acotada en
+su bucle asyncio y, si un cliente lento la llena, se descartan los eventos más
+antiguos. Se guarda un histórico corto para reanudar con Last-Event-ID.
+"""
+
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 256
+QUEUE_SIZE = 256
+
+
+class Subscription:
+    """Cola de eventos de un cliente, ligada al bucle asyncio que la creó."""
+
+    def __init__(self, bus: "EventBus", loop: asyncio.AbstractEventLoop, maxsize: int = QUEUE_SIZE):
+        self._bus = bus
+        self._loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def push(self, event: Dict[str, Any]):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            # Misma cola que call_soon_threadsafe: se conserva el orden de publicación
+            self._loop.call_soon(self._put, event)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Bucle cerrado: el cliente ya no existe
+            self.close()
+
+    def _put(self, event: Dict[str, Any]):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Dict[str, Any]:
+        """Siguiente evento; lanza asyncio.TimeoutError si no llega ninguno."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscription] = set()
+        self._history: deque = deque(maxlen=history_size)
+        self._next_id = 1
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            event = {"id": self._next_id, "type": event_type, "ts": time.time(), "data": data}
+            self._next_id += 1
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        return event
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscription:
+        """Nuevo suscriptor (llamar desde el bucle asyncio que lo consumirá)."""
+        subscription = Subscription(self, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+            missed = self._since(last_event_id)
+        for event in missed:
+            subscription._put(event)
+        return subscription
+
+    def _since(self, last_event_id: Optional[str]) -> List[Dict[str, Any]]:
+        try:
+            last = int(last_event_id)
+        except (TypeError, ValueError):
+            return []
+        return [e for e in self._history if e["id"] > last]
+
+    def recent(self, event_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Eventos del histórico (del más antiguo al más reciente)."""
+        with self._lock:
+            return [e for e in self._history if event_type is None or e["type"] == event_type]
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_sse(event_type: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    """Serializa un evento en formato text/event-stream."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+event_bus = EventBus()
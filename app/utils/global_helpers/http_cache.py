@@ -0,0 +1,39 @@
+# app/utils/global_helpers/http_cache.py
+"""
+Validadores HTTP (ETag / Last-Modified) para respuestas servidas desde caché.
+"""
+
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparación de If-None-Match (lista separada por comas o '*')."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cache_headers(etag: str, mtime: Optional[float] = None, cache_control: str = "private, no-cache") -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if mtime is not None:
+        headers["Last-Modified"] = formatdate(mtime, usegmt=True)
+    return headers
+
+
+def is_not_modified(request_headers: Mapping[str, str], etag: str, mtime: Optional[float] = None) -> bool:
+    """True si la petición condicional permite responder 304 (If-None-Match tiene prioridad)."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if mtime is None or not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified tiene resolución de segundos
+    return int(mtime) <= since
@@ -5,49 +5,192 @@ Centraliza escritura de logs, archivos de configuración, y gestión de director
 """
 
 import os
+import gzip
+import fcntl
+import queue
+import atexit
+import shutil
 import logging
+import threading
 import json
-from typing import Optional, List, Tuple
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, List, Tuple
+from .state_store import read_json_document, write_json_document
+from .unit_of_work import current_unit_of_work
 
 
 # =============================================================================
 # LOGGING
 # =============================================================================
 
+# Rotación por tamaño de logs/<modulo>/actions.log
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_COMPRESS = True
+
+_LOG_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "WARN": logging.WARNING,
+    "ERROR": logging.ERROR,
+    "CRITICAL": logging.CRITICAL,
+}
+
+_module_loggers: Dict[str, logging.Logger] = {}
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_listener: Optional[QueueListener] = None
+_log_lock = threading.Lock()
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Comprime el log rotado y elimina el original."""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class _SharedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler compartido entre procesos (API, servidor CLI y portal
+    escriben el mismo actions.log): cada escritura, y la rotación que pueda
+    provocar, se hace bajo flock de <log>.lock. Si otro proceso ya rotó el
+    fichero (cambió el inodo), se reabre antes de escribir para no perder líneas
+    en el fichero renombrado.
+    """
+
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, **kwargs)
+        self._lock_fd: Optional[int] = None
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            st = os.stat(self.baseFilename)
+            current = os.fstat(self.stream.fileno())
+            if (st.st_dev, st.st_ino) == (current.st_dev, current.st_ino):
+                return
+        except FileNotFoundError:
+            pass
+        self.stream.close()
+        self.stream = self._open()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if self._lock_fd is None:
+                self._lock_fd = os.open(self.baseFilename + ".lock", os.O_CREAT | os.O_RDWR, 0o660)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        except OSError:
+            self.handleError(record)
+            return
+        try:
+            self._reopen_if_rotated()
+            super().emit(record)
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        super().close()
+
+
+class _ModuleLogRouter(logging.Handler):
+    """
+    Handler del hilo escritor: reparte cada registro al actions.log de su
+    módulo. Los RotatingFileHandler se abren una sola vez y se reutilizan.
+    """
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self._handlers: Dict[str, logging.Handler] = {}
+
+    def _open_handler(self, module_name: str) -> Optional[logging.Handler]:
+        log_file = create_module_log_directory(module_name)
+        if log_file == "/dev/null":
+            return None
+        fh = _SharedRotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT)
+        if LOG_COMPRESS:
+            fh.namer = _gzip_namer
+            fh.rotator = _gzip_rotator
+        # Línea en blanco entre entradas (formato histórico de actions.log)
+        fh.terminator = "\n\n"
+        fh.setLevel(logging.DEBUG)
+        fh.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%d/%m/%Y %H:%M:%S'))
+        return fh
+
+    def emit(self, record: logging.LogRecord):
+        module_name = record.name.rpartition(".")[2]
+        handler = self._handlers.get(module_name)
+        if handler is None:
+            handler = self._open_handler(module_name)
+            if handler is None:
+                logging.getLogger().error(f"[{module_name}] {record.getMessage()}")
+                return
+            self._handlers[module_name] = handler
+        handler.handle(record)
+
+    def close(self):
+        for handler in self._handlers.values():
+            handler.close()
+        self._handlers.clear()
+        super().close()
+
+
+def _stop_log_listener():
+    """Vacía la cola pendiente y cierra los ficheros al terminar el proceso."""
+    global _log_listener
+    with _log_lock:
+        listener, _log_listener = _log_listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _ensure_log_listener():
+    global _log_listener
+    if _log_listener is not None:
+        return
+    with _log_lock:
+        if _log_listener is None:
+            listener = QueueListener(_log_queue, _ModuleLogRouter(), respect_handler_level=True)
+            listener.start()
+            _log_listener = listener
+            atexit.register(_stop_log_listener)
+
+
 def get_module_logger(module_name: str) -> logging.Logger:
     """
     Obtener o crear un logger para un módulo específico.
+    Los mensajes se encolan y el hilo escritor los vuelca en logs/<modulo>/actions.log.
     """
-    logger = logging.getLogger(f"jsbach.{module_name}")
-    logger.setLevel(logging.DEBUG)
+    logger = _module_loggers.get(module_name)
+    if logger is not None:
+        return logger
+
+    _ensure_log_listener()
+    with _log_lock:
+        logger = _module_loggers.get(module_name)
+        if logger is None:
+            logger = logging.getLogger(f"jsbach.{module_name}")
+            logger.setLevel(logging.DEBUG)
+            logger.addHandler(QueueHandler(_log_queue))
+            _module_loggers[module_name] = logger
     return logger
 
 def log_action(module_name: str, message: str, level: str = "INFO"):
-    """Append a log message to the module's actions.log using Python logging."""
+    """Append a log message to the module's actions.log (asynchronous, via queue)."""
     try:
-        log_file = create_module_log_directory(module_name)
-        if log_file == "/dev/null":
-            logging.error(f"[{module_name}] {message}")
-            return
-
         logger = get_module_logger(module_name)
-        
-        # Avoid adding multiple handlers
-        if not any(isinstance(h, logging.FileHandler) and getattr(h, 'baseFilename', None) == os.path.abspath(log_file) for h in logger.handlers):
-            fh = logging.FileHandler(log_file)
-            fh.setLevel(logging.DEBUG)
-            fmt = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%d/%m/%Y %H:%M:%S')
-            fh.setFormatter(fmt)
-            logger.addHandler(fh)
-
         level = (level or "INFO").upper()
-        log_func = getattr(logger, level.lower(), logger.info)
-        log_func(message)
-        
-        # Legacy raw write
-        with open(log_file, 'a') as f:
-            f.write('\n')
-            
+        logger.log(_LOG_LEVELS.get(level, logging.INFO), message)
     except Exception as e:
         logging.error(f"Error logging action for {module_name}: {e}. Original message: {message}")
 
@@ -264,14 +407,12 @@ def write_json_file(file_path: str, data: dict, pretty: bool = True) -> bool:
     Returns:
         True si se escribió exitosamente
     """
+    uow = current_unit_of_work()
+    if uow is not None:
+        uow.stage(file_path, data, 4 if pretty else None)
+        return True
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        with open(file_path, "w") as f:
-            if pretty:
-                json.dump(data, f, indent=4)
-            else:
-                json.dump(data, f)
+        write_json_document(file_path, data, 4 if pretty else None)
         
         return True
     except Exception as e:
@@ -293,21 +434,30 @@ def read_json_file(file_path: str, default: Optional[dict] = None) -> dict:
     if default is None:
         default = {}
     
-    if not os.path.exists(file_path):
-        return default
-    
+    uow = current_unit_of_work()
+    if uow is not None:
+        staged, data = uow.get(file_path)
+        if staged:
+            return data
+
     try:
-        with open(file_path, "r") as f:
-            content = f.read().strip()
-            if not content:
-                return default
-            return json.loads(content)
+        data = read_json_document(file_path)
+    except FileNotFoundError:
+        if uow is not None:
+            uow.note_read(file_path, None)
+        return default
     except json.JSONDecodeError as e:
         logging.error(f"Error decodificando JSON en {file_path}: {e}")
         return default
+    except ValueError:
+        # Fichero vacío
+        return default
     except Exception as e:
         logging.error(f"Error leyendo JSON en {file_path}: {e}")
         return default
+    if uow is not None:
+        uow.note_read(file_path, data)
+    return data
 
 
 # =============================================================================
@@ -0,0 +1,214 @@
+# app/utils/global_helpers/link_state.py
+"""
+Estado IPv4 de una interfaz (UP, direcciones, ruta por defecto) sin ejecutar
+'ip', y espera dirigida por eventos hasta que quede operativa.
+
+- is_ready: flags de /sys/class/net/<iface>, direcciones IPv4 con un volcado
+  RTM_GETADDR de netlink y ruta por defecto de /proc/net/route.
+- wait_until_ready: se suscribe a los grupos RTNLGRP_LINK, RTNLGRP_IPV4_IFADDR
+  y RTNLGRP_IPV4_ROUTE y reevalúa el estado solo cuando el kernel notifica un
+  cambio; la espera termina en el mismo instante en que la interfaz tiene
+  dirección y ruta por defecto (p.ej. cuando dhcpcd configura la WAN).
+"""
+
+import os
+import errno
+import socket
+import struct
+import asyncio
+import logging
+import itertools
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROC_ROUTE = "/proc/net/route"
+SYS_NET = "/sys/class/net"
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFF_UP = 0x1
+RTF_UP = 0x1
+
+FALLBACK_INTERVAL = 1.0  # solo si no se puede abrir un socket netlink
+RECV_BUFSIZE = 64 * 1024
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_IFADDRMSG = struct.Struct("=BBBBI")
+_NLATTR = struct.Struct("=HH")
+_seq = itertools.count(1)
+
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def is_up(iface: str) -> bool:
+    try:
+        with open(os.path.join(SYS_NET, iface, "flags"), "r") as f:
+            return bool(int(f.read().strip(), 16) & IFF_UP)
+    except (OSError, ValueError):
+        return False
+
+
+def has_default_route(iface: str, path: str = PROC_ROUTE) -> bool:
+    """Ruta IPv4 por defecto (destino y máscara 0) activa a través de 'iface'."""
+    try:
+        with open(path, "r") as f:
+            next(f, None)  # cabecera
+            for line in f:
+                parts = line.split()
+                if len(parts) < 8 or parts[0] != iface:
+                    continue
+                try:
+                    if int(parts[1], 16) == 0 and int(parts[7], 16) == 0 and int(parts[3], 16) & RTF_UP:
+                        return True
+                except ValueError:
+                    continue
+    except OSError as e:
+        logger.debug(f"No se pudo leer {path}: {e}")
+    return False
+
+
+def parse_addr_messages(buf, ifindex: Optional[int] = None) -> List[str]:
+    """Direcciones "a.b.c.d/len" de los mensajes RTM_NEWADDR (opcionalmente de una interfaz)."""
+    buf = memoryview(buf)
+    addresses = []
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(buf):
+        length, msg_type, _flags, _seq_no, _pid = _NLMSGHDR.unpack_from(buf, offset)
+        if length < _NLMSGHDR.size or offset + length > len(buf):
+            break
+        body = offset + _NLMSGHDR.size
+        end = offset + length
+        if msg_type == RTM_NEWADDR and body + _IFADDRMSG.size <= end:
+            family, prefixlen, _flags, _scope, index = _IFADDRMSG.unpack_from(buf, body)
+            if family == socket.AF_INET and (ifindex is None or index == ifindex):
+                local = address = None
+                pos = body + _IFADDRMSG.size
+                while pos + _NLATTR.size <= end:
+                    alen, atype = _NLATTR.unpack_from(buf, pos)
+                    if alen < _NLATTR.size:
+                        break
+                    data = bytes(buf[pos + _NLATTR.size:pos + alen])
+                    if atype == IFA_LOCAL:
+                        local = data
+                    elif atype == IFA_ADDRESS:
+                        address = data
+                    pos += _align(alen)
+                value = local or address
+                if value and len(value) == 4:
+                    addresses.append(f"{socket.inet_ntoa(value)}/{prefixlen}")
+        offset += _align(length)
+    return addresses
+
+
+def _dump_done(buf) -> bool:
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(buf):
+        length, msg_type = _NLMSGHDR.unpack_from(buf, offset)[:2]
+        if msg_type in (NLMSG_DONE, NLMSG_ERROR):
+            return True
+        if length < _NLMSGHDR.size:
+            break
+        offset += _align(length)
+    return False
+
+
+def ipv4_addresses(iface: str) -> List[str]:
+    """Direcciones IPv4 de la interfaz (volcado RTM_GETADDR)."""
+    try:
+        ifindex = socket.if_nametoindex(iface)
+    except OSError:
+        return []
+    addresses: List[str] = []
+    try:
+        with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE) as sock:
+            sock.settimeout(1.0)
+            request = _IFADDRMSG.pack(socket.AF_INET, 0, 0, 0, 0)
+            header = _NLMSGHDR.pack(_NLMSGHDR.size + len(request), RTM_GETADDR,
+                                    NLM_F_REQUEST | NLM_F_DUMP, next(_seq), 0)
+            sock.send(header + request)
+            while True:
+                data = sock.recv(RECV_BUFSIZE)
+                addresses.extend(parse_addr_messages(data, ifindex))
+                if not data or _dump_done(data):
+                    break
+    except OSError as e:
+        logger.debug(f"No se pudieron consultar las direcciones de {iface}: {e}")
+    return addresses
+
+
+def is_ready(iface: str) -> bool:
+    """Interfaz UP, con dirección IPv4 y ruta por defecto."""
+    return is_up(iface) and has_default_route(iface) and bool(ipv4_addresses(iface))
+
+
+def _subscribe() -> Optional[socket.socket]:
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    except OSError as e:
+        logger.warning(f"No se pudo abrir netlink para esperar a la interfaz: {e}")
+        return None
+    try:
+        sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+        sock.setblocking(False)
+    except OSError as e:
+        sock.close()
+        logger.warning(f"No se pudo suscribir a eventos de red: {e}")
+        return None
+    return sock
+
+
+async def wait_until_ready(iface: str, timeout: float) -> bool:
+    """
+    Espera hasta que 'iface' esté UP con dirección IPv4 y ruta por defecto.
+    Devuelve False si vence el plazo.
+    """
+    loop = asyncio.get_running_loop()
+    # Suscribirse antes de comprobar: ningún cambio puede perderse entre ambos pasos
+    sock = _subscribe()
+    if sock is None:
+        deadline = loop.time() + timeout
+        while not is_ready(iface):
+            if loop.time() >= deadline:
+                return False
+            await asyncio.sleep(FALLBACK_INTERVAL)
+        return True
+
+    ready = loop.create_future()
+
+    def on_event():
+        try:
+            while True:
+                sock.recv(RECV_BUFSIZE)
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            # ENOBUFS: eventos perdidos, se reevalúa igualmente el estado completo
+            if e.errno != errno.ENOBUFS:
+                logger.debug(f"Error leyendo eventos de red: {e}")
+        if not ready.done() and is_ready(iface):
+            ready.set_result(True)
+
+    loop.add_reader(sock.fileno(), on_event)
+    try:
+        if is_ready(iface):
+            return True
+        try:
+            return await asyncio.wait_for(ready, timeout)
+        except asyncio.TimeoutError:
+            return False
+    finally:
+        loop.remove_reader(sock.fileno())
+        sock.close()
@@ -0,0 +1,155 @@
+# app/utils/global_helpers/module_graph.py
+"""
+Grafo de dependencias entre módulos a partir de los metadatos que declara cada
+paquete en app/modules/<modulo>/__init__.py:
+
+- DEPENDENCIES = {
+      "configured": [...],  # módulos que deben estar configurados (su REQUIRED_CONFIG)
+      "active": [...],      # módulos que deben estar activos; una lista anidada
+                            # se cumple con cualquiera de sus elementos
+      "after": [...],       # solo orden de arranque durante la restauración
+  }
+- RESOURCES: recursos compartidos (p.ej. "iptables") que dos arranques no
+  pueden modificar a la vez.
+- RESTORE: "always" (crítico, Zero-Lockout), "enabled" (por defecto) o "never".
+- REQUIRED_CONFIG: claves que deben tener valor para considerar el módulo configurado.
+- READY_TIMEOUT: segundos que la restauración espera a que el módulo quede operativo.
+- WAIT_READY: corrutina (timeout) -> bool que se resuelve cuando el módulo está
+  operativo (p.ej. la WAN con IP y ruta, por eventos netlink). Sin ella, el
+  módulo se considera listo al terminar su start().
+- LIVE_STATE: estado del kernel que aplica el módulo (ver applied_state.py);
+  permite el arranque en caliente si el kernel lo conserva.
+- LABEL: nombre para los mensajes.
+
+Para la restauración, las dependencias "active" (primer elemento de cada
+grupo alternativo) y "after" se convierten en aristas del grafo.
+"""
+
+import os
+import importlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .module_helpers import load_module_config, get_module_status_by_name
+
+logger = logging.getLogger(__name__)
+
+MODULES_PACKAGE = "app.modules"
+MODULES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "modules"))
+
+
+class ModuleInfo:
+    """Metadatos de dependencias de un módulo."""
+
+    def __init__(self, name: str, package: Any):
+        deps = getattr(package, "DEPENDENCIES", {}) or {}
+        self.name = name
+        self.label = getattr(package, "LABEL", name.capitalize())
+        self.configured: List[str] = list(deps.get("configured", []))
+        self.active: List[List[str]] = [[d] if isinstance(d, str) else list(d) for d in deps.get("active", [])]
+        self.after: List[str] = list(deps.get("after", []))
+        self.resources: List[str] = sorted(getattr(package, "RESOURCES", []) or [])
+        self.restore: str = getattr(package, "RESTORE", "enabled")
+        self.required_config: List[str] = list(getattr(package, "REQUIRED_CONFIG", []) or [])
+        self.ready_timeout: float = float(getattr(package, "READY_TIMEOUT", 0) or 0)
+        self.live_state: Optional[Dict[str, Any]] = getattr(package, "LIVE_STATE", None)
+        self.wait_ready: Optional[Callable[[float], Awaitable[bool]]] = getattr(package, "WAIT_READY", None)
+
+    def predecessors(self) -> Set[str]:
+        """Módulos que deben arrancar antes durante la restauración."""
+        return {group[0] for group in self.active} | set(self.after)
+
+
+_cache: Dict[str, ModuleInfo] = {}
+
+
+def module_names() -> List[str]:
+    """Paquetes de app/modules."""
+    return sorted(
+        entry for entry in os.listdir(MODULES_DIR)
+        if os.path.isfile(os.path.join(MODULES_DIR, entry, "__init__.py"))
+    )
+
+
+def get_module_info(name: str) -> ModuleInfo:
+    info = _cache.get(name)
+    if info is None:
+        info = ModuleInfo(name, importlib.import_module(f"{MODULES_PACKAGE}.{name}"))
+        _cache[name] = info
+    return info
+
+
+def _label(name: str) -> str:
+    try:
+        return get_module_info(name).label
+    except ImportError:
+        return name
+
+
+def is_configured(base_dir: str, name: str) -> bool:
+    required = get_module_info(name).required_config
+    cfg = load_module_config(base_dir, name, {}) or {}
+    return all(cfg.get(key) for key in required)
+
+
+def check_dependencies(base_dir: str, name: str) -> Tuple[bool, str]:
+    """Comprueba las dependencias declaradas por un módulo antes de arrancarlo."""
+    try:
+        info = get_module_info(name)
+    except ImportError:
+        return True, 'Dependencias satisfechas'
+    for dep in info.configured:
+        if not is_configured(base_dir, dep):
+            return False, f'Error: El módulo {_label(dep)} debe estar configurado.'
+    for group in info.active:
+        if not any(get_module_status_by_name(base_dir, dep) == 1 for dep in group):
+            return False, f'Error: El módulo {_label(group[0])} debe estar activo.'
+    return True, 'Dependencias satisfechas'
+
+
+def build_graph(names: List[str]) -> Dict[str, Set[str]]:
+    """
+    {módulo: predecesores} restringido a 'names'. Lanza ValueError si los
+    metadatos forman un ciclo.
+    """
+    selected = set(names)
+    graph = {name: get_module_info(name).predecessors() & selected for name in names}
+
+    # Kahn: detectar ciclos antes de arrancar nada
+    pending = {name: set(preds) for name, preds in graph.items()}
+    while pending:
+        ready = [name for name, preds in pending.items() if not preds]
+        if not ready:
+            raise ValueError(f"Ciclo de dependencias entre módulos: {', '.join(sorted(pending))}")
+        for name in ready:
+            del pending[name]
+        for preds in pending.values():
+            preds.difference_update(ready)
+    return graph
+
+
+def critical_path(graph: Dict[str, Set[str]], durations: Dict[str, float]) -> Tuple[float, List[str]]:
+    """Camino más largo (en segundos) del grafo según las duraciones medidas."""
+    finish: Dict[str, float] = {}
+    via: Dict[str, Optional[str]] = {}
+
+    def visit(name: str) -> float:
+        if name not in finish:
+            best, best_pred = 0.0, None
+            for pred in graph.get(name, ()):
+                t = visit(pred)
+                if t > best:
+                    best, best_pred = t, pred
+            finish[name] = best + durations.get(name, 0.0)
+            via[name] = best_pred
+        return finish[name]
+
+    if not graph:
+        return 0.0, []
+    end = max(graph, key=visit)
+    path = []
+    node: Optional[str] = end
+    while node is not None:
+        path.append(node)
+        node = via[node]
+    return finish[end], path[::-1]
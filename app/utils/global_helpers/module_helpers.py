@@ -1,29 +1,46 @@
 import os
-import json
+import asyncio
 import logging
 import subprocess
 import re
+from contextvars import ContextVar
 from typing import Dict, Any, Tuple, Optional
+from .state_store import read_json_document, write_json_document
+from .unit_of_work import current_unit_of_work
 
 logger = logging.getLogger(__name__)
 
 # --- Funciones de carga de JSON ---
 
 def load_json_config(file_path: str, default_value: Any = None) -> Any:
-    if not os.path.exists(file_path):
-        return default_value
+    # Cambios pendientes de la unidad de trabajo activa
+    uow = current_unit_of_work()
+    if uow is not None:
+        staged, data = uow.get(file_path)
+        if staged:
+            return data
+    # Backend activo (fichero cacheado o SQLite); devuelve una copia modificable
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        data = read_json_document(file_path)
+    except FileNotFoundError:
+        if uow is not None:
+            uow.note_read(file_path, None)
+        return default_value
     except Exception as e:
         logger.error(f'Error cargando configuración de {file_path}: {str(e)}')
         return default_value
+    if uow is not None:
+        uow.note_read(file_path, data)
+    return data
 
 def save_json_config(file_path: str, data: Any) -> bool:
+    # Dentro de una acción se escribe una sola vez al confirmar
+    uow = current_unit_of_work()
+    if uow is not None:
+        uow.stage(file_path, data)
+        return True
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        write_json_document(file_path, data)
         return True
     except Exception as e:
         logger.error(f'Error guardando configuración en {file_path}: {str(e)}')
@@ -84,22 +101,36 @@ def update_module_status(file_path: str, status: int) -> bool:
 # --- Dependencias ---
 
 def check_module_dependencies(base_dir: str, module_name: str = None) -> Tuple[bool, str]:
+    """Dependencias declaradas por el propio módulo (DEPENDENCIES, ver module_graph)."""
     if module_name is None: return True, 'Dependencias satisfechas'
-    if module_name in ['wan', 'wifi', 'vlans']: return True, 'Dependencias satisfechas'
-    if module_name == 'tagging':
-        if get_module_status_by_name(base_dir, 'vlans') != 1:
-            return False, 'Error: El módulo VLANs debe estar activo.'
-        return True, 'Dependencias satisfechas'
-    wan_cfg = load_module_config(base_dir, 'wan', {})
-    if not wan_cfg.get('interface'): return False, 'Error: El módulo WAN debe estar configurado.'
-    if module_name in ['nat', 'dhcp']: return True, 'Dependencias satisfechas'
-    if get_module_status_by_name(base_dir, 'vlans') != 1:
-        if module_name == 'firewall' and get_module_status_by_name(base_dir, 'wifi') == 1: pass
-        else: return False, 'Error: El módulo VLANs debe estar activo.'
-    if get_module_status_by_name(base_dir, 'tagging') != 1:
-        if module_name == 'firewall' and get_module_status_by_name(base_dir, 'wifi') == 1: pass
-        else: return False, 'Error: El módulo Tagging debe estar activo.'
-    return True, 'Dependencias satisfechas'
+    from .module_graph import check_dependencies
+    return check_dependencies(base_dir, module_name)
+
+# --- Tareas en segundo plano ---
+
+# Loop del servicio; el agente de restauración lo fija antes de ejecutar los
+# start() síncronos en hilos de trabajo (asyncio.to_thread copia el contexto)
+background_loop: ContextVar[Optional[asyncio.AbstractEventLoop]] = ContextVar("background_loop", default=None)
+# Referencias a las tareas en curso: el loop solo guarda referencias débiles
+_background_tasks: set = set()
+
+def _track(task: asyncio.Task):
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def spawn_background(coro) -> bool:
+    """Lanza una corrutina en el loop del servicio, también desde un hilo de trabajo."""
+    try:
+        _track(asyncio.get_running_loop().create_task(coro))
+        return True
+    except RuntimeError:
+        pass
+    loop = background_loop.get()
+    if loop is None or loop.is_closed():
+        coro.close()
+        return False
+    loop.call_soon_threadsafe(lambda: _track(loop.create_task(coro)))
+    return True
 
 # --- Firewall & Ebtables Helpers ---
 
@@ -140,10 +171,11 @@ def ensure_module_hook(table: str, parent_chain: str, module_chain: str, pos: in
 
 # --- Ejecución de Comandos ---
 
-def run_command(cmd: list, use_sudo: bool = True, timeout: int = 30, ignore_error: bool = False) -> Tuple[bool, str]:
+def run_command(cmd: list, use_sudo: bool = True, timeout: int = 30, ignore_error: bool = False,
+                input_text: Optional[str] = None) -> Tuple[bool, str]:
     try:
         full_cmd = ['sudo', '-n'] + cmd if use_sudo else cmd
-        result = subprocess.run(full_cmd, capture_output=True, text=True, timeout=timeout)
+        result = subprocess.run(full_cmd, capture_output=True, text=True, timeout=timeout, input=input_text)
         if result.returncode == 0:
             return True, result.stdout.strip()
         else:
@@ -0,0 +1,246 @@
+# app/utils/global_helpers/neighbors.py
+"""
+Tabla de vecinos (IP -> MAC) en memoria, sin ejecutar 'arp' ni 'ip neigh'.
+
+- NeighborTable lee /proc/net/arp de forma perezosa: como mucho una vez cada
+  TTL segundos (y una relectura extra ante un fallo de búsqueda, ya que el
+  cliente que acaba de conectarse puede no estar aún en la copia).
+- NeighborMonitor (opcional) se suscribe a los eventos RTM_NEWNEIGH /
+  RTM_DELNEIGH de netlink (grupo RTNLGRP_NEIGH) y mantiene la tabla al día;
+  mientras está activo la relectura de /proc pasa a ser solo una red de
+  seguridad (MONITORED_TTL).
+"""
+
+import errno
+import socket
+import struct
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROC_ARP = "/proc/net/arp"
+TTL = 2.0
+MONITORED_TTL = 60.0
+MISS_REFRESH_INTERVAL = 0.2
+
+NETLINK_ROUTE = 0
+RTMGRP_NEIGH = 0x4
+RTM_NEWNEIGH = 28
+RTM_DELNEIGH = 29
+NDA_DST = 1
+NDA_LLADDR = 2
+NUD_INCOMPLETE = 0x01
+NUD_FAILED = 0x20
+
+ATF_COM = 0x02  # entrada completa en /proc/net/arp
+ZERO_MAC = "00:00:00:00:00:00"
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_NDMSG = struct.Struct("=BxxxiHBB")
+_NLATTR = struct.Struct("=HH")
+
+RECV_BUFSIZE = 64 * 1024
+
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def read_proc_arp(path: str = PROC_ARP) -> Dict[str, Dict[str, str]]:
+    """{ip: {"mac", "dev"}} con las entradas completas de /proc/net/arp."""
+    entries: Dict[str, Dict[str, str]] = {}
+    try:
+        with open(path, "r") as f:
+            next(f, None)  # cabecera
+            for line in f:
+                parts = line.split()
+                if len(parts) < 6:
+                    continue
+                ip, _hw_type, flags, mac, _mask, dev = parts[:6]
+                try:
+                    complete = int(flags, 16) & ATF_COM
+                except ValueError:
+                    continue
+                if complete and mac != ZERO_MAC:
+                    entries[ip] = {"mac": mac.lower(), "dev": dev}
+    except OSError as e:
+        logger.debug(f"No se pudo leer {path}: {e}")
+    return entries
+
+
+def parse_neigh_messages(buf) -> Dict[str, Optional[Dict[str, str]]]:
+    """Cambios de un datagrama netlink: {ip: {"mac", "dev"}} o {ip: None} si se borró."""
+    buf = memoryview(buf)
+    changes: Dict[str, Optional[Dict[str, str]]] = {}
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(buf):
+        length, msg_type, _flags, _seq, _pid = _NLMSGHDR.unpack_from(buf, offset)
+        if length < _NLMSGHDR.size or offset + length > len(buf):
+            break
+        body = offset + _NLMSGHDR.size
+        if msg_type in (RTM_NEWNEIGH, RTM_DELNEIGH) and body + _NDMSG.size <= offset + length:
+            family, ifindex, state, _flags, _type = _NDMSG.unpack_from(buf, body)
+            dst = lladdr = None
+            pos = body + _NDMSG.size
+            end = offset + length
+            while pos + _NLATTR.size <= end:
+                alen, atype = _NLATTR.unpack_from(buf, pos)
+                if alen < _NLATTR.size:
+                    break
+                data = bytes(buf[pos + _NLATTR.size:pos + alen])
+                if atype == NDA_DST:
+                    dst = data
+                elif atype == NDA_LLADDR:
+                    lladdr = data
+                pos += _align(alen)
+
+            if dst is not None and family in (socket.AF_INET, socket.AF_INET6):
+                ip = socket.inet_ntop(family, dst)
+                if msg_type == RTM_DELNEIGH or state & (NUD_INCOMPLETE | NUD_FAILED) or not lladdr:
+                    changes[ip] = None
+                else:
+                    try:
+                        dev = socket.if_indextoname(ifindex)
+                    except OSError:
+                        dev = str(ifindex)
+                    changes[ip] = {"mac": ":".join(f"{b:02x}" for b in lladdr), "dev": dev}
+        offset += _align(length)
+    return changes
+
+
+class NeighborTable:
+    """Caché IP -> MAC con refresco perezoso."""
+
+    def __init__(self, path: str = PROC_ARP, ttl: float = TTL):
+        self.path = path
+        self.ttl = ttl
+        self.monitored = False
+        self._entries: Dict[str, Dict[str, str]] = {}
+        self._loaded = 0.0
+        self._lock = threading.Lock()
+
+    def _refresh_locked(self):
+        fresh = read_proc_arp(self.path)
+        if self.monitored:
+            # Conservar entradas IPv6 aprendidas por netlink (/proc/net/arp es solo IPv4)
+            fresh.update({ip: e for ip, e in self._entries.items() if ":" in ip})
+        self._entries = fresh
+        self._loaded = time.monotonic()
+
+    def _ensure_fresh(self, max_age: float):
+        if time.monotonic() - self._loaded >= max_age:
+            self._refresh_locked()
+
+    def refresh(self):
+        with self._lock:
+            self._refresh_locked()
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """MAC (minúsculas) asociada a una IP, o None."""
+        with self._lock:
+            self._ensure_fresh(MONITORED_TTL if self.monitored else self.ttl)
+            entry = self._entries.get(ip)
+            if entry is None:
+                self._ensure_fresh(MISS_REFRESH_INTERVAL)
+                entry = self._entries.get(ip)
+            return entry["mac"] if entry else None
+
+    def lookup_ip(self, mac: str) -> Optional[str]:
+        """IP asociada a una MAC (primera coincidencia), o None."""
+        mac = mac.lower()
+        with self._lock:
+            self._ensure_fresh(MONITORED_TTL if self.monitored else self.ttl)
+            for ip, entry in self._entries.items():
+                if entry["mac"] == mac:
+                    return ip
+        return None
+
+    def snapshot(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            self._ensure_fresh(MONITORED_TTL if self.monitored else self.ttl)
+            return {ip: dict(e) for ip, e in self._entries.items()}
+
+    def apply(self, changes: Dict[str, Optional[Dict[str, str]]]):
+        with self._lock:
+            for ip, entry in changes.items():
+                if entry is None:
+                    self._entries.pop(ip, None)
+                else:
+                    self._entries[ip] = entry
+
+
+class NeighborMonitor(threading.Thread):
+    """Hilo que aplica los eventos de vecinos de netlink a una NeighborTable."""
+
+    def __init__(self, table: NeighborTable):
+        super().__init__(name="jsbach-neigh", daemon=True)
+        self.table = table
+        self.events = 0
+        self._sock: Optional[socket.socket] = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_NEIGH))
+            sock.settimeout(1.0)
+            self._sock = sock
+        except OSError as e:
+            logger.warning(f"No se pudo suscribir a eventos de vecinos: {e}")
+            return
+
+        self.table.refresh()
+        self.table.monitored = True
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    data = sock.recv(RECV_BUFSIZE)
+                except socket.timeout:
+                    continue
+                except OSError as e:
+                    if e.errno == errno.ENOBUFS:
+                        # Eventos perdidos: resincronizar desde /proc
+                        self.table.refresh()
+                        continue
+                    if not self._stop_event.is_set():
+                        logger.error(f"Error leyendo eventos de vecinos: {e}")
+                    break
+                changes = parse_neigh_messages(data)
+                if changes:
+                    self.events += len(changes)
+                    self.table.apply(changes)
+        finally:
+            self.table.monitored = False
+            sock.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+neighbor_table = NeighborTable()
+
+_monitor: Optional[NeighborMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def start_neighbor_monitor() -> bool:
+    """Arranca la suscripción a eventos de vecinos. Idempotente."""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is not None and _monitor.is_alive():
+            return True
+        _monitor = NeighborMonitor(neighbor_table)
+        _monitor.start()
+    return True
+
+
+def stop_neighbor_monitor():
+    global _monitor
+    with _monitor_lock:
+        monitor, _monitor = _monitor, None
+    if monitor is not None:
+        monitor.stop()
+        monitor.join(timeout=3)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# app/utils/global_helpers/nflog_bind.py
+"""
+Apertura del socket NFLOG (netlink NETLINK_NETFILTER) con CAP_NET_ADMIN.
+
+Suscribirse a un grupo NFLOG exige CAP_NET_ADMIN, pero leer de un socket ya
+suscrito no. El instalador copia este archivo (solo biblioteca estándar, sin
+imports de JSBach) a NFLOG_HELPER, propiedad de root, y sudoers permite
+ejecutarlo. El proceso auxiliar abre y configura el socket, lo entrega por
+SCM_RIGHTS a través de su stdout (un extremo de socketpair) y termina: el
+servicio web no necesita ninguna capacidad.
+
+Uso: nflog-bind <grupo> <copy_range> <qthresh> <timeout>
+"""
+
+import sys
+import errno
+import socket
+import struct
+from typing import List
+
+NFLOG_HELPER = "/usr/local/libexec/jsbach/nflog-bind"
+
+NETLINK_NETFILTER = 12
+NFNL_SUBSYS_ULOG = 4
+NFULNL_MSG_CONFIG = 1
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLMSG_ERROR = 0x2
+
+NFULA_CFG_CMD = 1
+NFULA_CFG_MODE = 2
+NFULA_CFG_TIMEOUT = 4
+NFULA_CFG_QTHRESH = 5
+
+NFULNL_CFG_CMD_BIND = 1
+NFULNL_CFG_CMD_PF_BIND = 3
+NFULNL_CFG_CMD_PF_UNBIND = 4
+NFULNL_COPY_PACKET = 2
+
+NFPROTO_BRIDGE = 7
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_NLATTR = struct.Struct("=HH")
+_CONFIG_MSG = (NFNL_SUBSYS_ULOG << 8) | NFULNL_MSG_CONFIG
+
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def _nla(attr_type: int, data: bytes) -> bytes:
+    length = _NLATTR.size + len(data)
+    return _NLATTR.pack(length, attr_type) + data + b"\0" * (_align(length) - length)
+
+
+def _config(sock: socket.socket, seq: int, group: int, attrs: List[bytes],
+            family: int = socket.AF_UNSPEC, check: bool = True):
+    payload = struct.pack("=BB", family, 0) + struct.pack("!H", group) + b"".join(attrs)
+    msg = _NLMSGHDR.pack(_NLMSGHDR.size + len(payload), _CONFIG_MSG,
+                         NLM_F_REQUEST | NLM_F_ACK, seq, 0) + payload
+    sock.send(msg)
+
+    data = sock.recv(4096)
+    _length, msg_type, _flags, _seq, _pid = _NLMSGHDR.unpack_from(data, 0)
+    if msg_type == NLMSG_ERROR:
+        err = struct.unpack_from("=i", data, _NLMSGHDR.size)[0]
+        if err and check:
+            raise OSError(-err, f"NFLOG config: {errno.errorcode.get(-err, err)}")
+
+
+def open_nflog_socket(group: int, copy_range: int, qthresh: int, flush_timeout: int) -> socket.socket:
+    """Socket suscrito al grupo NFLOG. Requiere CAP_NET_ADMIN."""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_NETFILTER)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+        sock.bind((0, 0))
+        seq = 0
+
+        # Kernels antiguos requieren PF_BIND por familia (se ignoran errores)
+        for family in (socket.AF_INET, socket.AF_INET6, NFPROTO_BRIDGE):
+            for cmd in (NFULNL_CFG_CMD_PF_UNBIND, NFULNL_CFG_CMD_PF_BIND):
+                seq += 1
+                _config(sock, seq, 0, [_nla(NFULA_CFG_CMD, struct.pack("B", cmd))], family, check=False)
+
+        _config(sock, seq + 1, group, [_nla(NFULA_CFG_CMD, struct.pack("B", NFULNL_CFG_CMD_BIND))])
+        _config(sock, seq + 2, group, [
+            _nla(NFULA_CFG_MODE, struct.pack("!IBB", copy_range, NFULNL_COPY_PACKET, 0)),
+            _nla(NFULA_CFG_QTHRESH, struct.pack("!I", qthresh)),
+            _nla(NFULA_CFG_TIMEOUT, struct.pack("!I", flush_timeout)),
+        ])
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def main(argv: List[str]) -> int:
+    try:
+        group, copy_range, qthresh, flush_timeout = (int(a) for a in argv[1:5])
+    except ValueError:
+        group = -1
+    if len(argv) != 5 or not (0 <= group <= 65535 and 0 <= copy_range <= 65535
+                              and 0 < qthresh <= 4096 and 0 <= flush_timeout <= 6000):
+        print("Uso: nflog-bind <grupo> <copy_range> <qthresh> <timeout>", file=sys.stderr)
+        return 2
+    try:
+        nflog = open_nflog_socket(group, copy_range, qthresh, flush_timeout)
+        out = socket.socket(fileno=sys.stdout.fileno())
+    except OSError as e:
+        print(f"nflog-bind: {e}", file=sys.stderr)
+        return 1
+    try:
+        socket.send_fds(out, [b"ok"], [nflog.fileno()])
+    except OSError as e:
+        print(f"nflog-bind: stdout no es un socket unix: {e}", file=sys.stderr)
+        return 1
+    finally:
+        out.detach()
+        nflog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
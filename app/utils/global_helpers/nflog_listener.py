@@ -0,0 +1,275 @@
+# app/utils/global_helpers/nflog_listener.py
+"""
+Consumidor NFLOG en proceso (netlink NETLINK_NETFILTER, subsistema ULOG).
+
+Se suscribe al grupo configurado en packet_log.json, recibe los paquetes de las
+reglas '-j NFLOG --nflog-prefix [JSB-...]' por lotes y los guarda como registros
+compactos en el PacketStore. La suscripción al grupo requiere CAP_NET_ADMIN:
+el socket lo abre el auxiliar nflog-bind (vía sudo) y lo entrega ya suscrito,
+así que el servicio no necesita ninguna capacidad.
+"""
+
+import errno
+import socket
+import subprocess
+import struct
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .nflog_bind import NFLOG_HELPER, open_nflog_socket
+from .packet_log import (
+    MODE_NFLOG, PacketStore, encode_record, get_log_mode, get_packet_store, load_packet_log_config
+)
+
+logger = logging.getLogger(__name__)
+
+NFNL_SUBSYS_ULOG = 4
+NFULNL_MSG_PACKET = 0
+
+NFULA_PACKET_HDR = 1
+NFULA_TIMESTAMP = 3
+NFULA_IFINDEX_INDEV = 4
+NFULA_IFINDEX_OUTDEV = 5
+NFULA_PAYLOAD = 9
+NFULA_PREFIX = 10
+NFULA_VLAN = 20
+NFULA_VLAN_TCI = 2
+
+NLA_TYPE_MASK = 0x3FFF
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_NLATTR = struct.Struct("=HH")
+_PACKET_MSG = (NFNL_SUBSYS_ULOG << 8) | NFULNL_MSG_PACKET
+_PORT_PROTOS = (6, 17, 132)
+
+RECV_BUFSIZE = 256 * 1024
+
+
+def _align(n: int) -> int:
+    return (n + 3) & ~3
+
+
+def _parse_attrs(buf, start: int, end: int) -> Dict[int, memoryview]:
+    attrs = {}
+    while start + _NLATTR.size <= end:
+        length, attr_type = _NLATTR.unpack_from(buf, start)
+        if length < _NLATTR.size:
+            break
+        attrs[attr_type & NLA_TYPE_MASK] = buf[start + _NLATTR.size:start + length]
+        start += _align(length)
+    return attrs
+
+
+@lru_cache(maxsize=256)
+def _vlan_from_ifindex(ifindex: int) -> int:
+    """br0.10 -> 10 (0 si la interfaz no es una subinterfaz VLAN)."""
+    try:
+        name = socket.if_indextoname(ifindex)
+    except OSError:
+        return 0
+    _, _, suffix = name.rpartition(".")
+    return int(suffix) if suffix.isdigit() else 0
+
+
+def parse_packet(attrs: Dict[int, memoryview]) -> Optional[bytes]:
+    """Convierte los atributos NFULA_* de un paquete en un registro codificado."""
+    prefix_raw = attrs.get(NFULA_PREFIX)
+    prefix = bytes(prefix_raw).split(b"\0", 1)[0].decode("utf-8", "replace") if prefix_raw is not None else ""
+
+    ts_raw = attrs.get(NFULA_TIMESTAMP)
+    if ts_raw is not None and len(ts_raw) >= 16:
+        sec, usec = struct.unpack_from("!QQ", ts_raw)
+        ts = sec + usec / 1e6
+    else:
+        ts = time.time()
+
+    vlan = 0
+    vlan_raw = attrs.get(NFULA_VLAN)
+    if vlan_raw is not None:
+        tci = _parse_attrs(vlan_raw, 0, len(vlan_raw)).get(NFULA_VLAN_TCI)
+        if tci is not None and len(tci) >= 2:
+            vlan = struct.unpack_from("!H", tci)[0] & 0x0FFF
+    if not vlan:
+        for key in (NFULA_IFINDEX_INDEV, NFULA_IFINDEX_OUTDEV):
+            raw = attrs.get(key)
+            if raw is not None and len(raw) >= 4:
+                vlan = _vlan_from_ifindex(struct.unpack_from("!I", raw)[0])
+                if vlan:
+                    break
+
+    proto = ipver = sport = dport = 0
+    src = dst = b""
+    payload = attrs.get(NFULA_PAYLOAD)
+    if payload is not None and len(payload) >= 20 and payload[0] >> 4 == 4:
+        ihl = (payload[0] & 0x0F) * 4
+        ipver, proto = 4, payload[9]
+        src, dst = bytes(payload[12:16]), bytes(payload[16:20])
+        frag_offset = struct.unpack_from("!H", payload, 6)[0] & 0x1FFF
+        if proto in _PORT_PROTOS and frag_offset == 0 and len(payload) >= ihl + 4:
+            sport, dport = struct.unpack_from("!HH", payload, ihl)
+    elif payload is not None and len(payload) >= 40 and payload[0] >> 4 == 6:
+        ipver, proto = 6, payload[6]
+        src, dst = bytes(payload[8:24]), bytes(payload[24:40])
+        if proto in _PORT_PROTOS and len(payload) >= 44:
+            sport, dport = struct.unpack_from("!HH", payload, 40)
+
+    return encode_record(ts, prefix, vlan, proto, ipver, src, dst, sport, dport)
+
+
+def parse_nflog_messages(buf) -> List[bytes]:
+    """Extrae todos los paquetes de un datagrama netlink (varios mensajes por lote)."""
+    buf = memoryview(buf)
+    records = []
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(buf):
+        length, msg_type, _flags, _seq, _pid = _NLMSGHDR.unpack_from(buf, offset)
+        if length < _NLMSGHDR.size or offset + length > len(buf):
+            break
+        if msg_type == _PACKET_MSG:
+            # nlmsghdr (16) + nfgenmsg (4) + atributos
+            attrs = _parse_attrs(buf, offset + _NLMSGHDR.size + 4, offset + length)
+            try:
+                record = parse_packet(attrs)
+                if record:
+                    records.append(record)
+            except Exception as e:
+                logger.debug(f"Paquete NFLOG no válido: {e}")
+        offset += _align(length)
+    return records
+
+
+class NflogListener(threading.Thread):
+    """Hilo lector del grupo NFLOG."""
+
+    def __init__(self, group: int, store: PacketStore, copy_range: int = 128,
+                 qthresh: int = 64, flush_timeout: int = 50):
+        super().__init__(name="jsbach-nflog", daemon=True)
+        self.group = group
+        self.store = store
+        self.copy_range = copy_range
+        self.qthresh = qthresh
+        self.flush_timeout = flush_timeout  # centésimas de segundo
+        self.received = 0
+        self.dropped = 0
+        self._sock: Optional[socket.socket] = None
+        self._stop_event = threading.Event()
+
+    # --- apertura del socket -------------------------------------------------
+
+    def _from_helper(self) -> socket.socket:
+        """Pide a nflog-bind (root, vía sudo) el socket ya suscrito al grupo."""
+        ours, theirs = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            args = [str(v) for v in (self.group, self.copy_range, self.qthresh, self.flush_timeout)]
+            result = subprocess.run(["sudo", "-n", NFLOG_HELPER, *args], stdin=subprocess.DEVNULL,
+                                    stdout=theirs, stderr=subprocess.PIPE, text=True, timeout=10)
+            theirs.close()
+            if result.returncode != 0:
+                raise OSError(errno.EPERM, result.stderr.strip() or f"{NFLOG_HELPER} rc={result.returncode}")
+            ours.settimeout(1.0)
+            _msg, fds, _flags, _addr = socket.recv_fds(ours, 16, 1)
+            if not fds:
+                raise OSError(errno.EBADF, f"{NFLOG_HELPER} no entregó el socket")
+            return socket.socket(fileno=fds[0])
+        except subprocess.TimeoutExpired:
+            raise OSError(errno.ETIMEDOUT, f"{NFLOG_HELPER} no respondió")
+        finally:
+            theirs.close()
+            ours.close()
+
+    def _open(self):
+        try:
+            sock = self._from_helper()
+        except OSError as e:
+            # Sin el auxiliar (desarrollo, ejecución como root): apertura directa
+            logger.debug(f"nflog-bind no disponible ({e}); se intenta abrir el socket directamente")
+            sock = open_nflog_socket(self.group, self.copy_range, self.qthresh, self.flush_timeout)
+        sock.settimeout(1.0)
+        self._sock = sock
+
+    def _close(self):
+        # Al cerrar el socket el kernel libera la suscripción al grupo (sin CAP_NET_ADMIN)
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+
+    # --- bucle principal ------------------------------------------------------
+
+    def run(self):
+        try:
+            self._open()
+        except OSError as e:
+            hint = f" (revise {NFLOG_HELPER} y sudoers)" if e.errno == errno.EPERM else ""
+            logger.error(f"No se pudo suscribir al grupo NFLOG {self.group}: {e}{hint}")
+            self._close()
+            return
+
+        logger.info(f"Consumidor NFLOG escuchando en el grupo {self.group}")
+        while not self._stop_event.is_set():
+            try:
+                data = self._sock.recv(RECV_BUFSIZE)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    # El kernel descartó mensajes: el buffer de recepción se llenó
+                    self.dropped += 1
+                    continue
+                if not self._stop_event.is_set():
+                    logger.error(f"Error leyendo NFLOG: {e}")
+                break
+
+            records = parse_nflog_messages(data)
+            if records:
+                self.received += len(records)
+                try:
+                    self.store.append(records)
+                except Exception as e:
+                    logger.error(f"Error guardando registros NFLOG: {e}")
+        self._close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_listener: Optional[NflogListener] = None
+_listener_lock = threading.Lock()
+
+
+def start_packet_log_listener() -> bool:
+    """Arranca el consumidor si el modo es NFLOG. Idempotente."""
+    global _listener
+    if get_log_mode() != MODE_NFLOG:
+        return False
+    with _listener_lock:
+        if _listener is not None and _listener.is_alive():
+            return True
+        cfg = load_packet_log_config()
+        _listener = NflogListener(
+            group=int(cfg.get("group", 32)),
+            store=get_packet_store(),
+            copy_range=int(cfg.get("copy_range", 128)),
+        )
+        _listener.start()
+    return True
+
+
+def stop_packet_log_listener():
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        listener.join(timeout=3)
+        listener.store.close()
+
+
+def get_listener_stats() -> Dict[str, int]:
+    listener = _listener
+    if listener is None:
+        return {"running": 0, "received": 0, "dropped": 0}
+    return {"running": int(listener.is_alive()), "received": listener.received, "dropped": listener.dropped}
@@ -0,0 +1,453 @@
+# app/utils/global_helpers/packet_log.py
+"""
+Registro de paquetes de las reglas [JSB-...] (traffic_log, isolate, restrict...).
+
+- Genera el fragmento de regla LOG (printk) o NFLOG (grupo netlink) según el
+  modo configurado en config/packet_log/packet_log.json.
+- Almacén append-only por segmentos (logs/packets/seg-XXXXXXXX.log) con
+  índices por prefijo [JSB-...] e IP. Al sellar un segmento su índice se
+  guarda en seg-XXXXXXXX.idx; el segmento activo se indexa de forma incremental.
+- Consultas usadas por las acciones traffic_query de los módulos.
+"""
+
+import os
+import re
+import json
+import time
+import struct
+import socket
+import logging
+import threading
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+CONFIG_FILE = os.path.join(BASE_DIR, "config", "packet_log", "packet_log.json")
+STORE_DIR = os.path.join(BASE_DIR, "logs", "packets")
+
+MODE_LOG = "log"
+MODE_NFLOG = "nflog"
+
+DEFAULT_CONFIG = {
+    "mode": MODE_LOG,
+    "group": 32,
+    "copy_range": 128,
+    "segment_bytes": 4 * 1024 * 1024,
+    "max_segments": 16,
+}
+
+PROTO_NAMES = {1: "ICMP", 6: "TCP", 17: "UDP", 47: "GRE", 58: "ICMPv6", 132: "SCTP"}
+
+_TAG_RE = re.compile(r"\[(JSB-[A-Z0-9-]+)\]")
+
+# Registro: longitud total (H) + ts (d) + vlan (H) + proto (B) + versión IP (B)
+#           + src (16s) + dst (16s) + sport (H) + dport (H) + long. prefijo (B) + prefijo
+_RECORD = struct.Struct("<HdHBB16s16sHHB")
+
+_config_cache: Tuple[Optional[int], Dict[str, Any]] = (None, dict(DEFAULT_CONFIG))
+
+
+# =============================================================================
+# CONFIGURACIÓN Y FRAGMENTOS DE REGLA
+# =============================================================================
+
+def load_packet_log_config() -> Dict[str, Any]:
+    """Devuelve la configuración de registro de paquetes (releída sólo si cambia)."""
+    global _config_cache
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime is not None and mtime == _config_cache[0]:
+        return _config_cache[1]
+
+    cfg = dict(DEFAULT_CONFIG)
+    if mtime is not None:
+        try:
+            with open(CONFIG_FILE, "r") as f:
+                cfg.update(json.load(f) or {})
+        except Exception as e:
+            logger.error(f"Error leyendo {CONFIG_FILE}: {e}")
+    _config_cache = (mtime, cfg)
+    return cfg
+
+
+def get_log_mode() -> str:
+    mode = str(load_packet_log_config().get("mode", MODE_LOG)).lower()
+    return mode if mode in (MODE_LOG, MODE_NFLOG) else MODE_LOG
+
+
+def _nflog_prefix(prefix: str) -> str:
+    # --nflog-prefix admite hasta 64 caracteres
+    return prefix.strip()[:63]
+
+
+def iptables_log_target(prefix: str, mode: Optional[str] = None) -> List[str]:
+    """Fragmento '-j LOG|NFLOG ...' para iptables según el modo activo."""
+    mode = mode or get_log_mode()
+    if mode == MODE_NFLOG:
+        cfg = load_packet_log_config()
+        return ["-j", "NFLOG", "--nflog-group", str(cfg.get("group", 32)),
+                "--nflog-prefix", _nflog_prefix(prefix)]
+    return ["-j", "LOG", "--log-prefix", prefix]
+
+
+def iptables_log_targets(prefix: str) -> List[List[str]]:
+    """Todas las variantes posibles (para borrar reglas creadas con otro modo)."""
+    return [iptables_log_target(prefix, MODE_NFLOG), iptables_log_target(prefix, MODE_LOG)]
+
+
+def ebtables_log_watcher(prefix: str, mode: Optional[str] = None) -> List[str]:
+    """Watcher de log para ebtables (se combina con '-j CONTINUE' u otro target)."""
+    mode = mode or get_log_mode()
+    if mode == MODE_NFLOG:
+        cfg = load_packet_log_config()
+        return ["--nflog-group", str(cfg.get("group", 32)),
+                "--nflog-prefix", _nflog_prefix(prefix)]
+    return ["--log-prefix", prefix]
+
+
+def ebtables_log_watchers(prefix: str) -> List[List[str]]:
+    return [ebtables_log_watcher(prefix, MODE_NFLOG), ebtables_log_watcher(prefix, MODE_LOG)]
+
+
+# =============================================================================
+# REGISTROS
+# =============================================================================
+
+def extract_tag(prefix: str) -> str:
+    """'[JSB-FW-LOG] ...' -> 'JSB-FW-LOG'."""
+    match = _TAG_RE.search(prefix or "")
+    return match.group(1) if match else (prefix or "").strip()
+
+
+def encode_record(ts: float, prefix: str, vlan: Optional[int], proto: int, ipver: int,
+                  src: bytes, dst: bytes, sport: int, dport: int) -> bytes:
+    raw_prefix = (prefix or "").encode("utf-8", "replace")[:255]
+    return _RECORD.pack(_RECORD.size + len(raw_prefix), ts, vlan or 0, proto & 0xFF, ipver,
+                        src.ljust(16, b"\0"), dst.ljust(16, b"\0"),
+                        sport & 0xFFFF, dport & 0xFFFF, len(raw_prefix)) + raw_prefix
+
+
+def _addr_to_str(ipver: int, raw: bytes) -> str:
+    if ipver == 4:
+        return socket.inet_ntop(socket.AF_INET, raw[:4])
+    if ipver == 6:
+        return socket.inet_ntop(socket.AF_INET6, raw)
+    return ""
+
+
+def decode_record(buf, offset: int = 0) -> Tuple[Dict[str, Any], int]:
+    """Decodifica un registro y devuelve (registro, longitud)."""
+    length, ts, vlan, proto, ipver, src, dst, sport, dport, plen = _RECORD.unpack_from(buf, offset)
+    start = offset + _RECORD.size
+    prefix = bytes(buf[start:start + plen]).decode("utf-8", "replace")
+    return {
+        "ts": ts,
+        "prefix": prefix,
+        "tag": extract_tag(prefix),
+        "vlan": vlan or None,
+        "proto": PROTO_NAMES.get(proto, str(proto)) if ipver else "",
+        "src": _addr_to_str(ipver, src),
+        "dst": _addr_to_str(ipver, dst),
+        "sport": sport or None,
+        "dport": dport or None,
+    }, length
+
+
+# =============================================================================
+# ALMACÉN POR SEGMENTOS
+# =============================================================================
+
+class _SegmentIndex:
+    """Índices de un segmento: offsets por prefijo y por IP."""
+
+    __slots__ = ("size", "by_tag", "by_ip")
+
+    def __init__(self):
+        self.size = 0
+        self.by_tag: Dict[str, array] = {}
+        self.by_ip: Dict[str, array] = {}
+
+    def add(self, offset: int, tag: str, src: str, dst: str):
+        self.by_tag.setdefault(tag, array("I")).append(offset)
+        if src:
+            self.by_ip.setdefault(src, array("I")).append(offset)
+        if dst and dst != src:
+            self.by_ip.setdefault(dst, array("I")).append(offset)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "tags": {k: v.tolist() for k, v in self.by_tag.items()},
+            "ips": {k: v.tolist() for k, v in self.by_ip.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_SegmentIndex":
+        idx = cls()
+        idx.size = int(data.get("size", 0))
+        idx.by_tag = {k: array("I", v) for k, v in data.get("tags", {}).items()}
+        idx.by_ip = {k: array("I", v) for k, v in data.get("ips", {}).items()}
+        return idx
+
+
+class PacketStore:
+    """
+    Almacén append-only de registros de paquetes.
+    Un único proceso escribe (el consumidor NFLOG); cualquier proceso puede consultar.
+    """
+
+    def __init__(self, directory: str = STORE_DIR, segment_bytes: Optional[int] = None,
+                 max_segments: Optional[int] = None):
+        cfg = load_packet_log_config()
+        self.directory = directory
+        self.segment_bytes = int(segment_bytes or cfg.get("segment_bytes", DEFAULT_CONFIG["segment_bytes"]))
+        self.max_segments = int(max_segments or cfg.get("max_segments", DEFAULT_CONFIG["max_segments"]))
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, _SegmentIndex] = {}
+        self._active_file = None
+        self._active_name: Optional[str] = None
+
+    # --- segmentos -----------------------------------------------------------
+
+    def _segments(self) -> List[str]:
+        try:
+            names = [n for n in os.listdir(self.directory) if n.startswith("seg-") and n.endswith(".log")]
+        except OSError:
+            return []
+        return sorted(names)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _index_path(self, name: str) -> str:
+        return self._path(name[:-4] + ".idx")
+
+    def _open_active(self):
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self._segments()
+        if segments and os.path.getsize(self._path(segments[-1])) < self.segment_bytes \
+                and not os.path.exists(self._index_path(segments[-1])):
+            name = segments[-1]
+        else:
+            seq = int(segments[-1][4:12]) + 1 if segments else 1
+            name = f"seg-{seq:08d}.log"
+        self._active_name = name
+        self._active_file = open(self._path(name), "ab")
+        self._refresh_index(name)
+
+    def _seal_active(self):
+        """Cierra el segmento activo, guarda su índice y aplica la retención."""
+        if self._active_file is None:
+            return
+        name = self._active_name
+        self._active_file.close()
+        self._active_file = None
+        self._active_name = None
+        idx = self._refresh_index(name)
+        try:
+            tmp = self._index_path(name) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(idx.to_dict(), f)
+            os.replace(tmp, self._index_path(name))
+        except Exception as e:
+            logger.error(f"Error guardando índice de {name}: {e}")
+
+        segments = self._segments()
+        for old in segments[:max(0, len(segments) - self.max_segments)]:
+            for path in (self._path(old), self._index_path(old)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._indexes.pop(old, None)
+
+    def _refresh_index(self, name: str) -> _SegmentIndex:
+        """Devuelve el índice del segmento, indexando sólo los bytes nuevos."""
+        idx = self._indexes.get(name)
+        path = self._path(name)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            self._indexes.pop(name, None)
+            return _SegmentIndex()
+
+        if idx is None:
+            idx = _SegmentIndex()
+            idx_path = self._index_path(name)
+            if os.path.exists(idx_path):
+                try:
+                    with open(idx_path, "r") as f:
+                        idx = _SegmentIndex.from_dict(json.load(f))
+                except Exception:
+                    idx = _SegmentIndex()
+            self._indexes[name] = idx
+
+        if size > idx.size:
+            with open(path, "rb") as f:
+                f.seek(idx.size)
+                data = f.read(size - idx.size)
+            pos = 0
+            while pos + _RECORD.size <= len(data):
+                length = struct.unpack_from("<H", data, pos)[0]
+                if length < _RECORD.size or pos + length > len(data):
+                    break
+                rec, _ = decode_record(data, pos)
+                idx.add(idx.size + pos, rec["tag"], rec["src"], rec["dst"])
+                pos += length
+            idx.size += pos
+        return idx
+
+    # --- escritura -----------------------------------------------------------
+
+    def append(self, records: Iterable[bytes]):
+        """Añade un lote de registros ya codificados (una sola escritura)."""
+        records = list(records)
+        if not records:
+            return
+        with self._lock:
+            if self._active_file is None:
+                self._open_active()
+            self._active_file.write(b"".join(records))
+            self._active_file.flush()
+            idx = self._refresh_index(self._active_name)
+            if idx.size >= self.segment_bytes:
+                self._seal_active()
+
+    def close(self):
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+                self._active_name = None
+
+    # --- consulta ------------------------------------------------------------
+
+    def query(self, tags: Optional[List[str]] = None, ip: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Registros más recientes primero. 'tags' admite familias de prefijo
+        (p.ej. 'JSB-FW' encuentra JSB-FW-LOG y JSB-FW-ISOLATE).
+        """
+        results: List[Dict[str, Any]] = []
+        with self._lock:
+            segments = self._segments()
+            for name in reversed(segments):
+                idx = self._refresh_index(name)
+                offsets = self._candidate_offsets(idx, tags, ip)
+                if offsets is not None and not offsets:
+                    continue
+                try:
+                    with open(self._path(name), "rb") as f:
+                        data = f.read(idx.size)
+                except OSError:
+                    continue
+
+                if offsets is None:
+                    offsets = self._all_offsets(data)
+
+                for offset in reversed(offsets):
+                    rec, _ = decode_record(data, offset)
+                    if since is not None and rec["ts"] < since:
+                        # Los registros se añaden en orden temporal
+                        return results
+                    if until is not None and rec["ts"] > until:
+                        continue
+                    results.append(rec)
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    @staticmethod
+    def _all_offsets(data: bytes) -> List[int]:
+        offsets, pos = [], 0
+        while pos + _RECORD.size <= len(data):
+            length = struct.unpack_from("<H", data, pos)[0]
+            if length < _RECORD.size:
+                break
+            offsets.append(pos)
+            pos += length
+        return offsets
+
+    @staticmethod
+    def _candidate_offsets(idx: _SegmentIndex, tags: Optional[List[str]], ip: Optional[str]) -> Optional[List[int]]:
+        """Offsets que cumplen los filtros de índice (None = sin filtro)."""
+        selected = None
+        if tags:
+            by_tag = set()
+            for tag, offs in idx.by_tag.items():
+                if any(tag == t or tag.startswith(t + "-") for t in tags):
+                    by_tag.update(offs)
+            selected = by_tag
+        if ip:
+            by_ip = set(idx.by_ip.get(ip, ()))
+            selected = by_ip if selected is None else (selected & by_ip)
+        return None if selected is None else sorted(selected)
+
+
+_store: Optional[PacketStore] = None
+_store_lock = threading.Lock()
+
+
+def get_packet_store() -> PacketStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PacketStore()
+    return _store
+
+
+# =============================================================================
+# CONSULTAS PARA LOS MÓDULOS
+# =============================================================================
+
+def query_packets(tags: Optional[List[str]] = None, ip: Optional[str] = None,
+                  minutes: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    since = time.time() - float(minutes) * 60 if minutes else None
+    return get_packet_store().query(tags=tags, ip=ip, since=since, limit=limit)
+
+
+def format_packet(rec: Dict[str, Any]) -> str:
+    when = datetime.fromtimestamp(rec["ts"]).strftime("%d/%m/%Y %H:%M:%S")
+    vlan = f"VLAN {rec['vlan']} " if rec.get("vlan") else ""
+    src = rec["src"] + (f":{rec['sport']}" if rec.get("sport") else "")
+    dst = rec["dst"] + (f":{rec['dport']}" if rec.get("dport") else "")
+    flow = f"{rec['proto']} {src} -> {dst}" if rec["src"] else "(sin cabecera IP)"
+    return f"{when} {rec['prefix']} {vlan}{flow}"
+
+
+def traffic_query(tags: List[str], params: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
+    """
+    Implementación común de la acción traffic_query.
+    Parámetros: ip, minutes, limit (por defecto 50, máximo 1000).
+    """
+    params = params or {}
+    try:
+        limit = max(1, min(int(params.get("limit", 50)), 1000))
+        minutes = float(params["minutes"]) if params.get("minutes") else None
+    except (TypeError, ValueError):
+        return False, "Parámetros 'limit' y 'minutes' deben ser numéricos"
+
+    ip = params.get("ip")
+    if ip:
+        ip = str(ip).strip()
+
+    records = query_packets(tags=tags, ip=ip, minutes=minutes, limit=limit)
+    header = f"Paquetes registrados ({', '.join(tags)})"
+    if ip:
+        header += f" para {ip}"
+    if not records:
+        msg = f"{header}: ninguno"
+        if get_log_mode() != MODE_NFLOG:
+            msg += "\nEl modo de registro es LOG (printk); active 'nflog' en config/packet_log/packet_log.json"
+        return True, msg
+
+    lines = [f"{header}: {len(records)} (más recientes primero)", "=" * 60]
+    lines.extend(format_packet(r) for r in records)
+    return True, "\n".join(lines)
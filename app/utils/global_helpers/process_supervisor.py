@@ -0,0 +1,325 @@
+# app/utils/global_helpers/process_supervisor.py
+"""
+Seguimiento y supervisión de los demonios de JSBach (hostapd, dnsmasq, portal).
+
+- ProcessTracker: PID vivo de un demonio a partir de su pidfile, verificado con
+  /proc/<pid>/cmdline y mantenido como pidfd (os.pidfd_open). Consultar la
+  vivacidad es O(1): un poll() sobre el pidfd, sin 'ps' ni procesos externos.
+  El pidfd no sufre reutilización de PIDs. Funciona en cualquier proceso (API,
+  CLI, portal) porque solo depende del pidfile.
+- wait_for_path / wait_for_exit: esperas dirigidas por eventos (inotify sobre el
+  directorio del pidfile/socket, poll sobre el pidfd) en lugar de sleeps fijos.
+- ProcessSupervisor: tarea asyncio del proceso principal que vigila los pidfd
+  (loop.add_reader) y, si un demonio cae mientras su módulo debe estar activo,
+  lo relanza con espera exponencial.
+"""
+
+import os
+import time
+import errno
+import select
+import ctypes
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from .config_cache import file_signature
+
+logger = logging.getLogger(__name__)
+
+RESCAN_INTERVAL = 2.0
+BACKOFF_MIN = 2.0
+BACKOFF_MAX = 60.0
+STABLE_AFTER = 60.0  # segundos vivo para considerar estable (reinicia la espera)
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+class DaemonSpec:
+    """Descripción de un demonio gestionado por un módulo."""
+
+    def __init__(self, name: str, pid_file: str, match: bytes, module: str,
+                 restart_action: str = "restart", wanted: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.pid_file = pid_file
+        self.match = match              # fragmento esperado en /proc/<pid>/cmdline
+        self.module = module
+        self.restart_action = restart_action
+        self.wanted = wanted            # ¿debe estar en ejecución? (estado deseado del módulo)
+
+
+def _pidfd_open(pid: int) -> Optional[int]:
+    try:
+        return os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        # Kernel < 5.3 o Python sin soporte: se usa /proc como respaldo
+        return None
+
+
+def _pidfd_exited(pidfd: int) -> bool:
+    poller = select.poll()
+    poller.register(pidfd, select.POLLIN)
+    return bool(poller.poll(0))
+
+
+def _cmdline_matches(pid: int, match: bytes) -> bool:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return match in f.read()
+    except OSError:
+        return False
+
+
+class _Tracked:
+    __slots__ = ("signature", "pid", "pidfd", "since")
+
+    def __init__(self, signature, pid: Optional[int], pidfd: Optional[int]):
+        self.signature = signature
+        self.pid = pid
+        self.pidfd = pidfd
+        self.since = time.monotonic()
+
+
+class ProcessTracker:
+    """PIDs vivos de los demonios, revalidados solo cuando cambia el pidfile."""
+
+    def __init__(self):
+        self._entries: Dict[str, _Tracked] = {}
+        self._lock = threading.Lock()
+
+    def _close(self, entry: _Tracked):
+        if entry.pidfd is not None:
+            try:
+                os.close(entry.pidfd)
+            except OSError:
+                pass
+            entry.pidfd = None
+        entry.pid = None
+
+    def _load(self, spec: DaemonSpec, signature) -> _Tracked:
+        pid = pidfd = None
+        try:
+            with open(spec.pid_file, "r") as f:
+                pid = int(f.read().strip())
+        except (OSError, ValueError):
+            pid = None
+        if pid and _cmdline_matches(pid, spec.match):
+            pidfd = _pidfd_open(pid)
+        else:
+            pid = None
+        return _Tracked(signature, pid, pidfd)
+
+    def _entry(self, spec: DaemonSpec) -> _Tracked:
+        signature = file_signature(spec.pid_file)
+        entry = self._entries.get(spec.name)
+        if entry is None or entry.signature != signature:
+            if entry is not None:
+                self._close(entry)
+            entry = self._load(spec, signature) if signature is not None else _Tracked(None, None, None)
+            self._entries[spec.name] = entry
+        elif entry.pid is not None:
+            alive = (not _pidfd_exited(entry.pidfd)) if entry.pidfd is not None \
+                else _cmdline_matches(entry.pid, spec.match)
+            if not alive:
+                self._close(entry)
+        return entry
+
+    def pid(self, spec: DaemonSpec) -> Optional[int]:
+        """PID si el demonio está vivo, None en caso contrario."""
+        with self._lock:
+            return self._entry(spec).pid
+
+    def handle(self, spec: DaemonSpec) -> Tuple[Optional[int], Optional[int], float]:
+        """(pid, pidfd, vivo_desde) para el supervisor."""
+        with self._lock:
+            entry = self._entry(spec)
+            return entry.pid, entry.pidfd, entry.since
+
+    def forget(self, spec: DaemonSpec):
+        with self._lock:
+            entry = self._entries.pop(spec.name, None)
+            if entry is not None:
+                self._close(entry)
+
+    def wait_ready(self, spec: DaemonSpec, timeout: float) -> Optional[int]:
+        """Espera a que el pidfile apunte a un proceso vivo del demonio."""
+        found: Dict[str, int] = {}
+
+        def ready(_path: str) -> bool:
+            pid = self.pid(spec)
+            if pid:
+                found["pid"] = pid
+            return bool(pid)
+
+        wait_for_path(spec.pid_file, timeout, ready)
+        return found.get("pid")
+
+
+# =============================================================================
+# Esperas por eventos
+# =============================================================================
+
+_libc = None
+
+
+def _inotify_watch(directory: str) -> Optional[int]:
+    """Descriptor inotify que vigila creaciones/escrituras en un directorio (None si no hay soporte)."""
+    global _libc
+    try:
+        if _libc is None:
+            _libc = ctypes.CDLL(None, use_errno=True)
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        if _libc.inotify_add_watch(fd, os.fsencode(directory), IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def wait_for_path(path: str, timeout: float, predicate: Callable[[str], bool] = os.path.exists) -> bool:
+    """
+    Espera hasta que predicate(path) sea cierto (por defecto, que exista).
+    Se reevalúa con cada evento inotify del directorio; sin inotify, cada 50 ms.
+    """
+    if predicate(path):
+        return True
+    deadline = time.monotonic() + timeout
+    fd = _inotify_watch(os.path.dirname(path) or ".")
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return predicate(path)
+            if fd is None:
+                time.sleep(min(0.05, remaining))
+            else:
+                readable, _, _ = select.select([fd], [], [], min(remaining, 0.5))
+                if readable:
+                    try:
+                        os.read(fd, 4096)
+                    except BlockingIOError:
+                        pass
+            if predicate(path):
+                return True
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+def wait_for_exit(pid: int, timeout: float) -> bool:
+    """True si el proceso termina antes del plazo (poll sobre su pidfd)."""
+    pidfd = _pidfd_open(pid)
+    if pidfd is None:
+        deadline = time.monotonic() + timeout
+        while os.path.exists(f"/proc/{pid}"):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+    try:
+        poller = select.poll()
+        poller.register(pidfd, select.POLLIN)
+        return bool(poller.poll(int(timeout * 1000)))
+    finally:
+        os.close(pidfd)
+
+
+process_tracker = ProcessTracker()
+
+
+# =============================================================================
+# Supervisor (proceso principal)
+# =============================================================================
+
+RestartFn = Callable[[str, str], Awaitable[Tuple[bool, Any]]]
+
+
+class ProcessSupervisor:
+    """Relanza con espera exponencial los demonios que caen inesperadamente."""
+
+    def __init__(self, specs: Iterable[DaemonSpec], restart: RestartFn, tracker: ProcessTracker = process_tracker):
+        self.specs = list(specs)
+        self.restart = restart
+        self.tracker = tracker
+        self.restarts: Dict[str, int] = {}
+        self._watched: Dict[str, Tuple[int, int, float]] = {}
+        self._backoff: Dict[str, float] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def _watch(self, spec: DaemonSpec):
+        loop = asyncio.get_running_loop()
+        pid, pidfd, since = self.tracker.handle(spec)
+        current = self._watched.get(spec.name)
+        if current is not None and current[0] != pid:
+            # Salida detectada antes por otra consulta (o relanzado por otro proceso)
+            loop.remove_reader(current[1])
+            self._on_exit(spec, current[1], current[2], relaunch=pid is None)
+            current = None
+        if current is None and pid is not None and pidfd is not None:
+            # Copia propia del pidfd: el tracker puede cerrar el suyo en cualquier momento
+            fd = os.dup(pidfd)
+            loop.add_reader(fd, self._on_exit, spec, fd, since)
+            self._watched[spec.name] = (pid, fd, since)
+
+    def _on_exit(self, spec: DaemonSpec, fd: int, since: float, relaunch: bool = True):
+        loop = asyncio.get_running_loop()
+        loop.remove_reader(fd)
+        os.close(fd)
+        self._watched.pop(spec.name, None)
+        if not relaunch:
+            return
+        if time.monotonic() - since >= STABLE_AFTER:
+            self._backoff.pop(spec.name, None)
+        if spec.name not in self._pending:
+            task = asyncio.create_task(self._recover(spec))
+            self._pending[spec.name] = task
+            task.add_done_callback(lambda _t, name=spec.name: self._pending.pop(name, None))
+
+    async def _recover(self, spec: DaemonSpec):
+        delay = self._backoff.get(spec.name, BACKOFF_MIN)
+        self._backoff[spec.name] = min(delay * 2, BACKOFF_MAX)
+        # La espera también cubre las paradas intencionadas (el estado deseado pasa a 0)
+        await asyncio.sleep(delay)
+        if self.tracker.pid(spec) is not None:
+            return
+        if spec.wanted is not None and not await asyncio.to_thread(spec.wanted):
+            return
+        self.restarts[spec.name] = self.restarts.get(spec.name, 0) + 1
+        logger.warning(f"{spec.name} terminó inesperadamente; relanzando ({spec.module} {spec.restart_action})")
+        try:
+            success, message = await self.restart(spec.module, spec.restart_action)
+            if not success:
+                logger.error(f"No se pudo relanzar {spec.name}: {message}")
+        except Exception as e:
+            logger.error(f"Error relanzando {spec.name}: {e}")
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                for spec in self.specs:
+                    try:
+                        self._watch(spec)
+                    except OSError as e:
+                        if e.errno != errno.EBADF:
+                            logger.debug(f"No se pudo vigilar {spec.name}: {e}")
+                await asyncio.sleep(RESCAN_INTERVAL)
+        finally:
+            for _pid, fd, _since in self._watched.values():
+                loop.remove_reader(fd)
+                os.close(fd)
+            self._watched.clear()
+            for task in list(self._pending.values()):
+                task.cancel()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {spec.name: {"pid": self.tracker.pid(spec), "restarts": self.restarts.get(spec.name, 0)}
+                for spec in self.specs}
@@ -1,67 +1,191 @@
 # app/utils/global_helpers/restore_agent.py
 import os
+import time
 import logging
 import asyncio
 import importlib
-import json
-from .module_helpers import load_json_config, get_config_file_path, get_module_status
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Set, Tuple
+from .module_helpers import load_json_config, save_json_config, get_config_file_path, update_module_status, background_loop
+from .module_graph import ModuleInfo, module_names, get_module_info, build_graph, critical_path
+from .unit_of_work import config_unit_of_work
+from . import applied_state, ruleset_snapshot
 
 logger = logging.getLogger(__name__)
 
+MAX_PARALLEL = 4
+
+# Informe de la última restauración (duraciones por módulo y camino crítico)
+last_restore: Dict[str, Any] = {}
+
+
 async def restore_system_state(base_dir: str):
     """
     Agente de persistencia JSBach.
-    Reaplica la configuración de los módulos activos en orden jerárquico.
+    Reaplica la configuración de los módulos activos siguiendo el grafo de
+    dependencias que declaran los propios módulos (module_graph): cada módulo
+    arranca en cuanto terminan sus predecesores, en un pool de hilos acotado,
+    y los que comparten un recurso (iptables, ebtables) no se solapan.
+    En un arranque en frío se cargan antes las instantáneas de reglas y enlaces
+    (ruleset_snapshot), de modo que el router filtra y reenvía desde el primer
+    segundo; los módulos cuyo estado sigue aplicado en el kernel desde este
+    mismo arranque (applied_state) se marcan activos sin ejecutar start().
     """
     logger.info("🟢 Agente de Restauración: Iniciando recuperación de estado...")
     
     try:
         # 0. Sitema Zero-Lockout: Asegurar configuración base de gestión
         _ensure_management_base(base_dir)
-        
-        # 1. Arrancar WAN (Primer paso crítico)
-        await _restore_module(base_dir, "wan")
-        
-        # 2. ESPERA ACTIVA POR WAN (DHCP Sync)
-        wan_cfg_path = get_config_file_path(base_dir, "wan")
-        
-        for i in range(20):
-            current_status = get_module_status(wan_cfg_path)
-            if current_status == 1:
-                logger.info(f"✅ WAN sincronizada tras {i}s.")
-                break
-            # Las VLANs y Tagging pueden arrancar MIENTRAS la WAN negocia IP
-            if i == 0:
-                await _restore_module(base_dir, "vlans")
-                await _restore_module(base_dir, "tagging")
-            
-            await asyncio.sleep(1)
-        
-        # 3. Resto de módulos que sí dependen de una WAN activa (o configurada)
-        modules_to_restore = [
-            "firewall", "nat", "ebtables", "dmz", "dhcp", "wifi"
-        ]
-        
-        for module_name in modules_to_restore:
-            if module_name not in ["vlans", "tagging"]:
-                await _restore_module(base_dir, module_name)
+
+        # 1. Arranque rápido: instantáneas de reglas y enlaces (solo si el kernel no las tiene)
+        loaded = await asyncio.to_thread(ruleset_snapshot.apply, _live_specs())
+        if loaded:
+            logger.info(f"⚡ Instantáneas del estado aplicado: {loaded}")
+
+        # 2. Reconciliación de cada módulo con su configuración JSON
+        modules = []
+        for name in module_names():
+            try:
+                if _should_restore(base_dir, name):
+                    modules.append(name)
+            except ImportError as e:
+                logger.error(f"❌ No se pudo cargar el módulo {name}: {e}")
+        graph = build_graph(modules)
+        await _run_graph(base_dir, graph)
+        last_restore["snapshot"] = loaded
+        await asyncio.to_thread(persist_applied_state, base_dir)
         
         logger.info("✅ Agente de Restauración: Recuperación completada.")
     except Exception as e:
         logger.error(f"❌ Error crítico en el Agente de Restauración: {str(e)}")
 
+def _should_restore(base_dir: str, module_name: str) -> bool:
+    info = get_module_info(module_name)
+    if info.restore == "always":
+        return True
+    if info.restore == "never":
+        return False
+    cfg = load_json_config(get_config_file_path(base_dir, module_name), {"status": 0})
+    return cfg.get("status") == 1
+
+async def _run_graph(base_dir: str, graph: Dict[str, Set[str]]):
+    """Arranca cada módulo cuando han terminado sus predecesores."""
+    started = time.monotonic()
+    done = {name: asyncio.Event() for name in graph}
+    locks = {res: asyncio.Lock() for name in graph for res in get_module_info(name).resources}
+    workers = asyncio.Semaphore(MAX_PARALLEL)
+    timings: Dict[str, Dict[str, Any]] = {}
+    # Volcado del kernel compartido; se descarta tras cada arranque en frío
+    kernel = {"dump": applied_state.KernelDump()}
+    # Los start() síncronos (hilos de trabajo) lanzan sus tareas en este loop
+    background_loop.set(asyncio.get_running_loop())
+
+    async def run(name: str):
+        try:
+            for pred in graph[name]:
+                await done[pred].wait()
+            info = get_module_info(name)
+            queued = time.monotonic()
+            async with AsyncExitStack() as stack:
+                # Orden fijo de adquisición: sin interbloqueos entre recursos
+                for res in info.resources:
+                    await stack.enter_async_context(locks[res])
+                await stack.enter_async_context(workers)
+                began = time.monotonic()
+                warm = await asyncio.to_thread(_is_warm, base_dir, name, info, kernel["dump"])
+                if warm:
+                    await asyncio.to_thread(_mark_active, base_dir, name)
+                else:
+                    await _restore_module(base_dir, name)
+                    kernel["dump"] = applied_state.KernelDump()
+            if info.wait_ready is not None and info.ready_timeout:
+                await _wait_ready(name, info)
+            finished = time.monotonic()
+            timings[name] = {
+                "start": round(began - started, 3),
+                "waited": round(began - queued, 3),
+                "duration": round(finished - began, 3),
+                "warm": warm,
+            }
+        finally:
+            done[name].set()
+
+    await asyncio.gather(*(run(name) for name in graph))
+
+    total = time.monotonic() - started
+    path_time, path = critical_path(graph, {n: t["duration"] + t["waited"] for n, t in timings.items()})
+    last_restore.clear()
+    last_restore.update({
+        "total": round(total, 3),
+        "sequential": round(sum(t["duration"] for t in timings.values()), 3),
+        "critical_path": path,
+        "critical_path_time": round(path_time, 3),
+        "warm": sorted(n for n, t in timings.items() if t["warm"]),
+        "modules": timings,
+    })
+    summary = ", ".join(
+        f"{n} {'en caliente' if t['warm'] else format(t['duration'], '.2f') + 's'}"
+        for n, t in sorted(timings.items(), key=lambda i: i[1]["start"])
+    )
+    logger.info(f"⏱️ Restauración en {total:.2f}s (camino crítico: {' → '.join(path)}): {summary}")
+
+async def _wait_ready(module_name: str, info: ModuleInfo):
+    """Espera a que el módulo quede operativo (p.ej. la WAN obteniendo IP por DHCP)."""
+    began = time.monotonic()
+    try:
+        ready = await info.wait_ready(info.ready_timeout)
+    except Exception as e:
+        logger.error(f"❌ Error esperando a {module_name}: {e}")
+        return
+    if not ready:
+        logger.warning(f"⚠️ {module_name} no está operativo tras {info.ready_timeout:.0f}s; se continúa la restauración")
+        return
+    logger.info(f"✅ {module_name} sincronizado tras {time.monotonic() - began:.2f}s.")
+
+def _is_warm(base_dir: str, module_name: str, info: ModuleInfo, dump: applied_state.KernelDump) -> bool:
+    try:
+        return applied_state.matches(base_dir, module_name, info.live_state, dump)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo comparar el estado aplicado de {module_name}: {e}")
+        return False
+
+def _mark_active(base_dir: str, module_name: str):
+    logger.info(f"♻️ {module_name}: estado intacto en el kernel, arranque en caliente")
+    cfg_path = get_config_file_path(base_dir, module_name)
+    if load_json_config(cfg_path, {}).get("status") != 1:
+        with config_unit_of_work():
+            update_module_status(cfg_path, 1)
+
+def _live_specs() -> Dict[str, Any]:
+    specs = {}
+    for name in module_names():
+        try:
+            specs[name] = get_module_info(name).live_state
+        except ImportError:
+            continue
+    return specs
+
+def record_applied_state(base_dir: str):
+    """Registra la huella del estado aplicado por los módulos activos (arranque en caliente)."""
+    applied_state.record(base_dir, _live_specs())
+
+def persist_applied_state(base_dir: str):
+    """Huellas (arranque en caliente) e instantáneas de reglas y enlaces (arranque rápido)."""
+    specs = _live_specs()
+    applied_state.record(base_dir, specs)
+    ruleset_snapshot.save(specs)
+
 def _ensure_management_base(base_dir: str):
     """Lógica Zero-Lockout - Crea configs de emergencia si faltan."""
     vlans_path = get_config_file_path(base_dir, "vlans")
     tagging_path = get_config_file_path(base_dir, "tagging")
     
-    if not os.path.exists(vlans_path):
+    if load_json_config(vlans_path) is None:
         logger.warning("⚠️ Zero-Lockout: Recreando vlans.json...")
         os.makedirs(os.path.dirname(vlans_path), exist_ok=True)
-        with open(vlans_path, "w") as f:
-            json.dump({"status": 1, "vlans": [{"id": 1, "name": "Management", "ip_interface": "192.168.1.1/24", "ip_network": "192.168.1.0/24"}]}, f, indent=4)
+        save_json_config(vlans_path, {"status": 1, "vlans": [{"id": 1, "name": "Management", "ip_interface": "192.168.1.1/24", "ip_network": "192.168.1.0/24"}]})
             
-    if not os.path.exists(tagging_path):
+    if load_json_config(tagging_path) is None:
         logger.warning("⚠️ Zero-Lockout: Recreando tagging.json...")
         wan_cfg = load_json_config(get_config_file_path(base_dir, "wan"), {})
         wan_iface = wan_cfg.get("interface")
@@ -69,32 +193,32 @@ def _ensure_management_base(base_dir: str):
         if logical_ifaces:
             main_iface = logical_ifaces[0]
             os.makedirs(os.path.dirname(tagging_path), exist_ok=True)
-            with open(tagging_path, "w") as f:
-                json.dump({"status": 1, "ports": {main_iface: {"pvid": 1, "untagged": [1], "tagged": []}}}, f, indent=4)
+            save_json_config(tagging_path, {"status": 1, "ports": {main_iface: {"pvid": 1, "untagged": [1], "tagged": []}}})
 
 async def _restore_module(base_dir: str, module_name: str):
-    """Llama a la función start() de cada módulo si está activo o es crítico."""
+    """Llama a la función start() del módulo (en un hilo si es síncrona)."""
     try:
-        config_path = get_config_file_path(base_dir, module_name)
-        cfg = load_json_config(config_path, {"status": 0})
+        logger.info(f"🔄 Restaurando módulo: {module_name}")
+        module_path = f"app.modules.{module_name}.{module_name}"
+        mod = importlib.import_module(module_path)
         
-        if cfg.get("status") == 1 or module_name in ["wan", "vlans", "tagging"]:
-            logger.info(f"🔄 Restaurando módulo: {module_name}")
-            module_path = f"app.modules.{module_name}.{module_name}"
-            mod = importlib.import_module(module_path)
-            
-            if hasattr(mod, "start"):
-                func = getattr(mod, "start")
-                if asyncio.iscoroutinefunction(func):
+        if hasattr(mod, "start"):
+            func = getattr(mod, "start")
+            if asyncio.iscoroutinefunction(func):
+                with config_unit_of_work():
                     success, msg = await func()
-                else:
-                    success, msg = func()
-                
-                if success:
-                    logger.info(f"✅ Módulo {module_name} restaurado: {msg}")
-                else:
-                    logger.warning(f"⚠️ Módulo {module_name} no pudo restaurarse: {msg}")
             else:
-                logger.error(f"❌ Módulo {module_name} no tiene función start()")
+                success, msg = await asyncio.to_thread(_start_sync, func)
+            
+            if success:
+                logger.info(f"✅ Módulo {module_name} restaurado: {msg}")
+            else:
+                logger.warning(f"⚠️ Módulo {module_name} no pudo restaurarse: {msg}")
+        else:
+            logger.error(f"❌ Módulo {module_name} no tiene función start()")
     except Exception as e:
         logger.error(f"❌ Error restaurando {module_name}: {str(e)}")
+
+def _start_sync(func) -> Tuple[bool, Any]:
+    with config_unit_of_work():
+        return func()
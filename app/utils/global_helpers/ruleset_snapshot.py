@@ -0,0 +1,348 @@
+# app/utils/global_helpers/ruleset_snapshot.py
+"""
+Instantáneas del estado aplicado en el kernel para el arranque rápido.
+
+Tras cada acción que modifica la configuración se guarda en config/ruleset/:
+- iptables.rules / ebtables.rules: fragmentos de iptables-save / ebtables-save
+  limitados a las cadenas propias (JSB_* y los prefijos LIVE_STATE de cada
+  módulo) y a los saltos hacia ellas desde las cadenas del sistema.
+- links.json: el puente, sus subinterfaces VLAN, sus puertos, sus direcciones
+  IPv4 y la pertenencia a VLANs del puente.
+
+En un arranque en frío (ninguna cadena propia en el kernel), el agente de
+restauración carga primero las instantáneas: una transacción atómica por tabla
+con 'iptables-restore --noflush' / 'ebtables-restore --noflush' y un lote de
+'ip -batch' / 'bridge -batch' para los enlaces. El router filtra y reenvía en
+cuanto termina la carga; después la restauración normal reconcilia cada módulo
+con su JSON (applied_state decide si hace falta su start()).
+"""
+
+import os
+import json
+import shutil
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config_cache import atomic_write_json
+from .module_helpers import run_command
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "config", "ruleset")
+IPTABLES_FILE = os.path.join(SNAPSHOT_DIR, "iptables.rules")
+EBTABLES_FILE = os.path.join(SNAPSHOT_DIR, "ebtables.rules")
+LINKS_FILE = os.path.join(SNAPSHOT_DIR, "links.json")
+
+GLOBAL_PREFIXES = ["JSB_"]
+BUILTIN_CHAINS = {"INPUT", "OUTPUT", "FORWARD", "PREROUTING", "POSTROUTING", "BROUTING"}
+JUMP_OPTIONS = {"-j", "--jump", "-g", "--goto"}
+SAVE_DEBOUNCE = 1.0
+
+_lock = threading.Lock()
+
+
+def _bin(cmd: str, default_path: str) -> str:
+    return shutil.which(cmd) or default_path
+
+
+# =============================================================================
+# Fragmentos de iptables / ebtables
+# =============================================================================
+
+def parse_save(output: str) -> Dict[str, Dict[str, Any]]:
+    """Salida de *-save a {tabla: {"chains": {nombre: línea}, "rules": [...], "commit": bool}}."""
+    tables: Dict[str, Dict[str, Any]] = {}
+    current = None
+    for line in output.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("*"):
+            current = tables.setdefault(line[1:].strip(), {"chains": {}, "rules": [], "commit": False})
+        elif current is None:
+            continue
+        elif line == "COMMIT":
+            current["commit"] = True
+        elif line.startswith(":"):
+            current["chains"][line[1:].split()[0]] = line
+        elif line.startswith("-A "):
+            current["rules"].append(line)
+    return tables
+
+
+def _owned(name: str, prefixes: Iterable[str]) -> bool:
+    return any(name.startswith(p) for p in prefixes)
+
+
+def _jump_targets(rule: str) -> List[str]:
+    tokens = rule.split()
+    return [tokens[i + 1] for i in range(len(tokens) - 1) if tokens[i] in JUMP_OPTIONS]
+
+
+def _owned_closure(data: Dict[str, Any], prefixes: List[str]) -> Set[str]:
+    """
+    Cadenas propias más las cadenas de usuario a las que saltan sus reglas
+    (p.ej. INPUT_WIFI desde JSB_GLOBAL_RESTRICT), recursivamente: sin ellas
+    iptables-restore rechazaría la tabla entera.
+    """
+    owned = {name for name in data["chains"] if _owned(name, prefixes)}
+    pending = list(owned)
+    while pending:
+        chain = pending.pop()
+        for rule in data["rules"]:
+            if rule.split()[1] != chain:
+                continue
+            for target in _jump_targets(rule):
+                if target in data["chains"] and target not in BUILTIN_CHAINS and target not in owned:
+                    owned.add(target)
+                    pending.append(target)
+    return owned
+
+
+def build_fragment(tables: Dict[str, Dict[str, Any]], prefixes: List[str]) -> str:
+    """
+    Fragmento restaurable con --noflush: declaraciones y reglas de las cadenas
+    propias (y de las cadenas a las que saltan), y los saltos desde cadenas del
+    sistema convertidos en '-I cadena n' (quedan al principio, en el mismo
+    orden, sin duplicarse con reglas ajenas).
+    """
+    out: List[str] = []
+    for table, data in tables.items():
+        owned = _owned_closure(data, prefixes)
+        lines = [data["chains"][name] for name in data["chains"] if name in owned]
+        positions: Dict[str, int] = {}
+        for rule in data["rules"]:
+            tokens = rule.split()
+            chain = tokens[1]
+            if chain in owned:
+                lines.append(rule)
+            elif any(_owned(tok, prefixes) for tok in tokens[2:]):
+                positions[chain] = positions.get(chain, 0) + 1
+                lines.append(f"-I {chain} {positions[chain]} {' '.join(tokens[2:])}")
+        if not lines:
+            continue
+        out.append(f"*{table}")
+        out.extend(lines)
+        if data["commit"]:
+            out.append("COMMIT")
+    return "\n".join(out) + "\n" if out else ""
+
+
+def has_owned_chains(tables: Dict[str, Dict[str, Any]], prefixes: List[str]) -> bool:
+    return any(_owned(name, prefixes) for data in tables.values() for name in data["chains"])
+
+
+# =============================================================================
+# Enlaces (puente, VLANs, puertos)
+# =============================================================================
+
+def _json_command(cmd: List[str]) -> List[Dict[str, Any]]:
+    ok, output = run_command(cmd, use_sudo=False, ignore_error=True)
+    if not ok or not output:
+        return []
+    try:
+        data = json.loads(output)
+        return data if isinstance(data, list) else []
+    except ValueError:
+        return []
+
+
+def capture_links(prefixes: List[str]) -> Dict[str, Any]:
+    """Puentes/interfaces con esos prefijos, sus puertos, direcciones y VLANs del puente."""
+    ip = _bin("ip", "/usr/sbin/ip")
+    links = _json_command([ip, "-d", "-j", "link", "show"])
+    addrs = {entry.get("ifname"): entry.get("addr_info", [])
+             for entry in _json_command([ip, "-j", "-4", "addr", "show"])}
+    selected = {l["ifname"] for l in links if _owned(l.get("ifname", ""), prefixes)}
+    snapshot: Dict[str, Any] = {"links": [], "bridge_vlans": {}}
+    for link in links:
+        name = link.get("ifname", "")
+        master = link.get("master")
+        if name not in selected and master not in selected:
+            continue
+        info = link.get("linkinfo", {})
+        entry: Dict[str, Any] = {
+            "name": name,
+            "kind": info.get("info_kind"),
+            "up": "UP" in link.get("flags", []),
+            "master": master if master in selected else None,
+            "addresses": [f"{a['local']}/{a['prefixlen']}" for a in addrs.get(name, [])
+                          if a.get("family") == "inet" and a.get("scope") == "global"],
+        }
+        data = info.get("info_data", {})
+        if entry["kind"] == "bridge":
+            entry["vlan_filtering"] = int(data.get("vlan_filtering", 0))
+        elif entry["kind"] == "vlan":
+            entry["parent"] = link.get("link")
+            entry["vlan_id"] = data.get("id")
+        if name in selected or entry["master"]:
+            snapshot["links"].append(entry)
+    names = {l["name"] for l in snapshot["links"]}
+    for port in _json_command([_bin("bridge", "/usr/sbin/bridge"), "-j", "vlan", "show"]):
+        if port.get("ifname") not in names:
+            continue
+        vlans = []
+        for vlan in port.get("vlans", []):
+            first = vlan.get("vlan")
+            last = vlan.get("vlanEnd", first)
+            flags = vlan.get("flags", [])
+            for vid in range(first, last + 1):
+                vlans.append({"vid": vid, "pvid": "PVID" in flags, "untagged": "Egress Untagged" in flags})
+        snapshot["bridge_vlans"][port["ifname"]] = vlans
+    return snapshot
+
+
+def links_batch(snapshot: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """Comandos para 'ip -batch' y 'bridge -batch' que recrean el estado de enlaces."""
+    links = snapshot.get("links", [])
+    ip_cmds: List[str] = []
+    for link in links:
+        if link["kind"] == "bridge":
+            ip_cmds.append(f"link add name {link['name']} type bridge vlan_filtering {link.get('vlan_filtering', 0)}")
+    for link in links:
+        if link["kind"] == "vlan" and link.get("parent") and link.get("vlan_id") is not None:
+            ip_cmds.append(f"link add link {link['parent']} name {link['name']} type vlan id {link['vlan_id']}")
+    for link in links:
+        if link.get("master"):
+            ip_cmds.append(f"link set dev {link['name']} master {link['master']}")
+    for link in links:
+        ip_cmds.extend(f"addr add {addr} dev {link['name']}" for addr in link.get("addresses", []))
+    ip_cmds.extend(f"link set dev {link['name']} up" for link in links if link.get("up"))
+
+    bridges = {link["name"] for link in links if link["kind"] == "bridge"}
+    bridge_cmds: List[str] = []
+    for port, vlans in snapshot.get("bridge_vlans", {}).items():
+        suffix = " self" if port in bridges else ""
+        if not any(v["vid"] == 1 for v in vlans):
+            # VLAN 1 por defecto del kernel
+            bridge_cmds.append(f"vlan del dev {port} vid 1{suffix}")
+        for v in vlans:
+            flags = (" pvid" if v["pvid"] else "") + (" untagged" if v["untagged"] else "")
+            bridge_cmds.append(f"vlan add dev {port} vid {v['vid']}{flags}{suffix}")
+    return ip_cmds, bridge_cmds
+
+
+# =============================================================================
+# Guardar / cargar
+# =============================================================================
+
+def owned_prefixes(specs: Dict[str, Optional[Dict[str, Any]]], source: str) -> List[str]:
+    """Prefijos propios de una fuente ("iptables", "ebtables", "links") según LIVE_STATE."""
+    prefixes = list(GLOBAL_PREFIXES) if source != "links" else []
+    for spec in specs.values():
+        for prefix in (spec or {}).get(source, []):
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+    return prefixes
+
+
+def _write_text(path: str, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def save(specs: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, int]:
+    """Guarda las instantáneas del estado actual. Devuelve líneas/enlaces guardados."""
+    summary: Dict[str, int] = {}
+    with _lock:
+        for source, cmd, path in (
+            ("iptables", [_bin("iptables-save", "/usr/sbin/iptables-save")], IPTABLES_FILE),
+            ("ebtables", [_bin("ebtables-save", "/usr/sbin/ebtables-save")], EBTABLES_FILE),
+        ):
+            ok, output = run_command(cmd, ignore_error=True)
+            if not ok:
+                logger.debug(f"No se pudo volcar {source}: {output}")
+                continue
+            fragment = build_fragment(parse_save(output), owned_prefixes(specs, source))
+            _write_text(path, fragment)
+            summary[source] = fragment.count("\n")
+        link_prefixes = owned_prefixes(specs, "links")
+        if link_prefixes:
+            snapshot = capture_links(link_prefixes)
+            atomic_write_json(LINKS_FILE, snapshot)
+            summary["links"] = len(snapshot["links"])
+    return summary
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def apply(specs: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Carga las instantáneas en las fuentes que no conservan estado propio en el
+    kernel (arranque en frío). Primero las reglas y después los enlaces, para
+    que ninguna interfaz se levante sin filtrado.
+    """
+    result: Dict[str, Any] = {}
+    with _lock:
+        for source, save_cmd, restore_cmd, path in (
+            ("iptables", [_bin("iptables-save", "/usr/sbin/iptables-save")],
+             [_bin("iptables-restore", "/usr/sbin/iptables-restore"), "--noflush"], IPTABLES_FILE),
+            ("ebtables", [_bin("ebtables-save", "/usr/sbin/ebtables-save")],
+             [_bin("ebtables-restore", "/usr/sbin/ebtables-restore"), "--noflush"], EBTABLES_FILE),
+        ):
+            fragment = _read(path)
+            if not fragment:
+                continue
+            ok, output = run_command(save_cmd, ignore_error=True)
+            if ok and has_owned_chains(parse_save(output), owned_prefixes(specs, source)):
+                result[source] = "presente"
+                continue
+            ok, output = run_command(restore_cmd, input_text=fragment, ignore_error=True)
+            result[source] = "cargado" if ok else f"error: {output}"
+
+        links = None
+        try:
+            with open(LINKS_FILE, "r") as f:
+                links = json.load(f)
+        except (OSError, ValueError):
+            pass
+        bridges = [l["name"] for l in (links or {}).get("links", []) if l.get("kind") == "bridge"]
+        if bridges:
+            if all(os.path.exists(f"/sys/class/net/{name}") for name in bridges):
+                result["links"] = "presente"
+            else:
+                ip_cmds, bridge_cmds = links_batch(links)
+                ok, output = run_command([_bin("ip", "/usr/sbin/ip"), "-force", "-batch", "-"],
+                                         input_text="\n".join(ip_cmds) + "\n", ignore_error=True)
+                if bridge_cmds:
+                    run_command([_bin("bridge", "/usr/sbin/bridge"), "-force", "-batch", "-"],
+                                input_text="\n".join(bridge_cmds) + "\n", ignore_error=True)
+                # -force continúa tras un error: el estado final lo revisa la reconciliación
+                result["links"] = "cargado" if ok else f"parcial: {output}"
+    return result
+
+
+class SnapshotScheduler:
+    """Agrupa las peticiones de guardado (ráfagas de acciones) en un único volcado."""
+
+    def __init__(self, save_fn, debounce: float = SAVE_DEBOUNCE):
+        self.save_fn = save_fn
+        self.debounce = debounce
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def request(self):
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self._dirty:
+            await asyncio.sleep(self.debounce)
+            self._dirty = False
+            try:
+                await asyncio.to_thread(self.save_fn)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar la instantánea del estado aplicado: {e}")
@@ -0,0 +1,102 @@
+# app/utils/global_helpers/snapshot.py
+"""
+Documento único con la vista del panel: estados, resumen de configuración por
+módulo, contadores y últimas acciones. Permite arrancar la interfaz con una sola
+petición (/admin/snapshot).
+
+Selección de campos: "statuses,modules.wan,jobs" -> solo esas secciones/módulos.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from . import module_helpers as mh
+from .config_cache import config_cache
+from .event_bus import event_bus
+
+SECTIONS = ("statuses", "modules", "counters", "jobs")
+JOBS_LIMIT = 20
+MAX_SCALAR_LEN = 64
+
+# Nunca se incluyen en el resumen
+_SENSITIVE = re.compile(r"pass|secret|key|token|psk|hash|mfa", re.IGNORECASE)
+
+
+def summarize_config(cfg: Any) -> Dict[str, Any]:
+    """Valores simples de primer nivel y tamaño de cada colección."""
+    if not isinstance(cfg, dict):
+        return {}
+    summary: Dict[str, Any] = {}
+    counts: Dict[str, int] = {}
+    for name, value in cfg.items():
+        if _SENSITIVE.search(name):
+            continue
+        if isinstance(value, (list, dict)):
+            counts[name] = len(value)
+        elif isinstance(value, str):
+            summary[name] = value[:MAX_SCALAR_LEN]
+        else:
+            summary[name] = value
+    if counts:
+        summary["counts"] = counts
+    return summary
+
+
+def parse_fields(fields: Optional[str]) -> Dict[str, Optional[set]]:
+    """'statuses,modules.wan' -> {'statuses': None, 'modules': {'wan'}} (None = todo)."""
+    if not fields:
+        return {section: None for section in SECTIONS}
+    selected: Dict[str, Optional[set]] = {}
+    for item in fields.split(","):
+        section, _, sub = item.strip().partition(".")
+        if section not in SECTIONS:
+            continue
+        if not sub:
+            selected[section] = None
+        elif section not in selected or selected[section] is not None:
+            selected.setdefault(section, set()).add(sub)
+    return selected
+
+
+def recent_jobs(limit: int = JOBS_LIMIT) -> List[Dict[str, Any]]:
+    """Últimas acciones (estado final o en curso) publicadas en el bus de eventos."""
+    jobs: Dict[tuple, Dict[str, Any]] = {}
+    for event in event_bus.recent("action"):
+        data = event["data"]
+        key = (data.get("module"), data.get("action"))
+        job = {"module": data.get("module"), "action": data.get("action"),
+               "state": "running" if data.get("phase") == "started" else ("ok" if data.get("success") else "error"),
+               "ts": event["ts"]}
+        jobs.pop(key, None)
+        jobs[key] = job
+    return list(jobs.values())[-limit:][::-1]
+
+
+def build_snapshot(base_dir: str, modules: Iterable[str], statuses: Dict[str, str],
+                   fields: Optional[str] = None, counters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    selected = parse_fields(fields)
+    snapshot: Dict[str, Any] = {}
+
+    def wanted(section: str, name: str) -> bool:
+        names = selected.get(section)
+        return names is None or name in names
+
+    if "statuses" in selected:
+        snapshot["statuses"] = {m: s for m, s in statuses.items() if wanted("statuses", m)}
+
+    if "modules" in selected:
+        snapshot["modules"] = {
+            m: summarize_config(mh.load_module_config(base_dir, m, {}))
+            for m in modules if wanted("modules", m)
+        }
+
+    if "counters" in selected:
+        all_counters = dict(counters or {})
+        all_counters["config_cache"] = config_cache.stats()
+        all_counters["event_subscribers"] = event_bus.subscriber_count()
+        snapshot["counters"] = {k: v for k, v in all_counters.items() if wanted("counters", k)}
+
+    if "jobs" in selected:
+        snapshot["jobs"] = [j for j in recent_jobs() if wanted("jobs", j["module"])]
+
+    return snapshot
@@ -0,0 +1,410 @@
+# app/utils/global_helpers/state_store.py
+"""
+Backend opcional de estado en SQLite (modo WAL).
+
+Con JSBACH_STATE_BACKEND=sqlite los ficheros JSON de config/ se guardan en
+config/state.db en lugar de reescribirse completos:
+
+- documents: una fila por fichero con los campos simples, el orden de las
+  claves y la versión del documento.
+- entities: una fila por entidad de cada colección (VLANs, reglas de whitelist,
+  MACs, switches, credenciales...). Las listas de objetos se indexan por el
+  primer campo identificador común (id, vlan_id, mac, ip, name, username); los
+  diccionarios de objetos por su clave; las listas de valores por el valor.
+
+Al guardar se compara con las filas existentes y solo se escriben las que han
+cambiado, dentro de una transacción (BEGIN IMMEDIATE). En modo WAL los lectores
+de otros hilos y procesos (API, servidor CLI, monitor Wi-Fi) no se bloquean.
+
+La primera lectura de un fichero sin documento en la base importa el JSON
+existente. Los ficheros de usuarios (cli_users.json, portal_users.json) y los
+perfiles de expect siguen siendo ficheros.
+
+Para volver a ficheros JSON:
+    python -m app.utils.global_helpers.state_store export
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config_cache import atomic_write_json, clone_json, config_cache, raw_file_cache
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+CONFIG_DIR = os.path.join(BASE_DIR, "config")
+DB_PATH = os.path.join(CONFIG_DIR, "state.db")
+
+BACKEND_ENV = "JSBACH_STATE_BACKEND"
+BACKEND_SQLITE = "sqlite"
+
+FILE_ONLY = ("cli_users.json", "portal_users.json")
+FILE_ONLY_DIRS = (os.path.join("expect", "profiles"),)
+ENTITY_KEYS = ("id", "vlan_id", "mac", "ip", "name", "username")
+
+_ROOT = ""  # nombre de colección cuando el documento completo es una colección
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    meta TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    path TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (path, collection, key)
+) WITHOUT ROWID;
+"""
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+# =============================================================================
+# DESCOMPOSICIÓN DOCUMENTO <-> FILAS
+# =============================================================================
+
+def _entity_key_field(items: List[Any]) -> Optional[str]:
+    """Primer campo identificador presente y único en todos los objetos."""
+    if not all(isinstance(item, dict) for item in items):
+        return None
+    for field in ENTITY_KEYS:
+        keys = [item.get(field) for item in items]
+        if not all(isinstance(k, (str, int)) and not isinstance(k, bool) for k in keys):
+            continue
+        if len({str(k) for k in keys}) == len(keys):
+            return field
+    return None
+
+
+def _split_collection(value: Any) -> Optional[Tuple[Dict[str, Any], Dict[str, str]]]:
+    """(spec, {clave: cuerpo}) si 'value' es una colección de entidades."""
+    if isinstance(value, dict) and value and all(isinstance(v, dict) for v in value.values()):
+        order = list(value.keys())
+        return {"kind": "map", "order": order}, {k: _dumps(v) for k, v in value.items()}
+
+    if isinstance(value, list) and value:
+        field = _entity_key_field(value)
+        if field is not None:
+            order = [str(item[field]) for item in value]
+            return {"kind": "records", "key": field, "order": order}, dict(zip(order, map(_dumps, value)))
+
+        if not any(isinstance(item, (dict, list)) for item in value):
+            order = [_dumps(item) for item in value]
+            if len(set(order)) == len(order):
+                return {"kind": "values", "order": order}, {k: k for k in order}
+    return None
+
+
+def decompose(data: Any) -> Tuple[Dict[str, Any], Dict[Tuple[str, str], str]]:
+    """Convierte un documento JSON en (meta, {(colección, clave): cuerpo})."""
+    rows: Dict[Tuple[str, str], str] = {}
+
+    # Un diccionario cuyos valores son a su vez colecciones (state.json:
+    # {"switches": {ip: {...}}}) se descompone por campos, no como una única
+    # colección raíz con una entidad por campo
+    nested = isinstance(data, dict) and any(_split_collection(v) is not None for v in data.values())
+    split = None if nested else _split_collection(data)
+    if split is not None:
+        spec, entities = split
+        rows.update(((_ROOT, k), body) for k, body in entities.items())
+        return {"root": spec}, rows
+
+    if not isinstance(data, dict):
+        return {"value": data}, rows
+
+    fields = []
+    for name, value in data.items():
+        split = _split_collection(value)
+        if split is None:
+            fields.append([name, "value", value])
+            continue
+        spec, entities = split
+        fields.append([name, "collection", spec])
+        rows.update(((name, k), body) for k, body in entities.items())
+    return {"fields": fields}, rows
+
+
+def _build(spec: Dict[str, Any], entities: Dict[str, str]) -> Any:
+    if spec["kind"] == "map":
+        return {k: json.loads(entities[k]) for k in spec["order"]}
+    return [json.loads(entities[k]) for k in spec["order"]]
+
+
+def compose(meta: Dict[str, Any], rows: Dict[Tuple[str, str], str]) -> Any:
+    """Inversa de decompose()."""
+    by_collection: Dict[str, Dict[str, str]] = {}
+    for (collection, key), body in rows.items():
+        by_collection.setdefault(collection, {})[key] = body
+
+    if "root" in meta:
+        return _build(meta["root"], by_collection.get(_ROOT, {}))
+    if "value" in meta:
+        return meta["value"]
+
+    data = {}
+    for name, kind, value in meta["fields"]:
+        data[name] = _build(value, by_collection.get(name, {})) if kind == "collection" else value
+    return data
+
+
+# =============================================================================
+# ALMACÉN
+# =============================================================================
+
+class SQLiteStateStore:
+    """Documentos JSON guardados como filas por entidad en una base SQLite."""
+
+    def __init__(self, db_path: str = DB_PATH, config_dir: str = CONFIG_DIR):
+        self.db_path = db_path
+        self.config_dir = os.path.normpath(config_dir)
+        self._local = threading.local()
+        self._cache: Dict[str, Tuple[int, Any]] = {}
+        self._bytes: Dict[str, Tuple[int, bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rows_written = 0
+        self._conn()  # crea la base y el esquema
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    def _conn(self) -> sqlite3.Connection:
+        """Conexión propia de cada hilo (y de cada proceso tras un fork)."""
+        entry = getattr(self._local, "conn", None)
+        if entry is not None and entry[0] == os.getpid():
+            return entry[1]
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        conn.executescript(_SCHEMA)
+        self._local.conn = (os.getpid(), conn)
+        return conn
+
+    def handles(self, path: str) -> bool:
+        key = self._key(path)
+        if not key.endswith(".json") or not key.startswith(self.config_dir + os.sep):
+            return False
+        if os.path.basename(key) in FILE_ONLY:
+            return False
+        rel = os.path.relpath(key, self.config_dir)
+        return not any(rel.startswith(d + os.sep) for d in FILE_ONLY_DIRS)
+
+    def _read(self, key: str) -> Optional[Tuple[int, Any]]:
+        """(versión, documento) leídos en una única transacción de lectura."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT meta, version FROM documents WHERE path = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            meta_text, version = row
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == version:
+                    self.hits += 1
+                    return version, cached[1]
+            rows = {
+                (collection, k): body
+                for collection, k, body in conn.execute(
+                    "SELECT collection, key, body FROM entities WHERE path = ?", (key,))
+            }
+        finally:
+            conn.execute("COMMIT")
+
+        data = compose(json.loads(meta_text), rows)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = (version, data)
+        return version, data
+
+    def load(self, path: str) -> Any:
+        """
+        Devuelve una copia del documento. Si aún no existe en la base se importa
+        el fichero JSON (FileNotFoundError / ValueError como config_cache.load).
+        """
+        key = self._key(path)
+        result = self._read(key)
+        if result is not None:
+            return clone_json(result[1])
+
+        data = config_cache.load(key)
+        self.save(key, data)
+        logger.info(f"Importado {key} al almacén de estado SQLite")
+        return data
+
+    def load_bytes(self, path: str) -> Tuple[int, bytes]:
+        """(versión, documento serializado con indent=4) para servirlo por HTTP."""
+        key = self._key(path)
+        result = self._read(key)
+        if result is None:
+            self.load(key)
+            result = self._read(key)
+        version, data = result
+        with self._lock:
+            cached = self._bytes.get(key)
+            if cached is not None and cached[0] == version:
+                return cached
+        raw = json.dumps(data, indent=4).encode()
+        with self._lock:
+            self._bytes[key] = (version, raw)
+        return version, raw
+
+    def save(self, path: str, data: Any) -> int:
+        """Guarda el documento escribiendo solo las filas modificadas. Devuelve cuántas."""
+        key = self._key(path)
+        meta, rows = decompose(data)
+        meta_text = _dumps(meta)
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            doc = conn.execute("SELECT meta, version FROM documents WHERE path = ?", (key,)).fetchone()
+            existing = {
+                (collection, k): body
+                for collection, k, body in conn.execute(
+                    "SELECT collection, key, body FROM entities WHERE path = ?", (key,))
+            }
+            upserts = [(key, c, k, body) for (c, k), body in rows.items() if existing.get((c, k)) != body]
+            deletes = [(key, c, k) for (c, k) in existing if (c, k) not in rows]
+
+            written = len(upserts) + len(deletes)
+            version = doc[1] if doc is not None else 0
+            if written or doc is None or doc[0] != meta_text:
+                # Versiones crecientes en toda la base: un documento borrado y
+                # recreado nunca reutiliza una versión cacheada por otro proceso
+                version = conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM documents").fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO entities (path, collection, key, body) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (path, collection, key) DO UPDATE SET body = excluded.body", upserts)
+                conn.executemany("DELETE FROM entities WHERE path = ? AND collection = ? AND key = ?", deletes)
+                conn.execute(
+                    "INSERT INTO documents (path, meta, version) VALUES (?, ?, ?) "
+                    "ON CONFLICT (path) DO UPDATE SET meta = excluded.meta, version = excluded.version",
+                    (key, meta_text, version))
+                written += 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self._cache[key] = (version, clone_json(data))
+            self.rows_written += written
+        return written
+
+    def delete(self, path: str):
+        key = self._key(path)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entities WHERE path = ?", (key,))
+            conn.execute("DELETE FROM documents WHERE path = ?", (key,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._cache.pop(key, None)
+            self._bytes.pop(key, None)
+
+    def paths(self) -> List[str]:
+        return [row[0] for row in self._conn().execute("SELECT path FROM documents ORDER BY path")]
+
+    def export_files(self) -> List[str]:
+        """Vuelca cada documento a su fichero JSON (para volver al backend de ficheros)."""
+        exported = []
+        for path in self.paths():
+            result = self._read(path)
+            if result is None:
+                continue
+            atomic_write_json(path, result[1])
+            config_cache.store(path, result[1])
+            exported.append(path)
+        return exported
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"documents": len(self._cache), "hits": self.hits, "misses": self.misses,
+                    "rows_written": self.rows_written}
+
+
+_store: Optional[SQLiteStateStore] = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> Optional[SQLiteStateStore]:
+    """Almacén SQLite si JSBACH_STATE_BACKEND=sqlite; None con el backend de ficheros."""
+    global _store, _store_failed
+    if _store is not None or _store_failed:
+        return _store
+    if os.environ.get(BACKEND_ENV, "").strip().lower() != BACKEND_SQLITE:
+        return None
+    with _store_lock:
+        if _store is None and not _store_failed:
+            try:
+                _store = SQLiteStateStore()
+            except Exception as e:
+                _store_failed = True
+                logger.error(f"No se pudo abrir {DB_PATH}, se usan ficheros JSON: {e}")
+    return _store
+
+
+def read_json_document(path: str) -> Any:
+    """
+    Lee un documento de configuración del backend activo.
+    Lanza FileNotFoundError si no existe y ValueError si está vacío o es inválido.
+    """
+    store = get_state_store()
+    if store is not None and store.handles(path):
+        return store.load(path)
+    return config_cache.load(path)
+
+
+def write_json_document(path: str, data: Any, indent: Optional[int] = 4):
+    """Guarda un documento de configuración en el backend activo."""
+    store = get_state_store()
+    if store is not None and store.handles(path):
+        store.save(path, data)
+        return
+    atomic_write_json(path, data, indent)
+    config_cache.store(path, data)
+    raw_file_cache.invalidate(path)
+
+
+def read_json_bytes(path: str) -> Tuple[str, Optional[float], bytes]:
+    """
+    (etag, mtime, bytes) de un documento para servirlo sin decodificar.
+    ETag por mtime/tamaño/inodo del fichero, o por versión con el backend SQLite
+    (mtime None). Lanza FileNotFoundError si no existe.
+    """
+    store = get_state_store()
+    if store is not None and store.handles(path):
+        version, raw = store.load_bytes(path)
+        return f'"db-{version:x}"', None, raw
+    # El inodo cambia con cada escritura atómica (rename): dos escrituras dentro
+    # de la resolución de mtime con el mismo tamaño no comparten ETag
+    (mtime_ns, _ctime_ns, size, ino), raw = raw_file_cache.load(path)
+    return f'"{mtime_ns:x}-{size:x}-{ino:x}"', mtime_ns / 1e9, raw
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["export"]:
+        print("Uso: python -m app.utils.global_helpers.state_store export")
+        sys.exit(1)
+    for exported_path in SQLiteStateStore().export_files():
+        print(exported_path)
@@ -0,0 +1,77 @@
+# app/utils/global_helpers/status_registry.py
+"""
+Registro en memoria del estado de los módulos (ACTIVO / INACTIVO / DESCONOCIDO).
+
+Se actualiza al confirmar cada acción de módulo (execute_module_action) y se
+revalida como mucho cada MAX_AGE segundos para recoger cambios hechos por otros
+procesos (servidor CLI). Mantiene el cuerpo JSON ya serializado y un ETag fuerte
+para que /admin/status pueda responder 304 sin recalcular nada. Cada transición
+se publica en el bus de eventos (tipo 'status') para /admin/events.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from . import module_helpers as mh
+from .event_bus import event_bus
+
+MAX_AGE = 2.0
+
+STATUS_LABELS = {0: "INACTIVO", 1: "ACTIVO"}
+
+
+def status_label(status: int) -> str:
+    return STATUS_LABELS.get(status, "DESCONOCIDO")
+
+
+class StatusRegistry:
+    """Snapshot de estados con ETag; thread-safe."""
+
+    def __init__(self, base_dir: str, modules: Iterable[str], max_age: float = MAX_AGE):
+        self.base_dir = base_dir
+        self.modules = list(modules)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._statuses: Dict[str, int] = {}
+        self._body = b"{}"
+        self._etag = ""
+        self._checked_at = 0.0
+
+    def refresh(self, modules: Optional[Iterable[str]] = None) -> bool:
+        """Relee el estado de 'modules' (todos por defecto). True si algo cambió."""
+        full = modules is None or not self._etag
+        names = self.modules if full else [m for m in modules if m in self.modules]
+        fresh = {name: mh.get_module_status_by_name(self.base_dir, name) for name in names}
+        with self._lock:
+            if full:
+                self._checked_at = time.monotonic()
+            initial = not self._etag
+            transitions = {
+                k: status_label(v) for k, v in fresh.items()
+                if k in self._statuses and status_label(self._statuses[k]) != status_label(v)
+            }
+            changed = initial or any(self._statuses.get(k) != v for k, v in fresh.items())
+            if changed:
+                self._statuses.update(fresh)
+                payload = {name: status_label(self._statuses.get(name, -1)) for name in self.modules}
+                self._body = json.dumps(payload, separators=(",", ":")).encode()
+                self._etag = '"' + hashlib.sha256(self._body).hexdigest()[:32] + '"'
+
+        if transitions and not initial:
+            event_bus.publish("status", {"changes": transitions, "statuses": payload})
+        return changed
+
+    def snapshot(self) -> Tuple[str, bytes]:
+        """(etag, cuerpo JSON) revalidando si el snapshot ha caducado."""
+        if not self._etag or time.monotonic() - self._checked_at > self.max_age:
+            self.refresh()
+        with self._lock:
+            return self._etag, self._body
+
+    def get(self, module_name: str) -> int:
+        self.snapshot()
+        with self._lock:
+            return self._statuses.get(module_name, -1)
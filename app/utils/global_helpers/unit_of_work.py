@@ -0,0 +1,191 @@
+# app/utils/global_helpers/unit_of_work.py
+"""
+Unidad de trabajo para escrituras de configuración JSON.
+
+Dentro de config_unit_of_work() las llamadas a save_json_config / write_json_file
+no tocan disco: el contenido queda preparado en memoria y las lecturas
+posteriores de la misma ruta lo ven. Al salir del contexto cada fichero
+modificado se escribe una sola vez (temporal + fsync + rename, o una transacción
+con solo las filas cambiadas si el backend es SQLite, ver state_store).
+
+El contexto es reentrante (una acción que llama a otra comparte la misma unidad)
+y se propaga por contextvars: las tareas asyncio lanzadas desde la acción que
+sigan vivas tras el commit escriben directamente en disco.
+
+Las acciones asíncronas conservan sus cambios preparados entre awaits, y otra
+acción puede guardar el mismo fichero mientras tanto. Por eso se recuerda el
+documento leído al principio (base) y al confirmar, bajo un cerrojo por ruta,
+se relee el actual: si ha cambiado se fusionan a tres bandas los cambios de la
+acción (base -> preparado) sobre el actual en vez de sobrescribirlo.
+"""
+
+import os
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config_cache import clone_json
+from .state_store import _entity_key_field, read_json_document, write_json_document
+
+logger = logging.getLogger(__name__)
+
+_current_uow: ContextVar[Optional["ConfigUnitOfWork"]] = ContextVar("jsbach_config_uow", default=None)
+
+_MISSING = object()
+_path_locks: Dict[str, threading.Lock] = {}
+_path_locks_guard = threading.Lock()
+
+
+def _path_lock(path: str) -> threading.Lock:
+    with _path_locks_guard:
+        return _path_locks.setdefault(path, threading.Lock())
+
+
+def _merge_value(base: Any, ours: Any, theirs: Any) -> Any:
+    """Como merge_json, pero cualquiera de los tres puede faltar (_MISSING)."""
+    if ours == base:
+        return theirs
+    if theirs == base or theirs == ours:
+        return ours
+    if ours is _MISSING or theirs is _MISSING:
+        # Borrado frente a modificación: prevalece la acción que confirma
+        return ours
+    return merge_json(None if base is _MISSING else base, ours, theirs)
+
+
+def _merge_records(base: List[Any], ours: List[Any], theirs: List[Any]) -> Optional[List[Any]]:
+    """Fusión de listas de entidades por su campo identificador (None si no lo son)."""
+    field = _entity_key_field(ours) or _entity_key_field(theirs)
+    if field is None or any(items and _entity_key_field(items) != field for items in (base, ours, theirs)):
+        return None
+    def by_key(items: List[Any]) -> Dict[str, Any]:
+        return {str(item[field]): item for item in items}
+
+    return list(merge_json(by_key(base), by_key(ours), by_key(theirs)).values())
+
+
+def merge_json(base: Any, ours: Any, theirs: Any) -> Any:
+    """
+    Fusión a tres bandas de documentos JSON: aplica los cambios base -> ours
+    sobre theirs. Los diccionarios y las listas de entidades (ver state_store)
+    se fusionan por clave; en cualquier otro conflicto prevalece 'ours'.
+    """
+    if ours == base:
+        return theirs
+    if theirs == base or theirs == ours:
+        return ours
+    if isinstance(base, dict) and isinstance(ours, dict) and isinstance(theirs, dict):
+        merged = {}
+        for key in list(theirs) + [k for k in ours if k not in theirs]:
+            value = _merge_value(base.get(key, _MISSING), ours.get(key, _MISSING), theirs.get(key, _MISSING))
+            if value is not _MISSING:
+                merged[key] = value
+        return merged
+    if isinstance(base, list) and isinstance(ours, list) and isinstance(theirs, list):
+        merged = _merge_records(base, ours, theirs)
+        if merged is not None:
+            return merged
+    return ours
+
+
+def _read_current(path: str) -> Any:
+    """Documento actual en el backend (None si no existe, _MISSING si es ilegible)."""
+    try:
+        return read_json_document(path)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        return _MISSING
+
+
+class ConfigUnitOfWork:
+    """Cambios de configuración pendientes de una acción."""
+
+    def __init__(self):
+        self._staged: Dict[str, Tuple[Any, Optional[int]]] = {}
+        self._base: Dict[str, Any] = {}  # documento leído de disco antes de preparar cambios
+        self._lock = threading.Lock()
+        self.closed = False
+        self.errors: List[str] = []
+        self.written: List[str] = []
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.normpath(os.path.abspath(path))
+
+    def get(self, path: str) -> Tuple[bool, Any]:
+        """(True, copia) si la ruta tiene cambios preparados."""
+        with self._lock:
+            entry = self._staged.get(self._key(path))
+        if entry is None:
+            return False, None
+        return True, clone_json(entry[0])
+
+    def note_read(self, path: str, data: Any):
+        """Recuerda el primer documento leído de disco (base de la fusión al confirmar)."""
+        key = self._key(path)
+        with self._lock:
+            if key in self._base or key in self._staged:
+                return
+            self._base[key] = clone_json(data)
+
+    def stage(self, path: str, data: Any, indent: Optional[int] = 4):
+        key = self._key(path)
+        with self._lock:
+            known = key in self._base
+        if not known:
+            # Escritura sin lectura previa en esta unidad: la base es lo que hay ahora
+            self.note_read(key, _read_current(key))
+        with self._lock:
+            self._staged[key] = (clone_json(data), indent)
+
+    def commit(self) -> List[str]:
+        """Escribe cada fichero modificado una vez. Devuelve los errores."""
+        with self._lock:
+            staged, self._staged = self._staged, {}
+            self.closed = True
+        for path, (data, indent) in staged.items():
+            try:
+                with _path_lock(path):
+                    base = self._base.get(path, _MISSING)
+                    current = _read_current(path)
+                    if base is not _MISSING and current is not _MISSING and current != base:
+                        logger.info(f"{path} cambió durante la acción; se fusionan los cambios")
+                        data = merge_json(base, data, current)
+                    write_json_document(path, data, indent)
+                self.written.append(path)
+            except Exception as e:
+                msg = f"Error guardando configuración en {path}: {e}"
+                logger.error(msg)
+                self.errors.append(msg)
+        return self.errors
+
+
+def current_unit_of_work() -> Optional[ConfigUnitOfWork]:
+    uow = _current_uow.get()
+    if uow is None or uow.closed:
+        return None
+    return uow
+
+
+@contextmanager
+def config_unit_of_work() -> Iterator[ConfigUnitOfWork]:
+    """
+    Agrupa las escrituras de configuración de una acción.
+    Se confirma también si la acción lanza una excepción: los cambios ya
+    aplicados en el sistema (iptables, interfaces...) deben quedar reflejados.
+    """
+    outer = current_unit_of_work()
+    if outer is not None:
+        yield outer
+        return
+
+    uow = ConfigUnitOfWork()
+    token = _current_uow.set(uow)
+    try:
+        yield uow
+    finally:
+        _current_uow.reset(token)
+        uow.commit()
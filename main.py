@@ -5,7 +5,9 @@ import logging
 import asyncio
 from fastapi import FastAPI
 import uvicorn
-from app.utils.global_helpers.restore_agent import restore_system_state
+from app.utils.global_helpers.restore_agent import restore_system_state, record_applied_state
+from app.utils.global_helpers.nflog_listener import start_packet_log_listener, stop_packet_log_listener
+from app.utils.global_helpers.process_supervisor import ProcessSupervisor
 
 # Load secret key
 def get_secret_key():
@@ -19,8 +21,40 @@ app = FastAPI()
 async def startup_event():
     """Evento que se ejecuta al arrancar FastAPI."""
     base_dir = os.path.dirname(os.path.abspath(__file__))
+    # Consumidor NFLOG de las reglas [JSB-...] (antes de restaurar para no perder paquetes)
+    start_packet_log_listener()
     # Ejecutar la restauración en segundo plano para no bloquear el arranque del API
     asyncio.create_task(restore_system_state(base_dir))
+    # Revalidación de estados para los clientes de /admin/events
+    from app.api.admin_router import watch_status_changes
+    app.state.status_watcher = asyncio.create_task(watch_status_changes())
+    # Vigilancia de demonios (pidfd): relanza hostapd, portal o dnsmasq si caen
+    from app.api.admin_router import execute_module_action
+    from app.modules.wifi.wifi import HOSTAPD_DAEMON, PORTAL_DAEMON
+    from app.modules.dhcp.helpers import DNSMASQ_DAEMON
+    app.state.process_supervisor = ProcessSupervisor(
+        [HOSTAPD_DAEMON, PORTAL_DAEMON, DNSMASQ_DAEMON],
+        restart=execute_module_action,
+    )
+    app.state.supervisor_task = asyncio.create_task(app.state.process_supervisor.run())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    watcher = getattr(app.state, "status_watcher", None)
+    if watcher is not None:
+        watcher.cancel()
+    supervisor_task = getattr(app.state, "supervisor_task", None)
+    if supervisor_task is not None:
+        supervisor_task.cancel()
+    stop_packet_log_listener()
+    # Cerrar las sesiones abiertas con los switches (logout ordenado)
+    from app.modules.expect import session_pool
+    await session_pool.close_all()
+    # Huella del estado aplicado: el próximo arranque del servicio puede ser en caliente
+    try:
+        await asyncio.to_thread(record_applied_state, os.path.dirname(os.path.abspath(__file__)))
+    except Exception:
+        logging.exception("Error registrando el estado aplicado")
 
 # Setup app immediately on import
 def _setup_app():
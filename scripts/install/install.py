@@ -53,6 +53,26 @@ def create_logs_directory(target_path):
     subprocess.run(f"chmod 750 {log_dir}", shell=True)
     success(f"Directorio de logs creado y permisos establecidos en {log_dir}")
 
+################################
+#  Fragmentos de dnsmasq       #
+################################
+def create_dnsmasq_fragments_directory():
+    """
+    opts.d / hosts.d / names.d de dnsmasq (dhcp-optsdir, dhcp-hostsdir, hostsdir).
+    dnsmasq los relee tras soltar privilegios, así que no pueden estar en config/
+    (700): jsbach escribe, el resto solo lee.
+    """
+    base_dir = "/var/lib/jsbach"
+    frag_dir = os.path.join(base_dir, "dnsmasq")
+    info(f"Creando directorio de fragmentos de dnsmasq en {frag_dir}")
+    os.makedirs(base_dir, exist_ok=True)
+    os.chmod(base_dir, 0o755)
+    for d in [frag_dir] + [os.path.join(frag_dir, sub) for sub in ("opts.d", "hosts.d", "names.d")]:
+        os.makedirs(d, exist_ok=True)
+        subprocess.run(f"chown jsbach:jsbach {d}", shell=True)
+        os.chmod(d, 0o755)
+    success(f"Directorio de fragmentos de dnsmasq creado en {frag_dir}")
+
 ############
 #  Config  #
 ############
@@ -223,7 +243,7 @@ def create_venv(target_path):
     if result.returncode != 0:
         error(f"Fallo al crear el entorno virtual: {result.stderr.strip()}")
     # Instalar paquetes
-    result = subprocess.run(f"{venv_path}/bin/pip install fastapi[all] uvicorn requests cryptography argon2-cffi pyotp slowapi qrcode pillow", shell=True,
+    result = subprocess.run(f"{venv_path}/bin/pip install fastapi[all] uvicorn requests cryptography argon2-cffi pyotp slowapi qrcode pillow brotli", shell=True,
                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
     if result.returncode != 0:
         error(f"Fallo al instalar paquetes en el entorno virtual: {result.stderr.strip()}")
@@ -311,6 +331,27 @@ def set_directory_permissions(target_path):
 
     success("Permisos configurados correctamente (o=0 garantizado en todo el proyecto)")
 
+def install_nflog_helper(target_path):
+    """
+    Copia el auxiliar nflog-bind fuera del proyecto, propiedad de root.
+    Es el único proceso con CAP_NET_ADMIN para el registro NFLOG: abre el
+    socket suscrito y se lo entrega al servicio (que no tiene capacidades).
+    """
+    info("Instalando auxiliar NFLOG")
+    src = os.path.join(target_path, "app", "utils", "global_helpers", "nflog_bind.py")
+    dst = "/usr/local/libexec/jsbach/nflog-bind"
+    try:
+        os.makedirs(os.path.dirname(dst), mode=0o755, exist_ok=True)
+        shutil.copyfile(src, dst)
+        os.chown(dst, 0, 0)
+        os.chmod(dst, 0o755)
+        os.chown(os.path.dirname(dst), 0, 0)
+        os.chmod(os.path.dirname(dst), 0o755)
+    except Exception as e:
+        warn(f"No se pudo instalar {dst} (el modo NFLOG no estará disponible): {e}")
+        return
+    success(f"Auxiliar NFLOG instalado en {dst}")
+
 def create_systemd_service(target_path, venv_path, port):
     info("Creando servicio systemd")
     service_content = f"""[Unit]
@@ -324,6 +365,8 @@ Group=jsbach
 UMask=0027
 WorkingDirectory={target_path}
 Environment="PATH={venv_path}/bin:/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+# Estado en SQLite (config/state.db): activar igual en jsbach.service y jsbach-cli.service
+#Environment=JSBACH_STATE_BACKEND=sqlite
 ExecStartPre=+/bin/sh -c "chown -R jsbach:jsbach {target_path}/config {target_path}/logs || true"
 ExecStart={venv_path}/bin/python3 -m uvicorn main:app --host 0.0.0.0 --port {port}
 Restart=always
@@ -366,6 +409,8 @@ Group=jsbach
 UMask=0027
 WorkingDirectory={target_path}
 Environment=\"PATH={venv_path}/bin:/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin\"
+# Estado en SQLite (config/state.db): activar igual en jsbach.service y jsbach-cli.service
+#Environment=JSBACH_STATE_BACKEND=sqlite
 ExecStartPre=+/bin/sh -c "chown -R jsbach:jsbach {target_path}/config {target_path}/logs || true"
 ExecStart={venv_path}/bin/python3 {cli_path}
 Restart=always
@@ -507,6 +552,7 @@ if __name__ == "__main__":
     prepare_directory(target_path)
     create_logs_directory(target_path)
     create_config_directory(target_path)
+    create_dnsmasq_fragments_directory()
     venv_path = create_venv(target_path)
 
     # Elegir puerto
@@ -534,6 +580,7 @@ if __name__ == "__main__":
     
     print()
 
+    install_nflog_helper(target_path)
     create_systemd_service(target_path, venv_path, port)
     create_cli_systemd_service(target_path, venv_path)
 
@@ -599,6 +646,10 @@ if __name__ == "__main__":
         f"{_bin('iptables', '/usr/sbin/iptables')} -X *",
         f"{_bin('iptables', '/usr/sbin/iptables')} -t nat *",
         f"{_bin('iptables', '/usr/sbin/iptables')} -t mangle *",
+        # Transacciones incrementales (reglas de bypass del portal cautivo)
+        f"{_bin('iptables-restore', '/usr/sbin/iptables-restore')} --noflush",
+        # Volcado del estado aplicado (arranque en caliente y rápido)
+        f"{_bin('iptables-save', '/usr/sbin/iptables-save')}",
         
         # --- EBTABLES ---
         f"{_bin('ebtables', '/usr/sbin/ebtables')} -A *",
@@ -610,6 +661,9 @@ if __name__ == "__main__":
         f"{_bin('ebtables', '/usr/sbin/ebtables')} -t broute *",
         f"{_bin('ebtables', '/usr/sbin/ebtables')} -t nat *",
         f"{_bin('ebtables', '/usr/sbin/ebtables')} -t filter *",
+        # Instantáneas de las cadenas propias (arranque rápido)
+        f"{_bin('ebtables-save', '/usr/sbin/ebtables-save')}",
+        f"{_bin('ebtables-restore', '/usr/sbin/ebtables-restore')} --noflush",
         
         # --- NETWORK & IP ---
         f"{_bin('ip', '/usr/sbin/ip')} a *",
@@ -624,6 +678,9 @@ if __name__ == "__main__":
         f"{_bin('ip', '/usr/sbin/ip')} -4 *",
         f"{_bin('bridge', '/usr/sbin/bridge')} vlan *",
         f"{_bin('bridge', '/usr/sbin/bridge')} fdb *",
+        # Recreación de puente, VLANs y puertos desde la instantánea (arranque rápido)
+        f"{_bin('ip', '/usr/sbin/ip')} -force -batch -",
+        f"{_bin('bridge', '/usr/sbin/bridge')} -force -batch -",
         
         # --- CONNTRACK ---
         f"{_bin('conntrack', '/usr/sbin/conntrack')} -D *",
@@ -637,6 +694,9 @@ if __name__ == "__main__":
         f"{_bin('dhcpcd', '/usr/sbin/dhcpcd')} -x *",
         f"{_bin('dnsmasq', '/usr/sbin/dnsmasq')} * --log-facility=*",
         f"{_bin('dnsmasq', '/usr/sbin/dnsmasq')} --conf-file=*",
+        # Recarga de fragmentos de dnsmasq (opciones y reservas) sin reiniciar:
+        # solo el dnsmasq de JSBach (su pidfile y nombre de proceso)
+        f"{_bin('pkill', '/usr/bin/pkill')} -HUP -x -F {target_path}/config/dhcp/dnsmasq.pid dnsmasq",
         f"{_bin('resolvectl', '/usr/bin/resolvectl')} dns *",
         f"{_bin('resolvectl', '/usr/bin/resolvectl')} revert *",
         
@@ -654,6 +714,10 @@ if __name__ == "__main__":
         f"{__import__('shutil').which('pkill') or '/usr/bin/pkill'} /opt/JSBach/config/wifi/hostapd.pid",
         f"{__import__('shutil').which('pkill') or '/usr/bin/pkill'} /opt/JSBach/config/wifi/hostapd.pid",
         
+        # --- REGISTRO DE PAQUETES (NFLOG) ---
+        # Auxiliar root que abre el socket NFLOG y lo entrega al servicio
+        "/usr/local/libexec/jsbach/nflog-bind *",
+
         # --- EXPECT (Strictly confined to modules) ---
         "/usr/bin/expect /opt/JSBach/app/modules/expect/scripts/*"
     ]
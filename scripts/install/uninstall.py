@@ -95,6 +95,11 @@ def remove_sudoers():
     except Exception as e:
         error(f"No se pudo eliminar el archivo sudoers: {e}")
 
+    # Auxiliar NFLOG y fragmentos de dnsmasq instalados fuera del proyecto
+    for path in ("/usr/local/libexec/jsbach", "/var/lib/jsbach"):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
 ###############
 #   Eliminar directorio del proyecto
 ###############
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test de las huellas del estado aplicado (applied_state, arranque en caliente).
+
+Un volcado del kernel simulado (reglas de iptables y enlaces) sustituye a
+iptables-save / ip: se comprueba que la huella coincide mientras la
+configuración y el estado propio del módulo no cambian, y que deja de
+coincidir en cuanto cambia cualquiera de los dos o el arranque del kernel.
+No requiere sudo ni toca el kernel.
+"""
+import sys
+import os
+import json
+import tempfile
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.utils.global_helpers import applied_state
+
+MODULE = "t_vlans"
+SPEC = {"iptables": ["JSB_VLAN_"], "links": ["br0"]}
+IPTABLES = {"filter": [
+    ":INPUT ACCEPT",
+    ":JSB_VLAN_STATS -",
+    ":DOCKER -",
+    "-A FORWARD -j JSB_VLAN_STATS",
+    "-A JSB_VLAN_STATS -i br0.10 -j RETURN",
+    "-A DOCKER -j RETURN",
+]}
+LINKS = [
+    "5: br0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 state UP",
+    "6: br0.10@br0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 state UP",
+    "6: br0.10    inet 10.0.10.1/24 brd 10.0.10.255 scope global br0.10",
+    "7: eth1: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 master br0 state UP",
+]
+
+
+class FakeDump(applied_state.KernelDump):
+    """Volcado del kernel con el estado que indique el test."""
+    iptables_state = IPTABLES
+    links_state = LINKS
+
+    def iptables(self):
+        return self.iptables_state
+
+    def links(self):
+        return self.links_state
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+def write_config(base_dir, cfg):
+    path = os.path.join(base_dir, "config", MODULE, f"{MODULE}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(cfg, f)
+
+
+def run_applied_state_tests():
+    print("--- Running Applied State Fingerprint Tests ---")
+    results = []
+    base_dir = tempfile.mkdtemp(prefix="jsbach-applied-")
+    state_file = os.path.join(base_dir, "config", "applied_state.json")
+    applied_state.KernelDump = FakeDump
+    applied_state.BOOT_ID_FILE = os.path.join(base_dir, "boot_id")
+    with open(applied_state.BOOT_ID_FILE, "w") as f:
+        f.write("boot-1\n")
+    cfg = {"status": 1, "vlans": [{"id": 10, "ip_interface": "10.0.10.1/24"}]}
+    write_config(base_dir, cfg)
+
+    def matches(spec=SPEC):
+        return applied_state.matches(base_dir, MODULE, spec, FakeDump(), path=state_file)
+
+    # 1. Registro y coincidencia con el mismo kernel y la misma configuración
+    records = applied_state.record(base_dir, {MODULE: SPEC, "t_other": None}, path=state_file)
+    check(results, "1. Registro y coincidencia", list(records) == [MODULE] and matches())
+
+    # 2. Solo se toma el estado propio: reglas de otras cadenas e interfaces ajenas no cuentan
+    lines = applied_state.live_lines(SPEC, FakeDump())
+    check(results, "2. Estado propio del módulo",
+          not any("DOCKER" in l or "eth1" in l for l in lines) and "ip4 filter -A FORWARD -j JSB_VLAN_STATS" in lines,
+          str(len(lines)))
+
+    # 3. Claves volátiles (status, dhcp_error) no invalidan la huella; el resto sí
+    write_config(base_dir, dict(cfg, status=0, dhcp_error="x"))
+    volatile = matches()
+    write_config(base_dir, dict(cfg, vlans=[{"id": 20, "ip_interface": "10.0.20.1/24"}]))
+    changed = matches()
+    write_config(base_dir, cfg)
+    check(results, "3. Cambios de configuración", volatile and not changed and matches())
+
+    # 4. Una regla propia distinta invalida la huella; una ajena no
+    FakeDump.iptables_state = {"filter": IPTABLES["filter"] + ["-A DOCKER -j ACCEPT"]}
+    foreign = matches()
+    FakeDump.iptables_state = {"filter": IPTABLES["filter"] + ["-A JSB_VLAN_STATS -j DROP"]}
+    own = matches()
+    FakeDump.iptables_state = IPTABLES
+    check(results, "4. Reglas de iptables", foreign and not own)
+
+    # 5. Enlaces: el índice de la interfaz no cuenta (recreada desde la instantánea); la dirección sí
+    FakeDump.links_state = [l.replace("6:", "12:").replace("5:", "11:") for l in LINKS]
+    renumbered = matches()
+    FakeDump.links_state = [l.replace("10.0.10.1/24", "10.0.10.2/24") for l in LINKS]
+    readdressed = matches()
+    FakeDump.links_state = LINKS
+    check(results, "5. Enlaces", renumbered and not readdressed)
+
+    # 6. Otro arranque del kernel (boot_id distinto): el estado pudo recrearse desde las instantáneas
+    with open(applied_state.BOOT_ID_FILE, "w") as f:
+        f.write("boot-2\n")
+    rebooted = matches()
+    applied_state.record(base_dir, {MODULE: SPEC}, path=state_file)
+    check(results, "6. Sin arranque en caliente tras reiniciar el equipo", not rebooted and matches())
+
+    # 7. Módulo inactivo o sin LIVE_STATE: sin huella, nunca en caliente
+    write_config(base_dir, dict(cfg, status=0))
+    inactive = applied_state.record(base_dir, {MODULE: SPEC}, path=state_file)
+    check(results, "7. Sin huella si está inactivo o sin LIVE_STATE",
+          inactive == {} and not matches() and not matches(spec=None))
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_applied_state_tests() else 1)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Test del driver telnet nativo del módulo Expect contra un switch simulado.
+
+FakeSwitch es un servidor telnet local (asyncio) que imita la CLI de un switch
+TP-Link: negociación IAC al conectar, login, modo privilegiado, modos de
+configuración, paginación "--More--" y un comando lento para los timeouts.
+El orden FIFO del pool se comprueba con una sesión simulada en memoria y los
+trabajos de la sesión expect con un proceso simulado.
+No requiere sudo ni hardware.
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+import tempfile
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.modules.expect import session_pool, state_manager
+from app.modules.expect.actions.security import run_sync_security
+from app.modules.expect.telnet_driver import (
+    ProfilePrompts, TelnetClient, TelnetError, IAC, WILL, DO, SB, SE, OPT_ECHO, OPT_SGA
+)
+
+PROFILE_FILE = os.path.join(BASE_DIR, "config/expect/profiles/tp_link.json")
+CISCO_FILE = os.path.join(BASE_DIR, "config/expect/profiles/cisco_ios.json")
+USER, PASSWORD = "admin", "s3cret"
+HOSTNAME = "JSB-TEST"
+OPT_TTYPE = 24
+
+MAC_TABLE = "\r\n".join(
+    [" MAC Address        VLAN    Port", "-----------------  ------  --------"]
+    + [f"00:11:22:33:44:{i:02x}  1       Gi1/0/{i % 8 + 1}" for i in range(40)]
+)
+
+
+class FakeSwitch:
+    """Servidor telnet con la CLI mínima de un switch."""
+
+    def __init__(self, page_lines: int = 20, slow_delay: float = 2.0):
+        self.page_lines = page_lines
+        self.slow_delay = slow_delay
+        self.logins = 0
+        self.commands = []
+        self.port = None
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @staticmethod
+    async def _readline(reader):
+        """Línea del cliente sin secuencias IAC."""
+        data = bytearray()
+        while True:
+            byte = await reader.read(1)
+            if not byte:
+                return None
+            if byte[0] == IAC:
+                cmd = await reader.read(1)
+                if cmd[0] == SB:
+                    while (await reader.read(1))[0] != SE:
+                        pass
+                else:
+                    await reader.read(1)
+                continue
+            if byte == b"\n":
+                return data.decode().rstrip("\r\x00")
+            data += byte
+
+    async def _handle(self, reader, writer):
+        send = lambda text: writer.write(text.encode())
+        # Negociación inicial: el switch hace eco y pide el tipo de terminal
+        writer.write(bytes((IAC, WILL, OPT_ECHO, IAC, WILL, OPT_SGA, IAC, DO, OPT_TTYPE)))
+        try:
+            while True:
+                send("\r\nUser:")
+                user = await self._readline(reader)
+                send("\r\nPassword:")
+                password = await self._readline(reader)
+                if user is None or password is None:
+                    return
+                if (user, password) == (USER, PASSWORD):
+                    break
+                send("\r\nLogin invalid.\r\n")
+            self.logins += 1
+            mode = ">"
+            send(f"\r\n{HOSTNAME}{mode}")
+            while True:
+                line = await self._readline(reader)
+                if line is None:
+                    return
+                cmd = line.strip()
+                self.commands.append(cmd)
+                send(f"{cmd}\r\n")  # eco
+                if cmd in ("enable", "en") and mode == ">":
+                    mode = "#"
+                elif cmd == "configure" and mode == "#":
+                    mode = "(config)#"
+                elif cmd.startswith("interface ") and mode.startswith("(config"):
+                    mode = "(config-if)#"
+                elif cmd == "exit":
+                    if mode == "(config-if)#":
+                        mode = "(config)#"
+                    elif mode == "(config)#":
+                        mode = "#"
+                    else:
+                        writer.close()
+                        return
+                elif cmd == "end" and mode.startswith("(config"):
+                    mode = "#"
+                elif cmd == "show mac address-table":
+                    lines = MAC_TABLE.split("\r\n")
+                    for start in range(0, len(lines), self.page_lines):
+                        send("\r\n".join(lines[start:start + self.page_lines]) + "\r\n")
+                        if start + self.page_lines < len(lines):
+                            send(" --More-- ")
+                            await reader.read(1)
+                            send("\r          \r")
+                elif cmd == "slow":
+                    await asyncio.sleep(self.slow_delay)
+                send(f"{HOSTNAME}{mode}")
+                await writer.drain()
+        except (ConnectionError, IndexError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+class FakeSession(session_pool.SwitchSession):
+    """Sesión en memoria: registra el orden en que se ejecutan los trabajos."""
+    order = []
+    on_run = None
+
+    def __init__(self, ip, key):
+        super().__init__(ip, key)
+        self._open = False
+
+    @property
+    def alive(self):
+        return self._open
+
+    async def open(self):
+        self._open = True
+
+    async def run(self, commands, timeout=session_pool.COMMAND_TIMEOUT):
+        await asyncio.sleep(0.02)
+        FakeSession.order.append(commands[0])
+        if FakeSession.on_run:
+            FakeSession.on_run(commands[0])
+        return True, ""
+
+    async def close(self):
+        self._open = False
+
+
+async def fifo_test(results):
+    pool = session_pool.SessionPool(max_sessions=1)
+    pool._new_session = lambda ip, *args: ("k", lambda: FakeSession(ip, "k"))
+    late = []
+
+    def job(label):
+        return asyncio.get_running_loop().create_task(pool.run("10.0.0.1", {}, USER, PASSWORD, [label]))
+
+    # E llega justo cuando A libera la sesión, con B y C ya en cola: no debe adelantarlas
+    FakeSession.on_run = lambda label: late.append(job("E")) if label == "A" else None
+    first = job("A")
+    await asyncio.sleep(0)
+    queued = [job("B"), job("C")]
+    await asyncio.gather(first, *queued)
+    await asyncio.gather(*late)
+    await pool.close_all()
+    check(results, "6. Pool: cola FIFO por switch", FakeSession.order == ["A", "B", "C", "E"],
+          " → ".join(FakeSession.order))
+
+    class Incomplete(session_pool.SwitchSession):
+        @property
+        def alive(self):
+            return False
+    try:
+        Incomplete("10.0.0.1", "k")
+        abstract = False
+    except TypeError:
+        abstract = True
+    check(results, "7. SwitchSession abstracta", abstract)
+
+
+class FakeExpectProcess:
+    """Proceso session.exp simulado: registra las líneas de stdin y responde @@DONE a cada trabajo."""
+
+    def __init__(self):
+        self.returncode = None
+        self.lines = []
+        self.stdin = self
+        self.stdout = asyncio.StreamReader()
+
+    def write(self, data):
+        for line in data.decode().splitlines():
+            self.lines.append(line)
+            if line.startswith("@@JOB "):
+                job_id = line.split()[1]
+            elif line == "@@END":
+                self.stdout.feed_data(f"{HOSTNAME}#\n@@DONE {job_id} 0\n".encode())
+
+    async def drain(self):
+        pass
+
+
+async def expect_job_test(results):
+    with open(CISCO_FILE) as f:
+        cisco = json.load(f)
+    layer = cisco["mac_security_cmds"]["layers"][0]
+    apply_cmd = layer["apply_cmd"].format(target="ethernet 1-24", acl_id="101")
+    session = session_pool.ExpectSession("10.0.0.2", "k", cisco, USER, PASSWORD, "ssh")
+    session.process = FakeExpectProcess()
+    ok, _ = await session.run(session_pool.config_job(cisco, [apply_cmd, "   ", "2000 permit any any  "]))
+    keepalive, _ = await session.run([""])
+    sent = session.process.lines
+    check(results, "8. Sesión expect: comandos de varias líneas del perfil",
+          ok and keepalive and sent[1:5] == ["configure", "interface ethernet 1-24",
+                                             "mac access-group JSBACH_BLACKLIST_101 in", "2000 permit any any"]
+          and "" not in sent[:sent.index("@@END")] and sent[-2:] == ["", "@@END"], str(sent))
+
+
+async def security_sync_test(results, switch):
+    """Sincronización de seguridad con el perfil Cisco (apply_cmd de varias líneas) por telnet nativo."""
+    with open(CISCO_FILE) as f:
+        cisco = json.load(f)
+    state_manager.STATE_JSON = os.path.join(tempfile.mkdtemp(prefix="jsbach-expect-"), "state.json")
+    with open(state_manager.STATE_JSON, "w") as f:
+        json.dump({"switches": {"127.0.0.1": {"mac_acl": {"aa:bb:cc:dd:ee:01": {"rule_id": "1"}}}}}, f)
+    session_pool.TELNET_PORT = switch.port
+    switch.commands.clear()
+    ok, out = await run_sync_security("127.0.0.1", cisco, True, USER, PASSWORD, cisco["max_ports"])
+    check(results, "9. Sincronización de seguridad (telnet, perfil Cisco)",
+          ok and "mac access-group JSBACH_BLACKLIST_101 in" in switch.commands
+          and "no mac access-group JSBACH_BLACKLIST_100 in" in switch.commands
+          and switch.commands.count("interface ethernet 1-24") == 2 and "" not in switch.commands
+          and state_manager.get_active_acl_id("127.0.0.1") == "101", out if not ok else str(len(switch.commands)))
+
+
+async def run_telnet_tests():
+    print("--- Running Expect Native Telnet Driver Tests ---")
+    with open(PROFILE_FILE) as f:
+        profile = json.load(f)
+    profile["prompts"]["more"] = "--More--"
+    prompts = ProfilePrompts.from_profile(profile)
+    results = []
+
+    switch = FakeSwitch()
+    await switch.start()
+    try:
+        # 1. Login, modo privilegiado y paginación, con salida incremental
+        chunks = []
+        client = TelnetClient("127.0.0.1", prompts, switch.port, on_output=chunks.append)
+        await client.connect()
+        await client.login(USER, PASSWORD, profile.get("enable_cmd", "en"))
+        ok, output = await client.run(["show mac address-table"], timeout=5)
+        await client.close()
+        check(results, "1. Login + tabla MAC paginada", ok and output.count("00:11:22:33:44:") == 40,
+              f"{output.count('00:11:22:33:44:')} entradas en {len(chunks)} fragmentos")
+
+        # 2. Credenciales incorrectas
+        client = TelnetClient("127.0.0.1", prompts, switch.port)
+        await client.connect()
+        try:
+            await client.login(USER, "wrong", timeout=3)
+            rejected = False
+        except TelnetError:
+            rejected = True
+        await client.close()
+        check(results, "2. Credenciales rechazadas", rejected)
+
+        # 3. Timeout por comando
+        client = TelnetClient("127.0.0.1", prompts, switch.port)
+        await client.connect()
+        await client.login(USER, PASSWORD)
+        start = time.monotonic()
+        ok, output = await client.run(["slow", "show version"], timeout=0.5)
+        elapsed = time.monotonic() - start
+        await client.close()
+        check(results, "3. Timeout por comando", not ok and elapsed < 1.5 and "show version" not in switch.commands,
+              f"{elapsed:.2f}s")
+
+        # 4. Pool: trabajos seguidos reutilizan la sesión (un solo login)
+        switch.logins = 0
+        job = session_pool.config_job(profile, ["interface gigabitEthernet 1/0/2", "switchport access vlan 10", "exit"])
+        ok1, _ = await session_pool.run_commands("127.0.0.1", profile, USER, PASSWORD, job, port=switch.port)
+        ok2, out2 = await session_pool.run_commands("127.0.0.1", profile, USER, PASSWORD,
+                                                    ["show mac address-table"], port=switch.port)
+        check(results, "4. Pool: reutilización de sesión", ok1 and ok2 and switch.logins == 1
+              and out2.rstrip().endswith(f"{HOSTNAME}#"), f"{switch.logins} login(s)")
+
+        # 5. Muchas sesiones concurrentes en el mismo bucle
+        async def one_session():
+            c = TelnetClient("127.0.0.1", prompts, switch.port)
+            await c.connect()
+            await c.login(USER, PASSWORD)
+            result = await c.run(["show mac address-table"], timeout=10)
+            await c.close()
+            return result[0]
+
+        start = time.monotonic()
+        oks = await asyncio.gather(*(one_session() for _ in range(200)))
+        check(results, "5. 200 sesiones concurrentes", all(oks),
+              f"{sum(oks)}/200 en {time.monotonic() - start:.2f}s")
+
+        await fifo_test(results)
+        await expect_job_test(results)
+        await security_sync_test(results, switch)
+    finally:
+        await session_pool.close_all()
+        await switch.stop()
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_telnet_tests()) else 1)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test del cliente de la interfaz de control de hostapd (wifi/hostapd_ctrl).
+
+Un hostapd simulado (socket Unix datagrama en un directorio temporal) responde
+a STATUS, STA-FIRST/STA-NEXT y PING. Se comprueba el análisis de las respuestas,
+la caché de estaciones y el antirrebote de desconexiones por MAC.
+No requiere sudo ni hostapd.
+"""
+import sys
+import os
+import time
+import socket
+import asyncio
+import tempfile
+import threading
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.modules.wifi.hostapd_ctrl import (
+    DisconnectBatcher, HostapdQuery, StationCache, parse_kv, parse_station
+)
+
+IFACE = "wlan-test"
+STATIONS = {
+    "aa:bb:cc:00:00:01": "flags=[AUTH][ASSOC][AUTHORIZED]\nrx_bytes=1200\ntx_bytes=3400\n"
+                         "signal=-52\nconnected_time=61\ninactive_msec=120\ntx_rate_info=866.7 vhtmcs 9",
+    "aa:bb:cc:00:00:02": "flags=[AUTH][ASSOC]\nrx_bytes=10\ntx_bytes=abc\naid=2",
+}
+STATUS = "state=ENABLED\nchannel=36\nssid[0]=JSBach\nnum_sta[0]=2\n"
+
+
+class FakeHostapd(threading.Thread):
+    """Interfaz de control mínima de hostapd."""
+
+    def __init__(self, ctrl_dir: str):
+        super().__init__(daemon=True)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(os.path.join(ctrl_dir, IFACE))
+        self.sock.settimeout(0.2)
+        self.requests = []
+        self.running = True
+
+    def reply(self, command: str) -> str:
+        macs = list(STATIONS)
+        if command == "STATUS":
+            return STATUS
+        if command == "PING":
+            return "PONG\n"
+        if command == "STA-FIRST":
+            return f"{macs[0]}\n{STATIONS[macs[0]]}\n"
+        if command.startswith("STA-NEXT "):
+            i = macs.index(command.split()[1]) + 1
+            return f"{macs[i]}\n{STATIONS[macs[i]]}\n" if i < len(macs) else ""
+        return "UNKNOWN COMMAND\n"
+
+    def run(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            command = data.decode()
+            self.requests.append(command)
+            self.sock.sendto(self.reply(command).encode(), addr)
+
+    def stop(self):
+        self.running = False
+        self.join()
+        self.sock.close()
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+async def batcher_test(results):
+    batches = []
+
+    async def apply(macs):
+        batches.append((round(time.monotonic() - start, 1), sorted(macs)))
+
+    batcher = DisconnectBatcher(apply, window=0.4)
+    start = time.monotonic()
+    batcher.disconnected("aa:00:00:00:00:01")
+    await asyncio.sleep(0.3)
+    batcher.disconnected("aa:00:00:00:00:02")   # su ventana empieza ahora
+    batcher.disconnected("aa:00:00:00:00:03")
+    await asyncio.sleep(0.05)
+    batcher.connected("aa:00:00:00:00:03")      # reasociación dentro de la ventana
+    await asyncio.sleep(0.6)
+    # La segunda MAC se revoca 0.4 s después de SU desconexión, no con el primer lote
+    check(results, "5. Antirrebote por MAC",
+          [macs for _, macs in batches] == [["aa:00:00:00:00:01"], ["aa:00:00:00:00:02"]]
+          and batches[1][0] >= 0.65, str(batches))
+
+    batcher.disconnected("aa:00:00:00:00:04")
+    await batcher.flush()
+    check(results, "6. flush() al detener aplica lo pendiente",
+          batches[-1][1] == ["aa:00:00:00:00:04"] and not batcher._pending)
+
+
+def run_hostapd_tests():
+    print("--- Running hostapd Control Interface Tests ---")
+    results = []
+
+    # 1. Respuestas clave=valor y bloques de estación
+    status = parse_kv(STATUS)
+    first = parse_station("aa:BB:cc:00:00:01\n" + STATIONS["aa:bb:cc:00:00:01"])
+    second = parse_station("aa:bb:cc:00:00:02\n" + STATIONS["aa:bb:cc:00:00:02"])
+    check(results, "1. parse_kv / parse_station",
+          status["ssid[0]"] == "JSBach" and first["mac"] == "aa:bb:cc:00:00:01" and first["authorized"]
+          and first["signal"] == -52 and first["tx_rate"] == "866.7 vhtmcs 9"
+          and not second["authorized"] and second["tx_bytes"] is None and second["aid"] == 2)
+    check(results, "2. Fin de la lista y respuestas no válidas",
+          parse_station("") is None and parse_station("FAIL") is None)
+
+    ctrl_dir = tempfile.mkdtemp(prefix="jsbach-hostapd-")
+    fake = FakeHostapd(ctrl_dir)
+    fake.start()
+    try:
+        # 3. Consulta directa: STATUS y recorrido STA-FIRST/STA-NEXT
+        with HostapdQuery(IFACE, ctrl_dir) as query:
+            stations = query.stations()
+            pong = query.request("PING").strip()
+        check(results, "3. Estaciones por STA-FIRST/STA-NEXT",
+              [s["mac"] for s in stations] == list(STATIONS) and pong == "PONG")
+
+        # 4. Caché: dos consultas seguidas dentro del TTL = un solo recorrido
+        cache = StationCache(ttl=5.0, ctrl_dir=ctrl_dir)
+        fake.requests.clear()
+        cache.stations(IFACE)
+        cache.status(IFACE)
+        missing = StationCache(ctrl_dir=ctrl_dir).status("wlan-none")
+        check(results, "4. StationCache dentro del TTL",
+              fake.requests.count("STATUS") == 1 and missing is None, str(fake.requests))
+    finally:
+        fake.stop()
+
+    asyncio.run(batcher_test(results))
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_hostapd_tests() else 1)
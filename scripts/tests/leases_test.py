@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test del índice de concesiones DHCP (dhcp/leases).
+
+Usa un fichero de concesiones con el formato de dnsmasq y una configuración de
+VLANs temporales: análisis de líneas, búsqueda por prefijo, orden, paginación,
+filtro por VLAN y recarga solo cuando cambia el fichero.
+No requiere sudo ni dnsmasq.
+"""
+import sys
+import os
+import json
+import tempfile
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.modules.dhcp import leases
+
+LEASES = """\
+1760000300 AA:BB:CC:00:00:01 10.0.10.20 portatil-ana 01:aa:bb:cc:00:00:01
+1760000100 aa:bb:cc:00:00:02 10.0.10.3 * *
+1760000200 aa:bb:cc:00:00:03 10.0.20.7 impresora *
+duid 00:01:00:01:2c:aa:bb:cc:dd:ee:ff:00:11
+1760000400 aa:bb:cc:00:00:04 192.168.99.9 movil-invitado *
+"""
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+def run_lease_tests():
+    print("--- Running DHCP Lease Index Tests ---")
+    results = []
+    tmp = tempfile.mkdtemp(prefix="jsbach-leases-")
+    lease_file = os.path.join(tmp, "dnsmasq.leases")
+    with open(lease_file, "w") as f:
+        f.write(LEASES)
+    leases.VLAN_CONFIG_FILE = os.path.join(tmp, "vlans.json")
+    leases.WIFI_CONFIG_FILE = os.path.join(tmp, "wifi.json")
+    with open(leases.VLAN_CONFIG_FILE, "w") as f:
+        json.dump({"vlans": [{"id": 10, "ip_interface": "10.0.10.1/24"},
+                             {"id": 20, "ip_interface": "10.0.20.1/24"}]}, f)
+    index = leases.LeaseIndex(lease_file)
+
+    # 1. Análisis: se ignoran las líneas duid, MAC en minúsculas, '*' sustituido, VLAN por red
+    lease = index.get_by_mac("AA:BB:CC:00:00:01")
+    anon = index.get_by_ip("10.0.10.3")
+    check(results, "1. Análisis del fichero de dnsmasq",
+          index.count() == 4 and lease["mac"] == "aa:bb:cc:00:00:01" and lease["vlan"] == "10"
+          and anon["hostname"] == "Desconocido" and anon["client_id"] == ""
+          and index.get_by_ip("192.168.99.9")["vlan"] is None)
+
+    # 2. Orden por IP numérico (10.0.10.3 antes que 10.0.10.20) y descendente por fecha
+    by_ip = [l["ip"] for l in index.select(sort="ip")]
+    newest = index.select(sort="-timestamp")[0]["mac"]
+    check(results, "2. Orden",
+          by_ip == ["10.0.10.3", "10.0.10.20", "10.0.20.7", "192.168.99.9"] and newest == "aa:bb:cc:00:00:04",
+          str(by_ip))
+
+    # 3. Búsqueda por prefijo de IP, MAC o nombre y filtro por VLAN
+    check(results, "3. Búsqueda y filtro por VLAN",
+          [l["ip"] for l in index.select(search="10.0.10.")] == ["10.0.10.3", "10.0.10.20"]
+          and [l["hostname"] for l in index.select(search="IMPR")] == ["impresora"]
+          and len(index.select(search="aa:bb:cc:00:00:0")) == 4
+          and [l["ip"] for l in index.select(vlan=20)] == ["10.0.20.7"])
+
+    # 4. Paginación
+    page = index.query(sort="ip", page=2, page_size=3)
+    check(results, "4. Paginación",
+          page["total"] == 4 and page["page"] == 2 and [l["ip"] for l in page["leases"]] == ["192.168.99.9"])
+
+    # 5. Campo de ordenación no válido
+    try:
+        index.select(sort="vendor")
+        rejected = False
+    except ValueError:
+        rejected = True
+    check(results, "5. Orden no válido rechazado", rejected)
+
+    # 6. Solo se relee el fichero cuando cambia
+    reloads = index.reloads
+    index.count()
+    index.select(search="10.")
+    unchanged = index.reloads == reloads
+    with open(lease_file, "a") as f:
+        f.write("1760000500 aa:bb:cc:00:00:05 10.0.20.8 nas *\n")
+    check(results, "6. Recarga solo si cambia el fichero",
+          unchanged and index.count() == 5 and index.reloads == reloads + 1)
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_lease_tests() else 1)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test del agente de restauración por grafo de dependencias (restore_agent).
+
+Usa módulos simulados (metadatos y start() en memoria): orden según
+DEPENDENCIES, paralelismo, exclusión por recurso compartido, espera a que la
+WAN quede operativa con una verificación lanzada desde un start() síncrono y
+fallo de un módulo sin bloquear a sus dependientes.
+No requiere sudo ni toca el kernel.
+"""
+import sys
+import time
+import types
+import asyncio
+import threading
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.utils.global_helpers import module_graph, restore_agent
+from app.utils.global_helpers import module_helpers as mh
+
+events = []      # (módulo, "begin"/"end"/"ready", instante, hilo)
+wan_ready = {}
+
+
+def mark(name, what):
+    events.append((name, what, time.monotonic(), threading.current_thread() is threading.main_thread()))
+
+
+def when(name, what):
+    return next((t for n, w, t, _ in events if n == name and w == what), float("inf"))
+
+
+async def verify_wan():
+    """Verificación en segundo plano (como _verify_dhcp_assignment de la WAN)."""
+    await asyncio.sleep(0.1)
+    mark("t_wan", "ready")
+    wan_ready["event"].set()
+
+
+async def wait_wan(timeout):
+    try:
+        await asyncio.wait_for(wan_ready["event"].wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+def sync_start(name, seconds, spawn=None, fail=False):
+    def start(params=None):
+        mark(name, "begin")
+        time.sleep(seconds)
+        if fail:
+            raise RuntimeError("fallo simulado")
+        if spawn:
+            mh.spawn_background(spawn())
+        mark(name, "end")
+        return True, "ok"
+    return start
+
+
+def async_start(name, seconds):
+    async def start(params=None):
+        mark(name, "begin")
+        await asyncio.sleep(seconds)
+        mark(name, "end")
+        return True, "ok"
+    return start
+
+
+FAKE_MODULES = {
+    # nombre: (metadatos del paquete, start)
+    "t_wan": ({"RESOURCES": ["iptables"], "READY_TIMEOUT": 5, "WAIT_READY": wait_wan},
+              sync_start("t_wan", 0.05, spawn=verify_wan)),
+    "t_fw": ({"RESOURCES": ["iptables"]}, sync_start("t_fw", 0.2)),
+    "t_nat": ({"DEPENDENCIES": {"after": ["t_wan", "t_fw"]}, "RESOURCES": ["iptables"]},
+              sync_start("t_nat", 0.02)),
+    "t_vlans": ({}, async_start("t_vlans", 0.15)),
+    "t_broken": ({}, sync_start("t_broken", 0.01, fail=True)),
+    "t_dhcp": ({"DEPENDENCIES": {"after": ["t_broken"]}}, sync_start("t_dhcp", 0.01)),
+}
+
+
+def install_fake_modules():
+    for name, (meta, start) in FAKE_MODULES.items():
+        module_graph._cache[name] = module_graph.ModuleInfo(name, types.SimpleNamespace(**meta))
+        module = types.ModuleType(f"app.modules.{name}.{name}")
+        module.start = start
+        sys.modules[module.__name__] = module
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+async def restore(graph):
+    wan_ready["event"] = asyncio.Event()
+    await restore_agent._run_graph("/nonexistent", graph)
+
+
+def run_restore_dag_tests():
+    print("--- Running Restore Dependency Graph Tests ---")
+    results = []
+    install_fake_modules()
+
+    # 1. Grafo: predecesores restringidos a los módulos seleccionados y ciclos rechazados
+    graph = module_graph.build_graph(list(FAKE_MODULES))
+    partial = module_graph.build_graph(["t_nat", "t_wan"])
+    module_graph._cache["t_cycle_a"] = module_graph.ModuleInfo(
+        "t_cycle_a", types.SimpleNamespace(DEPENDENCIES={"after": ["t_cycle_b"]}))
+    module_graph._cache["t_cycle_b"] = module_graph.ModuleInfo(
+        "t_cycle_b", types.SimpleNamespace(DEPENDENCIES={"active": [["t_cycle_a", "t_wan"]]}))
+    try:
+        module_graph.build_graph(["t_cycle_a", "t_cycle_b"])
+        cycle = False
+    except ValueError:
+        cycle = True
+    check(results, "1. build_graph y detección de ciclos",
+          graph["t_nat"] == {"t_wan", "t_fw"} and partial["t_nat"] == {"t_wan"} and cycle)
+
+    asyncio.run(restore(graph))
+    report = restore_agent.last_restore
+
+    # 2. Orden: NAT arranca cuando la WAN está operativa y el firewall ha terminado
+    check(results, "2. Orden de dependencias",
+          when("t_nat", "begin") >= when("t_wan", "ready") and when("t_nat", "begin") >= when("t_fw", "end"))
+
+    # 3. Recurso compartido (iptables): WAN y firewall no se solapan
+    wan = (when("t_wan", "begin"), when("t_wan", "end"))
+    fw = (when("t_fw", "begin"), when("t_fw", "end"))
+    check(results, "3. Exclusión por recurso", wan[1] <= fw[0] or fw[1] <= wan[0], f"wan={wan} fw={fw}")
+
+    # 4. Paralelismo: las VLANs (sin recursos ni dependencias) arrancan junto al firewall
+    check(results, "4. Arranque en paralelo",
+          when("t_vlans", "begin") < fw[1] and fw[0] < when("t_vlans", "end")
+          and report["total"] < report["sequential"], f"{report['total']}s / {report['sequential']}s")
+
+    # 5. La verificación lanzada por un start() síncrono corre en el loop: sin agotar READY_TIMEOUT
+    ready_on_loop = next((main for n, w, _, main in events if n == "t_wan" and w == "ready"), False)
+    check(results, "5. Tarea en segundo plano desde un hilo de trabajo",
+          ready_on_loop and not next(main for n, w, _, main in events if n == "t_wan" and w == "begin")
+          and report["modules"]["t_wan"]["duration"] < 1.0, str(report["modules"]["t_wan"]))
+
+    # 6. Un módulo que falla no bloquea a sus dependientes
+    check(results, "6. Fallo sin bloquear dependientes",
+          any(n == "t_dhcp" and w == "end" for n, w, _, _ in events)
+          and not any(n == "t_broken" and w == "end" for n, w, _, _ in events))
+
+    # 7. Informe: todos los módulos medidos y camino crítico terminado en NAT
+    check(results, "7. Informe de la restauración",
+          sorted(report["modules"]) == sorted(FAKE_MODULES) and report["critical_path"][-1] == "t_nat"
+          and not report["warm"], " → ".join(report["critical_path"]))
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_restore_dag_tests() else 1)
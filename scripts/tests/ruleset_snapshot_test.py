@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test de las instantáneas del estado aplicado (ruleset_snapshot, arranque rápido).
+
+A partir de una salida de iptables-save de ejemplo comprueba el fragmento
+restaurable con --noflush: cadenas propias, cadenas ajenas a las que saltan
+(INPUT_WIFI), saltos desde cadenas del sistema y reglas de terceros excluidas.
+También genera los lotes de 'ip -batch' / 'bridge -batch' de los enlaces.
+No requiere sudo ni toca el kernel.
+"""
+import sys
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.utils.global_helpers.ruleset_snapshot import build_fragment, links_batch, parse_save
+
+IPTABLES_SAVE = """\
+# Generated by iptables-save v1.8.9 on Mon Oct 19 10:00:00 2026
+*filter
+:INPUT ACCEPT [120:9000]
+:FORWARD DROP [0:0]
+:OUTPUT ACCEPT [80:7000]
+:DOCKER - [0:0]
+:FORWARD_WIFI - [0:0]
+:INPUT_WIFI - [0:0]
+:JSB_GLOBAL_RESTRICT - [0:0]
+:JSB_GLOBAL_STATS - [0:0]
+:WIFI_PORTAL - [0:0]
+-A INPUT -j JSB_GLOBAL_RESTRICT
+-A FORWARD -j DOCKER
+-A FORWARD -j JSB_GLOBAL_STATS
+-A FORWARD -i wlp3s0 -j FORWARD_WIFI
+-A DOCKER -j RETURN
+-A FORWARD_WIFI -j DROP
+-A INPUT_WIFI -p tcp --dport 8500 -g WIFI_PORTAL
+-A INPUT_WIFI -j DROP
+-A JSB_GLOBAL_RESTRICT -i wlp3s0 -j INPUT_WIFI
+-A JSB_GLOBAL_STATS -o eth0 -j RETURN
+-A WIFI_PORTAL -j ACCEPT
+COMMIT
+*nat
+:PREROUTING ACCEPT [0:0]
+:POSTROUTING ACCEPT [0:0]
+:DOCKER - [0:0]
+-A POSTROUTING -j DOCKER
+COMMIT
+"""
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+def declared_targets_ok(fragment, tables):
+    """Toda cadena del volcado a la que salta una regla del fragmento está declarada en él."""
+    for table, data in parse_save(fragment).items():
+        for rule in data["rules"]:
+            tokens = rule.split()
+            for opt, target in zip(tokens, tokens[1:]):
+                if opt in ("-j", "-g") and target in tables[table]["chains"] and target not in data["chains"]:
+                    return False
+    return True
+
+
+def run_snapshot_tests():
+    print("--- Running Ruleset Snapshot Tests ---")
+    results = []
+    tables = parse_save(IPTABLES_SAVE)
+    fragment = build_fragment(tables, ["JSB_"])
+    lines = fragment.splitlines()
+
+    # 1. Análisis de iptables-save
+    check(results, "1. parse_save",
+          sorted(tables) == ["filter", "nat"] and len(tables["filter"]["rules"]) == 11
+          and tables["filter"]["commit"] and "JSB_GLOBAL_STATS" in tables["filter"]["chains"])
+
+    # 2. Cadenas ajenas a las que saltan las propias: declaradas con sus reglas (recursivo)
+    check(results, "2. Cadenas referenciadas (INPUT_WIFI → WIFI_PORTAL)",
+          ":INPUT_WIFI - [0:0]" in lines and ":WIFI_PORTAL - [0:0]" in lines
+          and "-A INPUT_WIFI -p tcp --dport 8500 -g WIFI_PORTAL" in lines and "-A WIFI_PORTAL -j ACCEPT" in lines
+          and declared_targets_ok(fragment, tables))
+
+    # 3. Saltos desde cadenas del sistema: '-I cadena n' en orden, solo hacia cadenas propias
+    check(results, "3. Saltos desde cadenas del sistema",
+          "-I INPUT 1 -j JSB_GLOBAL_RESTRICT" in lines and "-I FORWARD 1 -j JSB_GLOBAL_STATS" in lines
+          and not any(l.startswith("-I FORWARD") and "FORWARD_WIFI" in l for l in lines))
+
+    # 4. Reglas y cadenas de terceros fuera; tablas sin estado propio omitidas
+    check(results, "4. Estado ajeno excluido",
+          "DOCKER" not in fragment and ":FORWARD_WIFI - [0:0]" not in lines and "*nat" not in lines
+          and lines[0] == "*filter" and lines[-1] == "COMMIT")
+
+    # 5. Con los prefijos de LIVE_STATE del firewall también se guarda FORWARD_WIFI
+    with_wifi = build_fragment(tables, ["JSB_", "INPUT_WIFI", "FORWARD_WIFI"]).splitlines()
+    check(results, "5. Prefijos LIVE_STATE",
+          ":FORWARD_WIFI - [0:0]" in with_wifi and "-I FORWARD 2 -i wlp3s0 -j FORWARD_WIFI" in with_wifi)
+
+    # 6. Enlaces: puente antes que VLANs y puertos, direcciones antes de levantar
+    ip_cmds, bridge_cmds = links_batch({
+        "links": [
+            {"name": "br0", "kind": "bridge", "up": True, "master": None, "addresses": [], "vlan_filtering": 1},
+            {"name": "br0.10", "kind": "vlan", "up": True, "master": None, "parent": "br0", "vlan_id": 10,
+             "addresses": ["10.0.10.1/24"]},
+            {"name": "eth1", "kind": None, "up": True, "master": "br0", "addresses": []},
+        ],
+        "bridge_vlans": {"br0": [{"vid": 10, "pvid": False, "untagged": False}],
+                         "eth1": [{"vid": 1, "pvid": True, "untagged": True}]},
+    })
+    check(results, "6. Lotes de enlaces",
+          ip_cmds[0] == "link add name br0 type bridge vlan_filtering 1"
+          and ip_cmds.index("addr add 10.0.10.1/24 dev br0.10") < ip_cmds.index("link set dev br0.10 up")
+          and "vlan del dev br0 vid 1 self" in bridge_cmds and "vlan add dev eth1 vid 1 pvid untagged" in bridge_cmds,
+          str(ip_cmds))
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_snapshot_tests() else 1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test del backend de estado SQLite (state_store).
+
+Comprueba la descomposición documento <-> filas por entidad (listas con campo
+identificador, diccionarios de objetos y documentos anidados como
+config/expect/state.json) y que al guardar solo se reescriben las filas
+modificadas. Usa una base temporal: no requiere sudo ni el servicio activo.
+"""
+import sys
+import os
+import json
+import tempfile
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.utils.global_helpers.state_store import SQLiteStateStore, compose, decompose
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+def run_state_store_tests():
+    print("--- Running SQLite State Store Tests ---")
+    results = []
+
+    # 1. Lista de VLANs: una fila por VLAN, clave 'id'
+    vlans = {"status": 1, "vlans": [{"id": 1, "name": "Management"}, {"id": 10, "name": "Oficina"}]}
+    meta, rows = decompose(vlans)
+    check(results, "1. vlans.json por entidad",
+          sorted(rows) == [("vlans", "1"), ("vlans", "10")] and compose(meta, rows) == vlans)
+
+    # 2. state.json de expect: una fila por switch, no una única entidad raíz
+    state = {"switches": {
+        "192.168.1.2": {"mac_acl": {"aa:bb:cc:dd:ee:01": {"rule_id": "1"}}, "active_blacklist_acl_id": "100"},
+        "192.168.1.3": {"mac_acl": {}, "active_blacklist_acl_id": "101"},
+    }}
+    meta, rows = decompose(state)
+    check(results, "2. state.json: una fila por switch",
+          sorted(rows) == [("switches", "192.168.1.2"), ("switches", "192.168.1.3")]
+          and compose(meta, rows) == state, str(sorted(rows)))
+
+    # 3. Diccionario de entidades en la raíz (sin colecciones anidadas)
+    leases = {"aa:bb:cc:dd:ee:01": {"ip": "192.168.10.5"}, "aa:bb:cc:dd:ee:02": {"ip": "192.168.10.6"}}
+    meta, rows = decompose(leases)
+    check(results, "3. Colección raíz", len(rows) == 2 and compose(meta, rows) == leases)
+
+    # 4. Guardado incremental: cambiar un switch reescribe su fila y el documento
+    tmp = tempfile.mkdtemp(prefix="jsbach-state-")
+    config_dir = os.path.join(tmp, "config")
+    os.makedirs(os.path.join(config_dir, "expect"))
+    path = os.path.join(config_dir, "expect", "state.json")
+    with open(path, "w") as f:
+        json.dump(state, f)
+    store = SQLiteStateStore(os.path.join(config_dir, "state.db"), config_dir)
+    imported = store.load(path)
+    imported["switches"]["192.168.1.3"]["active_blacklist_acl_id"] = "102"
+    written = store.save(path, imported)
+    reread = SQLiteStateStore(os.path.join(config_dir, "state.db"), config_dir).load(path)
+    entities = store._conn().execute("SELECT COUNT(*) FROM entities WHERE path = ?", (path,)).fetchone()[0]
+    check(results, "4. Solo se escriben las filas modificadas",
+          imported == reread and written == 2 and entities == 2,
+          f"{written} filas escritas, {entities} entidades")
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_state_store_tests() else 1)
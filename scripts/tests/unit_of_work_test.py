@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test de la unidad de trabajo de configuración (unit_of_work).
+
+Comprueba que las escrituras de una acción se preparan en memoria, que se
+confirman una sola vez y que dos acciones asíncronas concurrentes sobre el
+mismo fichero no pierden cambios (fusión a tres bandas al confirmar).
+Trabaja sobre ficheros temporales: no requiere sudo ni el servicio activo.
+"""
+import sys
+import os
+import json
+import asyncio
+import tempfile
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.utils.global_helpers.module_helpers import load_json_config, save_json_config
+from app.utils.global_helpers.unit_of_work import config_unit_of_work, merge_json
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+def read_disk(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+async def add_vlan(path, vlan_id, delay):
+    """Acción asíncrona: lee, espera (await) y guarda una VLAN nueva."""
+    with config_unit_of_work():
+        cfg = load_json_config(path, {"status": 0, "vlans": []})
+        await asyncio.sleep(delay)
+        cfg["vlans"].append({"id": vlan_id, "name": f"VLAN{vlan_id}"})
+        save_json_config(path, cfg)
+
+
+async def set_status(path, status, delay):
+    with config_unit_of_work():
+        cfg = load_json_config(path, {})
+        await asyncio.sleep(delay)
+        cfg["status"] = status
+        save_json_config(path, cfg)
+
+
+def run_uow_tests():
+    print("--- Running Config Unit of Work Tests ---")
+    results = []
+    tmp = tempfile.mkdtemp(prefix="jsbach-uow-")
+    path = os.path.join(tmp, "vlans.json")
+    with open(path, "w") as f:
+        json.dump({"status": 1, "vlans": [{"id": 1, "name": "Management"}]}, f)
+
+    # 1. Los cambios se preparan en memoria y se escriben al salir
+    with config_unit_of_work() as uow:
+        cfg = load_json_config(path)
+        cfg["vlans"].append({"id": 10, "name": "Oficina"})
+        save_json_config(path, cfg)
+        staged = load_json_config(path)
+        on_disk = read_disk(path)
+    check(results, "1. Escritura diferida hasta el commit",
+          len(staged["vlans"]) == 2 and len(on_disk["vlans"]) == 1
+          and len(read_disk(path)["vlans"]) == 2 and uow.written == [path])
+
+    # 2. Acciones asíncronas concurrentes sobre el mismo fichero
+    async def concurrent():
+        await asyncio.gather(add_vlan(path, 20, 0.05), add_vlan(path, 30, 0.01), set_status(path, 0, 0.03))
+
+    asyncio.run(concurrent())
+    final = read_disk(path)
+    ids = sorted(v["id"] for v in final["vlans"])
+    check(results, "2. Acciones concurrentes sin pérdida de cambios",
+          ids == [1, 10, 20, 30] and final["status"] == 0, f"ids={ids} status={final['status']}")
+
+    # 3. Fusión a tres bandas: borrado por clave, conflicto (prevalece la acción)
+    base = {"vlans": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}], "mode": "x"}
+    ours = {"vlans": [{"id": 1, "name": "a"}], "mode": "y"}
+    theirs = {"vlans": [{"id": 1, "name": "a2"}, {"id": 2, "name": "b"}, {"id": 3, "name": "c"}], "mode": "z"}
+    merged = merge_json(base, ours, theirs)
+    check(results, "3. merge_json por entidades",
+          merged == {"vlans": [{"id": 1, "name": "a2"}, {"id": 3, "name": "c"}], "mode": "y"}, str(merged))
+
+    # 4. Unidad reentrante: la acción interna comparte la externa
+    with config_unit_of_work() as outer:
+        with config_unit_of_work() as inner:
+            pass
+    check(results, "4. Contexto reentrante", outer is inner)
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_uow_tests() else 1)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test de los vales del portal cautivo (wifi/vouchers).
+
+Comprueba la firma HMAC de los códigos, el canje con límite de dispositivos,
+la reserva de MACs hasta que el portal confirma la autorización y la recarga
+de lotes con el backend de estado SQLite. Trabaja en un directorio temporal:
+no requiere sudo ni el servicio activo.
+"""
+import sys
+import os
+import json
+import tempfile
+
+# Añadir el directorio raíz al path para importar módulos de JSBach
+BASE_DIR = "/opt/JSBach"
+sys.path.append(BASE_DIR)
+
+from app.modules.wifi import vouchers
+from app.utils.global_helpers import state_store
+
+
+def check(results, name, ok, detail=""):
+    results.append((name, ok))
+    print(f"{'✅' if ok else '❌'} {name}{': ' + detail if detail else ''}")
+
+
+def use_temp_config():
+    config_dir = os.path.join(tempfile.mkdtemp(prefix="jsbach-vouchers-"), "config")
+    vouchers.CONFIG_DIR = os.path.join(config_dir, "wifi")
+    vouchers.KEY_FILE = os.path.join(vouchers.CONFIG_DIR, "voucher.key")
+    vouchers.VOUCHERS_FILE = os.path.join(vouchers.CONFIG_DIR, "vouchers.json")
+    vouchers.USAGE_FILE = os.path.join(vouchers.CONFIG_DIR, "voucher_usage.json")
+    return config_dir
+
+
+def run_voucher_tests():
+    print("--- Running Captive Portal Voucher Tests ---")
+    results = []
+    config_dir = use_temp_config()
+
+    # 1. Firma: ida y vuelta, tolerancia al teclear y códigos manipulados
+    key = vouchers.load_key(create=True)
+    code = vouchers.make_code(key, 1234)
+    typed = code.lower().replace("-", " ").replace("O", "0").replace("I", "1")
+    tampered = code[:-1] + ("A" if code[-1] != "A" else "B")
+    other_key = bytes(32)
+    check(results, "1. Firma HMAC de los códigos",
+          vouchers.parse_code(key, code) == 1234 and vouchers.parse_code(key, typed) == 1234
+          and vouchers.parse_code(key, tampered) is None and vouchers.parse_code(other_key, code) is None
+          and vouchers.parse_code(key, "ABCD") is None, code)
+
+    # 2. Lote y validación rápida
+    batch, codes = vouchers.generate_batch(3, max_devices=2, duration_minutes=60)
+    registry = vouchers.VoucherRegistry()
+    outside = vouchers.make_code(key, batch["first_serial"] + batch["count"])
+    check(results, "2. Vales del lote válidos, fuera del lote no",
+          all(registry.check(c) is not None for c in codes) and registry.check(outside) is None)
+
+    # 3. Límite de dispositivos por vale
+    ok1, _, expires = registry.redeem(codes[0], "aa:aa:aa:aa:aa:01")
+    ok2, _, _ = registry.redeem(codes[0], "aa:aa:aa:aa:aa:02")
+    ok3, msg3, _ = registry.redeem(codes[0], "aa:aa:aa:aa:aa:03")
+    again, _, _ = registry.redeem(codes[0], "aa:aa:aa:aa:aa:01")
+    check(results, "3. Máximo de dispositivos", ok1 and ok2 and not ok3 and again and expires, msg3)
+
+    # 4. Autorización fallida: la MAC y el primer uso no se registran
+    registry.release(codes[0], "aa:aa:aa:aa:aa:02")
+    ok4, _, _ = registry.redeem(codes[0], "aa:aa:aa:aa:aa:03")
+    registry.redeem(codes[1], "bb:bb:bb:bb:bb:01")
+    registry.release(codes[1], "bb:bb:bb:bb:bb:01")
+    registry.confirm(codes[0], "aa:aa:aa:aa:aa:01")
+    registry.persist(force=True)
+    with open(vouchers.USAGE_FILE) as f:
+        stored = json.load(f)["vouchers"]
+    serial0 = str(batch["first_serial"])
+    check(results, "4. Reserva hasta confirmar la autorización",
+          ok4 and list(stored) == [serial0] and stored[serial0]["macs"] == ["aa:aa:aa:aa:aa:01"], str(stored))
+
+    # 5. Recarga de lotes con el backend SQLite (sin fichero vouchers.json que cambie)
+    state_store._store = state_store.SQLiteStateStore(os.path.join(config_dir, "state.db"), config_dir)
+    registry = vouchers.VoucherRegistry()
+    before = registry.check(codes[2]) is not None
+    vouchers.remove_batch(batch["id"])
+    registry._checked = 0.0
+    after = registry.check(codes[2]) is not None
+    new_batch, new_codes = vouchers.generate_batch(1)
+    registry._checked = 0.0
+    check(results, "5. Recarga de lotes desde SQLite",
+          before and not after and registry.check(new_codes[0]) == new_batch["first_serial"])
+    state_store._store = None
+
+    passed = sum(1 for _, ok in results if ok)
+    print(f"\n{passed}/{len(results)} tests superados")
+    return passed == len(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_voucher_tests() else 1)
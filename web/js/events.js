@@ -0,0 +1,71 @@
+/* /web/js/events.js */
+
+/**
+ * Suscripción a los eventos del servidor (/admin/events, SSE).
+ * Si EventSource no está disponible o la conexión falla de forma permanente,
+ * se vuelve al sondeo de /admin/status.
+ */
+const JSB_EVENTS_FALLBACK_MS = 5000;
+
+let jsbEventSource = null;
+let jsbPollTimer = null;
+const jsbStatusHandlers = [];
+const jsbEventHandlers = { action: [], config: [] };
+
+function jsbDispatch(list, payload) {
+    list.forEach(handler => {
+        try { handler(payload); } catch (e) { console.error('Error en manejador de eventos:', e); }
+    });
+}
+
+function jsbPollStatus() {
+    clearTimeout(jsbPollTimer);
+    fetch('/admin/status', { credentials: 'include' })
+        .then(response => response.json())
+        .then(data => jsbDispatch(jsbStatusHandlers, data))
+        .catch(() => { })
+        .finally(() => {
+            jsbPollTimer = setTimeout(jsbPollStatus, JSB_EVENTS_FALLBACK_MS);
+        });
+}
+
+function jsbConnectEvents() {
+    if (jsbEventSource || jsbPollTimer) return;
+    if (!window.EventSource) {
+        jsbPollStatus();
+        return;
+    }
+
+    jsbEventSource = new EventSource('/admin/events', { withCredentials: true });
+
+    jsbEventSource.addEventListener('status', (e) => {
+        jsbDispatch(jsbStatusHandlers, JSON.parse(e.data).statuses);
+    });
+    ['action', 'config'].forEach(type => {
+        jsbEventSource.addEventListener(type, (e) => jsbDispatch(jsbEventHandlers[type], JSON.parse(e.data)));
+    });
+
+    jsbEventSource.onerror = () => {
+        // CLOSED: el navegador no reintentará (p.ej. sesión caducada -> 403)
+        if (jsbEventSource.readyState === EventSource.CLOSED) {
+            jsbEventSource = null;
+            jsbPollStatus();
+        }
+    };
+}
+
+/**
+ * Llama a handler(estados) con el mapa {modulo: 'ACTIVO'|'INACTIVO'|...}
+ * al conectar y en cada transición.
+ */
+function watchModuleStatus(handler) {
+    jsbStatusHandlers.push(handler);
+    jsbConnectEvents();
+}
+
+/** Eventos 'action' ({module, action, phase, success}) y 'config' ({module, file}). */
+function onServerEvent(type, handler) {
+    if (!jsbEventHandlers[type]) return;
+    jsbEventHandlers[type].push(handler);
+    jsbConnectEvents();
+}
@@ -6,53 +6,57 @@ function switchSection(sectionId) {
     console.log("Switching to", sectionId);
 }
 
-// --- STATUS POLLING ---
+// --- STATUS (pushed via /admin/events, see events.js) ---
 let lastWanStatus = null;
 let lastWanConfig = null;
 
+function renderStatus(data) {
+    // Update each card status
+    const modules = ["wan", "nat", "firewall", "vlans", "tagging", "dmz", "ebtables", "expect", "dhcp", "wifi"];
+    modules.forEach(mod => {
+        const status = data[mod] || 'INACTIVO';
+        const indicator = document.getElementById(`status-${mod}`);
+
+        if (indicator) {
+            if (status === 'ACTIVO') {
+                if (!indicator.classList.contains('active')) indicator.className = 'status-indicator active';
+            } else if (status === 'INACTIVO') {
+                if (!indicator.classList.contains('inactive')) indicator.className = 'status-indicator inactive';
+            } else {
+                if (!indicator.classList.contains('unknown')) indicator.className = 'status-indicator unknown';
+            }
+        }
+    });
+
+    // Update WAN specific info only if status changed or info is missing
+    if (data.wan !== lastWanStatus || !lastWanConfig) {
+        updateWanInfo(data.wan);
+        lastWanStatus = data.wan;
+    }
+}
+
 async function refreshStatus() {
     try {
         const response = await fetch('/admin/status', { credentials: 'include' });
         if (!response.ok) throw new Error("Error en la petición");
-
-        const data = await response.json();
-
-        // Update each card status
-        const modules = ["wan", "nat", "firewall", "vlans", "tagging", "dmz", "ebtables", "expect", "dhcp", "wifi"];
-        modules.forEach(mod => {
-            const status = data[mod] || 'INACTIVO';
-            const indicator = document.getElementById(`status-${mod}`);
-
-            if (indicator) {
-                if (status === 'ACTIVO') {
-                    if (!indicator.classList.contains('active')) indicator.className = 'status-indicator active';
-                } else if (status === 'INACTIVO') {
-                    if (!indicator.classList.contains('inactive')) indicator.className = 'status-indicator inactive';
-                } else {
-                    if (!indicator.classList.contains('unknown')) indicator.className = 'status-indicator unknown';
-                }
-            }
-        });
-
-        // Update WAN specific info only if status changed or info is missing
-        if (data.wan !== lastWanStatus || !lastWanConfig) {
-            updateWanInfo(data.wan);
-            lastWanStatus = data.wan;
-        }
+        renderStatus(await response.json());
     } catch (e) {
         console.error("Error refreshing status:", e);
     }
 }
 
-async function updateWanInfo(status) {
+async function updateWanInfo(status, preloaded = null) {
     const infoBox = document.getElementById('wan-interface-info');
     if (!infoBox) return;
 
     if (status === 'ACTIVO') {
         try {
-            // Fetch only if needed or force refresh
-            const response = await fetch('/admin/config/wan/wan.json', { credentials: 'include' });
-            const config = await response.json();
+            // Fetch only if needed or force refresh (summary from /admin/snapshot)
+            let config = preloaded;
+            if (!config) {
+                const response = await fetch('/admin/snapshot?fields=modules.wan', { credentials: 'include' });
+                config = (await response.json()).modules.wan;
+            }
 
             // Only update DOM if configuration actually changed
             const configStr = JSON.stringify(config);
@@ -98,11 +102,32 @@ async function stopAllModules() {
     refreshStatus();
 }
 
+// Statuses and WAN summary in a single request
+async function bootstrapDashboard() {
+    try {
+        const response = await fetch('/admin/snapshot?fields=statuses,modules.wan', { credentials: 'include' });
+        if (!response.ok) throw new Error("Error en la petición");
+        const snapshot = await response.json();
+        lastWanStatus = snapshot.statuses.wan;
+        await updateWanInfo(lastWanStatus, snapshot.modules.wan);
+        renderStatus(snapshot.statuses);
+    } catch (e) {
+        console.error("Error loading dashboard snapshot:", e);
+    }
+}
+
 // --- INITIALIZATION ---
-window.addEventListener('DOMContentLoaded', () => {
-    // Initial status check
-    refreshStatus();
+window.addEventListener('DOMContentLoaded', async () => {
+    await bootstrapDashboard();
 
-    // Polling status every 5 seconds
-    setInterval(refreshStatus, 5000);
+    // Live updates (falls back to polling every 5 seconds)
+    watchModuleStatus(renderStatus);
+
+    // WAN interface/mode changed while active
+    onServerEvent('config', (evt) => {
+        if (evt.file === 'wan/wan.json' && lastWanStatus === 'ACTIVO') {
+            lastWanConfig = null;
+            updateWanInfo(lastWanStatus);
+        }
+    });
 });
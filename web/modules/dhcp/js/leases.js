@@ -1,20 +1,44 @@
 /* /web/modules/dhcp/js/leases.js */
 
-async function fetchLeases() {
+const LEASE_PAGE_SIZE = 100;
+let leasePage = 1;
+let leaseSearchTimer = null;
+
+function searchLeases() {
+    // Esperar a que el usuario deje de teclear antes de consultar
+    clearTimeout(leaseSearchTimer);
+    leaseSearchTimer = setTimeout(() => fetchLeases(1), 250);
+}
+
+async function fetchLeases(page = leasePage) {
     const tbody = document.getElementById('leases-body');
+    leasePage = Math.max(1, page);
     tbody.innerHTML = '<tr><td colspan="4" class="loading">⏳ Consultando servidor...</td></tr>';
 
     try {
         const response = await fetch('/admin/dhcp', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ action: 'list_leases' }),
+            body: JSON.stringify({
+                action: 'query_leases',
+                params: {
+                    page: leasePage,
+                    page_size: LEASE_PAGE_SIZE,
+                    sort: document.getElementById('lease-sort').value,
+                    search: document.getElementById('lease-search').value.trim()
+                }
+            }),
             credentials: 'include'
         });
         const data = await response.json();
 
         if (data.success) {
-            const leases = data.message;
+            const result = data.message;
+            const leases = result.leases;
+            const pages = Math.max(1, Math.ceil(result.total / result.page_size));
+            document.getElementById('lease-page-info').textContent = `Página ${result.page} de ${pages} (${result.total} concesiones)`;
+            document.getElementById('lease-prev').disabled = result.page <= 1;
+            document.getElementById('lease-next').disabled = result.page >= pages;
             if (leases.length === 0) {
                 tbody.innerHTML = '<tr><td colspan="4" style="text-align:center; padding: 20px; color: var(--text-secondary);">No hay concesiones activas en este momento.</td></tr>';
                 return;
@@ -40,4 +64,4 @@ async function fetchLeases() {
     }
 }
 
-window.addEventListener('DOMContentLoaded', fetchLeases);
+window.addEventListener('DOMContentLoaded', () => fetchLeases(1));
@@ -19,26 +19,22 @@ async function loadLoggingStatus() {
     } catch (e) { }
 }
 
-// Polling for module status box
+// Module status box (pushed via /admin/events)
 let lastStatus = '';
+function renderModuleStatus(data) {
+    const status = data['dhcp'] || 'DESCONOCIDO';
+    if (status !== lastStatus) {
+        lastStatus = status;
+        const statusBox = document.getElementById('module-status');
+        if (statusBox) {
+            statusBox.textContent = `Estado: ${status}`;
+            statusBox.className = 'status-box ' + status.toLowerCase();
+        }
+    }
+}
+
 function fetchModuleStatus() {
-    fetch('/admin/status', { credentials: 'include' })
-        .then(response => response.json())
-        .then(data => {
-            const status = data['dhcp'] || 'DESCONOCIDO';
-            if (status !== lastStatus) {
-                lastStatus = status;
-                const statusBox = document.getElementById('module-status');
-                if (statusBox) {
-                    statusBox.textContent = `Estado: ${status}`;
-                    statusBox.className = 'status-box ' + status.toLowerCase();
-                }
-            }
-            setTimeout(fetchModuleStatus, 5000);
-        })
-        .catch(() => {
-            setTimeout(fetchModuleStatus, 5000);
-        });
+    watchModuleStatus(renderModuleStatus);
 }
 
 window.addEventListener('DOMContentLoaded', () => {
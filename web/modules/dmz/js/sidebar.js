@@ -19,51 +19,46 @@ async function loadLoggingStatus() {
     } catch (e) { }
 }
 
-// Polling for module status and dependencies
+// Module status and dependencies (pushed via /admin/events)
 let lastStatus = '';
-function fetchModuleStatus() {
-    fetch('/admin/status', { credentials: 'include' })
-        .then(response => response.json())
-        .then(data => {
-            const status = data['dmz'] || 'DESCONOCIDO';
-            if (status !== lastStatus) {
-                lastStatus = status;
-                const statusBox = document.getElementById('module-status');
-                if (statusBox) {
-                    statusBox.textContent = `Estado: ${status}`;
-                    statusBox.className = 'status-box ' + status.toLowerCase();
-                }
-            }
+function renderModuleStatus(data) {
+    const status = data['dmz'] || 'DESCONOCIDO';
+    if (status !== lastStatus) {
+        lastStatus = status;
+        const statusBox = document.getElementById('module-status');
+        if (statusBox) {
+            statusBox.textContent = `Estado: ${status}`;
+            statusBox.className = 'status-box ' + status.toLowerCase();
+        }
+    }
 
-            const taggingStatus = data['tagging'] || 'DESCONOCIDO';
-            const depTagging = document.getElementById('dep-tagging');
-            if (depTagging) {
-                if (taggingStatus === 'ACTIVO') {
-                    depTagging.innerHTML = '✅ Tagging: Activo';
-                    depTagging.style.color = 'var(--success)';
-                } else {
-                    depTagging.innerHTML = `❌ Tagging: ${taggingStatus}`;
-                    depTagging.style.color = 'var(--error)';
-                }
-            }
+    const taggingStatus = data['tagging'] || 'DESCONOCIDO';
+    const depTagging = document.getElementById('dep-tagging');
+    if (depTagging) {
+        if (taggingStatus === 'ACTIVO') {
+            depTagging.innerHTML = '✅ Tagging: Activo';
+            depTagging.style.color = 'var(--success)';
+        } else {
+            depTagging.innerHTML = `❌ Tagging: ${taggingStatus}`;
+            depTagging.style.color = 'var(--error)';
+        }
+    }
 
-            const firewallStatus = data['firewall'] || 'DESCONOCIDO';
-            const depFirewall = document.getElementById('dep-firewall');
-            if (depFirewall) {
-                if (firewallStatus === 'ACTIVO') {
-                    depFirewall.innerHTML = '✅ Firewall: Activo';
-                    depFirewall.style.color = 'var(--success)';
-                } else {
-                    depFirewall.innerHTML = `❌ Firewall: ${firewallStatus}`;
-                    depFirewall.style.color = 'var(--error)';
-                }
-            }
+    const firewallStatus = data['firewall'] || 'DESCONOCIDO';
+    const depFirewall = document.getElementById('dep-firewall');
+    if (depFirewall) {
+        if (firewallStatus === 'ACTIVO') {
+            depFirewall.innerHTML = '✅ Firewall: Activo';
+            depFirewall.style.color = 'var(--success)';
+        } else {
+            depFirewall.innerHTML = `❌ Firewall: ${firewallStatus}`;
+            depFirewall.style.color = 'var(--error)';
+        }
+    }
+}
 
-            setTimeout(fetchModuleStatus, 5000);
-        })
-        .catch(() => {
-            setTimeout(fetchModuleStatus, 5000);
-        });
+function fetchModuleStatus() {
+    watchModuleStatus(renderModuleStatus);
 }
 
 window.addEventListener('DOMContentLoaded', () => {
@@ -19,49 +19,44 @@ async function loadLoggingStatus() {
     } catch (e) { }
 }
 
-// Polling for module status and dependencies
+// Module status and dependencies (pushed via /admin/events)
 let lastStatus = '';
-function fetchModuleStatus() {
-    fetch('/admin/status', { credentials: 'include' })
-        .then(response => response.json())
-        .then(data => {
-            // Module Status
-            const status = data['ebtables'] || 'DESCONOCIDO';
-            if (status !== lastStatus) {
-                lastStatus = status;
-                const statusBox = document.getElementById('module-status');
-                if (statusBox) {
-                    statusBox.textContent = `Estado: ${status}`;
-                    statusBox.className = 'status-box ' + status.toLowerCase();
-                }
-            }
+function renderModuleStatus(data) {
+    // Module Status
+    const status = data['ebtables'] || 'DESCONOCIDO';
+    if (status !== lastStatus) {
+        lastStatus = status;
+        const statusBox = document.getElementById('module-status');
+        if (statusBox) {
+            statusBox.textContent = `Estado: ${status}`;
+            statusBox.className = 'status-box ' + status.toLowerCase();
+        }
+    }
 
-            // Dependency Mapping
-            const deps = {
-                'wan': 'dep-wan',
-                'vlans': 'dep-vlans',
-                'tagging': 'dep-tagging'
-            };
+    // Dependency Mapping
+    const deps = {
+        'wan': 'dep-wan',
+        'vlans': 'dep-vlans',
+        'tagging': 'dep-tagging'
+    };
 
-            for (const [mod, elementId] of Object.entries(deps)) {
-                const modStatus = data[mod] || 'DESCONOCIDO';
-                const el = document.getElementById(elementId);
-                if (el) {
-                    if (modStatus === 'ACTIVO') {
-                        el.innerHTML = `✅ ${mod.toUpperCase()}: Activo`;
-                        el.style.color = 'var(--success)';
-                    } else {
-                        el.innerHTML = `❌ ${mod.toUpperCase()}: ${modStatus}`;
-                        el.style.color = 'var(--error)';
-                    }
-                }
+    for (const [mod, elementId] of Object.entries(deps)) {
+        const modStatus = data[mod] || 'DESCONOCIDO';
+        const el = document.getElementById(elementId);
+        if (el) {
+            if (modStatus === 'ACTIVO') {
+                el.innerHTML = `✅ ${mod.toUpperCase()}: Activo`;
+                el.style.color = 'var(--success)';
+            } else {
+                el.innerHTML = `❌ ${mod.toUpperCase()}: ${modStatus}`;
+                el.style.color = 'var(--error)';
             }
+        }
+    }
+}
 
-            setTimeout(fetchModuleStatus, 5000);
-        })
-        .catch(() => {
-            setTimeout(fetchModuleStatus, 5000);
-        });
+function fetchModuleStatus() {
+    watchModuleStatus(renderModuleStatus);
 }
 
 window.addEventListener('DOMContentLoaded', () => {
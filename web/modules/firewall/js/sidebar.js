@@ -19,54 +19,49 @@ async function loadLoggingStatus() {
     } catch (e) { }
 }
 
-// Polling for module status and dependencies
+// Module status and dependencies (pushed via /admin/events)
 let lastStatus = '';
-function fetchModuleStatus() {
-    fetch('/admin/status', { credentials: 'include' })
-        .then(response => response.json())
-        .then(data => {
-            // Module Status
-            const status = data['firewall'] || 'DESCONOCIDO';
-            if (status !== lastStatus) {
-                lastStatus = status;
-                const statusBox = document.getElementById('module-status');
-                if (statusBox) {
-                    statusBox.textContent = `Estado: ${status}`;
-                    statusBox.className = 'status-box ' + status.toLowerCase();
-                }
-            }
+function renderModuleStatus(data) {
+    // Module Status
+    const status = data['firewall'] || 'DESCONOCIDO';
+    if (status !== lastStatus) {
+        lastStatus = status;
+        const statusBox = document.getElementById('module-status');
+        if (statusBox) {
+            statusBox.textContent = `Estado: ${status}`;
+            statusBox.className = 'status-box ' + status.toLowerCase();
+        }
+    }
 
-            // VLANs Dependency
-            const vlansStatus = data['vlans'] || 'DESCONOCIDO';
-            const depVlans = document.getElementById('dep-vlans');
-            if (depVlans) {
-                if (vlansStatus === 'ACTIVO') {
-                    depVlans.innerHTML = '✅ VLANs: Activo';
-                    depVlans.style.color = 'var(--success)';
-                } else {
-                    depVlans.innerHTML = `❌ VLANs: ${vlansStatus}`;
-                    depVlans.style.color = 'var(--error)';
-                }
-            }
+    // VLANs Dependency
+    const vlansStatus = data['vlans'] || 'DESCONOCIDO';
+    const depVlans = document.getElementById('dep-vlans');
+    if (depVlans) {
+        if (vlansStatus === 'ACTIVO') {
+            depVlans.innerHTML = '✅ VLANs: Activo';
+            depVlans.style.color = 'var(--success)';
+        } else {
+            depVlans.innerHTML = `❌ VLANs: ${vlansStatus}`;
+            depVlans.style.color = 'var(--error)';
+        }
+    }
 
-            // Tagging Dependency
-            const taggingStatus = data['tagging'] || 'DESCONOCIDO';
-            const depTagging = document.getElementById('dep-tagging');
-            if (depTagging) {
-                if (taggingStatus === 'ACTIVO') {
-                    depTagging.innerHTML = '✅ Tagging: Activo';
-                    depTagging.style.color = 'var(--success)';
-                } else {
-                    depTagging.innerHTML = `❌ Tagging: ${taggingStatus}`;
-                    depTagging.style.color = 'var(--error)';
-                }
-            }
+    // Tagging Dependency
+    const taggingStatus = data['tagging'] || 'DESCONOCIDO';
+    const depTagging = document.getElementById('dep-tagging');
+    if (depTagging) {
+        if (taggingStatus === 'ACTIVO') {
+            depTagging.innerHTML = '✅ Tagging: Activo';
+            depTagging.style.color = 'var(--success)';
+        } else {
+            depTagging.innerHTML = `❌ Tagging: ${taggingStatus}`;
+            depTagging.style.color = 'var(--error)';
+        }
+    }
+}
 
-            setTimeout(fetchModuleStatus, 5000);
-        })
-        .catch(() => {
-            setTimeout(fetchModuleStatus, 5000);
-        });
+function fetchModuleStatus() {
+    watchModuleStatus(renderModuleStatus);
 }
 
 window.addEventListener('DOMContentLoaded', () => {
@@ -19,39 +19,34 @@ async function loadLoggingStatus() {
     } catch (e) { }
 }
 
-// Polling for module status and dependencies
+// Module status and dependencies (pushed via /admin/events)
 let lastStatus = '';
-function fetchModuleStatus() {
-    fetch('/admin/status', { credentials: 'include' })
-        .then(response => response.json())
-        .then(data => {
-            const status = data['nat'] || 'DESCONOCIDO';
-            if (status !== lastStatus) {
-                lastStatus = status;
-                const statusBox = document.getElementById('module-status');
-                if (statusBox) {
-                    statusBox.textContent = `Estado: ${status}`;
-                    statusBox.className = 'status-box ' + status.toLowerCase();
-                }
-            }
+function renderModuleStatus(data) {
+    const status = data['nat'] || 'DESCONOCIDO';
+    if (status !== lastStatus) {
+        lastStatus = status;
+        const statusBox = document.getElementById('module-status');
+        if (statusBox) {
+            statusBox.textContent = `Estado: ${status}`;
+            statusBox.className = 'status-box ' + status.toLowerCase();
+        }
+    }
 
-            const wanStatus = data['wan'] || 'DESCONOCIDO';
-            const depWan = document.getElementById('dep-wan');
-            if (depWan) {
-                if (wanStatus === 'ACTIVO') {
-                    depWan.innerHTML = '✅ WAN: Activo';
-                    depWan.style.color = 'var(--success)';
-                } else {
-                    depWan.innerHTML = `❌ WAN: ${wanStatus}`;
-                    depWan.style.color = 'var(--error)';
-                }
-            }
+    const wanStatus = data['wan'] || 'DESCONOCIDO';
+    const depWan = document.getElementById('dep-wan');
+    if (depWan) {
+        if (wanStatus === 'ACTIVO') {
+            depWan.innerHTML = '✅ WAN: Activo';
+            depWan.style.color = 'var(--success)';
+        } else {
+            depWan.innerHTML = `❌ WAN: ${wanStatus}`;
+            depWan.style.color = 'var(--error)';
+        }
+    }
+}
 
-            setTimeout(fetchModuleStatus, 5000);
-        })
-        .catch(() => {
-            setTimeout(fetchModuleStatus, 5000);
-        });
+function fetchModuleStatus() {
+    watchModuleStatus(renderModuleStatus);
 }
 
 window.addEventListener('DOMContentLoaded', () => {
@@ -31,6 +31,9 @@ async function loadConfig() {
             if (document.getElementById('portal-users-table')) {
                 await loadPortalUsers();
             }
+            if (document.getElementById('voucher-batches-table')) {
+                await loadVoucherBatches();
+            }
         }
     } catch (error) {
         console.error("Error cargando configuración wifi:", error);
@@ -307,6 +310,88 @@ async function removePortalUser(username) {
     }
 }
 
+async function wifiAction(action, params) {
+    const response = await fetch('/admin/wifi', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ action, params }),
+        credentials: 'include'
+    });
+    return response.json();
+}
+
+async function loadVoucherBatches() {
+    const tableBody = document.getElementById('voucher-batches-table');
+    if (!tableBody) return;
+
+    try {
+        const data = await wifiAction('list_vouchers', {});
+        if (!data.success || !Array.isArray(data.message)) {
+            tableBody.innerHTML = '<tr><td colspan="7" style="text-align: center; padding: 20px; color: var(--error);">Error al cargar vales</td></tr>';
+            return;
+        }
+        if (data.message.length === 0) {
+            tableBody.innerHTML = '<tr><td colspan="7" style="text-align: center; padding: 20px; color: var(--text-secondary);">No hay lotes generados</td></tr>';
+            return;
+        }
+        tableBody.innerHTML = '';
+        data.message.forEach(batch => {
+            const tr = document.createElement('tr');
+            tr.innerHTML = `
+                <td><strong>#${batch.id}</strong></td>
+                <td>${batch.count}</td>
+                <td>${batch.used} (${batch.devices} disp.)</td>
+                <td>${batch.max_devices}</td>
+                <td>${batch.duration_minutes} min</td>
+                <td style="color: var(--text-secondary); font-size: 0.85rem;"></td>
+                <td>
+                    <button class="btn btn-red" onclick="removeVoucherBatch(${batch.id})" style="padding: 5px 10px; font-size: 0.8rem;">Eliminar</button>
+                </td>
+            `;
+            tr.children[5].textContent = batch.note || '';
+            tableBody.appendChild(tr);
+        });
+    } catch (error) {
+        tableBody.innerHTML = '<tr><td colspan="7" style="text-align: center; padding: 20px; color: var(--error);">Error de conexión</td></tr>';
+    }
+}
+
+async function generateVouchers() {
+    const params = {
+        count: parseInt(document.getElementById('v-count').value, 10),
+        max_devices: parseInt(document.getElementById('v-devices').value, 10),
+        duration_minutes: parseInt(document.getElementById('v-duration').value, 10),
+        note: document.getElementById('v-note').value
+    };
+    try {
+        const data = await wifiAction('generate_vouchers', params);
+        if (data.success) {
+            const codes = document.getElementById('voucher-codes');
+            codes.value = data.message.codes.join('\n');
+            codes.style.display = 'block';
+            await loadVoucherBatches();
+        } else {
+            alert("Error: " + (data.message || data.detail));
+        }
+    } catch (error) {
+        alert("Error de conexión");
+    }
+}
+
+async function removeVoucherBatch(batchId) {
+    if (!confirm(`¿Eliminar el lote #${batchId}? Sus vales dejarán de funcionar.`)) return;
+    try {
+        const data = await wifiAction('remove_voucher_batch', { batch: batchId });
+        if (data.success) {
+            await loadVoucherBatches();
+        } else {
+            alert("Error: " + (data.message || data.detail));
+        }
+    } catch (error) {
+        alert("Error de conexión");
+    }
+}
+
 async function saveConfig() {
     const msgDiv = document.getElementById('config-message');
     const btn = document.getElementById('btnSaveConfig');
@@ -18,25 +18,21 @@ async function loadLoggingStatus() {
 }
 
 let lastStatus = '';
+function renderModuleStatus(data) {
+    let status = data['wifi'] || 'DESCONOCIDO';
+    if (status !== lastStatus) {
+        lastStatus = status;
+        const statusBox = document.getElementById('module-status');
+        if (statusBox) {
+            statusBox.textContent = `Estado: ${status}`;
+            const statusClass = status.split(' ')[0].toLowerCase();
+            statusBox.className = 'status-box ' + statusClass;
+        }
+    }
+}
+
 function fetchModuleStatus() {
-    fetch('/admin/status', { credentials: 'include' })
-        .then(response => response.json())
-        .then(data => {
-            let status = data['wifi'] || 'DESCONOCIDO';
-            if (status !== lastStatus) {
-                lastStatus = status;
-                const statusBox = document.getElementById('module-status');
-                if (statusBox) {
-                    statusBox.textContent = `Estado: ${status}`;
-                    const statusClass = status.split(' ')[0].toLowerCase();
-                    statusBox.className = 'status-box ' + statusClass;
-                }
-            }
-            setTimeout(fetchModuleStatus, 5000);
-        })
-        .catch(() => {
-            setTimeout(fetchModuleStatus, 5000);
-        });
+    watchModuleStatus(renderModuleStatus);
 }
 
 window.addEventListener('DOMContentLoaded', () => {
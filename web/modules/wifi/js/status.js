@@ -6,6 +6,36 @@ function escapeHtml(text) {
     return div.innerHTML.replace(/\n/g, '<br>');
 }
 
+function formatBytes(value) {
+    if (value === null || value === undefined) return '-';
+    const units = ['B', 'KB', 'MB', 'GB'];
+    let i = 0;
+    while (value >= 1024 && i < units.length - 1) { value /= 1024; i++; }
+    return `${value.toFixed(i ? 1 : 0)} ${units[i]}`;
+}
+
+function renderStations(stations) {
+    if (stations.length === 0) {
+        return '<div style="color: var(--text-secondary); padding: 20px; text-align: center;">No hay clientes conectados</div>';
+    }
+    const rows = stations.map(sta => `
+        <tr>
+            <td><strong>${escapeHtml(sta.mac)}</strong></td>
+            <td>${sta.signal !== null ? sta.signal + ' dBm' : '-'}</td>
+            <td>${formatBytes(sta.rx_bytes)} / ${formatBytes(sta.tx_bytes)}</td>
+            <td>${sta.connected_time !== null ? Math.floor(sta.connected_time / 60) + ' min' : '-'}</td>
+            <td>${sta.authorized ? '✅' : '⏳'}</td>
+            <td>${sta.portal_authorized === null ? '-' : (sta.portal_authorized ? '✅' : '🔒')}</td>
+        </tr>`).join('');
+    return `
+        <table class="vlan-table">
+            <thead>
+                <tr><th>MAC</th><th>Señal</th><th>RX / TX</th><th>Conectado</th><th>Autorizado</th><th>Portal</th></tr>
+            </thead>
+            <tbody>${rows}</tbody>
+        </table>`;
+}
+
 async function runAction(action) {
     const container = document.getElementById('status-container');
     if (!container) return;
@@ -21,7 +51,12 @@ async function runAction(action) {
         });
         const data = await response.json();
 
-        if (response.ok && data.success) {
+        if (response.ok && data.success && Array.isArray(data.message)) {
+            container.innerHTML = `
+                <div style="color: var(--success); font-weight: 600; margin-bottom: 15px; font-size: 1.1rem;">📶 Clientes conectados: ${data.message.length}</div>
+                ${renderStations(data.message)}
+            `;
+        } else if (response.ok && data.success) {
             let statusColor = 'var(--success)';
             let statusIcon = '✅';
 